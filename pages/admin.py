@@ -1,12 +1,20 @@
 import streamlit as st
-from utils.ui import hide_sidebar
+from utils.ui import hide_sidebar, show_confirmation_steps
 
 # Apply global hide-sidebar config for consistent layout
 hide_sidebar()
 from datetime import datetime, timedelta
-from utils.database import supabase
-from utils.email import send_email, send_admin_email
-from utils.session import restore_session_from_refresh, set_auth_user_password
+from utils.matching import candidate_tutors_for_bookings
+from utils.reference_cache import tutors_cache, parents_cache
+from utils.email import send_email
+from utils.outbox import queue_email, queue_admin_email
+from utils.session import restore_remembered_session, await_restored_session, remember_session, set_auth_user_password, get_session_client
+from utils.booking_changes import mark_bookings_changed
+from utils.schema import writable_payload
+from utils.confirmation import ConfirmationPipeline, remember_steps, pop_steps
+
+# Queries run as the signed-in admin, so row-level security applies to them
+supabase = get_session_client()
 
 # If a one-time refresh token was pushed into the URL (tp_rt), try restoring session
 try:
@@ -33,30 +41,26 @@ try:
 except Exception:
     pass
 
-if params.get('tp_rt'):
+# The token exchange runs in the background (utils.token_store); the page
+# renders meanwhile and reruns when it is done
+if params.get('tp_rt') and not st.session_state.get('authenticated'):
     token = params.get('tp_rt')[0]
     restored = None
     try:
-        restored = restore_session_from_refresh(token)
+        restored = restore_remembered_session(token, 'admin')
     except Exception:
         restored = None
 
-    if restored and restored.get('user'):
-        st.session_state['authenticated'] = True
-        st.session_state['user'] = restored.get('user')
-        st.session_state['role'] = 'admin'
-        st.session_state['email'] = restored.get('user', {}).get('email')
+    if restored == 'restored':
         try:
-            st.query_params
-        except Exception:
-            pass
-        try:
-            st.experimental_rerun()
+            st.rerun()
         except Exception:
             try:
                 st.markdown("<script>window.location.reload()</script>", unsafe_allow_html=True)
             except Exception:
                 pass
+    elif restored == 'pending':
+        await_restored_session(token)
 
 st.title("Admin Portal")
 
@@ -124,12 +128,17 @@ with tab1:
 
     if st.button("Login"):
         try:
-            res = supabase.auth.sign_in_with_password({"email": admin_email, "password": admin_password})
+            res = get_session_client().auth.sign_in_with_password({"email": admin_email, "password": admin_password})
             if getattr(res, 'user', None):
                 st.session_state["authenticated"] = True
                 st.session_state["user"] = res.user
                 st.session_state["role"] = "admin"
                 st.session_state["email"] = getattr(res.user, 'email', None)
+                # Keep the tokens refreshed in the background from now on
+                try:
+                    remember_session(res)
+                except Exception:
+                    pass
                 st.success("Admin logged in")
                 # Save email to localStorage if user opted in
                 if remember:
@@ -245,12 +254,26 @@ with st.expander("Reset parent/tutor password (admin)"):
 # --- FETCH PENDING BOOKINGS ---
 st.header("Pending Bookings")
 
+# Results of confirmations made before the last rerun
+for confirmed_id, steps in pop_steps(st.session_state).items():
+    show_confirmation_steps(f"booking {confirmed_id}", steps)
+
 bookings_res = supabase.table("bookings").select("*").eq("status", "Pending").execute()
 
 if not bookings_res.data:
     st.info("No pending bookings")
     st.stop()
 
+# Candidate tutors for the whole queue: one tutors query and one
+# unavailability query covering the queue's exam dates.
+match_errors = []
+try:
+    candidates_by_booking = candidate_tutors_for_bookings(bookings_res.data, errors=match_errors)
+except Exception:
+    candidates_by_booking = {}
+if match_errors:
+    st.warning("Could not load confirmed bookings, so tutors already booked at the same time are not filtered out: " + "; ".join(match_errors))
+
 for booking in bookings_res.data:
     st.divider()
     st.subheader(f"{booking['child_name']} – {booking['subject']}")
@@ -259,106 +282,8 @@ for booking in bookings_res.data:
     st.write(f"Start: {booking['start_time']} | Duration: {booking['duration']} mins")
     st.write(f"Role required: {booking['role_required']}")
 
-    exam_date = booking.get("exam_date")
-    try:
-        start_time = datetime.strptime(booking["start_time"], "%H:%M:%S").time()
-    except Exception:
-        start_time = None
-
-    # --- FETCH SUITABLE TUTORS ---
-    tutors_res = supabase.table("tutors").select("*").eq("approved", True).execute()
-
-    suitable_tutors = []
-
-    def _normalize(r):
-        if not r:
-            return r
-        r = str(r)
-        if "Both" in r:
-            return "Both"
-        return r
-
-    def role_matches(tutor_role, required_role):
-        tr = _normalize(tutor_role)
-        rr = _normalize(required_role)
-        if not tr or not rr:
-            return False
-        if tr == rr:
-            return True
-        if tr == "All of the Above":
-            return True
-        if rr in ("Reader", "Scribe") and tr == "Both":
-            return True
-        return False
-
-    def _language_column_for(subject_text: str):
-        if not subject_text:
-            return None
-        s = subject_text.strip().lower()
-        mapping = {
-            'afrikaans': 'afrikaans',
-            'afr': 'afrikaans',
-            'isizulu': 'isizulu',
-            'zulu': 'isizulu',
-            'setswana': 'setswana',
-            'isixhosa': 'isixhosa',
-            'xhosa': 'isixhosa',
-            'french': 'french'
-        }
-        return mapping.get(s)
-
-    def _tutor_is_available(tutor_id, exam_date_obj, start_time_obj, duration_minutes):
-        try:
-            u_res = supabase.table('tutor_unavailability').select('*').eq('tutor_id', tutor_id).lte('start_date', exam_date_obj.isoformat()).gte('end_date', exam_date_obj.isoformat()).execute()
-            entries = u_res.data or []
-            if not entries:
-                return True
-            import datetime as _dt
-            bstart_dt = _dt.datetime.combine(exam_date_obj, start_time_obj)
-            bend_dt = bstart_dt + _dt.timedelta(minutes=duration_minutes)
-            for e in entries:
-                if not e.get('start_time') or not e.get('end_time'):
-                    return False
-                try:
-                    es = _dt.datetime.strptime(e.get('start_time'), '%H:%M:%S').time()
-                    ee = _dt.datetime.strptime(e.get('end_time'), '%H:%M:%S').time()
-                except Exception:
-                    return False
-                estart_dt = _dt.datetime.combine(exam_date_obj, es)
-                eend_dt = _dt.datetime.combine(exam_date_obj, ee)
-                latest_start = max(bstart_dt, estart_dt)
-                earliest_end = min(bend_dt, eend_dt)
-                overlap = (earliest_end - latest_start).total_seconds()
-                if overlap > 0:
-                    return False
-            return True
-        except Exception:
-            return False
-
-    # determine language column and exam date object
-    lang_col = _language_column_for(booking.get('subject'))
-    try:
-        exam_date_obj = datetime.fromisoformat(booking.get('exam_date')).date() if booking.get('exam_date') else None
-    except Exception:
-        exam_date_obj = None
-
-    for tutor in (tutors_res.data or []):
-        # role match
-        if not role_matches(tutor.get('roles'), booking.get('role_required')):
-            continue
-        # language match: only enforce if the tutor has any explicit
-        # language flags. Tutors with no language ticks are assumed able
-        # to cover any language subject.
-        def _tutor_has_any_lang_flags(t_row):
-            return any(bool(t_row.get(k)) for k in ('afrikaans', 'isizulu', 'setswana', 'isixhosa', 'french'))
-
-        if lang_col and _tutor_has_any_lang_flags(tutor) and not tutor.get(lang_col):
-            continue
-        # availability check (only if we have valid parsed start_time and exam_date)
-        if start_time and exam_date_obj:
-            if not _tutor_is_available(tutor.get('id'), exam_date_obj, start_time, booking.get('duration') or 60):
-                continue
-        suitable_tutors.append(tutor)
+    # --- SUITABLE TUTORS ---
+    suitable_tutors = candidates_by_booking.get(booking.get('id')) or []
 
     # Show all suitable tutors (no arbitrary limit)
 
@@ -374,108 +299,90 @@ for booking in bookings_res.data:
         tutor_id = tutor_options[selected_tutor]
 
         update_res = supabase.table("bookings").update({"status": "Confirmed", "tutor_id": tutor_id}).eq("id", booking["id"]).execute()
+        mark_bookings_changed(update_res.data)
 
         if getattr(update_res, 'error', None) is None:
             st.success("Booking confirmed")
 
-            # Notify parent by email with tutor details (if available)
+            # Side effects run concurrently: both lookups, then the parent and
+            # tutor emails, then the admin summary (all under one deadline).
+            pipeline = ConfirmationPipeline()
             try:
-                # fetch tutor contact details
-                t_res = supabase.table('tutors').select('name,surname,phone,email').eq('id', tutor_id).execute()
+                found = pipeline.stage({
+                    "Tutor lookup": lambda: tutors_cache.get_by_id(tutor_id, client=supabase),
+                    "Parent lookup": lambda: parents_cache.get_by_id(booking.get('parent_id'), client=supabase),
+                })
+                t = found["Tutor lookup"]
+                p = found["Parent lookup"]
+
                 tutor_name = None
                 tutor_contact = None
-                if getattr(t_res, 'data', None):
-                    t = t_res.data[0]
+                tutor_email = None
+                if t:
                     tutor_name = f"{t.get('name','')} {t.get('surname','')}".strip()
                     tutor_contact = t.get('phone') or t.get('email') or 'no contact'
-                else:
-                    st.warning("Tutor lookup failed — tutor contact not found.")
+                    tutor_email = t.get('email')
 
-                # fetch parent email (fallback to booking row if parents record missing)
-                p_res = supabase.table('parents').select('email').eq('id', booking.get('parent_id')).execute()
-                parent_email = (p_res.data or [None])[0].get('email') if getattr(p_res, 'data', None) else None
+                # parent email (fallback to booking row if parents record missing)
+                parent_email = p.get('email') if p else None
                 if not parent_email:
-                    # try booking-level fields
                     parent_email = (booking.get('parent_email') or booking.get('email') or None)
-                if not parent_email:
-                    st.warning("Parent email not found — parent may not have been notified")
 
-                parent_sent = False
-                tutor_sent = False
-                tutor_email = None
+                details = [
+                    f"Child: {booking.get('child_name')}",
+                    f"Subject: {booking.get('subject')}",
+                    f"Date: {booking.get('exam_date')}",
+                    f"Start: {booking.get('start_time')}",
+                ]
+                if tutor_name:
+                    details.append(f"Tutor: {tutor_name}")
+                if tutor_contact:
+                    details.append(f"Contact: {tutor_contact}")
+
+                # Queued for the background outbox so the admin is not kept waiting on Mailblaze
+                emails = {}
                 if parent_email:
-                    body_lines = [
-                        f"Your booking has been confirmed.",
-                        f"Child: {booking.get('child_name')}",
-                        f"Subject: {booking.get('subject')}",
-                        f"Date: {booking.get('exam_date')}",
-                        f"Start: {booking.get('start_time')}",
-                    ]
-                    if tutor_name:
-                        body_lines.append(f"Tutor: {tutor_name}")
-                    if tutor_contact:
-                        body_lines.append(f"Contact: {tutor_contact}")
-
+                    body_lines = ["Your booking has been confirmed."] + details
                     body_lines.append("\nPlease contact the tutor if you have any questions.\n\nThe Turning Point")
-                    send_parent = send_email(parent_email, "Booking Confirmed", "\n".join(body_lines))
-                    if send_parent.get('error'):
-                        st.warning(f"Failed to send confirmation email to parent: {send_parent.get('error')}")
-                    else:
-                        parent_sent = True
-                    # Also notify the tutor if we have their email
-                        try:
-                            tutor_email = t.get('email') if getattr(t_res, 'data', None) else None
-                            if tutor_email:
-                                tutor_body = [
-                                    f"You have been assigned a booking.",
-                                    f"Child: {booking.get('child_name')}",
-                                    f"Subject: {booking.get('subject')}",
-                                    f"Date: {booking.get('exam_date')}",
-                                    f"Start: {booking.get('start_time')}",
-                                ]
-                                if tutor_name:
-                                    tutor_body.append(f"Tutor: {tutor_name}")
-                                if tutor_contact:
-                                    tutor_body.append(f"Contact: {tutor_contact}")
-                                tutor_body.append("\nPlease confirm your availability.\n\nThe Turning Point")
-                                send_tutor = send_email(tutor_email, "New Booking Assigned", "\n".join(tutor_body))
-                                if send_tutor.get('error'):
-                                    st.warning(f"Failed to send assignment email to tutor: {send_tutor.get('error')}")
-                                else:
-                                    tutor_sent = True
-                        except Exception:
-                            pass
-
-                # Notify admin of email send status
-                recipients = []
-                if parent_sent and parent_email:
-                    recipients.append(parent_email)
-                if tutor_sent and tutor_email:
-                    recipients.append(tutor_email)
-                if recipients:
-                    st.success(f"Notification email(s) sent to: {', '.join(recipients)}")
-                # Send admin a summary email about what was sent
-                try:
-                    subject = f"Booking {booking.get('id')} - notification summary"
-                    body_lines = [
-                        f"Booking ID: {booking.get('id')}",
-                        f"Child: {booking.get('child_name')}",
-                        f"Subject: {booking.get('subject')}",
-                        f"Date: {booking.get('exam_date')}",
-                        f"Assigned tutor id: {tutor_id}",
-                        "",
-                        f"Parent email sent: {parent_sent} ({parent_email})",
-                        f"Tutor email sent: {tutor_sent} ({tutor_email})",
-                    ]
-                    admin_notify = send_admin_email(subject, "\n".join(body_lines))
-                    if admin_notify.get('error'):
-                        st.warning(f"Failed to send admin notification email: {admin_notify.get('error')}")
-                    else:
-                        st.info("Admin notified by email about sent notifications.")
-                except Exception:
-                    pass
-            except Exception:
-                pass
+
+                    def _email_parent():
+                        queue_email(parent_email, "Booking Confirmed", "\n".join(body_lines))
+                        return f"queued for {parent_email}"
+                    emails["Parent email"] = _email_parent
+                else:
+                    pipeline.skip("Parent email", "parent email not found")
+                if tutor_email:
+                    tutor_body = ["You have been assigned a booking."] + details
+                    tutor_body.append("\nPlease confirm your availability.\n\nThe Turning Point")
+
+                    def _email_tutor():
+                        queue_email(tutor_email, "New Booking Assigned", "\n".join(tutor_body))
+                        return f"queued for {tutor_email}"
+                    emails["Tutor email"] = _email_tutor
+                else:
+                    pipeline.skip("Tutor email", "tutor email not found")
+                pipeline.stage(emails)
+
+                parent_sent = pipeline.ok("Parent email")
+                tutor_sent = pipeline.ok("Tutor email")
+                summary_lines = [
+                    f"Booking ID: {booking.get('id')}",
+                    f"Child: {booking.get('child_name')}",
+                    f"Subject: {booking.get('subject')}",
+                    f"Date: {booking.get('exam_date')}",
+                    f"Assigned tutor id: {tutor_id}",
+                    "",
+                    f"Parent email queued: {parent_sent} ({parent_email})",
+                    f"Tutor email queued: {tutor_sent} ({tutor_email})",
+                ]
+
+                def _email_admin():
+                    queue_admin_email(f"Booking {booking.get('id')} - notification summary", "\n".join(summary_lines))
+                    return "queued; delivery status is on the Email Diagnostics page"
+                pipeline.stage({"Admin summary": _email_admin})
+            except Exception as e:
+                pipeline.skip("Notifications", f"stopped: {e}")
+            remember_steps(st.session_state, booking.get('id'), pipeline.steps)
 
             safe_rerun()
         else:
@@ -494,15 +401,15 @@ for booking in bookings_res.data:
             except Exception:
                 hours_before = None
 
-            # Build update payload only with keys present on this booking row
-            existing = set(booking.keys() or [])
+            # Build update payload only with columns the bookings table has
             candidate = {"cancelled": True, "cancelled_at": cancel_time.isoformat(), "status": "Cancelled"}
-            payload = {k: v for k, v in candidate.items() if k in existing}
+            payload = writable_payload('bookings', candidate, booking)
 
             if not payload:
                 st.error("Unable to cancel: bookings table missing cancel/status columns. Cancel manually in DB.")
             else:
-                supabase.table("bookings").update(payload).eq("id", booking.get("id")).execute()
+                changed = supabase.table("bookings").update(payload).eq("id", booking.get("id")).execute()
+                mark_bookings_changed(changed.data)
 
                 if hours_before is not None and hours_before < 12:
                     st.warning("Cancelled within 12 hours — billing may apply.")
@@ -1,13 +1,19 @@
 import os
 import streamlit as st
 from utils.ui import hide_sidebar
-from utils.database import supabase
-from utils.email import send_admin_email, send_email, _get_sender
-from utils.session import delete_auth_user, set_auth_user_password, get_supabase_service, get_supabase
+from utils.matching import load_approved_tutors, unavailability_for, eligible_tutors as match_tutors
+from utils.busy_index import busy_for
+from utils.enrichment import enrich_bookings, billing_columns
+from utils.pagination import iter_booking_pages
+from utils.email import send_admin_email, send_email, get_mailblaze_client
+from utils.session import delete_auth_user, set_auth_user_password, get_supabase_service, get_session_client
+from utils.booking_changes import mark_bookings_changed
+from utils.reference_cache import tutors_cache, parents_cache
 from datetime import date, datetime, time, timedelta
 import json
-import base64
-import requests
+
+# Queries run as the signed-in admin, so row-level security applies to them
+supabase = get_session_client()
 
 hide_sidebar()
 
@@ -26,14 +32,9 @@ else:
 
 # Mailblaze debug: check HTTP connectivity and send test messages
 with st.expander('Mailblaze Debug'):
-    base_default = os.getenv('MAILBLAZE_BASE') or os.getenv('MAILBLAZE_BASE_URL') or os.getenv('mailblaze_http') or 'https://control.mailblaze.com/api'
-    mb_key = (
-        os.getenv('API_KEY')
-        or os.getenv('MAILBLAZE_API_KEY')
-        or os.getenv('MAILBLAZE_KEY')
-        or os.getenv('mailblaze_api_key')
-        or os.getenv('MAILBLAZE_APIKEY')
-    )
+    mb = get_mailblaze_client()
+    base_default = mb.base_url
+    mb_key = mb.api_key
 
     st.write('Mailblaze API key present:', bool(mb_key))
 
@@ -41,10 +42,9 @@ with st.expander('Mailblaze Debug'):
         if not base_default:
             st.error('Missing Mailblaze base URL (MAILBLAZE_BASE or mailblaze_http)')
         else:
-            st.info(f'Attempting HTTPS GET to {base_default} (5s timeout)')
+            st.info(f'Attempting HTTPS GET to {base_default} ({mb.timeout[0]:g}s connect timeout)')
             try:
-                headers = {"Authorization": f"Bearer {mb_key}"} if mb_key else {}
-                r = requests.get(base_default, headers=headers, timeout=5)
+                r = mb.ping()
                 st.write(f'Status: {r.status_code}')
                 if r.status_code < 400:
                     st.success('Connectivity to Mailblaze base URL succeeded')
@@ -55,7 +55,7 @@ with st.expander('Mailblaze Debug'):
 
     # Mailblaze send test
     try:
-        default_from = _get_sender() or os.getenv('SMTP_USER')
+        default_from = mb.sender or os.getenv('SMTP_USER')
         # Default test recipient set to ben@youthrive.co.za per admin request.
         # Preserve explicit user edits across the Streamlit session, but if the
         # session key is missing (first load) initialise it to the desired default.
@@ -71,39 +71,18 @@ with st.expander('Mailblaze Debug'):
             elif not default_from:
                 st.error('SENDER_EMAIL or EMAIL_FROM is not configured')
             else:
-                # Build minimal JSON transactional payload — base64 encode body and plain_text
-                try:
-                    encoded_body = base64.b64encode(mb_body.encode("utf-8")).decode("utf-8")
-                except Exception:
-                    encoded_body = mb_body
-                try:
-                    encoded_plain = base64.b64encode(mb_body.encode("utf-8")).decode("utf-8")
-                except Exception:
-                    encoded_plain = mb_body
-
-                payload = {
-                    "to_email": mb_recipient,
-                    "to_name": None,
-                    "from_email": default_from,
-                    "from_name": os.getenv('MAILBLAZE_FROM_NAME') or os.getenv('EMAIL_FROM_NAME') or None,
-                    "subject": mb_subject,
-                    "body": encoded_body,
-                    "plain_text": encoded_plain,
-                }
-
-                headers = {"Authorization": mb_key, "Content-Type": "application/json"}
-                base = os.getenv('MAILBLAZE_BASE') or os.getenv('MAILBLAZE_BASE_URL') or os.getenv('mailblaze_http') or 'https://control.mailblaze.com/api'
-                endpoints = [f"{base.rstrip('/')}/transactional"]
+                # Same payload the app sends: base64 body and plain_text
+                payload = mb.build_payload(mb_recipient, mb_subject, mb_body, html=mb_body)
+                payload["from_email"] = default_from
+                ep = mb.transactional_url
                 results = []
-                for ep in endpoints:
-                    try:
-                        r = requests.post(ep, json=payload, headers=headers, timeout=10)
-                        results.append((ep, r.status_code, r.text))
-                        if r.status_code in (200, 201, 202):
-                            st.success(f'Mailblaze test send accepted via {ep}')
-                            break
-                    except Exception as e:
-                        results.append((ep, 'err', repr(e)))
+                try:
+                    r = mb.post(payload)
+                    results.append((ep, r.status_code, r.text))
+                    if r.status_code in (200, 201, 202):
+                        st.success(f'Mailblaze test send accepted via {ep}')
+                except Exception as e:
+                    results.append((ep, 'err', repr(e)))
                 st.write('Results:')
                 for ep, status, body in results:
                     try:
@@ -225,47 +204,9 @@ with cb1:
                         try:
                             import pandas as pd
 
-                            # Enrich bookings with parent and tutor names
-                            parent_ids = list({b.get('parent_id') for b in bookings if b.get('parent_id')})
-                            tutor_ids = list({b.get('tutor_id') for b in bookings if b.get('tutor_id')})
-
-                            parent_map = {}
-                            if parent_ids:
-                                try:
-                                    pres = supabase.table('parents').select('id,parent_name').in_('id', parent_ids).execute()
-                                    for p in (pres.data or []):
-                                        parent_map[p.get('id')] = p.get('parent_name')
-                                except Exception:
-                                    parent_map = {}
-
-                            tutor_map = {}
-                            if tutor_ids:
-                                try:
-                                    tres = supabase.table('tutors').select('id,name,surname').in_('id', tutor_ids).execute()
-                                    for t in (tres.data or []):
-                                        name = (t.get('name') or '')
-                                        surname = (t.get('surname') or '')
-                                        tutor_map[t.get('id')] = f"{name} {surname}".strip()
-                                except Exception:
-                                    tutor_map = {}
-
-                            for b in bookings:
-                                b['parent_name'] = parent_map.get(b.get('parent_id')) or b.get('parent_id')
-                                b['tutor_name'] = tutor_map.get(b.get('tutor_id')) or b.get('tutor_id')
-
-                            # Build minimal export rows with requested columns
-                            rows = []
-                            for b in bookings:
-                                rows.append({
-                                    "Parent Name": b.get('parent_name') or b.get('parent_id'),
-                                    "Child Name": b.get('child_name') or '',
-                                    "Exam Date": b.get('exam_date') or '',
-                                    "Duration": b.get('duration') or '',
-                                    "Tutor Name": b.get('tutor_name') or b.get('tutor_id'),
-                                    "Confirmed": (b.get('status') == 'Confirmed')
-                                })
-
-                            df = pd.DataFrame(rows)
+                            # Enrich with parent and tutor names (one query per table)
+                            enriched = enrich_bookings(bookings, client=supabase)
+                            df = pd.DataFrame(billing_columns(enriched))
                             st.dataframe(df)
                             csv = df.to_csv(index=False)
                             st.download_button("Download CSV", csv, file_name=f"bookings_{selected_parent_id}_{start_iso}_{end_iso}.csv", mime="text/csv")
@@ -292,42 +233,9 @@ with cb1:
                             try:
                                 import pandas as pd
 
-                                # Enrich bookings with parent/tutor names then show minimal columns
-                                parent_ids = list({b.get('parent_id') for b in bookings if b.get('parent_id')})
-                                tutor_ids = list({b.get('tutor_id') for b in bookings if b.get('tutor_id')})
-
-                                parent_map = {}
-                                if parent_ids:
-                                    try:
-                                        pres = supabase.table('parents').select('id,parent_name').in_('id', parent_ids).execute()
-                                        for p in (pres.data or []):
-                                            parent_map[p.get('id')] = p.get('parent_name')
-                                    except Exception:
-                                        parent_map = {}
-
-                                tutor_map = {}
-                                if tutor_ids:
-                                    try:
-                                        tres = supabase.table('tutors').select('id,name,surname').in_('id', tutor_ids).execute()
-                                        for t in (tres.data or []):
-                                            name = (t.get('name') or '')
-                                            surname = (t.get('surname') or '')
-                                            tutor_map[t.get('id')] = f"{name} {surname}".strip()
-                                    except Exception:
-                                        tutor_map = {}
-
-                                rows = []
-                                for b in bookings:
-                                    rows.append({
-                                        "Parent Name": parent_map.get(b.get('parent_id')) or b.get('parent_id'),
-                                        "Child Name": b.get('child_name') or '',
-                                        "Exam Date": b.get('exam_date') or '',
-                                        "Duration": b.get('duration') or '',
-                                        "Tutor Name": tutor_map.get(b.get('tutor_id')) or b.get('tutor_id'),
-                                        "Confirmed": (b.get('status') == 'Confirmed')
-                                    })
-
-                                df = pd.DataFrame(rows)
+                                # Enrich with parent and tutor names (one query per table)
+                                enriched = enrich_bookings(bookings, client=supabase)
+                                df = pd.DataFrame(billing_columns(enriched))
                                 st.dataframe(df)
                                 csv = df.to_csv(index=False)
                                 st.download_button("Download CSV", csv, file_name=f"bookings_{selected_parent_id}_{start_iso}_{end_iso}.csv", mime="text/csv")
@@ -400,29 +308,9 @@ with cb2:
                         try:
                             import pandas as pd
 
-                            # Enrich bookings with parent names
-                            parent_ids = list({b.get('parent_id') for b in bookings if b.get('parent_id')})
-                            parent_map = {}
-                            if parent_ids:
-                                try:
-                                    pres = supabase.table('parents').select('id,parent_name').in_('id', parent_ids).execute()
-                                    for p in (pres.data or []):
-                                        parent_map[p.get('id')] = p.get('parent_name')
-                                except Exception:
-                                    parent_map = {}
-
-                            rows = []
-                            for b in bookings:
-                                rows.append({
-                                    "Parent Name": parent_map.get(b.get('parent_id')) or b.get('parent_id'),
-                                    "Child Name": b.get('child_name') or '',
-                                    "Exam Date": b.get('exam_date') or '',
-                                    "Duration": b.get('duration') or '',
-                                    "Tutor Name": selected_label,
-                                    "Confirmed": True,
-                                })
-
-                            df = pd.DataFrame(rows)
+                            # Enrich with parent names; every row is the selected tutor
+                            enriched = enrich_bookings(bookings, tutors=False, client=supabase)
+                            df = pd.DataFrame(billing_columns(enriched, tutor_name=selected_label))
                             st.dataframe(df)
                             csv = df.to_csv(index=False)
                             st.download_button("Download CSV", csv, file_name=f"tutor_{selected_tutor_id}_{start_iso}_{end_iso}.csv", mime="text/csv")
@@ -448,29 +336,9 @@ with cb2:
                             try:
                                 import pandas as pd
 
-                                # Enrich bookings with parent names
-                                parent_ids = list({b.get('parent_id') for b in bookings if b.get('parent_id')})
-                                parent_map = {}
-                                if parent_ids:
-                                    try:
-                                        pres = supabase.table('parents').select('id,parent_name').in_('id', parent_ids).execute()
-                                        for p in (pres.data or []):
-                                            parent_map[p.get('id')] = p.get('parent_name')
-                                    except Exception:
-                                        parent_map = {}
-
-                                rows = []
-                                for b in bookings:
-                                    rows.append({
-                                        "Parent Name": parent_map.get(b.get('parent_id')) or b.get('parent_id'),
-                                        "Child Name": b.get('child_name') or '',
-                                        "Exam Date": b.get('exam_date') or '',
-                                        "Duration": b.get('duration') or '',
-                                        "Tutor Name": selected_label,
-                                        "Confirmed": True,
-                                    })
-
-                                df = pd.DataFrame(rows)
+                                # Enrich with parent names; every row is the selected tutor
+                                enriched = enrich_bookings(bookings, tutors=False, client=supabase)
+                                df = pd.DataFrame(billing_columns(enriched, tutor_name=selected_label))
                                 st.dataframe(df)
                                 csv = df.to_csv(index=False)
                                 st.download_button("Download CSV", csv, file_name=f"tutor_{selected_tutor_id}_{start_iso}_{end_iso}.csv", mime="text/csv")
@@ -480,79 +348,43 @@ with cb3:
     if st.button("Download"):
         st.info("Preparing bookings CSV...")
         try:
-            res = supabase.table('bookings').select('*').execute()
-            data = res.data or []
+            import io
+            import pandas as pd
+
+            # Stream the table page by page: each page is enriched (one query
+            # per related table) and appended to the CSV, so only one page of
+            # bookings is in memory at a time
+            buf = io.StringIO()
+            total = 0
+            for page in iter_booking_pages(client=supabase):
+                enriched = enrich_bookings(page, client=supabase)
+                pd.DataFrame(billing_columns(enriched)).to_csv(buf, index=False, header=total == 0)
+                total += len(page)
         except Exception as e:
             st.error(f"Failed to fetch bookings: {e}")
-            data = []
+            total = 0
 
-        if not data:
+        if not total:
             st.warning("No bookings found to download.")
         else:
-            try:
-                import pandas as pd
-
-                bookings = data
-
-                # Enrich with parent and tutor names
-                parent_ids = list({b.get('parent_id') for b in bookings if b.get('parent_id')})
-                tutor_ids = list({b.get('tutor_id') for b in bookings if b.get('tutor_id')})
-
-                parent_map = {}
-                if parent_ids:
-                    try:
-                        pres = supabase.table('parents').select('id,parent_name').in_('id', parent_ids).execute()
-                        for p in (pres.data or []):
-                            parent_map[p.get('id')] = p.get('parent_name')
-                    except Exception:
-                        parent_map = {}
-
-                tutor_map = {}
-                if tutor_ids:
-                    try:
-                        tres = supabase.table('tutors').select('id,name,surname').in_('id', tutor_ids).execute()
-                        for t in (tres.data or []):
-                            name = (t.get('name') or '')
-                            surname = (t.get('surname') or '')
-                            tutor_map[t.get('id')] = f"{name} {surname}".strip()
-                    except Exception:
-                        tutor_map = {}
-
-                for b in bookings:
-                    b['parent_name'] = parent_map.get(b.get('parent_id')) or b.get('parent_id')
-                    b['tutor_name'] = tutor_map.get(b.get('tutor_id')) or b.get('tutor_id')
-
-                # Build minimal export rows with requested columns
-                rows = []
-                for b in bookings:
-                    rows.append({
-                        "Parent Name": b.get('parent_name') or b.get('parent_id'),
-                        "Child Name": b.get('child_name') or '',
-                        "Exam Date": b.get('exam_date') or '',
-                        "Duration": b.get('duration') or '',
-                        "Tutor Name": b.get('tutor_name') or b.get('tutor_id'),
-                        "Confirmed": (b.get('status') == 'Confirmed')
-                    })
-
-                df = pd.DataFrame(rows)
-                csv = df.to_csv(index=False)
-                st.download_button("Download bookings CSV", csv, file_name="bookings.csv", mime="text/csv")
-            except Exception as e:
-                st.error(f"Failed to prepare CSV: {e}")
+            st.download_button("Download bookings CSV", buf.getvalue(), file_name="bookings.csv", mime="text/csv")
 
 
 # -- Manual booking: allow admin to create a booking for a client --
-with st.expander("Create Manual Booking (Admin)"):
-    st.write("Create a booking on behalf of a client.")
-
-    # Fetch parents
+# Drawn as a fragment: picking a client or tutor reruns only this section,
+# and the booking details are a form, sent once with "Find tutors".
+# The clients are read once per page run, as the signed-in admin (the shared
+# parents cache is for server-side use only), and reused by fragment reruns.
+def _manual_clients():
     try:
-        pres = supabase.table("parents").select("*").order("parent_name").execute()
-        parents = pres.data or []
+        return parents_cache.all(order="parent_name", client=supabase)
     except Exception as e:
         st.error(f"Failed to load clients: {e}")
-        parents = []
+        return []
 
+
+@st.fragment
+def _manual_booking(parents):
     if not parents:
         st.warning("No clients found.")
     else:
@@ -574,128 +406,66 @@ with st.expander("Create Manual Booking (Admin)"):
             if first:
                 children = [{'name': first, 'grade': selected_parent.get('grade'), 'school': selected_parent.get('school')}]
 
-        child_label = None
-        selected_child = None
-        if children:
-            labels = []
-            for c in children:
-                n = c.get('name') or 'Unnamed'
-                g = c.get('grade') or ''
-                s = c.get('school') or ''
-                lbl = n
-                if g:
-                    lbl += f" — Grade {g}"
-                if s:
-                    lbl += f" | {s}"
-                labels.append(lbl)
-            idx = st.selectbox("Which child is this for?", options=list(range(len(labels))), format_func=lambda i: labels[i], key="admin_manual_child_select")
-            selected_child = children[idx]
-
-        # Booking inputs
-        subject = st.text_input("Subject", key="admin_manual_subject")
-        today = datetime.now().date()
-        tomorrow = (datetime.now() + timedelta(days=1)).date()
-        exam_date = st.date_input("Exam Date", value=tomorrow, min_value=today, key="admin_manual_exam_date")
-        start_time = st.time_input("Start Time", value=time(7, 45), key="admin_manual_start_time")
-        duration = st.number_input("Duration (minutes)", min_value=30, max_value=480, value=60, key="admin_manual_duration")
-        extra_time = st.number_input("Extra Time (minutes)", min_value=0, max_value=120, value=0, key="admin_manual_extra_time")
-        role_options = ["Reader", "Scribe", "Both (Reader & Scribe)", "Invigilator", "Prompter", "All of the Above"]
-        role_required = st.selectbox("Role Required", role_options, key="admin_manual_role")
-
-        # Tutor selection (optional)
-        def _language_column_for(subject_text: str):
-            if not subject_text:
-                return None
-            s = subject_text.strip().lower()
-            mapping = {
-                'afrikaans': 'afrikaans',
-                'afr': 'afrikaans',
-                'isizulu': 'isizulu',
-                'zulu': 'isizulu',
-                'setswana': 'setswana',
-                'isixhosa': 'isixhosa',
-                'xhosa': 'isixhosa',
-                'french': 'french'
-            }
-            return mapping.get(s)
-
-        def _tutor_is_available(tutor_id, exam_date_obj, start_time_obj, duration_minutes):
-            try:
-                u_res = supabase.table('tutor_unavailability').select('*').eq('tutor_id', tutor_id).lte('start_date', exam_date_obj.isoformat()).gte('end_date', exam_date_obj.isoformat()).execute()
-                entries = u_res.data or []
-                if not entries:
-                    return True
-                import datetime as _dt
-                bstart_dt = _dt.datetime.combine(exam_date_obj, start_time_obj)
-                bend_dt = bstart_dt + _dt.timedelta(minutes=duration_minutes)
-                for e in entries:
-                    if not e.get('start_time') or not e.get('end_time'):
-                        return False
-                    try:
-                        es = _dt.datetime.strptime(e.get('start_time'), '%H:%M:%S').time()
-                        ee = _dt.datetime.strptime(e.get('end_time'), '%H:%M:%S').time()
-                    except Exception:
-                        return False
-                    estart_dt = _dt.datetime.combine(exam_date_obj, es)
-                    eend_dt = _dt.datetime.combine(exam_date_obj, ee)
-                    latest_start = max(bstart_dt, estart_dt)
-                    earliest_end = min(bend_dt, eend_dt)
-                    overlap = (earliest_end - latest_start).total_seconds()
-                    if overlap > 0:
-                        return False
-                return True
-            except Exception:
-                return False
-
-        # fetch tutors with full data to allow filtering
+        # Booking details: held by the browser until "Find tutors"
+        with st.form("admin_manual_booking_form"):
+            child_label = None
+            selected_child = None
+            if children:
+                labels = []
+                for c in children:
+                    n = c.get('name') or 'Unnamed'
+                    g = c.get('grade') or ''
+                    s = c.get('school') or ''
+                    lbl = n
+                    if g:
+                        lbl += f" — Grade {g}"
+                    if s:
+                        lbl += f" | {s}"
+                    labels.append(lbl)
+                idx = st.selectbox("Which child is this for?", options=list(range(len(labels))), format_func=lambda i: labels[i], key="admin_manual_child_select")
+                selected_child = children[idx]
+
+            # Booking inputs
+            subject = st.text_input("Subject", key="admin_manual_subject")
+            today = datetime.now().date()
+            tomorrow = (datetime.now() + timedelta(days=1)).date()
+            exam_date = st.date_input("Exam Date", value=tomorrow, min_value=today, key="admin_manual_exam_date")
+            start_time = st.time_input("Start Time", value=time(7, 45), key="admin_manual_start_time")
+            duration = st.number_input("Duration (minutes)", min_value=30, max_value=480, value=60, key="admin_manual_duration")
+            extra_time = st.number_input("Extra Time (minutes)", min_value=0, max_value=120, value=0, key="admin_manual_extra_time")
+            role_options = ["Reader", "Scribe", "Both (Reader & Scribe)", "Invigilator", "Prompter", "All of the Above"]
+            role_required = st.selectbox("Role Required", role_options, key="admin_manual_role")
+            found = st.form_submit_button("Find tutors", key="admin_manual_find")
+
+        if found:
+            st.session_state["admin_manual_found"] = True
+        if not st.session_state.get("admin_manual_found"):
+            st.info("Fill in the booking details and press Find tutors.")
+            return
+
+        # Tutor selection (optional): one tutors query, with unavailability
+        # and existing bookings checked against the shared in-memory indexes.
         try:
-            tres = supabase.table('tutors').select('*').eq('approved', True).order('name').execute()
-            tutors = tres.data or []
+            tutors = load_approved_tutors(order='name')
         except Exception:
             tutors = []
 
-        # normalize roles stored labels
-        def _normalize(r):
-            if not r:
-                return r
-            r = str(r)
-            if "Both" in r:
-                return "Both"
-            return r
-
-        def role_matches(tutor_role, required_role):
-            tr = _normalize(tutor_role)
-            rr = _normalize(required_role)
-            if not tr or not rr:
-                return False
-            if tr == rr:
-                return True
-            if tr == "All of the Above":
-                return True
-            if rr in ("Reader", "Scribe") and tr == "Both":
-                return True
-            return False
-
         tutor_opts = ["Unassigned"]
         tutor_map = {"Unassigned": None}
 
-        lang_col = _language_column_for(subject)
-        exam_date_obj = exam_date if exam_date else None
-
-        for t in tutors:
-            if not role_matches(t.get('roles'), role_required):
-                continue
-            # Tutors who have no explicit language ticks are assumed able to cover
-            # language subjects; only enforce the language requirement if the
-            # tutor has any language flags set and doesn't include the required one.
-            def _tutor_has_any_lang_flags(tutor_row):
-                return any(bool(tutor_row.get(k)) for k in ('afrikaans', 'isizulu', 'setswana', 'isixhosa', 'french'))
-
-            if lang_col and _tutor_has_any_lang_flags(t) and not t.get(lang_col):
-                continue
-            if exam_date_obj and start_time:
-                if not _tutor_is_available(t.get('id'), exam_date_obj, start_time, duration):
-                    continue
+        try:
+            unavailability = unavailability_for(exam_date) if exam_date else None
+            try:
+                busy = busy_for(exam_date) if exam_date else None
+            except Exception as e:
+                busy = None
+                st.warning(f"Could not load confirmed bookings, so tutors already booked at that time are not filtered out: {e}")
+            suitable_tutors = match_tutors(tutors, role_required, subject, exam_date, start_time, duration,
+                                           unavailability, busy, extra_time)
+        except Exception:
+            suitable_tutors = []
+
+        for t in suitable_tutors:
             label = f"{(t.get('name') or '')} {(t.get('surname') or '')}".strip() or str(t.get('id'))
             tutor_opts.append(label)
             tutor_map[label] = t.get('id')
@@ -762,6 +532,7 @@ with st.expander("Create Manual Booking (Admin)"):
                     'tutor_id': selected_tutor_id,
                     'status': status,
                 }).execute()
+                mark_bookings_changed(ins.data)
 
                 if getattr(ins, 'error', None) is None and ins.data:
                     st.success('Manual booking created.')
@@ -782,13 +553,9 @@ with st.expander("Create Manual Booking (Admin)"):
                     # If booking is immediately Confirmed and a tutor was assigned, notify tutor and parent
                     try:
                         if status == 'Confirmed' and selected_tutor_id:
-                            # fetch tutor
-                            t_res = supabase.table('tutors').select('name,surname,email,phone').eq('id', selected_tutor_id).execute()
-                            t = (t_res.data or [None])[0] if getattr(t_res, 'data', None) else None
-
-                            # fetch parent
-                            p_res = supabase.table('parents').select('parent_name,email,phone').eq('id', selected_parent.get('id')).execute()
-                            p = (p_res.data or [None])[0] if getattr(p_res, 'data', None) else None
+                            # tutor and parent rows: already held by the reference caches
+                            t = tutors_cache.get_by_id(selected_tutor_id, client=supabase)
+                            p = selected_parent
 
                             # notify tutor
                             try:
@@ -842,6 +609,11 @@ with st.expander("Create Manual Booking (Admin)"):
             _admin_insert_booking()
 
 
+with st.expander("Create Manual Booking (Admin)"):
+    st.write("Create a booking on behalf of a client.")
+    _manual_booking(_manual_clients())
+
+
 # -- Manage Parents: allow admin to set temporary passwords or delete linked auth users --
 with st.expander("Manage Parents"):
     try:
@@ -962,9 +734,9 @@ with st.expander("Recent Admin Actions"):
         try:
             svc = get_supabase_service()
         except Exception:
-            # Service role not configured; try public/anon client for read-only access
+            # Service role not configured; read as the signed-in admin instead
             st.info('Service role not configured; attempting public client for read-only admin actions.')
-            svc = get_supabase()
+            svc = supabase
 
         a_res = svc.table('admin_actions').select('*').order('created_at', desc=True).limit(50).execute()
         actions = a_res.data or []
@@ -3,8 +3,15 @@ from utils.ui import hide_sidebar
 
 hide_sidebar()
 from datetime import datetime
-from utils.database import supabase
+from utils.session import get_session_client
+from utils.enrichment import enrich_bookings
+from utils.pagination import BookingPager
 from utils.email import send_email
+from utils.booking_changes import mark_bookings_changed
+from utils.schema import writable_payload
+
+# Queries run as the signed-in admin, so row-level security applies to them
+supabase = get_session_client()
 
 st.title("Awaiting Tutor Confirmation — Admin")
 
@@ -60,15 +67,20 @@ st.markdown("Bookings that have been allocated to a tutor but are waiting for th
 try:
     # Find bookings that have a tutor assigned but haven't been finalized
     statuses = ["AwaitingTutorConfirmation", "Assigned"]
-    res = supabase.table("bookings").select("*").in_("status", statuses).order("exam_date").limit(500).execute()
-    bookings = res.data or []
+    # First page only; "Load more" at the bottom fetches just the next page
+    pager = BookingPager(st.session_state, "awaiting", filters=lambda q: q.in_("status", statuses), client=supabase)
+    bookings, more_bookings = pager.rows(), pager.more
 except Exception as e:
     st.error(f"Could not load awaiting bookings: {e}")
     bookings = []
+    more_bookings = False
 
 if not bookings:
     st.info("No bookings awaiting tutor confirmation.")
 
+# Parent and tutor rows for the whole list, one query per table
+enriched = enrich_bookings(bookings, client=supabase)
+
 for b in bookings:
     st.divider()
     booking_id = b.get("id")
@@ -84,8 +96,7 @@ for b in bookings:
     tutor_info = None
     if b.get("tutor_id"):
         try:
-            t_res = supabase.table("tutors").select("name,surname,phone,email").eq("id", b.get("tutor_id")).execute()
-            t = (t_res.data or [None])[0]
+            t = enriched.tutor_for(b)
             if t:
                 tutor_info = (f"{t.get('name','')} {t.get('surname','')}".strip(), t.get('phone') or t.get('email') or 'no contact')
         except Exception:
@@ -101,18 +112,17 @@ for b in bookings:
     with cols[0]:
         if st.button("✅ Hard Confirm", key=f"hard_{booking_id}"):
             now = datetime.now()
-            existing = set(b.keys() or [])
             candidate = {"status": "Confirmed", "confirmed_at": now.isoformat()}
-            payload = {k: v for k, v in candidate.items() if k in existing}
+            payload = writable_payload('bookings', candidate, b)
             try:
                 if payload:
-                    supabase.table("bookings").update(payload).eq("id", booking_id).execute()
+                    changed = supabase.table("bookings").update(payload).eq("id", booking_id).execute()
+                    mark_bookings_changed(changed.data)
 
                 # Lookup parent email
                 parent_email = None
                 try:
-                    p_res = supabase.table("parents").select("*").eq("id", b.get("parent_id")).execute()
-                    p = (p_res.data or [None])[0]
+                    p = enriched.parent_for(b)
                     if p and p.get("email"):
                         parent_email = p.get("email")
                 except Exception:
@@ -151,13 +161,13 @@ for b in bookings:
         if st.button("❌ Cancel Booking", key=f"cancel_{booking_id}"):
             try:
                 cancel_time = datetime.now()
-                existing = set(b.keys() or [])
                 candidate = {"cancelled": True, "cancelled_at": cancel_time.isoformat(), "status": "Cancelled"}
-                payload = {k: v for k, v in candidate.items() if k in existing}
+                payload = writable_payload('bookings', candidate, b)
                 if not payload:
                     st.error("Unable to cancel: bookings table missing cancel/status columns. Cancel manually in DB.")
                 else:
-                    supabase.table("bookings").update(payload).eq("id", booking_id).execute()
+                    changed = supabase.table("bookings").update(payload).eq("id", booking_id).execute()
+                    mark_bookings_changed(changed.data)
                     st.success("Booking cancelled")
                     try:
                         st.experimental_rerun()
@@ -165,3 +175,8 @@ for b in bookings:
                         pass
             except Exception as e:
                 st.error(f"Failed to cancel booking: {e}")
+
+if more_bookings:
+    st.divider()
+    # Runs before the rerun, so the new page shows straight away
+    st.button("Load more bookings", key="awaiting_load_more", on_click=pager.load_more)
@@ -3,54 +3,15 @@ from utils.ui import hide_sidebar
 
 hide_sidebar()
 from datetime import datetime, timedelta
-from utils.database import supabase
+from utils.session import get_session_client
+from utils.enrichment import enrich_bookings
+from utils.booking_changes import mark_bookings_changed
+from utils.schema import writable_payload
+from utils.booking_times import normalize_booking_times, started_mask
 
+# Queries run as the signed-in admin, so row-level security applies to them
+supabase = get_session_client()
 
-def find_tutor(tutor_ref, booking=None):
-    """Try several strategies to find a tutor record for the given reference.
-    tutor_ref may be an id, email, or other identifier. booking is optional and
-    may contain name fields to help matching.
-    Returns tutor dict or None.
-    """
-    if not tutor_ref:
-        return None
-
-    # Try common identifier columns
-    keys_to_try = ["id", "tutor_id", "user_id", "email"]
-    for k in keys_to_try:
-        try:
-            res = supabase.table('tutors').select('name,surname,phone,email,id').eq(k, tutor_ref).execute()
-            if res.data:
-                return res.data[0]
-        except Exception:
-            pass
-
-    # Fallback: fetch all tutors and try to match in Python by id or by name
-    try:
-        all_res = supabase.table('tutors').select('id,name,surname,phone,email').execute()
-        tutors = all_res.data or []
-    except Exception:
-        tutors = []
-
-    # Try matching by id string
-    for t in tutors:
-        if str(t.get('id')) == str(tutor_ref):
-            return t
-
-    # Try matching by name fields present in booking
-    if booking:
-        candidates = []
-        for field in ('tutor_name', 'tutor_fullname', 'tutor'):
-            v = booking.get(field)
-            if v:
-                candidates.append(v.lower())
-
-        for t in tutors:
-            fullname = f"{t.get('name','')} {t.get('surname','')}".strip().lower()
-            if fullname in candidates or any(c in fullname for c in candidates):
-                return t
-
-    return None
 
 st.title("Confirmed Bookings — Admin")
 
@@ -114,28 +75,19 @@ except Exception as e:
     st.error(f"Could not load confirmed bookings: {e}")
     st.stop()
 
-# Filter out bookings that have already passed
-from datetime import datetime
-now = datetime.now()
-filtered = []
-for b in bookings:
-    try:
-        date_str = b.get('exam_date')
-        time_str = b.get('start_time') or '00:00:00'
-        dt = datetime.combine(datetime.fromisoformat(date_str), datetime.strptime(time_str, "%H:%M:%S").time())
-    except Exception:
-        # If we can't parse the datetime, keep the booking to avoid accidental hiding
-        filtered.append(b)
-        continue
-    if dt >= now:
-        filtered.append(b)
-
-bookings = filtered
+# Filter out bookings that have already passed; bookings whose time can't
+# be parsed are kept to avoid accidental hiding
+started = started_mask(normalize_booking_times(bookings), datetime.now())
+bookings = [b for b, gone in zip(bookings, started) if not gone]
 
 if not bookings:
     st.info("No upcoming confirmed bookings")
     st.stop()
 
+# Parents and tutors for the whole list: one query per table, then the
+# resolver for bookings whose tutor reference is not a tutor id
+enriched = enrich_bookings(bookings, fallback=True, client=supabase)
+
 for b in bookings:
     st.divider()
     # Header with inline cancel icon
@@ -147,13 +99,13 @@ for b in bookings:
         if st.button("❌", key=f"cancel_icon_{b.get('id')}"):
             try:
                 now = datetime.now()
-                existing = set(b.keys() or [])
                 candidate = {"cancelled": True, "cancelled_at": now.isoformat(), "status": "Cancelled"}
-                payload = {k: v for k, v in candidate.items() if k in existing}
+                payload = writable_payload('bookings', candidate, b)
                 if not payload:
                     cols[1].error("Unable to cancel: bookings table missing cancel/status columns. Cancel manually in DB.")
                 else:
-                    supabase.table('bookings').update(payload).eq('id', b.get('id')).execute()
+                    changed = supabase.table('bookings').update(payload).eq('id', b.get('id')).execute()
+                    mark_bookings_changed(changed.data)
                     # show confirmation across the row (left column) instead of below
                     cols[0].success("Booking cancelled")
             except Exception as e:
@@ -163,7 +115,7 @@ for b in bookings:
     tutor_display = "Tutor: not assigned"
     if b.get('tutor_id'):
         try:
-            t = find_tutor(b.get('tutor_id'), b)
+            t = enriched.tutor_for(b)
             if t:
                 tutor_display = f"Tutor: {t.get('name','')} {t.get('surname','')} — {t.get('phone') or t.get('email') or 'no contact'}"
             else:
@@ -176,8 +128,7 @@ for b in bookings:
     # Parent notification status (based on confirmed_at and parent email)
     parent_email = None
     try:
-        p_res = supabase.table('parents').select('id,email').eq('id', b.get('parent_id')).execute()
-        p = (p_res.data or [None])[0]
+        p = enriched.parent_for(b)
         if p and p.get('email'):
             parent_email = p.get('email')
     except Exception:
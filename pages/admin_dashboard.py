@@ -5,7 +5,12 @@ hide_sidebar()
 from datetime import date, datetime
 import math
 import pandas as pd
-from utils.database import supabase
+from utils.session import get_session_client, forget_session
+from utils.enrichment import enrich_bookings
+from utils.booking_window import window_bounds, fetch_bookings_window
+
+# Queries run as the signed-in admin, so row-level security applies to them
+supabase = get_session_client()
 
 st.title("Admin Dashboard")
 
@@ -18,6 +23,7 @@ def _logout():
         supabase.auth.sign_out()
     except Exception:
         pass
+    forget_session()
     for k in list(st.session_state.keys()):
         if k != "_is_running":
             try:
@@ -156,52 +162,27 @@ if st.session_state.get("_logout_confirmed"):
         st.session_state.pop("_logout_confirmed", None)
 
 # --- Build query ---
-query = supabase.table("bookings").select("*")
-
 # Apply view filter (Pending / Confirmed) from the top icons
 view = st.session_state.get("admin_dashboard_view", "pending")
-if view == "pending":
-    query = query.eq("status", "Pending")
-elif view == "confirmed":
-    query = query.eq("status", "Confirmed")
+status_filter = {"pending": "Pending", "confirmed": "Confirmed"}.get(view)
 
-# Exclude cancelled bookings (some DBs may not have a dedicated cancelled column)
-try:
-    query = query.neq("status", "Cancelled")
-except Exception:
-    # If the client or DB doesn't support `neq`, fall back to running the query as-is
-    pass
-
-res = query.order("start_time").execute()
-
-# Show only bookings (Pending/Confirmed) occurring in the next 48 hours
-from datetime import timedelta
-now = datetime.now()
-# Show only future bookings (from now) up to the next 48 hours
-# If the admin requested past bookings, extend the window back 7 days
-if st.session_state.get("admin_show_past"):
-    start_window = now - timedelta(days=7)
-else:
-    start_window = now
-cutoff = now + timedelta(hours=48)
+# Show only bookings (Pending/Confirmed) occurring in the next 48 hours.
+# If the admin requested past bookings, extend the window back 7 days.
+start_window, cutoff = window_bounds(hours_ahead=48, days_back=7 if st.session_state.get("admin_show_past") else 0)
 
-bookings = res.data or []
-upcoming = []
-for b in bookings:
-    try:
-        date_str = b.get('exam_date')
-        time_str = b.get('start_time') or '00:00:00'
-        dt = datetime.combine(datetime.fromisoformat(date_str), datetime.strptime(time_str, "%H:%M:%S").time())
-    except Exception:
-        continue
-    # Show bookings from now up to 48 hours from now (hide passed bookings)
-    if start_window <= dt <= cutoff:
-        upcoming.append((dt, b))
+# The exam_date range is filtered in the database, so this stays fast as
+# booking history grows; only the rendered columns are fetched.
+try:
+    upcoming = fetch_bookings_window(start_window, cutoff, status=status_filter, client=supabase)
+except Exception as e:
+    st.error(f"Could not load bookings: {e}")
+    upcoming = []
 
 if not upcoming:
     st.info("No bookings pending/confirmed in the next 48 hours.")
 else:
-    upcoming.sort(key=lambda x: x[0])
+    # Tutors for the listed bookings: one query, then the resolver for legacy references
+    enriched = enrich_bookings((b for _, b in upcoming), parents=False, fallback=True, client=supabase)
     st.subheader(f"Bookings from {start_window.strftime('%d %b %Y %H:%M')} to {cutoff.strftime('%d %b %Y %H:%M')}")
     for dt, b in upcoming:
         st.divider()
@@ -210,37 +191,7 @@ else:
         tutor_info = ''
         if b.get('tutor_id'):
             try:
-                # robust lookup: try id/email then fallback to full table match
-                def find_tutor_inline(tutor_ref, booking=None):
-                    if not tutor_ref:
-                        return None
-                    for k in ('id','tutor_id','user_id','email'):
-                        try:
-                            r = supabase.table('tutors').select('name,surname,phone,email,id').eq(k, tutor_ref).execute()
-                            if r.data:
-                                return r.data[0]
-                        except Exception:
-                            pass
-                    try:
-                        allr = supabase.table('tutors').select('id,name,surname,phone,email').execute()
-                        tutors_all = allr.data or []
-                    except Exception:
-                        tutors_all = []
-                    for ttt in tutors_all:
-                        if str(ttt.get('id')) == str(tutor_ref):
-                            return ttt
-                    if booking:
-                        for field in ('tutor_name','tutor_fullname','tutor'):
-                            v = booking.get(field)
-                            if v:
-                                v = v.lower()
-                                for ttt in tutors_all:
-                                    fullname = f"{ttt.get('name','')} {ttt.get('surname','')}".strip().lower()
-                                    if v in fullname or fullname in v:
-                                        return ttt
-                    return None
-
-                tt = find_tutor_inline(b.get('tutor_id'), b)
+                tt = enriched.tutor_for(b)
                 if tt:
                     contact = tt.get('phone') or tt.get('email') or 'no contact'
                     tutor_info = f"Tutor: {tt.get('name')} {tt.get('surname')} — {contact}"
@@ -1,11 +1,8 @@
 import streamlit as st
 from utils.ui import hide_sidebar
 hide_sidebar()
-from utils.session import restore_session_from_refresh
 import socket
 import os
-import base64
-import requests
 
 try:
     st.set_page_config(page_title="Email Diagnostics")
@@ -27,14 +24,15 @@ def mask(s):
 
 st.markdown("This page runs simple connectivity checks for your Mailblaze HTTP API and can send a test email. It does not reveal secrets.")
 
-mb_key = (
-    os.getenv("API_KEY")
-    or os.getenv("MAILBLAZE_API_KEY")
-    or os.getenv("MAILBLAZE_KEY")
-    or os.getenv("mailblaze_api_key")
-    or os.getenv("MAILBLAZE_APIKEY")
-)
-mb_base = os.getenv("MAILBLAZE_BASE") or os.getenv("MAILBLAZE_BASE_URL") or os.getenv('mailblaze_http') or "https://control.mailblaze.com/api"
+from utils.email import get_mailblaze_client, reset_mailblaze_client
+
+if st.button("Reload Mailblaze configuration", key="diag_mb_reload"):
+    # The shared client reads the environment once; rebuild it after env changes
+    reset_mailblaze_client()
+
+mb = get_mailblaze_client()
+mb_key = mb.api_key
+mb_base = mb.base_url
 sender = os.getenv("SENDER_EMAIL") or os.getenv("EMAIL_FROM") or os.getenv("SMTP_USER")
 
 st.write("**Configured values (masked):**")
@@ -43,23 +41,18 @@ st.write(f"MAILBLAZE_BASE: {mask(mb_base)}")
 st.write(f"SENDER_EMAIL: {mask(sender)}")
 
 # Show additional sender env variants and what the email helper resolves
-try:
-    from utils.email import _get_sender
-    resolved = _get_sender()
-except Exception:
-    resolved = None
 st.write(f"sender_email (env): {mask(os.getenv('sender_email'))}")
 st.write(f"email_from (env): {mask(os.getenv('email_from'))}")
-st.write(f"Resolved sender from helper: {mask(resolved)}")
+st.write(f"Resolved sender from helper: {mask(mb.sender)}")
+st.write(f"Connection pool size: {mb.pool_size} · timeouts (connect, read): {mb.timeout}")
 
 if st.button("Check Mailblaze connectivity"):
     if not mb_base:
         st.error('Missing Mailblaze base URL (MAILBLAZE_BASE or mailblaze_http)')
     else:
-        st.info(f'Attempting HTTPS GET to {mb_base} (5s timeout)')
+        st.info(f'Attempting HTTPS GET to {mb_base} ({mb.timeout[0]:g}s connect timeout)')
         try:
-            headers = {"Authorization": f"Bearer {mb_key}"} if mb_key else {}
-            r = requests.get(mb_base, headers=headers, timeout=5)
+            r = mb.ping()
             st.write(f'Status: {r.status_code}')
             if r.status_code < 400:
                 st.success('Connectivity to Mailblaze base URL succeeded')
@@ -77,40 +70,81 @@ try:
     if st.button('Send test via Mailblaze', key='diag_mb_send'):
         if not mb_key:
             st.error('MAILBLAZE_API_KEY (or mailblaze_api_key) is not set in environment')
-        elif not default_from:
+        elif not mb.sender:
             st.error('SENDER_EMAIL or EMAIL_FROM is not configured')
         else:
-            encoded_body = base64.b64encode(mb_body.encode('utf-8')).decode('utf-8')
-            encoded_plain = base64.b64encode(mb_body.encode('utf-8')).decode('utf-8')
-
-            payload = {
-                "to_email": mb_recipient,
-                "to_name": None,
-                "from_email": default_from,
-                "from_name": os.getenv("MAILBLAZE_FROM_NAME") or os.getenv("EMAIL_FROM_NAME") or None,
-                "subject": mb_subject,
-                "body": encoded_body,
-                "plain_text": encoded_plain,
-            }
-
-            headers = {"Authorization": mb_key, "Content-Type": "application/json"}
-            base = mb_base
-            endpoints = [f"{base.rstrip('/')}/transactional"]
-            results = []
-            for ep in endpoints:
-                try:
-                    r = requests.post(ep, json=payload, headers=headers, timeout=10)
-                    results.append((ep, r.status_code, r.text))
-                    if r.status_code in (200, 201, 202):
-                        st.success(f'Mailblaze test send accepted via {ep}')
-                        break
-                except Exception as e:
-                    results.append((ep, 'err', repr(e)))
-            st.write('Results:')
-            for ep, status, body in results:
-                try:
-                    st.text(f'{ep} → {status} — {body}')
-                except Exception:
-                    st.write(f'{ep} → {status}')
+            res = mb.send(mb_recipient, mb_subject, mb_body, html=mb_body)
+            if res.get('ok'):
+                st.success(f'Mailblaze test send accepted via {mb.transactional_url}')
+                st.text(f"{mb.transactional_url} → {res.get('status_code')} — {res.get('response')}")
+            else:
+                st.write('Results:')
+                st.text(res.get('error'))
 except Exception:
     pass
+
+# Outbox: messages queued for background delivery by utils.outbox
+st.markdown("---")
+st.subheader("Email outbox")
+try:
+    from datetime import datetime
+    from utils.outbox import get_outbox
+
+    outbox = get_outbox()
+    counts = outbox.stats()
+    st.write(" · ".join(f"{k}: {v}" for k, v in counts.items()))
+
+    def _fmt(ts):
+        return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S") if ts else ""
+
+    status_filter = st.selectbox("Show", ["all", "queued", "retrying", "sending", "sent", "dead"], key="diag_outbox_status")
+    recent = outbox.messages(status=None if status_filter == "all" else status_filter, limit=100)
+    if recent:
+        st.dataframe([
+            {
+                "id": m["id"],
+                "to": m["to_email"],
+                "subject": m["subject"],
+                "status": m["status"],
+                "attempts": m["attempts"],
+                "next attempt": _fmt(m["next_attempt_at"]) if m["status"] in ("queued", "retrying") else "",
+                "sent": _fmt(m["sent_at"]),
+                "last error": m["last_error"] or "",
+            }
+            for m in recent
+        ])
+    else:
+        st.info("No messages.")
+
+    dead = outbox.dead_letters(limit=50)
+    if dead:
+        st.write("**Dead letters** (delivery gave up):")
+        for m in dead:
+            c1, c2 = st.columns([8, 2])
+            c1.write(f"{m['to_email']} — {m['subject']} — {m['last_error']}")
+            if c2.button("Retry", key=f"diag_outbox_retry_{m['id']}"):
+                if outbox.retry(m["id"]):
+                    st.success("Message requeued.")
+except Exception as e:
+    st.error(f"Could not read the email outbox: {e}")
+
+# Supabase: the shared connection pool behind every client (utils.supabase_clients)
+st.markdown("---")
+st.subheader("Supabase connections")
+try:
+    from utils.supabase_clients import pool_stats
+
+    pool = pool_stats()
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Requests", pool["requests"])
+    c2.metric("Connections opened", pool["connections_opened"])
+    c3.metric("Reused", pool["reused"])
+    c4.metric("Open now", pool["open_connections"] if pool["open_connections"] is not None else "?")
+    st.write(
+        f"HTTP/2: {'on' if pool['http2'] else 'off'} ({pool['http2_responses']} responses) · "
+        f"max connections {pool['max_connections']} · keep-alive {pool['max_keepalive']} for {pool['keepalive_expiry']:g}s · "
+        f"timeouts connect {pool['connect_timeout']:g}s / {pool['timeout']:g}s"
+    )
+    st.write("Clients: " + (", ".join(pool["clients"]) or "none yet"))
+except Exception as e:
+    st.error(f"Could not read Supabase pool statistics: {e}")
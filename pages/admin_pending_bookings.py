@@ -1,9 +1,20 @@
 import streamlit as st
-from utils.ui import hide_sidebar
+from utils.ui import hide_sidebar, show_confirmation_steps
 
 hide_sidebar()
 from datetime import datetime
-from utils.database import supabase
+from utils.session import get_session_client
+from utils.matching import candidate_tutors_for_bookings
+from utils.reference_cache import tutors_cache, parents_cache
+from utils.outbox import queue_email
+from utils.booking_changes import mark_bookings_changed
+from utils.schema import writable_payload
+from utils.confirmation import ConfirmationPipeline, remember_steps, pop_steps
+from utils.bulk_actions import confirm_bookings, tutor_assignment_email, parent_confirmation_email
+from utils.auto_assign import propose_plan
+
+# Queries run as the signed-in admin, so row-level security applies to them
+supabase = get_session_client()
 
 st.title("Pending Bookings — Admin")
 
@@ -91,10 +102,118 @@ for booking in bookings:
 
 bookings = filtered
 
+# Results of confirmations made before the last rerun
+for confirmed_id, steps in pop_steps(st.session_state).items():
+    show_confirmation_steps(f"booking {confirmed_id}", steps)
+
+bulk_result = st.session_state.pop("bulk_confirm_result", None)
+if bulk_result:
+    st.success(f"Confirmed {len(bulk_result['confirmed'])} booking(s); {bulk_result['emails_queued']} email(s) queued.")
+    if bulk_result['skipped']:
+        st.warning(f"Skipped (no tutor selected, or a clash listed below): {', '.join(str(i) for i in bulk_result['skipped'])}")
+    for err in bulk_result['errors']:
+        st.error(err)
+    if not bulk_result['audited']:
+        st.warning("Could not write the admin_actions audit row.")
+
 if not bookings:
     st.info("No pending bookings")
     st.stop()
 
+# Compute candidate tutors for the whole queue up front: one tutors query and
+# one unavailability query covering the queue's exam dates.
+match_errors = []
+try:
+    candidates_by_booking = candidate_tutors_for_bookings(bookings, errors=match_errors)
+except Exception:
+    candidates_by_booking = {}
+if match_errors:
+    st.warning("Could not load confirmed bookings, so tutors already booked at the same time are not filtered out: " + "; ".join(match_errors))
+
+
+def tutor_options_for(booking_id):
+    return {f"{t.get('name')} {t.get('surname')} ({t.get('city','')})": t.get('id') for t in candidates_by_booking.get(booking_id) or []}
+
+
+# --- BULK CONFIRM / ASSIGN ---
+# Confirms every selected booking with the tutor chosen under it (or one
+# tutor for all of them) in one update per tutor, and queues all the emails
+# together.
+with st.expander("Bulk confirm"):
+    bulk_labels = {
+        f"{b.get('child_name')} — {b.get('subject')} ({b.get('exam_date')} {b.get('start_time')}) #{b.get('id')}": b.get('id')
+        for b in bookings if candidates_by_booking.get(b.get('id'))
+    }
+    chosen = st.multiselect("Bookings to confirm (each gets the tutor selected under it below)", list(bulk_labels), key="bulk_confirm_select")
+    # Tutors suitable for every selected booking can be assigned to all of them
+    each_own = "(each booking's selected tutor)"
+    common = None
+    for label in chosen:
+        options = tutor_options_for(bulk_labels[label])
+        common = dict(options) if common is None else {k: v for k, v in common.items() if k in options}
+    assign_all = st.selectbox("Tutor", [each_own] + list(common or {}), key="bulk_assign_tutor")
+    if st.button(f"Confirm {len(chosen)} selected", key="bulk_confirm_go", disabled=not chosen):
+        assignments = {}
+        for label in chosen:
+            bid = bulk_labels[label]
+            options = tutor_options_for(bid)
+            selected_label = assign_all if assign_all != each_own else st.session_state.get(f"assign_{bid}")
+            assignments[bid] = options.get(selected_label) if selected_label in options else next(iter(options.values()), None)
+        try:
+            st.session_state["bulk_confirm_result"] = confirm_bookings(
+                [b for b in bookings if b.get('id') in assignments],
+                assignments,
+                admin_email=st.session_state.get('email'),
+                client=supabase,
+            )
+            st.session_state.pop("bulk_confirm_select", None)
+            safe_rerun()
+        except Exception as e:
+            st.error(f"Bulk confirm failed: {e}")
+
+# --- AUTO-ASSIGN ---
+# Proposes a tutor for every pending booking at once (see utils.auto_assign);
+# the admin reviews the plan and accepts it as one bulk confirmation.
+with st.expander("Auto-assign"):
+    st.caption("Plans the whole queue: roles, languages, unavailability, confirmed bookings and the daily cap are respected.")
+    if st.button("Propose plan", key="auto_assign_propose"):
+        try:
+            with st.spinner("Planning..."):
+                st.session_state["auto_assign_plan"] = propose_plan(bookings, client=supabase)
+        except Exception as e:
+            st.error(f"Could not propose a plan: {e}")
+    plan = st.session_state.get("auto_assign_plan")
+    if plan:
+        tutor_names = {str(t.get('id')): f"{t.get('name') or ''} {t.get('surname') or ''}".strip() for t in tutors_cache.all()}
+        planned = [b for b in bookings if b.get('id') in plan['assignments']]
+        st.write(f"{len(planned)} booking(s) assigned, {len(plan['unassigned'])} left for manual assignment.")
+        rows = [{
+            'Booking': b.get('id'),
+            'Child': b.get('child_name'),
+            'Subject': b.get('subject'),
+            'Date': b.get('exam_date'),
+            'Start': b.get('start_time'),
+            'Tutor': tutor_names.get(str(plan['assignments'][b.get('id')]), plan['assignments'][b.get('id')]),
+        } for b in planned]
+        rows += [{'Booking': bid, 'Tutor': f"— {reason}"} for bid, reason in plan['unassigned'].items()]
+        st.dataframe(rows, use_container_width=True)
+        col_accept, col_discard = st.columns(2)
+        if col_accept.button(f"Accept plan ({len(planned)})", key="auto_assign_accept", disabled=not planned):
+            try:
+                st.session_state["bulk_confirm_result"] = confirm_bookings(
+                    planned,
+                    plan['assignments'],
+                    admin_email=st.session_state.get('email'),
+                    client=supabase,
+                )
+                st.session_state.pop("auto_assign_plan", None)
+                safe_rerun()
+            except Exception as e:
+                st.error(f"Accepting the plan failed: {e}")
+        if col_discard.button("Discard plan", key="auto_assign_discard"):
+            st.session_state.pop("auto_assign_plan", None)
+            safe_rerun()
+
 for booking in bookings:
     st.divider()
     st.subheader(f"{booking.get('child_name')} — {booking.get('subject')}")
@@ -103,111 +222,13 @@ for booking in bookings:
     st.write(f"Start: {booking.get('start_time')} | Duration: {booking.get('duration')} mins")
     st.write(f"Role required: {booking.get('role_required')}")
 
-    # find suitable tutors
-    try:
-        tutors_res = supabase.table("tutors").select("*").eq("approved", True).execute()
-        suitable = []
-        def _normalize(r):
-            if not r:
-                return r
-            r = str(r)
-            if "Both" in r:
-                return "Both"
-            return r
-
-        def role_matches(tutor_role, required_role):
-            tr = _normalize(tutor_role)
-            rr = _normalize(required_role)
-            if not tr or not rr:
-                return False
-            if tr == rr:
-                return True
-            if tr == "All of the Above":
-                return True
-            if rr in ("Reader", "Scribe") and tr == "Both":
-                return True
-            return False
-
-        def _language_column_for(subject_text: str):
-            if not subject_text:
-                return None
-            s = subject_text.strip().lower()
-            mapping = {
-                'afrikaans': 'afrikaans',
-                'afr': 'afrikaans',
-                'isizulu': 'isizulu',
-                'zulu': 'isizulu',
-                'setswana': 'setswana',
-                'isixhosa': 'isixhosa',
-                'xhosa': 'isixhosa',
-                'french': 'french'
-            }
-            return mapping.get(s)
-
-        def _tutor_is_available(tutor_id, exam_date_obj, start_time_obj, duration_minutes):
-            try:
-                u_res = supabase.table('tutor_unavailability').select('*').eq('tutor_id', tutor_id).lte('start_date', exam_date_obj.isoformat()).gte('end_date', exam_date_obj.isoformat()).execute()
-                entries = u_res.data or []
-                if not entries:
-                    return True
-                import datetime as _dt
-                bstart_dt = _dt.datetime.combine(exam_date_obj, start_time_obj)
-                bend_dt = bstart_dt + _dt.timedelta(minutes=duration_minutes)
-                for e in entries:
-                    if not e.get('start_time') or not e.get('end_time'):
-                        return False
-                    try:
-                        es = _dt.datetime.strptime(e.get('start_time'), '%H:%M:%S').time()
-                        ee = _dt.datetime.strptime(e.get('end_time'), '%H:%M:%S').time()
-                    except Exception:
-                        return False
-                    estart_dt = _dt.datetime.combine(exam_date_obj, es)
-                    eend_dt = _dt.datetime.combine(exam_date_obj, ee)
-                    latest_start = max(bstart_dt, estart_dt)
-                    earliest_end = min(bend_dt, eend_dt)
-                    overlap = (earliest_end - latest_start).total_seconds()
-                    if overlap > 0:
-                        return False
-                return True
-            except Exception:
-                return False
-
-        # parse booking exam date and start_time
-        try:
-            exam_date_obj = datetime.fromisoformat(booking.get('exam_date')).date() if booking.get('exam_date') else None
-        except Exception:
-            exam_date_obj = None
-        try:
-            start_time = datetime.strptime(booking.get('start_time'), "%H:%M:%S").time() if booking.get('start_time') else None
-        except Exception:
-            start_time = None
-
-        lang_col = _language_column_for(booking.get('subject'))
-
-        def _tutor_has_any_lang_flags(tutor_row):
-            return any(bool(tutor_row.get(k)) for k in ('afrikaans', 'isizulu', 'setswana', 'isixhosa', 'french'))
-
-        for t in (tutors_res.data or []):
-            if not role_matches(t.get('roles'), booking.get('role_required')):
-                continue
-            # If the booking maps to a language column, only filter out tutors
-            # who have explicit language flags and do not include this language.
-            # Tutors with no language flags set are treated as able to cover any subject.
-            if lang_col and _tutor_has_any_lang_flags(t) and not t.get(lang_col):
-                continue
-            if start_time and exam_date_obj:
-                if not _tutor_is_available(t.get('id'), exam_date_obj, start_time, booking.get('duration') or 60):
-                    continue
-            suitable.append(t)
-        # Show all suitable tutors (no arbitrary limit)
-    except Exception:
-        suitable = []
+    suitable = candidates_by_booking.get(booking.get('id')) or []
 
     if not suitable:
         st.warning("No suitable tutors available")
         continue
 
-    tutor_options = {f"{t.get('name')} {t.get('surname')} ({t.get('city','')})": t.get('id') for t in suitable}
+    tutor_options = tutor_options_for(booking.get('id'))
     key = f"assign_{booking.get('id')}"
     selected = st.selectbox("Assign Tutor", options=list(tutor_options.keys()), key=key)
 
@@ -215,81 +236,42 @@ for booking in bookings:
         tutor_id = tutor_options.get(selected)
         try:
             update_res = supabase.table("bookings").update({"status": "Confirmed", "tutor_id": tutor_id}).eq("id", booking.get("id")).execute()
+            mark_bookings_changed(update_res.data)
             if getattr(update_res, 'error', None) is None:
                 st.success("Booking confirmed")
 
-                # Fetch tutor and parent records to send confirmation emails
-                try:
-                    tres = supabase.table('tutors').select('*').eq('id', tutor_id).execute()
-                    tutor = (tres.data or [None])[0]
-                except Exception:
-                    tutor = None
-
-                try:
-                    pres = supabase.table('parents').select('*').eq('id', booking.get('parent_id')).execute()
-                    parent = (pres.data or [None])[0]
-                except Exception:
-                    parent = None
+                # Look up tutor and parent together, then queue both emails together
+                pipeline = ConfirmationPipeline()
+                found = pipeline.stage({
+                    "Tutor lookup": lambda: tutors_cache.get_by_id(tutor_id, client=supabase),
+                    "Parent lookup": lambda: parents_cache.get_by_id(booking.get('parent_id'), client=supabase),
+                })
+                tutor = found["Tutor lookup"]
+                parent = found["Parent lookup"]
 
+                emails = {}
                 # Email tutor about the assignment
-                try:
-                    if tutor and tutor.get('email'):
-                        from utils.email import send_email
-                        t_email = tutor.get('email')
-                        t_name = f"{tutor.get('name') or ''} {tutor.get('surname') or ''}".strip()
-                        subj = f"New booking assigned: {booking.get('child_name') or 'Child'} — {booking.get('subject') or ''}"
-                        body = (
-                            f"Hello {t_name or 'Tutor'},\n\n"
-                            f"You have been assigned to a booking:\n"
-                            f"Child: {booking.get('child_name')}\n"
-                            f"Subject: {booking.get('subject')}\n"
-                            f"Date: {booking.get('exam_date')}\n"
-                            f"Start Time: {booking.get('start_time')}\n"
-                            f"Duration: {booking.get('duration')} minutes\n"
-                            f"Parent contact (email): {parent.get('email') if parent else 'N/A'}\n"
-                            f"Parent phone: {parent.get('phone') if parent else 'N/A'}\n\n"
-                            f"Please log in to the admin panel to view details.\n"
-                        )
-                        try:
-                            mail = send_email(t_email, subj, body)
-                            if mail.get('ok'):
-                                st.info(f"Notification emailed to tutor {t_name}.")
-                            else:
-                                st.warning(f"Failed to email tutor: {mail.get('error')}")
-                        except Exception:
-                            st.warning("Failed to send email to tutor (exception)")
-                except Exception:
-                    pass
+                tutor_msg = tutor_assignment_email(booking, tutor, parent)
+                if tutor_msg:
+                    def _email_tutor():
+                        queue_email(*tutor_msg)
+                        return f"queued for {tutor_msg[0]}"
+                    emails["Tutor email"] = _email_tutor
+                else:
+                    pipeline.skip("Tutor email", "tutor email not found")
 
                 # Email parent confirming tutor assignment
-                try:
-                    if parent and parent.get('email'):
-                        from utils.email import send_email
-                        p_email = parent.get('email')
-                        tutor_display = (f"{tutor.get('name') or ''} {tutor.get('surname') or ''}".strip()) if tutor else str(tutor_id)
-                        subj = f"Booking confirmed — Tutor assigned: {tutor_display}"
-                        body = (
-                            f"Hello {parent.get('parent_name') or ''},\n\n"
-                            f"Your booking has been confirmed.\n\n"
-                            f"Booking details:\n"
-                            f"- Child: {booking.get('child_name') or 'N/A'}\n"
-                            f"- Date: {booking.get('exam_date')}\n"
-                            f"- Time: {booking.get('start_time')}\n"
-                            f"- Assigned tutor: {tutor_display}\n"
-                            f"- Tutor email: {tutor.get('email') if tutor else 'N/A'}\n"
-                            f"- Tutor phone: {tutor.get('phone') if tutor else 'N/A'}\n\n"
-                            f"If you have any questions, reply to this email or contact admin.\n"
-                        )
-                        try:
-                            mail = send_email(p_email, subj, body)
-                            if mail.get('ok'):
-                                st.info("Confirmation emailed to parent.")
-                            else:
-                                st.warning(f"Failed to email parent: {mail.get('error')}")
-                        except Exception:
-                            st.warning("Failed to send email to parent (exception)")
-                except Exception:
-                    pass
+                parent_msg = parent_confirmation_email(booking, tutor, parent, tutor_id)
+                if parent_msg:
+                    def _email_parent():
+                        queue_email(*parent_msg)
+                        return f"queued for {parent_msg[0]}"
+                    emails["Parent email"] = _email_parent
+                else:
+                    pipeline.skip("Parent email", "parent email not found")
+
+                pipeline.stage(emails)
+                remember_steps(st.session_state, booking.get('id'), pipeline.steps)
 
                 safe_rerun()
             else:
@@ -300,15 +282,15 @@ for booking in bookings:
     if st.button("Cancel Booking", key=f"cancel_{booking.get('id')}"):
         try:
             cancel_time = datetime.now()
-            # Build update payload only including columns that exist on this booking row
-            existing = set(booking.keys() or [])
+            # Build update payload only including columns the bookings table has
             candidate = {"cancelled": True, "cancelled_at": cancel_time.isoformat(), "status": "Cancelled"}
-            payload = {k: v for k, v in candidate.items() if k in existing}
+            payload = writable_payload('bookings', candidate, booking)
 
             if not payload:
                 st.error("Unable to cancel: the bookings table does not expose cancellable fields. Please cancel via the admin dashboard or update the booking status manually in the database.")
             else:
-                supabase.table("bookings").update(payload).eq("id", booking.get('id')).execute()
+                changed = supabase.table("bookings").update(payload).eq("id", booking.get('id')).execute()
+                mark_bookings_changed(changed.data)
                 st.success("Booking cancelled")
                 safe_rerun()
         except Exception as e:
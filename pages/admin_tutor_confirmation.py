@@ -3,8 +3,18 @@ from utils.ui import hide_sidebar
 
 hide_sidebar()
 from datetime import datetime
-from utils.database import supabase
+from utils.session import get_session_client
+from utils.reference_cache import tutors_cache
+from utils.enrichment import enrich_bookings
+from utils.pagination import BookingPager
 from utils.email import send_email
+from utils.booking_changes import mark_bookings_changed
+from utils.schema import writable_payload
+from utils.busy_index import busy_for
+from utils.booking_times import normalize_booking_times, started_mask
+
+# Queries run as the signed-in admin, so row-level security applies to them
+supabase = get_session_client()
 
 st.title("Edit Confirmed Bookings")
 
@@ -60,75 +70,61 @@ st.markdown("Edit or Cancel Bookings")
 try:
     # Load bookings that have an allocated tutor (we're showing tutors who are booked)
     statuses = ["Assigned", "AwaitingTutorConfirmation", "TutorConfirmed", "Confirmed"]
-    res = supabase.table("bookings").select("*").in_("status", statuses).order("exam_date").limit(500).execute()
-    rows = res.data or []
-    # Filter to entries that actually have a tutor allocated
-    rows = [r for r in rows if r.get('tutor_id')]
-    # Exclude bookings that have already passed
     from datetime import datetime
     now = datetime.now()
-    filtered_rows = []
-    for r in rows:
-        try:
-            date_str = r.get('exam_date')
-            time_str = r.get('start_time') or '00:00:00'
-            dt = datetime.combine(datetime.fromisoformat(date_str), datetime.strptime(time_str, "%H:%M:%S").time())
-        except Exception:
-            # if parsing fails, keep the row
-            filtered_rows.append(r)
-            continue
-        if dt >= now:
-            filtered_rows.append(r)
-
-    rows = filtered_rows
+    # Page through upcoming bookings (earlier dates are skipped in the query);
+    # "Load more" below fetches just the next page instead of a fixed 500-row cap
+    pager = BookingPager(
+        st.session_state,
+        "confirmation",
+        filters=lambda q: q.in_("status", statuses),
+        date_from=now.date().isoformat(),
+        client=supabase,
+    )
+    rows, more_bookings = pager.rows(), pager.more
+    # Filter to entries that actually have a tutor allocated
+    rows = [r for r in rows if r.get('tutor_id')]
+    # Exclude bookings that have already passed (rows that fail to parse are kept)
+    started = started_mask(normalize_booking_times(rows), now)
+    rows = [r for r, gone in zip(rows, started) if not gone]
 except Exception as e:
     st.error(f"Could not load bookings: {e}")
     rows = []
+    more_bookings = False
 
 if not rows:
     st.info("No upcoming bookings found with an allocated tutor.")
 
-def find_tutor(tutor_ref, booking=None):
-    if not tutor_ref:
-        return None
-    keys_to_try = ["id", "tutor_id", "user_id", "email"]
-    for k in keys_to_try:
-        try:
-            res = supabase.table('tutors').select('*').eq(k, tutor_ref).execute()
-            if res.data:
-                return res.data[0]
-        except Exception:
-            pass
-    try:
-        all_res = supabase.table('tutors').select('*').execute()
-        tutors = all_res.data or []
-    except Exception:
-        tutors = []
-    for t in tutors:
-        if str(t.get('id')) == str(tutor_ref):
-            return t
-    if booking:
-        candidates = []
-        for field in ('tutor_name', 'tutor_fullname', 'tutor'):
-            v = booking.get(field)
-            if v:
-                candidates.append(v.lower())
-        for t in tutors:
-            fullname = f"{t.get('name','')} {t.get('surname','')}".strip().lower()
-            if fullname in candidates or any(c in fullname for c in candidates):
-                return t
-    return None
-
 # Load tutors for dropdowns (fallback list used for assign UI)
 try:
-    t_res = supabase.table("tutors").select("id,name,surname,phone,email").order("name").execute()
-    tutors = t_res.data or []
+    tutors = tutors_cache.all(order="name")
 except Exception:
     tutors = []
 
+# Parents and tutors for the whole list: one query per table, then the
+# resolver for bookings whose tutor reference is not a tutor id
+enriched = enrich_bookings(rows, fallback=True, client=supabase)
+
 def tutor_label(t):
     return f"{t.get('name','')} {t.get('surname','')} ({t.get('phone') or t.get('email') or 'no contact'})"
 
+
+def _booking_minutes(b):
+    try:
+        return int(b.get('duration') or 60) + int(b.get('extra_time') or 0)
+    except (TypeError, ValueError):
+        return 60
+
+
+# Existing bookings per tutor for the listed dates, to avoid double-booking
+# a tutor when reassigning
+try:
+    listed_dates = sorted(r.get('exam_date') for r in rows if r.get('exam_date'))
+    busy = busy_for(listed_dates[0], listed_dates[-1]) if listed_dates else None
+except Exception as e:
+    busy = None
+    st.warning(f"Could not load confirmed bookings, so reassignments are not checked for clashes: {e}")
+
 for b in rows:
     st.divider()
     booking_id = b.get('id')
@@ -144,7 +140,7 @@ for b in rows:
     tutor_info = None
     if b.get('tutor_id'):
         try:
-            t = find_tutor(b.get('tutor_id'), b)
+            t = enriched.tutor_for(b)
             if t:
                 tutor_info = (t.get('id'), f"{t.get('name','')} {t.get('surname','')}", t.get('phone') or t.get('email'))
         except Exception:
@@ -155,20 +151,12 @@ for b in rows:
     if tutor_info:
         tutor_display = f"{tutor_info[1]}"
     else:
-        # try to resolve tutor_id using cached tutors list before falling back to raw id/fields
+        # Not resolved above; try a direct lookup by id
         tutor_display = None
-        try:
-            t_match = next((t for t in (tutors or []) if str(t.get('id')) == str(b.get('tutor_id'))), None)
-            if t_match:
-                tutor_display = f"{t_match.get('name','')} {t_match.get('surname','')}".strip()
-        except Exception:
-            t_match = None
-        # If still not resolved, try a direct DB lookup by id
         if not tutor_display and b.get('tutor_id'):
             try:
-                direct = supabase.table('tutors').select('name,surname,phone,email').eq('id', b.get('tutor_id')).execute()
-                if direct.data:
-                    d = direct.data[0]
+                d = tutors_cache.get_by_id(b.get('tutor_id'), client=supabase)
+                if d:
                     tutor_display = f"{d.get('name','')} {d.get('surname','')}".strip()
             except Exception:
                 pass
@@ -187,13 +175,13 @@ for b in rows:
         if st.button("Cancel Booking", key=f"cancel_{booking_id}"):
             try:
                 cancel_time = datetime.now()
-                existing = set(b.keys() or [])
                 candidate = {"cancelled": True, "cancelled_at": cancel_time.isoformat(), "status": "Cancelled"}
-                payload = {k: v for k, v in candidate.items() if k in existing}
+                payload = writable_payload('bookings', candidate, b)
                 if not payload:
                     st.error("Unable to cancel: bookings table missing cancel/status columns. Cancel manually in DB.")
                 else:
-                    supabase.table("bookings").update(payload).eq("id", booking_id).execute()
+                    changed = supabase.table("bookings").update(payload).eq("id", booking_id).execute()
+                    mark_bookings_changed(changed.data)
                     st.success("Booking cancelled")
                     try:
                         st.experimental_rerun()
@@ -216,8 +204,7 @@ for b in rows:
     tutor_id_for_edit = b.get('tutor_id')
     if tutor_id_for_edit and st.session_state.get(f"editing_tutor_{tutor_id_for_edit}"):
         try:
-            t_res = supabase.table('tutors').select('*').eq('id', tutor_id_for_edit).execute()
-            tutor = (t_res.data or [None])[0]
+            tutor = tutors_cache.get_by_id(tutor_id_for_edit, client=supabase)
         except Exception as e:
             st.error(f"Failed to load tutor: {e}")
             tutor = None
@@ -255,8 +242,6 @@ for b in rows:
 
                 if save:
                     # Build payload and store in session for confirmation modal
-                    payload = {}
-                    existing_keys = set(tutor.keys())
                     fields = {
                         'name': name,
                         'surname': surname,
@@ -272,9 +257,7 @@ for b in rows:
                         'isixhosa': bool(isixhosa),
                         'french': bool(french),
                     }
-                    for k, v in fields.items():
-                        if k in existing_keys:
-                            payload[k] = v
+                    payload = writable_payload('tutors', fields, tutor)
 
                     if not payload:
                         st.info("No updatable columns found for this tutor.")
@@ -302,6 +285,7 @@ for b in rows:
                     if st.button("Confirm changes", key=f"confirm_tutor_update_{tutor_id_for_edit}"):
                         try:
                             upd = supabase.table('tutors').update(payload).eq('id', tutor_id_for_edit).execute()
+                            tutors_cache.invalidate()
                             if getattr(upd, 'error', None) is None:
                                 st.success("Tutor profile updated")
                                 # clear pending and editing flags
@@ -329,18 +313,17 @@ for b in rows:
     if status == "TutorConfirmed":
         if st.button("Finalize & Email Parent", key=f"admin_finalize_{booking_id}"):
             now = datetime.now()
-            existing = set(b.keys() or [])
             candidate = {"status": "Confirmed", "confirmed_at": now.isoformat()}
-            payload = {k: v for k, v in candidate.items() if k in existing}
+            payload = writable_payload('bookings', candidate, b)
             try:
                 if payload:
-                    supabase.table('bookings').update(payload).eq('id', booking_id).execute()
+                    changed = supabase.table('bookings').update(payload).eq('id', booking_id).execute()
+                    mark_bookings_changed(changed.data)
 
                 # Find parent email
                 parent_email = None
                 try:
-                    p_res = supabase.table('parents').select('*').eq('id', b.get('parent_id')).execute()
-                    p = (p_res.data or [None])[0]
+                    p = enriched.parent_for(b)
                     if p and p.get('email'):
                         parent_email = p.get('email')
                 except Exception:
@@ -393,11 +376,17 @@ for b in rows:
             new_time = st.text_input("Start time (HH:MM or HH:MM:SS)", value=b.get('start_time') or "07:45")
             new_subject = st.text_input("Subject", value=b.get('subject') or "")
 
-            # tutor selection (default to current tutor)
-            tutor_options = [tutor_label(t) for t in tutors]
+            # tutor selection (default to current tutor); tutors already booked
+            # for an overlapping slot are not offered
+            choices = [
+                t for t in tutors
+                if t.get('id') == b.get('tutor_id') or busy is None
+                or busy.is_free(t.get('id'), b.get('exam_date'), b.get('start_time'), _booking_minutes(b), booking_id)
+            ]
+            tutor_options = [tutor_label(t) for t in choices]
             current_label = ""
             if tutor_info:
-                current_label = tutor_label(next((t for t in tutors if t.get('id') == tutor_info[0]), {}))
+                current_label = tutor_label(next((t for t in choices if t.get('id') == tutor_info[0]), {}))
             if current_label in tutor_options:
                 default_idx = tutor_options.index(current_label)
             else:
@@ -416,44 +405,60 @@ for b in rows:
 
             if submitted:
                 try:
-                    selected_tutor = tutors[tutor_options.index(sel_idx)] if sel_idx in tutor_options else None
-                    existing = set(b.keys() or [])
-                    candidate = {
-                        "exam_date": new_date.isoformat() if new_date else None,
-                        "start_time": new_time,
-                        "subject": new_subject,
-                        "tutor_id": selected_tutor.get('id') if selected_tutor else b.get('tutor_id'),
-                        "status": "Assigned",
-                        "assigned_at": datetime.now().isoformat(),
-                    }
-                    payload = {k: v for k, v in candidate.items() if k in existing}
-                    if payload:
-                        supabase.table('bookings').update(payload).eq('id', booking_id).execute()
-
-                        # notify new tutor if email available
-                        if selected_tutor and selected_tutor.get('email'):
-                            tutor_email = selected_tutor.get('email')
-                            login_link = "https://your-app.example.com/tutor_login"
-                            body = (
-                                f"You have been assigned a booking (updated by admin).\n\n"
-                                f"Date: {candidate.get('exam_date')}\n"
-                                f"Time: {candidate.get('start_time')}\n"
-                                f"Subject: {candidate.get('subject')}\n"
-                                f"Please log in to confirm: {login_link}\n\nThanks,\nTurning Point"
-                            )
+                    selected_tutor = choices[tutor_options.index(sel_idx)] if sel_idx in tutor_options else None
+                    new_tutor_id = selected_tutor.get('id') if selected_tutor else b.get('tutor_id')
+                    new_start = new_time if str(new_time).count(':') != 1 else f"{new_time}:00"
+                    try:
+                        new_busy = busy_for(new_date) if new_date else None
+                    except Exception as e:
+                        new_busy = None
+                        st.warning(f"Could not check this tutor's other bookings: {e}")
+                    if new_busy is not None and new_tutor_id and not new_busy.is_free(
+                            new_tutor_id, new_date, new_start, _booking_minutes(b), booking_id):
+                        st.error("That tutor already has a booking overlapping this time. Choose another tutor or time.")
+                    else:
+                        candidate = {
+                            "exam_date": new_date.isoformat() if new_date else None,
+                            "start_time": new_time,
+                            "subject": new_subject,
+                            "tutor_id": selected_tutor.get('id') if selected_tutor else b.get('tutor_id'),
+                            "status": "Assigned",
+                            "assigned_at": datetime.now().isoformat(),
+                        }
+                        payload = writable_payload('bookings', candidate, b)
+                        if payload:
+                            changed = supabase.table('bookings').update(payload).eq('id', booking_id).execute()
+                            mark_bookings_changed(changed.data)
+
+                            # notify new tutor if email available
+                            if selected_tutor and selected_tutor.get('email'):
+                                tutor_email = selected_tutor.get('email')
+                                login_link = "https://your-app.example.com/tutor_login"
+                                body = (
+                                    f"You have been assigned a booking (updated by admin).\n\n"
+                                    f"Date: {candidate.get('exam_date')}\n"
+                                    f"Time: {candidate.get('start_time')}\n"
+                                    f"Subject: {candidate.get('subject')}\n"
+                                    f"Please log in to confirm: {login_link}\n\nThanks,\nTurning Point"
+                                )
+                                try:
+                                    send_email(tutor_email, "Assigned booking (updated)", body)
+                                except Exception:
+                                    pass
+
+                            st.success("Booking updated.")
+                            st.session_state.pop(f"editing_{booking_id}", None)
                             try:
-                                send_email(tutor_email, "Assigned booking (updated)", body)
+                                st.experimental_rerun()
                             except Exception:
                                 pass
-
-                        st.success("Booking updated.")
-                        st.session_state.pop(f"editing_{booking_id}", None)
-                        try:
-                            st.experimental_rerun()
-                        except Exception:
-                            pass
-                    else:
-                        st.error("Could not update booking: DB missing expected columns.")
+                        else:
+                            st.error("Could not update booking: DB missing expected columns.")
                 except Exception as e:
                     st.error(f"Failed to save changes: {e}")
 
+
+if more_bookings:
+    st.divider()
+    # Runs before the rerun, so the new page shows straight away
+    st.button("Load more bookings", key="confirmation_load_more", on_click=pager.load_more)
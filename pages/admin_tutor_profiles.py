@@ -2,13 +2,19 @@ import streamlit as st
 from utils.ui import hide_sidebar
 
 hide_sidebar()
-from utils.database import supabase
+from utils.session import get_session_client
+from utils.reference_cache import tutors_cache
 from utils.email import send_email, send_admin_email
 from utils.session import set_auth_user_password, get_supabase_service
+from utils.bulk_actions import set_tutors_approved
+from utils.schema import writable_payload
 import os
 import secrets
 import string
 
+# Queries run as the signed-in admin, so row-level security applies to them
+supabase = get_session_client()
+
 st.title("Tutor Profiles — Admin")
 
 if not st.session_state.get("authenticated") or st.session_state.get("role") != "admin":
@@ -59,9 +65,9 @@ with back_col:
     )
 
 try:
-    # select all columns to avoid failing when optional columns (email/notes) are missing
-    tutors_res = supabase.table("tutors").select("*").order("name").execute()
-    tutors = tutors_res.data or []
+    # select all columns to avoid failing when optional columns (email/notes) are missing;
+    # read as the admin, since the shared tutors cache only holds approved tutors
+    tutors = supabase.table("tutors").select("*").order("name").execute().data or []
 except Exception as e:
     st.error(f"Could not load tutors: {e}")
     st.stop()
@@ -69,9 +75,40 @@ except Exception as e:
 unconfirmed = [t for t in tutors if not t.get("approved")]
 
 st.header("Unconfirmed Tutor Profiles")
+bulk_result = st.session_state.pop("bulk_approve_result", None)
+if bulk_result:
+    st.success(f"{bulk_result['verb']} {len(bulk_result['updated'])} of {len(bulk_result['requested'])} tutor(s).")
+    if not bulk_result['audited']:
+        st.warning("Could not write the admin_actions audit row.")
 if not unconfirmed:
     st.info("No tutor profiles awaiting confirmation")
 else:
+    # Bulk: approve or deny every selected tutor in one update
+    with st.expander("Bulk confirm / deny"):
+        bulk_labels = {
+            f"{(t.get('name') or '')} {(t.get('surname') or '')} <{t.get('email') or 'no email'}> #{t.get('id')}".strip(): t.get('id')
+            for t in unconfirmed
+        }
+        chosen = st.multiselect("Tutors", list(bulk_labels), key="bulk_tutor_select")
+        bcols = st.columns(2)
+        for col, approve, verb in ((bcols[0], True, "Confirmed"), (bcols[1], False, "Denied")):
+            label = f"{'Confirm' if approve else 'Deny'} {len(chosen)} selected"
+            if col.button(label, key=f"bulk_{'confirm' if approve else 'deny'}_tutors", disabled=not chosen):
+                try:
+                    result = set_tutors_approved(
+                        [bulk_labels[c] for c in chosen], approved=approve,
+                        admin_email=st.session_state.get('email'),
+                        client=supabase,
+                    )
+                    st.session_state["bulk_approve_result"] = {**result, 'verb': verb}
+                    st.session_state.pop("bulk_tutor_select", None)
+                    try:
+                        st.experimental_rerun()
+                    except Exception:
+                        pass
+                except Exception as e:
+                    st.error(f"Bulk update failed: {e}")
+
     for t in unconfirmed:
         tid = t.get('id')
         name = f"{t.get('name') or ''} {t.get('surname') or ''}".strip()
@@ -88,6 +125,7 @@ else:
                     try:
                         # attempt to set approved=True (DB may or may not include the column)
                         supabase.table('tutors').update({"approved": True}).eq('id', tid).execute()
+                        tutors_cache.invalidate()
                         st.success(f"Confirmed {name}")
                         try:
                             st.experimental_rerun()
@@ -98,6 +136,7 @@ else:
                 if st.button("Deny", key=f"deny_{tid}"):
                     try:
                         supabase.table('tutors').update({"approved": False}).eq('id', tid).execute()
+                        tutors_cache.invalidate()
                         st.info(f"Denied {name}")
                         try:
                             st.experimental_rerun()
@@ -111,8 +150,7 @@ else:
             # Inline edit for unconfirmed tutor
             if st.session_state.get(f"editing_unconfirmed_{tid}"):
                 try:
-                    t_res = supabase.table('tutors').select('*').eq('id', tid).execute()
-                    tutor = (t_res.data or [None])[0]
+                    tutor = tutors_cache.get_by_id(tid, client=supabase)
                 except Exception as e:
                     st.error(f"Failed to load tutor for edit: {e}")
                     tutor = None
@@ -147,8 +185,6 @@ else:
                                 pass
 
                         if save:
-                            payload = {}
-                            existing_keys = set(tutor.keys())
                             fields = {
                                 'name': name_in,
                                 'surname': surname_in,
@@ -164,15 +200,14 @@ else:
                                 'isixhosa': bool(isixhosa_in),
                                 'french': bool(french_in),
                             }
-                            for k, v in fields.items():
-                                if k in existing_keys:
-                                    payload[k] = v
+                            payload = writable_payload('tutors', fields, tutor)
 
                             if not payload:
                                 st.info("No updatable columns found for this tutor.")
                             else:
                                 try:
                                     upd = supabase.table('tutors').update(payload).eq('id', tid).execute()
+                                    tutors_cache.invalidate()
                                     if getattr(upd, 'error', None) is None:
                                         st.success("Tutor profile updated")
                                         st.session_state.pop(f"editing_unconfirmed_{tid}", None)
@@ -198,8 +233,7 @@ else:
     if selected_label:
         tutor_id = tutor_map.get(selected_label)
         try:
-            t_res = supabase.table("tutors").select("*").eq("id", tutor_id).execute()
-            tutor = (t_res.data or [None])[0]
+            tutor = tutors_cache.get_by_id(tutor_id, client=supabase)
         except Exception as e:
             st.error(f"Failed to load tutor: {e}")
             tutor = None
@@ -227,9 +261,7 @@ else:
 
                 submitted = st.form_submit_button("Save changes")
                 if submitted:
-                    # Build payload only with keys that exist in the current tutor record
-                    payload = {}
-                    existing_keys = set(tutor.keys())
+                    # Build payload only with columns the tutors table has
                     fields = {
                         "name": name,
                         "surname": surname,
@@ -245,9 +277,7 @@ else:
                         "isixhosa": bool(isixhosa),
                         "french": bool(french),
                     }
-                    for k, v in fields.items():
-                        if k in existing_keys:
-                            payload[k] = v
+                    payload = writable_payload('tutors', fields, tutor)
 
                     # If payload is empty, nothing to update
                     if not payload:
@@ -255,6 +285,7 @@ else:
                     else:
                         try:
                             upd = supabase.table("tutors").update(payload).eq("id", tutor_id).execute()
+                            tutors_cache.invalidate()
                             if getattr(upd, 'error', None) is None:
                                 st.success("Tutor profile updated")
                                 try:
@@ -5,14 +5,15 @@ try:
     st.set_page_config(page_title="Admin Tutors")
 except Exception:
     pass
-from utils.session import get_supabase
-from utils.session import delete_auth_user, set_auth_user_password, get_supabase_service
+from utils.reference_cache import tutors_cache
+from utils.session import delete_auth_user, set_auth_user_password, get_supabase_service, get_session_client
 import os
 from utils.email import send_email
 import secrets
 import string
 
-supabase = get_supabase()
+# Queries run as the signed-in admin, so row-level security applies to them
+supabase = get_session_client()
 
 st.title("Admin – Tutor Approval")
 
@@ -65,16 +66,14 @@ def safe_rerun():
     except Exception:
         st.markdown("<script>window.location.reload()</script>", unsafe_allow_html=True)
 
-res = supabase.table("tutors") \
-    .select("*") \
-    .order("created_at", desc=True) \
-    .execute()
+# Read as the admin: the shared tutors cache only holds approved tutors
+tutors = supabase.table("tutors").select("*").order("created_at", desc=True).execute().data or []
 
-if not res.data:
+if not tutors:
     st.info("No tutors found.")
     st.stop()
 
-for tutor in res.data:
+for tutor in tutors:
     with st.expander(f"{tutor.get('name')} {tutor.get('surname')}"):
         st.write(f"📞 {tutor.get('phone')}")
         st.write(f"📍 {tutor.get('town')}, {tutor.get('city')}")
@@ -88,6 +87,7 @@ for tutor in res.data:
                     .update({"approved": True}) \
                     .eq("id", tutor.get("id")) \
                     .execute()
+                tutors_cache.invalidate()
 
                 st.success("Tutor approved.")
                 safe_rerun()
@@ -97,6 +97,7 @@ for tutor in res.data:
             if st.button("Remove transport", key=f"remove_transport_{tutor.get('id')}"):
                 try:
                     supabase.table('tutors').update({'transport': False}).eq('id', tutor.get('id')).execute()
+                    tutors_cache.invalidate()
                     st.success('Transport flag cleared for tutor')
                     safe_rerun()
                 except Exception as e:
@@ -114,6 +115,7 @@ for tutor in res.data:
                 if confirm == 'DELETE' and st.button('Confirm delete record', key=f'confirm_delete_tutor_record_confirm_{tutor.get("id")}'):
                     try:
                         supabase.table('tutors').delete().eq('id', tutor.get('id')).execute()
+                        tutors_cache.invalidate()
                         # audit
                         try:
                             svc = get_supabase_service()
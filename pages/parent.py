@@ -1,7 +1,9 @@
 import streamlit as st
 from utils.ui import hide_sidebar
-from utils.database import supabase
-from utils.session import restore_session_from_refresh
+from utils.reference_cache import parents_cache
+from utils.session import restore_remembered_session, await_restored_session, remember_session, get_session_client
+from utils.parent_profile_store import ParentProfileStore
+from utils.profile_link import link_profile
 
 hide_sidebar()
 try:
@@ -74,23 +76,19 @@ with tab1:
     except Exception:
         pass
 
-    if params.get('tp_rt'):
+    # The token exchange runs in the background (utils.token_store); the
+    # page renders meanwhile and reruns when it is done
+    if params.get('tp_rt') and not st.session_state.get('authenticated'):
         token = params.get('tp_rt')[0]
         try:
-            restored = restore_session_from_refresh(token)
-            if restored and restored.get('user'):
-                st.session_state['authenticated'] = True
-                st.session_state['user'] = restored.get('user')
-                st.session_state['role'] = 'parent'
-                st.session_state['email'] = restored.get('user', {}).get('email')
-                try:
-                    st.query_params
-                except Exception:
-                    pass
+            restored = restore_remembered_session(token, 'parent')
+            if restored == 'restored':
                 try:
-                    st.experimental_rerun()
+                    st.rerun()
                 except Exception:
                     pass
+            elif restored == 'pending':
+                await_restored_session(token)
         except Exception:
             pass
 
@@ -100,7 +98,9 @@ with tab1:
 
     if st.button("Login"):
         try:
-            res = supabase.auth.sign_in_with_password({"email": email, "password": password})
+            # Sign in on this visitor's own client; the parents lookups below run as them
+            auth_client = get_session_client()
+            res = auth_client.auth.sign_in_with_password({"email": email, "password": password})
 
             # Persist refresh token to localStorage when requested (so we can
             # restore sessions across page reloads). We try to extract the
@@ -147,28 +147,19 @@ with tab1:
             st.session_state['user'] = user_obj
             st.session_state['role'] = 'parent'
             st.session_state['email'] = user_email
+            # Keep the tokens refreshed in the background from now on
+            try:
+                remember_session(res)
+            except Exception:
+                pass
             st.success("Logged in successfully.")
 
+            # Link or create the parents row in one call (see utils.profile_link)
             try:
-                if user_id or user_email:
-                    if user_id:
-                        p_res = supabase.table('parents').select('*').eq('user_id', user_id).execute()
-                        if getattr(p_res, 'data', None) and len(p_res.data) > 0:
-                            existing = p_res.data[0]
-                            if user_email and existing.get('email') != user_email:
-                                supabase.table('parents').update({'email': user_email}).eq('id', existing.get('id')).execute()
-                        else:
-                            if user_email:
-                                by_email = supabase.table('parents').select('*').eq('email', user_email).execute()
-                                if getattr(by_email, 'data', None) and len(by_email.data) > 0:
-                                    supabase.table('parents').update({'user_id': user_id}).eq('id', by_email.data[0].get('id')).execute()
-                                else:
-                                    supabase.table('parents').insert({'user_id': user_id, 'email': user_email}).execute()
-                    else:
-                        if user_email:
-                            by_email = supabase.table('parents').select('*').eq('email', user_email).execute()
-                            if not (getattr(by_email, 'data', None) and len(by_email.data) > 0):
-                                supabase.table('parents').insert({'email': user_email}).execute()
+                linked = link_profile('parents', user_id, user_email, client=auth_client)
+                if linked and linked['changed']:
+                    parents_cache.invalidate()
+                    ParentProfileStore(st.session_state).invalidate()
             except Exception:
                 pass
 
@@ -261,7 +252,8 @@ with tab2:
             st.error("Passwords do not match.")
         else:
             try:
-                res = supabase.auth.sign_up({"email": reg_email, "password": reg_password})
+                auth_client = get_session_client()
+                res = auth_client.auth.sign_up({"email": reg_email, "password": reg_password})
                 # Regardless of whether Supabase returns a user object (depends
                 # on email confirmation settings), store the registration email
                 # in session so the user can be redirected to complete their
@@ -290,28 +282,10 @@ with tab2:
                         user_email = reg_email
 
                     try:
-                        # If a parents record exists by user_id, update email if missing
-                        if user_id:
-                            p_res = supabase.table('parents').select('*').eq('user_id', user_id).execute()
-                            if getattr(p_res, 'data', None) and len(p_res.data) > 0:
-                                existing = p_res.data[0]
-                                if user_email and existing.get('email') != user_email:
-                                    supabase.table('parents').update({'email': user_email}).eq('id', existing.get('id')).execute()
-                            else:
-                                # Try to find by email and attach user_id
-                                if user_email:
-                                    by_email = supabase.table('parents').select('*').eq('email', user_email).execute()
-                                    if getattr(by_email, 'data', None) and len(by_email.data) > 0:
-                                        supabase.table('parents').update({'user_id': user_id}).eq('id', by_email.data[0].get('id')).execute()
-                                    else:
-                                        # Insert a minimal parent record
-                                        supabase.table('parents').insert({'user_id': user_id, 'email': user_email}).execute()
-                        else:
-                            # No user_id available; ensure a parents row for the email exists
-                            if user_email:
-                                by_email = supabase.table('parents').select('*').eq('email', user_email).execute()
-                                if not (getattr(by_email, 'data', None) and len(by_email.data) > 0):
-                                    supabase.table('parents').insert({'email': user_email}).execute()
+                        linked = link_profile('parents', user_id, user_email, client=auth_client)
+                        if linked and linked['changed']:
+                            parents_cache.invalidate()
+                            ParentProfileStore(st.session_state).invalidate()
                     except Exception:
                         pass
 
@@ -6,8 +6,14 @@ try:
 except Exception:
     pass
 from datetime import datetime, timedelta, time
-from utils.database import supabase
+from utils.session import get_session_client
 from utils.email import send_admin_email
+from utils.booking_changes import mark_bookings_changed
+from utils.parent_profile_store import ParentProfileStore
+from utils.schema import schema_cache, writable_payload
+
+# Queries run as the signed-in parent, so row-level security applies to them
+supabase = get_session_client()
 
 if "user" not in st.session_state:
     st.error("Please log in first")
@@ -15,15 +21,15 @@ if "user" not in st.session_state:
 
 # Get parent profile
 user = st.session_state["user"]
-profile_res = supabase.table("parents").select("*").eq("user_id", user.id).execute()
-profile = profile_res.data[0]
+# Loaded once per session; form reruns read it from the session store
+profile_store = ParentProfileStore(st.session_state, client=supabase)
+profile = profile_store.get(user.id)
+if not profile:
+    st.error("Parent profile not found. Please complete your profile first.")
+    st.stop()
 
 # Determine children for this parent (support multiple children)
-children = profile.get('children') or []
-if not children:
-    first = profile.get('child_name') or profile.get('child_firstname') or None
-    if first:
-        children = [{'name': first, 'grade': profile.get('grade'), 'school': profile.get('school')}]
+children = profile_store.children(user.id)
 
 child_options = []
 for c in (children or []):
@@ -37,13 +43,8 @@ for c in (children or []):
         label += f" | {s}"
     child_options.append({'label': label, 'data': c})
 
-# If multiple children, let parent choose which child this booking is for
-selected_child = None
+# Quick link to edit/add children in profile (buttons cannot live inside the form)
 if child_options:
-    labels = [c['label'] for c in child_options]
-    idx = st.selectbox("Which child is this for?", options=list(range(len(labels))), format_func=lambda i: labels[i])
-    selected_child = child_options[idx]['data']
-    # Provide quick link to edit/add children in profile
     col_edit, _ = st.columns([1, 3])
     with col_edit:
         if st.button("Add / Edit children"):
@@ -60,8 +61,6 @@ if child_options:
                         pass
             except Exception:
                 pass
-else:
-    selected_child = None
 
 # Top-left Back button (smaller) and header inline
 back_col, main_col = st.columns([1, 9])
@@ -155,20 +154,29 @@ saved_notice = st.session_state.pop("parent_booking_saved_notice", None)
 if saved_notice:
     st.success(saved_notice)
 
-# Form inputs
-# Default exam date to tomorrow (cannot pick past dates/times)
-subject = st.text_input("Subject", key="pb_subject")
-# Default exam date to tomorrow (cannot pick past dates/times)
-# Default exam date to tomorrow (cannot pick past dates/times)
-tomorrow = (datetime.now() + timedelta(days=1)).date()
-today = datetime.now().date()
-exam_date = st.date_input("Exam Date", min_value=today, key="pb_exam_date")
-# Default start time remains 07:45
-start_time = st.time_input("Start Time", key="pb_start_time")
-duration = st.number_input("Duration (minutes)", min_value=30, max_value=180, key="pb_duration")
-extra_time = st.number_input("Extra Time (minutes)", min_value=0, max_value=60, key="pb_extra_time")
-role_options = ["Reader", "Scribe", "Both (Reader & Scribe)", "Invigilator", "Prompter"]
-role_required = st.selectbox("Role Required", role_options, key="pb_role_required")
+# Form inputs: held by the browser until Save, so filling them in does not
+# rerun the page
+with st.form("parent_booking_form"):
+    # If multiple children, let parent choose which child this booking is for
+    child_idx = None
+    if child_options:
+        labels = [c['label'] for c in child_options]
+        child_idx = st.selectbox("Which child is this for?", options=list(range(len(labels))), format_func=lambda i: labels[i])
+
+    subject = st.text_input("Subject", key="pb_subject")
+    # Default exam date to tomorrow (cannot pick past dates/times)
+    today = datetime.now().date()
+    exam_date = st.date_input("Exam Date", min_value=today, key="pb_exam_date")
+    # Default start time remains 07:45
+    start_time = st.time_input("Start Time", key="pb_start_time")
+    duration = st.number_input("Duration (minutes)", min_value=30, max_value=180, key="pb_duration")
+    extra_time = st.number_input("Extra Time (minutes)", min_value=0, max_value=60, key="pb_extra_time")
+    role_options = ["Reader", "Scribe", "Both (Reader & Scribe)", "Invigilator", "Prompter"]
+    role_required = st.selectbox("Role Required", role_options, key="pb_role_required")
+
+    col1, col2 = st.columns([1,1])
+    _do_save = col1.form_submit_button("💾  Save Booking")
+    _do_save_add = col2.form_submit_button("➕  Save & Add Another")
 
 # Normalize role text into DB-acceptable values (check constraints expect
 # short canonical values such as 'Reader','Scribe','Both','Invigilator','Prompter','All')
@@ -189,156 +197,35 @@ def _normalize_role_for_db(r: str):
     except Exception:
         return None
 
-# role value to persist in DB
-role_required_db = _normalize_role_for_db(role_required)
-
-# Show tutors who are approved and match the required role and language/availability
-def _language_column_for(subject_text: str):
-    if not subject_text:
-        return None
-    s = subject_text.strip().lower()
-    mapping = {
-                'afrikaans': 'afrikaans',
-                'afr': 'afrikaans',
-        'isizulu': 'isizulu',
-        'zulu': 'isizulu',
-        'setswana': 'setswana',
-        'isixhosa': 'isixhosa',
-        'xhosa': 'isixhosa',
-        'french': 'french'
-    }
-    return mapping.get(s)
-
-def _tutor_is_available(tutor_id, exam_date, start_time_obj, duration_minutes):
-    try:
-        # find any unavailability entries that cover the exam date
-        u_res = supabase.table('tutor_unavailability').select('*').eq('tutor_id', tutor_id).lte('start_date', exam_date.isoformat()).gte('end_date', exam_date.isoformat()).execute()
-        entries = u_res.data or []
-        if not entries:
-            return True
-        # booking time
-        from datetime import datetime, time
-        b_start = start_time_obj
-        # compute booking end time
-        bhour, bmin = b_start.hour, b_start.minute
-        import datetime as _dt
-        bstart_dt = _dt.datetime.combine(exam_date, b_start)
-        bend_dt = bstart_dt + _dt.timedelta(minutes=duration_minutes)
-
-        for e in entries:
-            # if times are not specified, tutor is unavailable for full day
-            if not e.get('start_time') or not e.get('end_time'):
-                return False
-            # parse times
-            try:
-                es = _dt.datetime.strptime(e.get('start_time'), '%H:%M:%S').time()
-                ee = _dt.datetime.strptime(e.get('end_time'), '%H:%M:%S').time()
-            except Exception:
-                return False
-            estart_dt = _dt.datetime.combine(exam_date, es)
-            eend_dt = _dt.datetime.combine(exam_date, ee)
-            # if time ranges overlap => unavailable
-            latest_start = max(bstart_dt, estart_dt)
-            earliest_end = min(bend_dt, eend_dt)
-            overlap = (earliest_end - latest_start).total_seconds()
-            if overlap > 0:
-                return False
-        return True
-    except Exception:
-        # On error, be conservative and mark unavailable
-        return False
-
-try:
-    tutors_res = supabase.table("tutors").select("*").eq("approved", True).execute()
-    all_tutors = tutors_res.data or []
-
-    lang_col = _language_column_for(subject)
-
-    eligible_tutors = []
-    def _normalize(r):
-        if not r:
-            return r
-        r = str(r)
-        if "Both" in r:
-            return "Both"
-        return r
-
-    def role_matches(tutor_role, required_role):
-        tr = _normalize(tutor_role)
-        rr = _normalize(required_role)
-        if not tr or not rr:
-            return False
-        if tr == rr:
-            return True
-        if tr == "All of the Above":
-            return True
-        if rr in ("Reader", "Scribe") and tr == "Both":
-            return True
-        return False
-
-    for t in all_tutors:
-        # role match
-        if not role_matches(t.get('roles'), role_required):
-            continue
-        # language match (if applicable)
-        if lang_col:
-            def _tutor_has_any_lang_flags(tutor_row):
-                return any(bool(tutor_row.get(k)) for k in ('afrikaans', 'isizulu', 'setswana', 'isixhosa', 'french'))
-            if _tutor_has_any_lang_flags(t) and not t.get(lang_col):
-                continue
-        # availability check
-        if not _tutor_is_available(t.get('id'), exam_date, start_time, duration):
-            continue
-        eligible_tutors.append(t)
-
-except Exception as e:
-    st.error(f"Could not load tutors: {e}")
-
-# Booking rules
-booking_dt = datetime.combine(exam_date, start_time)
-now = datetime.now()
-
-if booking_dt < now:
-    st.error("Cannot book for a past time.")
-    st.stop()
 
-# time delta between requested booking and now
-delta = booking_dt - now
-
-# Business rule: bookings within 24 hours must be made via WhatsApp
-# Compute booking date/time values used later and leave tutor assignment to admin.
-booking_date = exam_date
-start_dt = datetime.combine(booking_date, start_time)
-end_dt = start_dt + timedelta(minutes=(duration + extra_time))
-selected_tutor_id = None
-
-if booking_dt < now + timedelta(hours=24):
-    wa_number_display = "+27 82 883 6167"
-    wa_link = "https://wa.me/27828836167"
-    st.error(f"Bookings within 24 hours must be made via WhatsApp: {wa_number_display}")
-    st.markdown(f"[Open WhatsApp chat →]({wa_link})")
-    st.stop()
+def _insert_booking(add_another=False):
+    # Booking rules, checked when the form is submitted
+    booking_dt = datetime.combine(exam_date, start_time)
+    now = datetime.now()
 
-col1, col2 = st.columns([1,1])
+    if booking_dt < now:
+        st.error("Cannot book for a past time.")
+        return
 
+    # Business rule: bookings within 24 hours must be made via WhatsApp
+    if booking_dt < now + timedelta(hours=24):
+        wa_number_display = "+27 82 883 6167"
+        wa_link = "https://wa.me/27828836167"
+        st.error(f"Bookings within 24 hours must be made via WhatsApp: {wa_number_display}")
+        st.markdown(f"[Open WhatsApp chat →]({wa_link})")
+        return
 
-def _insert_booking(add_another=False):
     normalized_role_required = _normalize_role_for_db(role_required)
 
     if not normalized_role_required:
         st.error("Please choose a valid role before saving the booking.")
         return
 
-    if delta.total_seconds() < 24*3600:
-        wa_number_display = "+27 82 883 6167"
-        wa_link = "https://wa.me/27828836167"
-        st.warning(f"You can still submit, but admin will require WhatsApp confirmation via {wa_number_display}.")
-        st.markdown(f"[Open WhatsApp chat →]({wa_link})")
-
     # Use selected child details if available
     child_name = None
     grade_val = None
     school_val = None
+    selected_child = child_options[child_idx]['data'] if child_options else None
     if selected_child:
         child_name = selected_child.get('name')
         grade_val = selected_child.get('grade')
@@ -359,17 +246,26 @@ def _insert_booking(add_another=False):
         "start_time": start_time.strftime("%H:%M:%S"),
         "duration": duration,
         "extra_time": extra_time,
-        "tutor_id": selected_tutor_id
+        # Tutor assignment is left to admin
+        "tutor_id": None
     }
+    payload = writable_payload("bookings", payload)
+    # Where role_required is an enum type its labels are known up front
+    allowed_roles = schema_cache.allowed_values("bookings", "role_required")
+    if allowed_roles and payload.get("role_required") not in allowed_roles and "Both" in allowed_roles:
+        payload["role_required"] = "Both"
 
     try:
         insert_res = supabase.table("bookings").insert(payload).execute()
+        mark_bookings_changed(insert_res.data)
     except Exception as e:
-        # If a legacy role label slips through, retry once with a safe fallback.
+        # A CHECK constraint is not visible in the schema description: if a
+        # legacy role label slips through, retry once with a safe fallback.
         if "bookings_role_required_check" in str(e):
             payload["role_required"] = "Both"
             try:
                 insert_res = supabase.table("bookings").insert(payload).execute()
+                mark_bookings_changed(insert_res.data)
             except Exception as retry_e:
                 st.error(f"Booking failed: {retry_e}")
                 return
@@ -406,15 +302,11 @@ def _insert_booking(add_another=False):
         st.error(f"Booking failed: {getattr(insert_res, 'error', None)}")
 
 
-_do_save = col1.button("💾  Save Booking")
-_do_save_add = col2.button("➕  Save & Add Another")
-
 if _do_save:
     _insert_booking(add_another=False)
 
 if _do_save_add:
     _insert_booking(add_another=True)
-    _force_rerun()
 
 # Note: Back/Logout button removed per user request
 
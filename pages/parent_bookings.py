@@ -5,29 +5,19 @@ try:
     st.set_page_config(page_title="Parent Your Bookings")
 except Exception:
     pass
-from utils.database import supabase
+from utils.session import get_session_client
+from utils.enrichment import enrich_bookings
+from utils.booking_changes import mark_bookings_changed
+from utils.booking_times import cancellation_cutoff_passed
+from utils.parent_profile_store import ParentProfileStore
+from utils.schema import writable_payload
+from utils.booking_lists import BookingList
+from utils.ui import rerun_fragment
+from datetime import datetime
 
+# Queries run as the signed-in parent, so row-level security applies to them
+supabase = get_session_client()
 
-def _find_tutor_record(tutor_ref):
-    """Robust tutor lookup: try direct id match, then fall back to scanning tutors and matching by id string."""
-    if not tutor_ref:
-        return None
-    try:
-        # select all columns to avoid errors when some columns (e.g. email) don't exist
-        res = supabase.table("tutors").select("*").eq("id", tutor_ref).execute()
-        if getattr(res, 'data', None):
-            return res.data[0]
-    except Exception:
-        pass
-    try:
-        all_res = supabase.table("tutors").select("*").execute()
-        tutors = all_res.data or []
-    except Exception:
-        tutors = []
-    for t in tutors:
-        if str(t.get('id')) == str(tutor_ref):
-            return t
-    return None
 
 # Toggle to show debug info on tutor lookup failures
 DEBUG_TUTOR_LOOKUP = True
@@ -36,8 +26,7 @@ if "user" not in st.session_state:
     st.info("Please log in first via the Parent Portal.")
 else:
     user = st.session_state["user"]
-    profile_res = supabase.table("parents").select("*").eq("user_id", user.id).execute()
-    profile = profile_res.data[0] if profile_res.data else None
+    profile = ParentProfileStore(st.session_state, client=supabase).get(user.id)
 
     if not profile:
         st.warning("No parent profile found. Please create your profile first.")
@@ -98,21 +87,83 @@ else:
 
         st.title("Your Bookings")
 
-        try:
-            bookings_res = supabase.table("bookings").select("*").eq("parent_id", profile.get("id")).in_("status", ["Pending", "Confirmed"]).order("exam_date", desc=False).execute()
-            bookings = bookings_res.data or []
-        except Exception as e:
-            st.error(f"Could not load bookings: {e}")
-            bookings = []
+        parent_id = profile.get("id")
+        # Held in the session: clicks below rerun only the list, not the page
+        bookings_list = BookingList(
+            st.session_state,
+            f"parent_{parent_id}",
+            load=lambda: supabase.table("bookings").select("*").eq("parent_id", parent_id).in_("status", ["Pending", "Confirmed"]).order("exam_date", desc=False).execute().data,
+            # Tutors for every booking in one query
+            enrich=lambda rows: enrich_bookings(rows, parents=False, fallback=True, client=supabase),
+        )
+        notices_key = "_parent_bookings_notices"
+
+        def _display_date_time(b):
+            exam_date = b.get("exam_date")
+            start_time = b.get("start_time")
+            display_date = exam_date
+            try:
+                display_date = datetime.fromisoformat(exam_date).date().isoformat()
+            except Exception:
+                pass
+            display_time = start_time
+            try:
+                display_time = datetime.strptime(start_time, "%H:%M:%S").time().strftime("%H:%M")
+            except Exception:
+                pass
+            return display_date, display_time
+
+        def _cancel_booking(b):
+            cancel_time = datetime.now()
+            # After 17:00 the day before the exam, billing may apply
+            cutoff_applies = cancellation_cutoff_passed(b, cancel_time)
+
+            try:
+                candidate = {"cancelled": True, "cancelled_at": cancel_time.isoformat(), "status": "Cancelled"}
+                payload = writable_payload('bookings', candidate, b)
+
+                if not payload:
+                    st.error("Unable to cancel: bookings table missing cancel/status columns. Cancel manually in DB.")
+                    return
+                changed = supabase.table("bookings").update(payload).eq("id", b.get("id")).execute()
+                bookings_list.apply_written(changed.data, mark_bookings_changed(changed.data))
+
+                if cutoff_applies:
+                    wa_number_display = "+27 82 883 6167"
+                    wa_link = "https://wa.me/27828836167"
+                    notices = [
+                        ("warning", f"Cancelled after 17:00 the day before — billing may apply. For emergencies after this cutoff please call or WhatsApp {wa_number_display}."),
+                        ("markdown", f"[Open WhatsApp →]({wa_link})"),
+                    ]
+                else:
+                    notices = [("success", "Booking cancelled without penalty.")]
+                # Shown above the redrawn list
+                st.session_state[notices_key] = notices
+            except Exception as e:
+                st.error(f"Failed to cancel booking: {e}")
+                return
+            rerun_fragment()
+
+        @st.fragment
+        def _bookings_section():
+            for kind, text in st.session_state.pop(notices_key, None) or []:
+                getattr(st, kind)(text)
+
+            try:
+                bookings = bookings_list.rows()
+            except Exception as e:
+                st.error(f"Could not load bookings: {e}")
+                bookings = []
+
+            if not bookings:
+                st.info("No bookings found. You can make a booking now.")
+                if st.button("Make a Booking"):
+                    try:
+                        st.switch_page("pages/parent_booking.py")
+                    except Exception:
+                        st.experimental_rerun()
+                return
 
-        if not bookings:
-            st.info("No bookings found. You can make a booking now.")
-            if st.button("Make a Booking"):
-                try:
-                    st.switch_page("pages/parent_booking.py")
-                except Exception:
-                    st.experimental_rerun()
-        else:
             # Partition bookings into pending and confirmed
             pending = [bb for bb in bookings if (bb.get('status') or '').lower() == 'pending']
             confirmed = [bb for bb in bookings if (bb.get('status') or '').lower() == 'confirmed']
@@ -123,220 +174,91 @@ else:
                 st.info("You have no pending bookings.")
             else:
                 for b in pending:
-                    exam_date = b.get("exam_date")
-                    start_time = b.get("start_time")
                     subject = b.get("subject") or "(no subject)"
-
-                    display_date = exam_date
-                    try:
-                        from datetime import datetime
-                        display_date = datetime.fromisoformat(exam_date).date().isoformat()
-                    except Exception:
-                        pass
-
-                    display_time = start_time
-                    try:
-                        from datetime import datetime
-                        display_time = datetime.strptime(start_time, "%H:%M:%S").time().strftime("%H:%M")
-                    except Exception:
-                        pass
+                    display_date, display_time = _display_date_time(b)
 
                     line = f"{display_date} {display_time} — {subject} (Pending)"
                     cols = st.columns([9, 1])
                     with cols[0]:
                         st.write(line)
                     with cols[1]:
-                        cancel_key = f"cancel_{b.get('id')}"
-                        if st.button("❌", key=cancel_key):
-                            from datetime import datetime, timedelta, time as dt_time
-
-                            cancel_time = datetime.now()
-                            exam_date_raw = b.get("exam_date")
-                            start_time_raw = b.get("start_time")
-                            cutoff_applies = False
-                            try:
-                                exam_date_obj = datetime.fromisoformat(exam_date_raw).date()
-                                start_time_obj = datetime.strptime(start_time_raw, "%H:%M:%S").time()
-                                exam_dt = datetime.combine(exam_date_obj, start_time_obj)
-
-                                cutoff = datetime.combine(exam_dt.date() - timedelta(days=1), dt_time(17, 0))
-                                if cancel_time > cutoff:
-                                    cutoff_applies = True
-                            except Exception:
-                                cutoff_applies = False
-
-                            try:
-                                existing = set(b.keys() or [])
-                                candidate = {"cancelled": True, "cancelled_at": cancel_time.isoformat(), "status": "Cancelled"}
-                                payload = {k: v for k, v in candidate.items() if k in existing}
-
-                                if not payload:
-                                    st.error("Unable to cancel: bookings table missing cancel/status columns. Cancel manually in DB.")
-                                else:
-                                    supabase.table("bookings").update(payload).eq("id", b.get("id")).execute()
-
-                                    if cutoff_applies:
-                                        wa_number_display = "+27 82 883 6167"
-                                        wa_link = "https://wa.me/27828836167"
-                                        st.warning(f"Cancelled after 17:00 the day before — billing may apply. For emergencies after this cutoff please call or WhatsApp {wa_number_display}.")
-                                        st.markdown(f"[Open WhatsApp →]({wa_link})")
-                                    else:
-                                        st.success("Booking cancelled without penalty.")
-
-                                    try:
-                                        st.experimental_rerun()
-                                    except Exception:
-                                        pass
-                            except Exception as e:
-                                st.error(f"Failed to cancel booking: {e}")
-
-                # Hide non-parent pages from the sidebar for logged-in parents
-                if st.session_state.get("role") == "parent" or "user" in st.session_state:
-                    st.markdown(
-                        """
-                        <script>
-                        (function(){
-                            const allowed = ['Parent','Parent Portal','Parent Dashboard','Parent Profile','Parent Booking','Parent Your Bookings','Your Bookings','Profile','Bookings','Booking'];
-                            const hideNonParent = ()=>{
-                                try{
-                                    const sidebar = document.querySelector('aside');
-                                    if(!sidebar) return;
-                                    const links = sidebar.querySelectorAll('a');
-                                    links.forEach(a=>{
-                                        const txt = (a.innerText||a.textContent||'').trim();
-                                        const keep = allowed.some(k=> txt.indexOf(k)!==-1);
-                                        if(!keep){
-                                            const node = a.closest('div');
-                                            if(node) node.style.display='none';
-                                        }
-                                    });
-                                }catch(e){}
-                            };
-                            setTimeout(hideNonParent, 200);
-                        })();
-                        </script>
-                        """,
-                        unsafe_allow_html=True,
-                    )
+                        if st.button("❌", key=f"cancel_{b.get('id')}"):
+                            _cancel_booking(b)
+
+            # Hide non-parent pages from the sidebar for logged-in parents
+            if st.session_state.get("role") == "parent" or "user" in st.session_state:
+                st.markdown(
+                    """
+                    <script>
+                    (function(){
+                        const allowed = ['Parent','Parent Portal','Parent Dashboard','Parent Profile','Parent Booking','Parent Your Bookings','Your Bookings','Profile','Bookings','Booking'];
+                        const hideNonParent = ()=>{
+                            try{
+                                const sidebar = document.querySelector('aside');
+                                if(!sidebar) return;
+                                const links = sidebar.querySelectorAll('a');
+                                links.forEach(a=>{
+                                    const txt = (a.innerText||a.textContent||'').trim();
+                                    const keep = allowed.some(k=> txt.indexOf(k)!==-1);
+                                    if(!keep){
+                                        const node = a.closest('div');
+                                        if(node) node.style.display='none';
+                                    }
+                                });
+                            }catch(e){}
+                        };
+                        setTimeout(hideNonParent, 200);
+                    })();
+                    </script>
+                    """,
+                    unsafe_allow_html=True,
+                )
 
             # Confirmed bookings section
             st.header("Confirmed Bookings")
             if not confirmed:
                 st.info("You have no confirmed bookings.")
-            else:
-                for b in confirmed:
-                    exam_date = b.get("exam_date")
-                    start_time = b.get("start_time")
-                    subject = b.get("subject") or "(no subject)"
+                return
 
-                    display_date = exam_date
-                    try:
-                        from datetime import datetime
-                        display_date = datetime.fromisoformat(exam_date).date().isoformat()
-                    except Exception:
-                        pass
+            enriched = bookings_list.enriched()
+            for b in confirmed:
+                subject = b.get("subject") or "(no subject)"
+                display_date, display_time = _display_date_time(b)
 
-                    display_time = start_time
+                line = f"{display_date} {display_time} — {subject} (Booked)"
+
+                # Tutor lookup (existing logic)
+                tutor_id = b.get("tutor_id")
+                if tutor_id:
                     try:
-                        from datetime import datetime
-                        display_time = datetime.strptime(start_time, "%H:%M:%S").time().strftime("%H:%M")
+                        t = enriched.tutor_for(b)
+                        if t:
+                            tutor_name = f"{t.get('name','')} {t.get('surname','')}".strip()
+                            contact = t.get("phone") or t.get("email") or "no contact"
+                            line = f"{line} — Tutor: {tutor_name} — {contact}"
+                        else:
+                            line = f"{line} — Tutor assigned (id: {tutor_id})"
+                            if DEBUG_TUTOR_LOOKUP:
+                                with st.expander(f"Tutor lookup failed (booking {b.get('id')})", expanded=True):
+                                    st.write("tutor_id", tutor_id)
+                                    try:
+                                        direct = supabase.table("tutors").select("*").eq("id", tutor_id).execute()
+                                        st.write("direct query result", getattr(direct, 'data', None))
+                                    except Exception as e:
+                                        st.write("direct query exception", str(e))
+                                    try:
+                                        sample = supabase.table("tutors").select("*").limit(50).execute()
+                                        st.write("sample tutors (first 50)", getattr(sample, 'data', None))
+                                    except Exception as e:
+                                        st.write("sample query exception", str(e))
                     except Exception:
                         pass
 
-                    line = f"{display_date} {display_time} — {subject} (Booked)"
+                cols = st.columns([9, 1])
+                with cols[0]:
+                    st.write(line)
+                with cols[1]:
+                    if st.button("❌", key=f"cancel_{b.get('id')}"):
+                        _cancel_booking(b)
 
-                    # Tutor lookup (existing logic)
-                    tutor_id = b.get("tutor_id")
-                    if tutor_id:
-                        try:
-                            t = _find_tutor_record(tutor_id)
-                            if t:
-                                tutor_name = f"{t.get('name','')} {t.get('surname','')}".strip()
-                                contact = t.get("phone") or t.get("email") or "no contact"
-                                line = f"{line} — Tutor: {tutor_name} — {contact}"
-                            else:
-                                # Stronger fallback: fetch all tutors and compare stringified ids
-                                try:
-                                    all_res = supabase.table("tutors").select("*").execute()
-                                    tutors = all_res.data or []
-                                except Exception:
-                                    tutors = []
-                                found = None
-                                for tt in tutors:
-                                    if str(tt.get('id')) == str(tutor_id) or (tt.get('id') and str(tutor_id) in str(tt.get('id'))):
-                                        found = tt
-                                        break
-                                if found:
-                                    tutor_name = f"{found.get('name','')} {found.get('surname','')}".strip()
-                                    contact = found.get('phone') or found.get('email') or 'no contact'
-                                    line = f"{line} — Tutor: {tutor_name} — {contact}"
-                                    # optionally show debug info when lookup succeeds (useful during testing)
-                                    if DEBUG_TUTOR_LOOKUP:
-                                        with st.expander(f"Tutor lookup (booking {b.get('id')})", expanded=False):
-                                            st.write("tutor_id", tutor_id)
-                                            st.write("matched_record", found)
-                                else:
-                                    line = f"{line} — Tutor assigned (id: {tutor_id})"
-                                    if DEBUG_TUTOR_LOOKUP:
-                                        with st.expander(f"Tutor lookup failed (booking {b.get('id')})", expanded=True):
-                                            st.write("tutor_id", tutor_id)
-                                            try:
-                                                direct = supabase.table("tutors").select("*").eq("id", tutor_id).execute()
-                                                st.write("direct query result", getattr(direct, 'data', None))
-                                            except Exception as e:
-                                                st.write("direct query exception", str(e))
-                                            try:
-                                                sample = supabase.table("tutors").select("*").limit(50).execute()
-                                                st.write("sample tutors (first 50)", getattr(sample, 'data', None))
-                                            except Exception as e:
-                                                st.write("sample query exception", str(e))
-                        except Exception:
-                            pass
-
-                    cols = st.columns([9, 1])
-                    with cols[0]:
-                        st.write(line)
-                    with cols[1]:
-                        cancel_key = f"cancel_{b.get('id')}"
-                        if st.button("❌", key=cancel_key):
-                            from datetime import datetime, timedelta, time as dt_time
-
-                            cancel_time = datetime.now()
-                            exam_date_raw = b.get("exam_date")
-                            start_time_raw = b.get("start_time")
-                            cutoff_applies = False
-                            try:
-                                exam_date_obj = datetime.fromisoformat(exam_date_raw).date()
-                                start_time_obj = datetime.strptime(start_time_raw, "%H:%M:%S").time()
-                                exam_dt = datetime.combine(exam_date_obj, start_time_obj)
-
-                                cutoff = datetime.combine(exam_dt.date() - timedelta(days=1), dt_time(17, 0))
-                                if cancel_time > cutoff:
-                                    cutoff_applies = True
-                            except Exception:
-                                cutoff_applies = False
-
-                            try:
-                                existing = set(b.keys() or [])
-                                candidate = {"cancelled": True, "cancelled_at": cancel_time.isoformat(), "status": "Cancelled"}
-                                payload = {k: v for k, v in candidate.items() if k in existing}
-
-                                if not payload:
-                                    st.error("Unable to cancel: bookings table missing cancel/status columns. Cancel manually in DB.")
-                                else:
-                                    supabase.table("bookings").update(payload).eq("id", b.get("id")).execute()
-
-                                    if cutoff_applies:
-                                        wa_number_display = "+27 82 883 6167"
-                                        wa_link = "https://wa.me/27828836167"
-                                        st.warning(f"Cancelled after 17:00 the day before — billing may apply. For emergencies after this cutoff please call or WhatsApp {wa_number_display}.")
-                                        st.markdown(f"[Open WhatsApp →]({wa_link})")
-                                    else:
-                                        st.success("Booking cancelled without penalty.")
-
-                                    try:
-                                        st.experimental_rerun()
-                                    except Exception:
-                                        pass
-                            except Exception as e:
-                                st.error(f"Failed to cancel booking: {e}")
+        _bookings_section()
@@ -5,7 +5,7 @@ try:
     st.set_page_config(page_title="Parent Dashboard")
 except Exception:
     pass
-from utils.database import supabase
+from utils.session import get_session_client, forget_session
 
 st.title("Parent Dashboard")
 
@@ -18,9 +18,10 @@ if "user" not in st.session_state:
 
 def _logout():
     try:
-        supabase.auth.sign_out()
+        get_session_client().auth.sign_out()
     except Exception:
         pass
+    forget_session()
     for k in list(st.session_state.keys()):
         if k != "_is_running":
             try:
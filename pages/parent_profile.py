@@ -2,7 +2,13 @@ import streamlit as st
 from utils.ui import hide_sidebar
 
 hide_sidebar()
-from utils.database import supabase
+from utils.session import get_session_client
+from utils.reference_cache import parents_cache
+from utils.parent_profile_store import ParentProfileStore, parent_children
+from utils.schema import schema_cache, writable_payload, send_without_missing_column
+
+# Queries run as the signed-in parent, so row-level security applies to them
+supabase = get_session_client()
 
 # Ensure user is logged in or at least we have their email from registration
 user = st.session_state.get("user")
@@ -34,10 +40,10 @@ user_id = get_user_attr(user, "id")
 
 # Fetch parent profile by user_id
 profile = None
+profile_store = ParentProfileStore(st.session_state, client=supabase)
 try:
     if user_id is not None:
-        res = supabase.table("parents").select("*").eq("user_id", user_id).execute()
-        profile = res.data[0] if getattr(res, 'data', None) else None
+        profile = profile_store.get(user_id)
 except Exception:
     profile = None
 
@@ -112,12 +118,8 @@ if profile:
 
         # Show Children
         st.subheader("Children")
-        children = profile.get('children') or []
-        # Fallback to older single-child fields
-        if not children:
-            first = profile.get('child_name') or profile.get('child_firstname') or None
-            if first:
-                children = [{'name': first, 'grade': profile.get('grade'), 'school': profile.get('school')}]
+        # Falls back to the older single-child fields
+        children = parent_children(profile)
 
         if children:
             for i, c in enumerate(children):
@@ -150,11 +152,7 @@ if profile:
         email_value = profile.get('email') or get_user_attr(user, 'email') or ''
         email = st.text_input("Contact Email", value=email_value, key="parent_email_edit")
         # children editor
-        existing_children = profile.get('children') or []
-        if not existing_children:
-            first = profile.get('child_name') or profile.get('child_firstname') or None
-            if first:
-                existing_children = [{'name': first, 'grade': profile.get('grade'), 'school': profile.get('school')}]
+        existing_children = parent_children(profile)
 
         if 'children_count' not in st.session_state:
             st.session_state['children_count'] = max(1, len(existing_children) or 1)
@@ -203,62 +201,29 @@ if profile:
                     payload['grade'] = children[0].get('grade')
                     payload['school'] = children[0].get('school')
 
+                # Only columns the parents table has, so the update succeeds first time;
+                # with the schema unknown, a missing column is dropped on one retry
+                dropped = schema_cache.missing('parents', payload)
+                payload = writable_payload('parents', payload)
                 try:
-                    upd = supabase.table('parents').update(payload).eq('id', profile.get('id')).execute()
+                    upd, retried = send_without_missing_column(
+                        lambda p: supabase.table('parents').update(p).eq('id', profile.get('id')).execute(), payload)
+                    dropped += retried
+                    payload = {k: v for k, v in payload.items() if k not in retried}
+                    parents_cache.invalidate()
                     err = getattr(upd, 'error', None)
                     if err is None:
+                        profile_store.update(payload)
                         st.success('Profile updated successfully.')
+                        if dropped:
+                            st.warning(f"Database does not have these columns, so they were not saved: {', '.join(dropped)}. Consider adding them for full functionality.")
                         st.session_state['editing_profile'] = False
                         try:
                             st.experimental_rerun()
                         except Exception:
                             st.markdown("<script>window.location.reload()</script>", unsafe_allow_html=True)
                     else:
-                        # If the DB doesn't have certain columns (older schema), retry without them
-                        try:
-                            msg = err.get('message') if isinstance(err, dict) else str(err)
-                        except Exception:
-                            msg = str(err)
-
-                        # Fallback for missing `email` column
-                        if msg and 'email' in msg and ('Could not find' in msg or 'could not find' in msg):
-                            fallback = payload.copy()
-                            fallback.pop('email', None)
-                            try:
-                                upd2 = supabase.table('parents').update(fallback).eq('id', profile.get('id')).execute()
-                                if getattr(upd2, 'error', None) is None:
-                                    st.success("Profile updated (saved without 'email' field; database schema lacks that column).")
-                                    st.warning("Database does not have an 'email' column; consider adding it for full functionality.")
-                                    st.session_state['editing_profile'] = False
-                                    try:
-                                        st.experimental_rerun()
-                                    except Exception:
-                                        st.markdown("<script>window.location.reload()</script>", unsafe_allow_html=True)
-                                else:
-                                    st.error(f"Failed to update profile: {getattr(upd2, 'error')}")
-                            except Exception as e2:
-                                st.error(f"Failed to update profile: {e2}")
-
-                        # Fallback for missing `children` column
-                        elif msg and 'children' in msg and ('Could not find' in msg or 'could not find' in msg):
-                            fallback = payload.copy()
-                            fallback.pop('children', None)
-                            try:
-                                upd2 = supabase.table('parents').update(fallback).eq('id', profile.get('id')).execute()
-                                if getattr(upd2, 'error', None) is None:
-                                    st.success("Profile updated (saved without 'children' field; database schema lacks that column).")
-                                    st.warning("Database does not have a 'children' column; consider adding it for multi-child support.")
-                                    st.session_state['editing_profile'] = False
-                                    try:
-                                        st.experimental_rerun()
-                                    except Exception:
-                                        st.markdown("<script>window.location.reload()</script>", unsafe_allow_html=True)
-                                else:
-                                    st.error(f"Failed to update profile: {getattr(upd2, 'error')}")
-                            except Exception as e2:
-                                st.error(f"Failed to update profile: {e2}")
-                        else:
-                            st.error(f"Failed to update profile: {err}")
+                        st.error(f"Failed to update profile: {err}")
                 except Exception as e:
                     st.error(f"Failed to update profile: {e}")
 
@@ -301,76 +266,27 @@ else:
                 "school": school_v,
                 "email": user_email,
             }
+            dropped = schema_cache.missing('parents', payload)
+            payload = writable_payload('parents', payload)
             try:
-                insert_res = supabase.table("parents").insert(payload).execute()
+                insert_res, retried = send_without_missing_column(
+                    lambda p: supabase.table("parents").insert(p).execute(), payload)
+                dropped += retried
+                parents_cache.invalidate()
+                profile_store.invalidate()
             except Exception as e:
-                # If the Supabase/PostgREST client raises an exception about missing
-                # columns in the schema cache (e.g. 'email' or 'children'), retry
-                # the insert without those keys so older DB schemas still work.
-                try:
-                    msg = str(e)
-                except Exception:
-                    msg = ''
-
-                if msg and ('Could not find' in msg or 'could not find' in msg):
-                    fallback = payload.copy()
-                    if 'email' in msg:
-                        fallback.pop('email', None)
-                    if 'children' in msg:
-                        fallback.pop('children', None)
-
-                    try:
-                        retry = supabase.table('parents').insert(fallback).execute()
-                    except Exception as e2:
-                        st.error(f"Failed to save profile: {e2}")
-                    else:
-                        if getattr(retry, 'error', None) is None and getattr(retry, 'data', None):
-                            st.success("Profile saved (with fallback; database schema lacks some columns).")
-                            st.warning("Database schema is missing fields; consider migrating to include them for full functionality.")
-                            try:
-                                st.experimental_rerun()
-                            except Exception:
-                                st.markdown("<script>window.location.reload()</script>", unsafe_allow_html=True)
-                        else:
-                            st.error(f"Failed to save profile. Error: {getattr(retry, 'error', None)}")
-                else:
-                    st.error(f"Failed to save profile: {e}")
+                st.error(f"Failed to save profile: {e}")
             else:
                 if getattr(insert_res, 'error', None) is None and getattr(insert_res, 'data', None):
                     st.success("Profile saved successfully! You can now book a reader/scribe.")
+                    if dropped:
+                        st.warning("Database schema is missing fields; consider migrating to include them for full functionality.")
                     try:
                         st.experimental_rerun()
                     except Exception:
                         st.markdown("<script>window.location.reload()</script>", unsafe_allow_html=True)
                 else:
-                    err = getattr(insert_res, 'error', None)
-                    # If DB lacks `email` or `children` column, retry without them
-                    try:
-                        msg = err.get('message') if isinstance(err, dict) else str(err)
-                    except Exception:
-                        msg = str(err)
-
-                    if msg and ('Could not find' in msg or 'could not find' in msg):
-                        fallback = payload.copy()
-                        if 'email' in msg:
-                            fallback.pop('email', None)
-                        if 'children' in msg:
-                            fallback.pop('children', None)
-                        try:
-                            retry = supabase.table('parents').insert(fallback).execute()
-                            if getattr(retry, 'error', None) is None and getattr(retry, 'data', None):
-                                st.success("Profile saved (without missing DB columns).")
-                                st.warning("Database schema is missing fields; consider migrating to include them for full functionality.")
-                                try:
-                                    st.experimental_rerun()
-                                except Exception:
-                                    st.markdown("<script>window.location.reload()</script>", unsafe_allow_html=True)
-                            else:
-                                st.error(f"Failed to save profile. Error: {getattr(retry, 'error', None)}")
-                        except Exception as e2:
-                            st.error(f"Failed to save profile: {e2}")
-                    else:
-                        st.error(f"Failed to save profile. Error: {err}")
+                    st.error(f"Failed to save profile. Error: {getattr(insert_res, 'error', None)}")
         else:
             st.error("Please fill in all fields.")
 
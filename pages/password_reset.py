@@ -1,5 +1,5 @@
 import streamlit as st
-from supabase import create_client
+from utils.session import get_session_client
 
 st.set_page_config(layout="centered")
 
@@ -10,10 +10,8 @@ st.markdown(
 
 st.title("Reset your password")
 
-supabase = create_client(
-    st.secrets["SUPABASE_URL"],
-    st.secrets["SUPABASE_ANON_KEY"]
-)
+# This visitor's own client: the recovery session set on it is theirs alone
+supabase = get_session_client()
 
 # Supabase JS handles token automatically from fragment
 password = st.text_input("New password", type="password")
@@ -105,7 +103,6 @@ try:
     if access_token:
         st.session_state['tp_recovery_token'] = access_token
         try:
-            from utils.database import supabase
             try:
                 supabase.auth.set_session({"access_token": access_token, "refresh_token": None})
             except Exception:
@@ -160,10 +157,8 @@ if st.button('Set new password'):
     if not new_pw or new_pw != confirm_pw:
         st.error('Passwords must match and not be empty.')
         try:
-            # Prefer using the configured Supabase client so we reuse existing
-            # HTTP settings and avoid managing raw tokens manually.
-            from utils.database import supabase
-
+            # Use this visitor's client so the recovery session never touches
+            # the shared one.
             # Try to set the session with the recovery access token so the
             # client has the correct auth context for update_user.
             try:
@@ -6,7 +6,12 @@ try:
 except Exception:
     pass
 from datetime import datetime, date
-from utils.database import supabase
+from utils.session import get_session_client, forget_session
+from utils.reference_cache import tutors_cache
+from utils.tutor_dashboard import cached_upcoming_bookings
+
+# Queries run as the signed-in tutor, so row-level security applies to them
+supabase = get_session_client()
 
 st.title("Tutor Dashboard")
 
@@ -23,14 +28,14 @@ if not st.session_state.get("authenticated") or st.session_state.get("role") !=
 user = st.session_state.user
 
 # fetch tutor profile
-profile_res = supabase.table("tutors").select("*").eq("user_id", user.id).execute()
-profile = profile_res.data[0] if profile_res.data else None
+profile = tutors_cache.get_by_user_id(user.id, client=supabase)
 
 def _logout():
     try:
-        supabase.auth.sign_out()
+        get_session_client().auth.sign_out()
     except Exception:
         pass
+    forget_session()
 
     # Clear session state (preserve any internal runner key)
     for k in list(st.session_state.keys()):
@@ -110,47 +115,11 @@ if st.session_state.get("_logout_confirmed"):
 # Upcoming Bookings
 st.subheader("Upcoming Bookings")
 try:
-    # Prefer tutor-specific bookings table if present, otherwise fall back to general bookings
-    try:
-        b_res = supabase.table("tutor_bookings").select("*").eq("tutor_id", profile.get("id")).execute()
-        rows = b_res.data or []
-    except Exception:
-        b_res = supabase.table("bookings").select("*").eq("tutor_id", profile.get("id")).execute()
-        rows = b_res.data or []
-
-    now = datetime.now()
-    upcoming = []
-    for b in rows:
-        # robustly handle different datetime representations
-        slot = b.get("slot") or b.get("start_datetime") or None
-        slot_dt = None
-        if slot:
-            try:
-                slot_dt = datetime.strptime(slot, "%Y-%m-%d %H:%M")
-            except Exception:
-                try:
-                    slot_dt = datetime.fromisoformat(slot)
-                except Exception:
-                    slot_dt = None
-
-        # fallback to separate date/time fields
-        if slot_dt is None:
-            exam_date = b.get("exam_date")
-            start_time = b.get("start_time")
-            if exam_date:
-                try:
-                    time_part = start_time or '00:00:00'
-                    if len(time_part.split(':')) == 2:
-                        time_part = time_part + ':00'
-                    slot_dt = datetime.fromisoformat(f"{exam_date}T{time_part}")
-                except Exception:
-                    slot_dt = None
-
-        if slot_dt and slot_dt >= now:
-            upcoming.append((slot_dt, b))
+    # One bookings query (upcoming only) plus one batched parents query for
+    # missing schools, kept for this session until a booking changes
+    upcoming = cached_upcoming_bookings(profile.get("id"), st.session_state, client=supabase)
 
     if upcoming:
-        upcoming.sort(key=lambda x: x[0])
         # Build a clear display for each upcoming booking with requested fields
         for slot_dt, b in upcoming:
             # derive date/time
@@ -164,17 +133,8 @@ try:
             child_name = (b.get('child_name') or b.get('child_firstname') or b.get('child') or '').strip()
             child_surname = (b.get('child_surname') or b.get('child_lastname') or '').strip()
 
-            # school may be on booking or on parent record
+            # school from the booking, or its parent's record when blank
             school = b.get('school') or ''
-            # try to enrich school from parent if missing
-            try:
-                parent_id = b.get('parent_id') or b.get('parent') or None
-                if (not school) and parent_id:
-                    p_res = supabase.table('parents').select('school').eq('id', parent_id).execute()
-                    if p_res.data and len(p_res.data) > 0:
-                        school = p_res.data[0].get('school') or ''
-            except Exception:
-                pass
 
             # render compact row: Date | Time | Subject | Child (name surname) | School
             school_display = school or '—'
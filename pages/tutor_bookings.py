@@ -6,107 +6,19 @@ try:
 except Exception:
     pass
 from datetime import datetime
-from utils.database import supabase
+from utils.session import get_session_client
+from utils.reference_cache import tutors_cache
+from utils.enrichment import enrich_bookings
 import os
 from utils.email import send_email, send_admin_email, _get_sender
+from utils.booking_changes import mark_bookings_changed
+from utils.booking_times import normalize_booking_times, start_datetimes, sorted_positions
+from utils.booking_lists import BookingList
+from utils.ui import rerun_fragment
 
+# Queries run as the signed-in tutor, so row-level security applies to them
+supabase = get_session_client()
 
-def find_parent(parent_ref, booking=None):
-    """Robust parent lookup: try by id, user_id, or fallback to scanning parents table.
-    Returns parent dict or None.
-    """
-    if not parent_ref and not booking:
-        return None
-
-    # Try by id
-    try:
-        if parent_ref:
-            r = supabase.table('parents').select('id,parent_name,phone,email,school,user_id').eq('id', parent_ref).execute()
-            if r.data:
-                return r.data[0]
-    except Exception:
-        pass
-
-    # Try by user_id if booking contains a user reference
-    try:
-        if booking:
-            for key in ('parent_user_id','parent_user','user_id'):
-                v = booking.get(key)
-                if v:
-                    r = supabase.table('parents').select('id,parent_name,phone,email,school,user_id').eq('user_id', v).execute()
-                    if r.data:
-                        return r.data[0]
-    except Exception:
-        pass
-
-    # Fallback: fetch all parents and try to match by multiple hints with scoring
-    try:
-        allr = supabase.table('parents').select('id,parent_name,name,phone,mobile,email,school,child_name,child_firstname,child_lastname').execute()
-        parents = allr.data or []
-    except Exception:
-        parents = []
-
-    # If we have a parent_ref try several id-like columns first
-    id_columns = ['id', 'parent_id', 'user_id', 'uid']
-    if parent_ref:
-        for col in id_columns:
-            try:
-                r = supabase.table('parents').select('*').eq(col, parent_ref).execute()
-                if r.data:
-                    return r.data[0]
-            except Exception:
-                pass
-
-    # Prepare booking hints
-    booking_parent_name = (booking.get('parent_name') if booking else '') or (booking.get('parent') if booking else '') or ''
-    booking_parent_name = booking_parent_name.strip().lower() if booking_parent_name else ''
-    booking_child = (booking.get('child_name') or booking.get('child') or '').strip().lower() if booking else ''
-    booking_parent_email = (booking.get('parent_email') or booking.get('email') or '').strip().lower() if booking else ''
-    booking_parent_phone = (booking.get('parent_phone') or booking.get('phone') or '').strip() if booking else ''
-
-    # Score parents by matching hints
-    best = (None, 0)
-    for p in parents:
-        score = 0
-        # exact id match
-        try:
-            if parent_ref and str(p.get('id')) == str(parent_ref):
-                score += 50
-        except Exception:
-            pass
-
-        # parent name match
-        pname = (p.get('parent_name') or p.get('name') or '').strip().lower()
-        if booking_parent_name and pname and booking_parent_name == pname:
-            score += 30
-
-        # email match
-        pemail = (p.get('email') or '').strip().lower()
-        if booking_parent_email and pemail and booking_parent_email == pemail:
-            score += 40
-
-        # phone partial match (last 6 digits)
-        pphone = (p.get('phone') or p.get('mobile') or '').strip()
-        if booking_parent_phone and pphone and booking_parent_phone[-6:] and pphone.endswith(booking_parent_phone[-6:]):
-            score += 25
-
-        # child name token match
-        pchild = (p.get('child_name') or p.get('child_firstname') or p.get('child_lastname') or '').strip().lower()
-        if booking_child and pchild:
-            # split tokens and award points for overlap
-            b_tokens = [t for t in booking_child.split() if t]
-            p_tokens = [t for t in pchild.split() if t]
-            common = sum(1 for t in b_tokens if any(t == pt or t in pt or pt in t for pt in p_tokens))
-            score += common * 10
-
-        if score > best[1]:
-            best = (p, score)
-
-    # Return best match if score positive
-    if best[0] and best[1] > 0:
-        return best[0]
-
-    return None
 
 st.title("My Bookings")
 
@@ -120,8 +32,7 @@ if "user" not in st.session_state:
 user = st.session_state.user
 
 # fetch tutor profile
-profile_res = supabase.table("tutors").select("*").eq("user_id", user.id).execute()
-profile = profile_res.data[0] if profile_res.data else None
+profile = tutors_cache.get_by_user_id(user.id, client=supabase)
 
 # Top-left Back button (small) to return to Tutor Dashboard
 back_col, main_col = st.columns([1, 9])
@@ -176,44 +87,39 @@ if not profile:
     st.warning("Please complete your tutor profile first.")
     st.stop()
 
-try:
+tutor_id = profile.get("id")
+# Held in the session: Accept / Decline rerun only the list below, not the page
+bookings_list = BookingList(
+    st.session_state,
+    f"tutor_{tutor_id}",
     # Be defensive: some DB schemas use `slot`, others use `exam_date` + `start_time`.
-    b_res = supabase.table("bookings").select("*").eq("tutor_id", profile.get("id")).execute()
-    rows = b_res.data or []
-    if not rows:
-        st.info("No bookings assigned to you yet.")
-    else:
-        # Build sortable list using available date/time fields
-        parsed = []
-        for b in rows:
-            slot = b.get('slot')
-            exam_date = b.get('exam_date')
-            start_time = b.get('start_time')
-            notes = b.get('notes') or ''
-            cancelled = b.get('cancelled')
-            status = b.get('status')
+    load=lambda: supabase.table("bookings").select("*").eq("tutor_id", tutor_id).execute().data,
+    # Parents for every booking: one query by id, then the resolver for
+    # bookings that only carry parent names/contacts
+    enrich=lambda rows: enrich_bookings(rows, tutors=False, fallback=True, client=supabase),
+)
+notice_key = "_tutor_bookings_notice"
 
-            dt = None
-            # Prefer explicit slot if present and parseable
-            if slot:
-                try:
-                    dt = datetime.strptime(slot, "%Y-%m-%d %H:%M")
-                except Exception:
-                    dt = None
-            # Fallback to exam_date + start_time
-            if dt is None and exam_date:
-                try:
-                    time_part = start_time or '00:00:00'
-                    if len(time_part.split(':')) == 2:
-                        time_part = time_part + ':00'
-                    dt = datetime.fromisoformat(f"{exam_date}T{time_part}")
-                except Exception:
-                    dt = None
 
-            parsed.append((dt, b))
+@st.fragment
+def _bookings_section():
+    notice = st.session_state.pop(notice_key, None)
+    if notice:
+        getattr(st, notice[0])(notice[1])
 
-        # Sort by datetime (None values go last)
-        parsed.sort(key=lambda x: (x[0] is None, x[0]))
+    try:
+        rows = bookings_list.rows()
+        if not rows:
+            st.info("No bookings assigned to you yet.")
+            return
+
+        enriched = bookings_list.enriched()
+
+        # Start times for every booking in one pass (slot, or exam_date +
+        # start_time); unparseable ones are listed last
+        times = normalize_booking_times(rows, use_slot=True)
+        starts = start_datetimes(times)
+        parsed = [(starts[i], rows[i]) for i in sorted_positions(times)]
         for dt, b in parsed:
             # Build display fields
             subject = b.get('subject') or ''
@@ -226,7 +132,7 @@ try:
             parent_contact = None
             parent_email = None
             try:
-                p = find_parent(b.get('parent_id'), b)
+                p = enriched.parent_for(b)
                 if p:
                     parent_name = p.get('parent_name') or p.get('name') or p.get('parent')
                     parent_contact = p.get('phone') or p.get('mobile')
@@ -279,7 +185,8 @@ try:
                                 # Set session flag so UI updates immediately
                                 st.session_state[session_key] = 'accepted'
                                 # Update booking status to indicate tutor accepted
-                                supabase.table('bookings').update({"status": "TutorConfirmed"}).eq('id', b.get('id')).execute()
+                                changed = supabase.table('bookings').update({"status": "TutorConfirmed"}).eq('id', b.get('id')).execute()
+                                bookings_list.apply_written(changed.data, mark_bookings_changed(changed.data))
 
                                 # Gather details for emails
                                 tutor_name = f"{profile.get('name','')} {profile.get('surname','')}".strip()
@@ -290,7 +197,7 @@ try:
                                 start_time = b.get('start_time') or ''
 
                                 # Find parent info
-                                parent = find_parent(b.get('parent_id'), b) or {}
+                                parent = enriched.parent_for(b) or {}
                                 parent_email = parent.get('email')
                                 parent_name = parent.get('parent_name') or parent.get('name') or ''
                                 parent_phone = parent.get('phone') or parent.get('mobile') or ''
@@ -332,11 +239,9 @@ try:
                                 except Exception:
                                     pass
 
-                                st.success("You accepted this booking. Parent and notifications team have been emailed.")
-                                try:
-                                    st.experimental_rerun()
-                                except Exception:
-                                    pass
+                                # Shown above the redrawn list
+                                st.session_state[notice_key] = ("success", "You accepted this booking. Parent and notifications team have been emailed.")
+                                rerun_fragment()
                             except Exception as e:
                                 st.error(f"Failed to accept booking: {e}")
                     with action_cols[1]:
@@ -345,7 +250,8 @@ try:
                                 # Set session flag so UI updates immediately
                                 st.session_state[session_key] = 'declined'
                                 # Mark booking as declined by tutor
-                                supabase.table('bookings').update({"status": "TutorDeclined"}).eq('id', b.get('id')).execute()
+                                changed = supabase.table('bookings').update({"status": "TutorDeclined"}).eq('id', b.get('id')).execute()
+                                bookings_list.apply_written(changed.data, mark_bookings_changed(changed.data))
                                 # Notify admins about the decline
                                 try:
                                     admin_body = (
@@ -356,11 +262,9 @@ try:
                                 except Exception:
                                     pass
 
-                                st.info("You declined this booking — admin has been notified.")
-                                try:
-                                    st.experimental_rerun()
-                                except Exception:
-                                    pass
+                                # Shown above the redrawn list
+                                st.session_state[notice_key] = ("info", "You declined this booking — admin has been notified.")
+                                rerun_fragment()
                             except Exception as e:
                                 st.error(f"Failed to decline booking: {e}")
             except Exception:
@@ -374,11 +278,14 @@ try:
                         st.json(b)
                         st.write("Parent lookup result:")
                         try:
-                            p_try = find_parent(b.get('parent_id'), b)
+                            p_try = enriched.parent_for(b)
                             st.json(p_try or {})
                         except Exception as _:
                             st.write("Parent lookup threw an error")
                 except Exception:
                     pass
-except Exception as e:
-    st.error(f"Could not fetch bookings: {e}")
+    except Exception as e:
+        st.error(f"Could not fetch bookings: {e}")
+
+
+_bookings_section()
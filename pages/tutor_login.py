@@ -29,14 +29,17 @@ st.markdown(
     """,
     unsafe_allow_html=True,
 )
-from utils.session import get_supabase, restore_session_from_refresh
+from utils.session import get_session_client, restore_remembered_session, await_restored_session, remember_session
+from utils.reference_cache import tutors_cache
+from utils.profile_link import link_profile
 import json
 try:
     from config import SUPABASE_URL
 except Exception:
     SUPABASE_URL = None
 
-supabase = get_supabase()
+# This visitor's own client: signing in here must not change anyone else's session
+supabase = get_session_client()
 
 # Auto-restore session from refresh token if one was passed once in the URL
 params = {}
@@ -45,21 +48,18 @@ try:
 except Exception:
     params = {}
 
-if params.get('tp_rt'):
+# The token exchange runs in the background (utils.token_store); the page
+# renders meanwhile and reruns when it is done
+if params.get('tp_rt') and not st.session_state.get('authenticated'):
     token = params.get('tp_rt')[0]
-    restored = restore_session_from_refresh(token)
-    if restored and restored.get('user'):
-        st.session_state['authenticated'] = True
-        st.session_state['user'] = restored.get('user')
-        st.session_state['email'] = restored.get('user', {}).get('email')
+    restored = restore_remembered_session(token, 'tutor')
+    if restored == 'restored':
         try:
-            st.query_params
-        except Exception:
-            pass
-        try:
-            st.experimental_rerun()
+            st.rerun()
         except Exception:
             pass
+    elif restored == 'pending':
+        await_restored_session(token)
 
 # Handle password recovery links sent by Supabase (e.g. ?type=recovery&access_token=...)
 try:
@@ -171,6 +171,11 @@ with tab1:
                 st.session_state["user"] = res.user
                 st.session_state["role"] = "tutor"
                 st.session_state["email"] = getattr(res.user, 'email', None)
+                # Keep the tokens refreshed in the background from now on
+                try:
+                    remember_session(res)
+                except Exception:
+                    pass
                 st.success("Logged in successfully.")
                 # Ensure tutors table has this user's email and user_id linked
                 try:
@@ -181,26 +186,11 @@ with tab1:
                     user_id = None
                     user_email = getattr(res.user, 'email', None)
 
+                # Link or create the tutors row in one call (see utils.profile_link)
                 try:
-                    if user_id or user_email:
-                        if user_id:
-                            t_res = supabase.table('tutors').select('*').eq('user_id', user_id).execute()
-                            if getattr(t_res, 'data', None) and len(t_res.data) > 0:
-                                existing = t_res.data[0]
-                                if user_email and existing.get('email') != user_email:
-                                    supabase.table('tutors').update({'email': user_email}).eq('id', existing.get('id')).execute()
-                            else:
-                                if user_email:
-                                    by_email = supabase.table('tutors').select('*').eq('email', user_email).execute()
-                                    if getattr(by_email, 'data', None) and len(by_email.data) > 0:
-                                        supabase.table('tutors').update({'user_id': user_id}).eq('id', by_email.data[0].get('id')).execute()
-                                    else:
-                                        supabase.table('tutors').insert({'user_id': user_id, 'email': user_email}).execute()
-                        else:
-                            if user_email:
-                                by_email = supabase.table('tutors').select('*').eq('email', user_email).execute()
-                                if not (getattr(by_email, 'data', None) and len(by_email.data) > 0):
-                                    supabase.table('tutors').insert({'email': user_email}).execute()
+                    linked = link_profile('tutors', user_id, user_email, client=supabase)
+                    if linked and linked['changed']:
+                        tutors_cache.invalidate()
                 except Exception:
                     pass
                 try:
@@ -305,26 +295,9 @@ with tab2:
                         user_email = reg_email
 
                     try:
-                        # If a tutors record already exists for this email, link the user_id
-                        if user_email:
-                            existing = supabase.table('tutors').select('*').eq('email', user_email).execute()
-                            if getattr(existing, 'data', None) and len(existing.data) > 0:
-                                # update the existing tutor row with user_id (if available) and ensure email stored
-                                upd_payload = {}
-                                if user_id:
-                                    upd_payload['user_id'] = user_id
-                                upd_payload['email'] = user_email
-                                supabase.table('tutors').update(upd_payload).eq('id', existing.data[0].get('id')).execute()
-                            else:
-                                # create a new tutor row
-                                payload = {'email': user_email}
-                                if user_id:
-                                    payload['user_id'] = user_id
-                                supabase.table('tutors').insert(payload).execute()
-                        else:
-                            # Fallback: create a minimal row if we don't have an email
-                            if user_id:
-                                supabase.table('tutors').insert({'user_id': user_id}).execute()
+                        linked = link_profile('tutors', user_id, user_email, client=supabase)
+                        if linked and linked['changed']:
+                            tutors_cache.invalidate()
                     except Exception:
                         pass
 
@@ -5,8 +5,13 @@ try:
     st.set_page_config(page_title="Tutor Profile")
 except Exception:
     pass
-from utils.database import supabase
+from utils.session import get_session_client
 from utils.session import get_supabase_service
+from utils.reference_cache import tutors_cache
+from utils.schema import writable_payload
+
+# Queries run as the signed-in tutor, so row-level security applies to them
+supabase = get_session_client()
 
 st.title("My Tutor Profile")
 
@@ -20,8 +25,7 @@ if "user" not in st.session_state:
 user = st.session_state.user
 
 # fetch tutor profile
-profile_res = supabase.table("tutors").select("*").eq("user_id", user.id).execute()
-profile = profile_res.data[0] if profile_res.data else None
+profile = tutors_cache.get_by_user_id(user.id, client=supabase)
 
 # Top-left Back button (smaller) and spacer
 back_col, main_col = st.columns([1, 9])
@@ -123,23 +127,26 @@ if not profile:
         if not all([name_v, surname_v, phone_v, town_v, city_v, email_v]):
             st.error("All fields are required.")
         else:
+            # Only columns the tutors table has (older schemas lack the language columns)
+            tutor_row = writable_payload("tutors", {
+                "user_id": user.id,
+                "name": name_v,
+                "surname": surname_v,
+                "phone": phone_v,
+                "town": town_v,
+                "city": city_v,
+                "email": email_v,
+                "transport": transport,
+                "roles": _role_to_db(roles),
+                "afrikaans": bool(afrikaans),
+                "isizulu": bool(isizulu),
+                "setswana": bool(setswana),
+                "isixhosa": bool(isixhosa),
+                "french": bool(french)
+            })
             try:
-                insert_res = supabase.table("tutors").insert({
-                    "user_id": user.id,
-                    "name": name_v,
-                    "surname": surname_v,
-                    "phone": phone_v,
-                    "town": town_v,
-                    "city": city_v,
-                    "email": email_v,
-                    "transport": transport,
-                    "roles": _role_to_db(roles),
-                    "afrikaans": bool(afrikaans),
-                    "isizulu": bool(isizulu),
-                    "setswana": bool(setswana),
-                    "isixhosa": bool(isixhosa),
-                    "french": bool(french)
-                }).execute()
+                insert_res = supabase.table("tutors").insert(tutor_row).execute()
+                tutors_cache.invalidate()
                 if getattr(insert_res, 'error', None) is None:
                     st.success("Profile submitted. Await admin approval.")
                     safe_rerun()
@@ -155,22 +162,8 @@ if not profile:
                     if msg and ('row-level security' in msg or 'row level security' in msg or 'violates row-level security' in msg or '42501' in msg):
                         try:
                             svc = get_supabase_service()
-                            svc_res = svc.table('tutors').insert({
-                                "user_id": user.id,
-                                "name": name_v,
-                                "surname": surname_v,
-                                "phone": phone_v,
-                                "town": town_v,
-                                "city": city_v,
-                                "email": email_v,
-                                "transport": transport,
-                                "roles": _role_to_db(roles),
-                                "afrikaans": bool(afrikaans),
-                                "isizulu": bool(isizulu),
-                                "setswana": bool(setswana),
-                                "isixhosa": bool(isixhosa),
-                                "french": bool(french)
-                            }).execute()
+                            svc_res = svc.table('tutors').insert(tutor_row).execute()
+                            tutors_cache.invalidate()
                             if getattr(svc_res, 'error', None) is None:
                                 st.success("Profile submitted (used service-role fallback). Await admin approval.")
                                 safe_rerun()
@@ -253,9 +246,7 @@ if st.session_state.get("_editing_tutor_profile"):
     french = st.checkbox("French", value=bool(profile.get('french')))
 
     if st.button("Save Changes", key="tutor_edit_save"):
-        # Build payload and only include keys that exist in the tutors row
-        payload = {}
-        existing = set(profile.keys() or [])
+        # Build payload and only include columns the tutors table has
         candidates = {
             "name": name,
             "surname": surname,
@@ -271,15 +262,14 @@ if st.session_state.get("_editing_tutor_profile"):
             "isixhosa": bool(isixhosa),
             "french": bool(french)
         }
-        for k, v in candidates.items():
-            if k in existing:
-                payload[k] = v
+        payload = writable_payload('tutors', candidates, profile)
 
         if not payload:
             st.error("No updatable columns found for this tutor in the database.")
         else:
             try:
                 update_res = supabase.table("tutors").update(payload).eq("id", profile.get('id')).execute()
+                tutors_cache.invalidate()
 
                 if getattr(update_res, 'error', None) is None:
                     st.success("Profile updated.")
@@ -298,6 +288,7 @@ if st.session_state.get("_editing_tutor_profile"):
                         try:
                             svc = get_supabase_service()
                             svc_res = svc.table('tutors').update(payload).eq('id', profile.get('id')).execute()
+                            tutors_cache.invalidate()
                             if getattr(svc_res, 'error', None) is None:
                                 st.success('Profile updated (used service-role fallback).')
                                 del st.session_state["_editing_tutor_profile"]
@@ -6,7 +6,13 @@ try:
 except Exception:
     pass
 from datetime import date
-from utils.database import supabase
+from utils.session import get_session_client
+from utils.reference_cache import tutors_cache
+from utils.unavailability_index import record_insert, record_delete
+from utils.schema import writable_payload
+
+# Queries run as the signed-in tutor, so row-level security applies to them
+supabase = get_session_client()
 
 st.title("Tutor Unavailability")
 
@@ -17,8 +23,7 @@ if "user" not in st.session_state:
 user = st.session_state["user"]
 
 # fetch tutor profile
-profile_res = supabase.table("tutors").select("*").eq("user_id", user.id).execute()
-profile = profile_res.data[0] if profile_res.data else None
+profile = tutors_cache.get_by_user_id(user.id, client=supabase)
 
 if not profile:
     st.warning("Please complete your tutor profile first.")
@@ -116,9 +121,13 @@ if st.button("Add Unavailability"):
                 "end_time": end_time.strftime("%H:%M:%S")
             })
 
+        insert_payload = writable_payload("tutor_unavailability", insert_payload)
         insert_res = supabase.table("tutor_unavailability").insert(insert_payload).execute()
 
         if getattr(insert_res, 'error', None) is None:
+            # Keep the shared matching index current without a reload
+            for row in (insert_res.data or []):
+                record_insert(row)
             st.success("Unavailability added.")
             safe_rerun()
         else:
@@ -139,6 +148,7 @@ if unavail_res.data:
         st.write(f"{a.get('start_date')} → {a.get('end_date')} {times} — {a.get('reason')}")
         if st.button("Remove", key=f"remove_unavail_{a.get('id')}"):
             supabase.table("tutor_unavailability").delete().eq("id", a.get('id')).execute()
+            record_delete(a.get('id'))
             st.success("Removed")
             safe_rerun()
 else:
@@ -0,0 +1,4 @@
+-- Run once in Supabase SQL editor so date-window queries (admin dashboard,
+-- confirmed bookings, billing) read only the rows in the window instead of
+-- scanning the whole bookings history
+create index if not exists idx_bookings_exam_date_start on bookings (exam_date, start_time);
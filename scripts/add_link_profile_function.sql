@@ -0,0 +1,76 @@
+-- Migration: add `link_profile`, which links a signed-in user to their
+-- parents/tutors row (or creates it) in one call
+-- Usage (Supabase SQL editor): paste the contents and run.
+-- Usage (psql):
+--   PGPASSWORD=<pass> psql -h <host> -p <port> -U <user> -d <db> -f add_link_profile_function.sql
+-- Called by utils/profile_link.py after sign-in and registration:
+--   POST /rest/v1/rpc/link_profile {"p_table": "parents", "p_user_id": "...", "p_email": "..."}
+-- Returns {"profile": <row>, "changed": <bool>}. Steps, as the pages used to do them:
+--   1) a row with this user_id: store the current email if it differs
+--   2) else a row with this email: attach the user_id
+--   3) else insert a row with the user_id and email
+-- SECURITY INVOKER: row-level security applies exactly as to the separate
+-- calls it replaces. The script is idempotent (CREATE OR REPLACE).
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION public.link_profile(p_table text, p_user_id uuid DEFAULT NULL, p_email text DEFAULT NULL)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY INVOKER
+SET search_path = public
+AS $$
+DECLARE
+  v_email text := NULLIF(btrim(p_email), '');
+  v_row jsonb;
+BEGIN
+  IF p_table NOT IN ('parents', 'tutors') THEN
+    RAISE EXCEPTION 'link_profile: unsupported table %', p_table USING ERRCODE = '22023';
+  END IF;
+  IF p_user_id IS NULL AND v_email IS NULL THEN
+    RETURN NULL;
+  END IF;
+
+  -- 1) Linked already: keep the email current
+  IF p_user_id IS NOT NULL THEN
+    EXECUTE format('SELECT to_jsonb(t) FROM public.%I t WHERE t.user_id = $1 ORDER BY t.id LIMIT 1', p_table)
+      INTO v_row USING p_user_id;
+    IF v_row IS NOT NULL THEN
+      IF v_email IS NULL OR v_row->>'email' IS NOT DISTINCT FROM v_email THEN
+        RETURN jsonb_build_object('profile', v_row, 'changed', false);
+      END IF;
+      EXECUTE format(
+        'UPDATE public.%1$I t SET email = $2 WHERE t.id = (SELECT id FROM public.%1$I WHERE user_id = $1 ORDER BY id LIMIT 1) RETURNING to_jsonb(t)',
+        p_table) INTO v_row USING p_user_id, v_email;
+      RETURN jsonb_build_object('profile', v_row, 'changed', true);
+    END IF;
+  END IF;
+
+  -- 2) Known by email: attach the auth user
+  IF v_email IS NOT NULL THEN
+    EXECUTE format('SELECT to_jsonb(t) FROM public.%I t WHERE t.email = $1 ORDER BY t.id LIMIT 1', p_table)
+      INTO v_row USING v_email;
+    IF v_row IS NOT NULL THEN
+      IF p_user_id IS NULL THEN
+        RETURN jsonb_build_object('profile', v_row, 'changed', false);
+      END IF;
+      EXECUTE format(
+        'UPDATE public.%1$I t SET user_id = $1 WHERE t.id = (SELECT id FROM public.%1$I WHERE email = $2 ORDER BY id LIMIT 1) RETURNING to_jsonb(t)',
+        p_table) INTO v_row USING p_user_id, v_email;
+      RETURN jsonb_build_object('profile', v_row, 'changed', true);
+    END IF;
+  END IF;
+
+  -- 3) New user: minimal row
+  EXECUTE format('INSERT INTO public.%I AS t (user_id, email) VALUES ($1, $2) RETURNING to_jsonb(t)', p_table)
+    INTO v_row USING p_user_id, v_email;
+  RETURN jsonb_build_object('profile', v_row, 'changed', true);
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.link_profile(text, uuid, text) TO anon, authenticated;
+
+-- Make PostgREST see the new function without a restart
+NOTIFY pgrst, 'reload schema';
+
+COMMIT;
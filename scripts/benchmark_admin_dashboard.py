@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Benchmark the admin dashboard bookings query as booking history grows.
+
+Compares the old path (select every booking, parse and filter in Python)
+with `utils.booking_window.fetch_bookings_window` (exam_date range pushed to
+the database, rendered columns only). Runs against an in-process stand-in
+for the bookings table that answers range filters from a sorted index, the
+way Postgres does with `scripts/add_bookings_exam_date_index.sql`.
+
+Usage: python scripts/benchmark_admin_dashboard.py [--sizes 1000,10000,100000]
+"""
+from pathlib import Path
+from datetime import datetime, timedelta
+import argparse
+import bisect
+import random
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils.booking_window import DASHBOARD_COLUMNS, fetch_bookings_window, filter_window, window_bounds  # noqa: E402
+
+
+class IndexedBookings:
+    """Bookings sorted by exam_date; range filters bisect instead of scanning."""
+
+    def __init__(self, rows):
+        self.rows = sorted(rows, key=lambda r: r['exam_date'])
+        self.keys = [r['exam_date'] for r in self.rows]
+
+    def table(self, name):
+        return _Query(self)
+
+
+class _Query:
+    def __init__(self, store):
+        self.store = store
+        self.lo = None
+        self.hi = None
+        self.columns = None
+        self.preds = []
+
+    def select(self, columns='*'):
+        self.columns = None if columns == '*' else columns.split(',')
+        return self
+
+    def gte(self, col, val):
+        self.lo = val
+        return self
+
+    def lte(self, col, val):
+        self.hi = val
+        return self
+
+    def eq(self, col, val):
+        self.preds.append(lambda r: r.get(col) == val)
+        return self
+
+    def neq(self, col, val):
+        self.preds.append(lambda r: r.get(col) != val)
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def execute(self):
+        i = bisect.bisect_left(self.store.keys, self.lo) if self.lo else 0
+        j = bisect.bisect_right(self.store.keys, self.hi) if self.hi else len(self.store.keys)
+        rows = [r for r in self.store.rows[i:j] if all(p(r) for p in self.preds)]
+        if self.columns:
+            rows = [{c: r.get(c) for c in self.columns} for r in rows]
+
+        class R:
+            data = rows
+
+        return R()
+
+
+def synthetic_bookings(n, now, seed=1):
+    """`n` bookings: 20 in the coming week, the rest older history outside the window."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        if i < 20:
+            day = now.date() + timedelta(days=rng.randint(0, 7))
+        else:
+            day = now.date() - timedelta(days=rng.randint(8, 5 * 365))
+        rows.append({
+            'id': i,
+            'exam_date': day.isoformat(),
+            'start_time': f"{rng.randint(7, 16):02d}:{rng.choice([0, 30]):02d}:00",
+            'child_name': f"Child {i}",
+            'subject': 'Maths',
+            'status': rng.choice(['Pending', 'Confirmed', 'Cancelled']),
+            'school': 'School',
+            'duration': 60,
+            'role_required': 'Reader',
+            'tutor_id': None,
+            'parent_id': i % 500,
+            'notes': 'x' * 200,
+        })
+    return rows
+
+
+def legacy_dashboard(client, start, end, status):
+    q = client.table("bookings").select("*")
+    if status:
+        q = q.eq("status", status)
+    res = q.neq("status", "Cancelled").order("start_time").execute()
+    return filter_window(res.data or [], start, end)
+
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    args = parser.parse_args()
+
+    now = datetime.now()
+    start, end = window_bounds(now, hours_ahead=48, days_back=7)
+    print(f"{'history':>10} {'legacy ms':>10} {'windowed ms':>12} {'rows':>6}")
+    for n in (int(s) for s in args.sizes.split(',')):
+        client = IndexedBookings(synthetic_bookings(n, now))
+        t_old, old = timed(lambda: legacy_dashboard(client, start, end, 'Pending'))
+        t_new, new = timed(lambda: fetch_bookings_window(start, end, status='Pending', client=client))
+        assert [b['id'] for _, b in old] == [b['id'] for _, b in new]
+        print(f"{n:>10} {t_old * 1000:>10.2f} {t_new * 1000:>12.3f} {len(new):>6}")
+    print(f"(windowed query selects: {DASHBOARD_COLUMNS})")
+
+
+if __name__ == '__main__':
+    main()
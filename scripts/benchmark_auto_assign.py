@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Benchmark the auto-assign planner on a synthetic exam season.
+
+Generates pending bookings spread over ~12 weeks of weekdays at typical exam
+start times, approved tutors with mixed roles and language flags, tutor
+unavailability and already-confirmed bookings, then times
+`utils.auto_assign.propose_assignments`. For comparison it also runs a
+greedy baseline (each booking in turn takes the cheapest tutor still free)
+and reports how many bookings each one places and at what cost.
+
+Usage: python scripts/benchmark_auto_assign.py [--sizes 500,2000,5000] [--tutors 150] [--cap 3]
+"""
+from pathlib import Path
+from datetime import date, timedelta
+import argparse
+import random
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils.auto_assign import propose_assignments, _edge_cost  # noqa: E402
+from utils.booking_times import normalize_booking_times  # noqa: E402
+from utils.matching import eligible_tutors  # noqa: E402
+from utils.unavailability_index import UnavailabilityIndex  # noqa: E402
+
+START = date(2026, 10, 5)
+SLOTS = ['08:00:00', '08:30:00', '09:00:00', '11:00:00', '12:00:00', '14:00:00']
+ROLES = ['Reader', 'Scribe', 'Both', 'All of the Above']
+SUBJECTS = ['Maths', 'English', 'Science', 'History', 'Afrikaans', 'IsiZulu', 'French']
+
+
+def school_days(weeks):
+    return [START + timedelta(days=d) for d in range(weeks * 7) if (START + timedelta(days=d)).weekday() < 5]
+
+
+def synthetic_season(n, n_tutors, seed=1):
+    rng = random.Random(seed)
+    days = school_days(12)
+    tutors = []
+    for i in range(n_tutors):
+        t = {'id': f"t{i}", 'name': f"Tutor {i}", 'roles': rng.choice(ROLES), 'approved': True}
+        for lang in ('afrikaans', 'isizulu', 'french'):
+            t[lang] = rng.random() < 0.2
+        tutors.append(t)
+    bookings = [{
+        'id': i,
+        'exam_date': rng.choice(days).isoformat(),
+        'start_time': rng.choice(SLOTS),
+        'duration': rng.choice([60, 90, 120, 180]),
+        'role_required': rng.choice(['Reader', 'Scribe', 'Reader', 'Both']),
+        'subject': rng.choice(SUBJECTS),
+        'status': 'Pending',
+    } for i in range(n)]
+    unavailable = []
+    for i in range(n_tutors * 3):
+        d = rng.choice(days)
+        row = {'id': i, 'tutor_id': f"t{rng.randrange(n_tutors)}", 'start_date': d.isoformat(),
+               'end_date': (d + timedelta(days=rng.choice([0, 0, 2]))).isoformat()}
+        if rng.random() < 0.6:
+            row.update(start_time='08:00:00', end_time=rng.choice(['10:00:00', '12:00:00']))
+        unavailable.append(row)
+    confirmed = [{
+        'id': 100000 + i, 'tutor_id': f"t{rng.randrange(n_tutors)}", 'exam_date': rng.choice(days).isoformat(),
+        'start_time': rng.choice(SLOTS), 'duration': 120,
+    } for i in range(n // 4)]
+    index = UnavailabilityIndex(unavailable, days[0], days[-1])
+    return bookings, tutors, index, confirmed
+
+
+def greedy(bookings, tutors, index, confirmed, cap):
+    """Baseline: bookings in date/time order, each takes the cheapest free tutor."""
+    load, spans = {}, {}
+    for c, ok, s, e in zip(confirmed, *(normalize_booking_times(confirmed, use_slot=True)[k] for k in ('valid', 'start', 'end'))):
+        if ok:
+            key = (c['tutor_id'], s.date())
+            load[key] = load.get(key, 0) + 1
+            spans.setdefault(key, []).append((s, e))
+    times = normalize_booking_times(bookings, use_slot=True)
+    placed, cost = 0, 0
+    for i in sorted(range(len(bookings)), key=lambda i: times['start'][i]):
+        b, s, e = bookings[i], times['start'][i], times['end'][i]
+        best = None
+        for t in eligible_tutors(tutors, b['role_required'], b['subject'], s.date(), b['start_time'], b['duration'], index):
+            key = (t['id'], s.date())
+            if load.get(key, 0) >= cap or any(a < e and s < z for a, z in spans.get(key, ())):
+                continue
+            c = _edge_cost(t, load.get(key, 0), b['role_required'])
+            if best is None or c < best[0]:
+                best = (c, key)
+        if best:
+            placed += 1
+            cost += best[0]
+            load[best[1]] = load.get(best[1], 0) + 1
+            spans.setdefault(best[1], []).append((s, e))
+    return placed, cost
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='500,2000,5000')
+    parser.add_argument('--tutors', type=int, default=150)
+    parser.add_argument('--cap', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'bookings':>9} {'plan s':>8} {'placed':>7} {'cost':>7} {'repairs':>8} {'greedy s':>9} {'placed':>7} {'cost':>7}")
+    for n in (int(s) for s in args.sizes.split(',')):
+        bookings, tutors, index, confirmed = synthetic_season(n, args.tutors)
+        t0 = time.perf_counter()
+        plan = propose_assignments(bookings, tutors, index, confirmed, daily_cap=args.cap)
+        t_plan = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        g_placed, g_cost = greedy(bookings, tutors, index, confirmed, args.cap)
+        t_greedy = time.perf_counter() - t0
+        print(f"{n:>9} {t_plan:>8.2f} {len(plan['assignments']):>7} {plan['cost']:>7} {plan['repairs']:>8}"
+              f" {t_greedy:>9.2f} {g_placed:>7} {g_cost:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,304 @@
+"""Supabase calls per user intent on the booking pages, measured by driving the real pages.
+
+Each flow runs a page with Streamlit's `AppTest` against an in-process
+`FakeSupabase` (see `utils/fake_supabase.py`) and replays what a visitor
+does: open the page, change the booking fields, submit; or click cancel /
+accept / decline on two bookings. A step is charged the round trips the
+browser would cause:
+
+- changing a widget inside an `st.form` costs nothing until the form is
+  submitted (the browser holds the value);
+- any other widget change or click reruns the page, except that widgets
+  drawn inside an `st.fragment` rerun only that fragment, so they are
+  charged only the calls made inside fragment bodies.
+
+AppTest always reruns the whole script, so the harness wraps `st.fragment`
+to count calls made inside fragment bodies, and reads which fragment each
+widget was drawn in from the page's delta messages.
+
+Usage (from the repository root):
+  python scripts/benchmark_booking_flows.py
+  python scripts/benchmark_booking_flows.py --flows parent_booking,parent_cancel --check
+"""
+
+from typing import Optional, Dict, List, Any, Tuple
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+import argparse
+import functools
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+from streamlit.testing.v1 import local_script_runner  # noqa: E402
+
+import utils.database  # noqa: E402
+import utils.schema  # noqa: E402
+from utils.busy_index import invalidate_shared_busy_index  # noqa: E402
+from utils.fake_supabase import FakeSupabase, seed_tables  # noqa: E402
+from utils.reference_cache import tutors_cache, parents_cache  # noqa: E402
+from utils.schema import SchemaCache  # noqa: E402
+from utils.unavailability_index import invalidate_shared_index  # noqa: E402
+
+
+# Calls per flow (whole flow, after the restructuring); --check fails above these
+EXPECTED_CALLS = {
+    'parent_booking': 2,
+    'parent_cancel': 5,
+    'tutor_accept': 5,
+    'admin_manual_booking': 9,  # includes the recent admin actions, read as the admin
+}
+
+RUN_TIMEOUT = 60
+
+
+class _Meter:
+    """Round trips on the fake client, in total and inside `st.fragment` bodies."""
+
+    def __init__(self):
+        self.client: Optional[FakeSupabase] = None
+        self.in_fragments = 0
+        self.widget_fragments: Dict[str, str] = {}
+
+    def total(self) -> int:
+        return self.client.round_trips if self.client is not None else 0
+
+
+_meter = _Meter()
+_original_fragment = st.fragment
+_original_parse = local_script_runner.parse_tree_from_messages
+
+
+def _counting_fragment(func=None, *, run_every=None):
+    if func is None:
+        return lambda f: _counting_fragment(f, run_every=run_every)
+
+    @functools.wraps(func)
+    def body(*args, **kwargs):
+        before = _meter.total()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _meter.in_fragments += _meter.total() - before
+
+    return _original_fragment(body, run_every=run_every)
+
+
+def _recording_parse(messages):
+    for msg in messages:
+        if not msg.HasField('delta') or msg.delta.WhichOneof('type') != 'new_element':
+            continue
+        element = msg.delta.new_element
+        kind = element.WhichOneof('type')
+        widget_id = getattr(getattr(element, kind, None), 'id', None) if kind else None
+        if widget_id:
+            _meter.widget_fragments[widget_id] = msg.delta.fragment_id
+    return _original_parse(messages)
+
+
+def _install():
+    st.fragment = _counting_fragment
+    local_script_runner.parse_tree_from_messages = _recording_parse
+
+
+class FlowRun:
+    """One visitor's session on one page, charging each step what the browser would cause."""
+
+    def __init__(self, page: str, client: FakeSupabase, session: Dict[str, Any]):
+        self.at = AppTest.from_file(str(ROOT / 'pages' / page), default_timeout=RUN_TIMEOUT)
+        for key, value in session.items():
+            self.at.session_state[key] = value
+        # The visitor's own client (utils.session.get_session_client) is the fake too
+        self.at.session_state['_supabase_session'] = client
+        self.client = client
+        self.steps: List[Tuple[str, int]] = []
+
+    def _run(self, label: str, widget=None):
+        total, fragment = _meter.total(), _meter.in_fragments
+        scoped = widget is not None and bool(_meter.widget_fragments.get(widget.id))
+        self.at.run()
+        if self.at.exception:
+            raise RuntimeError(f"{label}: {self.at.exception[0].value}")
+        cost = (_meter.in_fragments - fragment) if scoped else (_meter.total() - total)
+        self.steps.append((label, cost))
+
+    def open(self):
+        self._run('open page')
+        return self
+
+    def set(self, kind: str, key: str, value):
+        widget = getattr(self.at, kind)(key=key)
+        widget.set_value(value)
+        if widget.proto.form_id:
+            self.steps.append((f"set {key}", 0))  # held by the browser until the form is submitted
+        else:
+            self._run(f"set {key}", widget)
+        return self
+
+    def click(self, label: str, key: Optional[str] = None):
+        if key is not None:
+            widget = self.at.button(key=key)
+        else:
+            widget = next(w for w in self.at.button if w.label == label)
+        widget.click()
+        self._run(f"click {key or label}", widget)
+        return self
+
+    def texts(self) -> List[str]:
+        return [e.value for kind in ('success', 'error', 'warning', 'info') for e in getattr(self.at, kind)]
+
+    @property
+    def calls(self) -> int:
+        return sum(cost for _, cost in self.steps)
+
+
+def _fresh_client(today: date) -> FakeSupabase:
+    sb = FakeSupabase(seed_tables(1, today=today))
+    utils.database.supabase = sb
+    utils.schema.schema_cache = SchemaCache(fetch=sb.openapi)
+    utils.schema.schema_cache.load()  # once per process, at startup
+    tutors_cache.invalidate()
+    parents_cache.invalidate()
+    invalidate_shared_index()
+    invalidate_shared_busy_index()
+    sb.reset_stats()
+    _meter.client = sb
+    _meter.in_fragments = 0
+    return sb
+
+
+def _parent_with(sb: FakeSupabase, status: str) -> Dict:
+    counts: Dict[str, int] = {}
+    for b in sb.tables['bookings']:
+        if b['status'] == status:
+            counts[b['parent_id']] = counts.get(b['parent_id'], 0) + 1
+    pid = max(counts, key=counts.get)
+    return next(p for p in sb.tables['parents'] if p['id'] == pid)
+
+
+def _user(row: Dict, role: str) -> Dict[str, Any]:
+    return {'user': SimpleNamespace(id=row['user_id'], email=row['email']), 'authenticated': True,
+            'role': role, 'email': row['email']}
+
+
+# Flows
+
+def flow_parent_booking(today: date) -> FlowRun:
+    """A parent fills in the booking form and saves it."""
+    sb = _fresh_client(today)
+    parent = sb.tables['parents'][0]
+    run = FlowRun('parent_booking.py', sb, _user(parent, 'parent')).open()
+    run.set('text_input', 'pb_subject', 'Maths')
+    run.set('date_input', 'pb_exam_date', today + timedelta(days=7))
+    run.set('time_input', 'pb_start_time', time(9, 0))
+    run.set('number_input', 'pb_duration', 90)
+    run.set('number_input', 'pb_extra_time', 15)
+    run.set('selectbox', 'pb_role_required', 'Scribe')
+    run.click('💾  Save Booking')
+    assert any(b.get('subject') == 'Maths' and b.get('parent_id') == parent['id'] and b.get('start_time') == '09:00:00'
+               for b in sb.tables['bookings']), run.texts()
+    return run
+
+
+def flow_parent_cancel(today: date) -> FlowRun:
+    """A parent opens their bookings and cancels two pending ones."""
+    sb = _fresh_client(today)
+    parent = _parent_with(sb, 'Pending')
+    pending = sorted((b for b in sb.tables['bookings'] if b['parent_id'] == parent['id'] and b['status'] == 'Pending'),
+                     key=lambda b: b['exam_date'])
+    run = FlowRun('parent_bookings.py', sb, _user(parent, 'parent')).open()
+    for b in pending[:2]:
+        run.click('❌', key=f"cancel_{b['id']}")
+    assert [b['status'] for b in pending[:2]] == ['Cancelled', 'Cancelled'], run.texts()
+    return run
+
+
+def flow_tutor_accept(today: date) -> FlowRun:
+    """A tutor opens their bookings, accepts one and declines another."""
+    sb = _fresh_client(today)
+    counts: Dict[str, int] = {}
+    for b in sb.tables['bookings']:
+        if b.get('tutor_id') and b['status'] in ('Assigned', 'Confirmed'):
+            counts[b['tutor_id']] = counts.get(b['tutor_id'], 0) + 1
+    tutor = next(t for t in sb.tables['tutors'] if t['id'] == max(counts, key=counts.get))
+    open_ones = [b for b in sb.tables['bookings'] if b.get('tutor_id') == tutor['id'] and b['status'] in ('Assigned', 'Confirmed')]
+    run = FlowRun('tutor_bookings.py', sb, _user(tutor, 'tutor')).open()
+    run.click('✅ Accept', key=f"accept_{open_ones[0]['id']}")
+    run.click('❌ Decline', key=f"decline_{open_ones[1]['id']}")
+    assert (open_ones[0]['status'], open_ones[1]['status']) == ('TutorConfirmed', 'TutorDeclined'), run.texts()
+    return run
+
+
+def flow_admin_manual_booking(today: date) -> FlowRun:
+    """An admin creates a booking for a client from the Admin Area."""
+    sb = _fresh_client(today)
+    admin = {'user_id': 'user-admin', 'email': 'admin@example.com'}
+    run = FlowRun('admin_admin_area.py', sb, _user(admin, 'admin')).open()
+    parent = sb.tables['parents'][3]
+    client_label = next(o for o in run.at.selectbox(key='admin_manual_client_select').options
+                        if o.startswith(parent['parent_name'] + ' '))
+    run.set('selectbox', 'admin_manual_client_select', client_label)
+    run.set('text_input', 'admin_manual_subject', 'History')
+    run.set('date_input', 'admin_manual_exam_date', today + timedelta(days=10))
+    run.set('time_input', 'admin_manual_start_time', time(11, 0))
+    run.set('number_input', 'admin_manual_duration', 120)
+    run.set('number_input', 'admin_manual_extra_time', 30)
+    run.set('selectbox', 'admin_manual_role', 'Reader')
+    if _has_button(run, 'admin_manual_find'):
+        run.click('Find tutors', key='admin_manual_find')
+    tutor_label = run.at.selectbox(key='admin_manual_tutor').options[1]
+    run.set('selectbox', 'admin_manual_tutor', tutor_label)
+    run.set('selectbox', 'admin_manual_status', 'Confirmed')
+    run.click('Save Manual Booking', key='admin_manual_save')
+    assert any(b.get('subject') == 'History' and b.get('parent_id') == parent['id'] for b in sb.tables['bookings']), run.texts()
+    return run
+
+
+def _has_button(run: FlowRun, key: str) -> bool:
+    try:
+        run.at.button(key=key)
+        return True
+    except KeyError:
+        return False
+
+
+FLOWS = {
+    'parent_booking': flow_parent_booking,
+    'parent_cancel': flow_parent_cancel,
+    'tutor_accept': flow_tutor_accept,
+    'admin_manual_booking': flow_admin_manual_booking,
+}
+
+
+def run_flow(name: str, today: Optional[date] = None) -> FlowRun:
+    _install()
+    return FLOWS[name](today or datetime.now().date())
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--flows', default=','.join(FLOWS), help='comma-separated flows to run')
+    parser.add_argument('--steps', action='store_true', help='print the calls charged to each step')
+    parser.add_argument('--check', action='store_true', help='fail if a flow exceeds EXPECTED_CALLS')
+    args = parser.parse_args(argv)
+
+    failed = False
+    for name in [f.strip() for f in args.flows.split(',') if f.strip()]:
+        run = run_flow(name)
+        line = f"{name:<22} {run.calls:>4} Supabase calls over {len(run.steps)} steps"
+        if args.check and run.calls > EXPECTED_CALLS[name]:
+            failed = True
+            line += f"  (budget {EXPECTED_CALLS[name]})"
+        print(line)
+        if args.steps:
+            for label, cost in run.steps:
+                print(f"    {cost:>4}  {label}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
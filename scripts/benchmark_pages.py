@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""Time each page's data path and count its Supabase round trips.
+
+Runs the queries behind the busiest pages (admin dashboard, pending queue,
+awaiting-confirmation list, tutor dashboard, parent booking form, auto-assign,
+bulk confirm and the profile link after a parent signs in) against
+`utils.fake_supabase.FakeSupabase`, seeded with synthetic parents, tutors,
+bookings and unavailability at 1x / 10x / 100x the live table sizes. Each `execute` can be given a network latency, so the
+wall times show what the round trips cost.
+
+`EXPECTED_ROUND_TRIPS` is the query budget of each path. With `--check` the
+script exits 1 when a path makes more round trips than that at any scale,
+so a change that adds a per-row query (or loses batching) fails loudly.
+`tests/test_fake_supabase.py` runs the same check at 1x.
+
+The 100x run takes about a minute (matching thousands of pending bookings
+against thousands of tutors is CPU-bound), so it is not in the defaults.
+
+Usage: python scripts/benchmark_pages.py [--scales 1,10,100] [--latency-ms 20] [--repeat 3] [--check]
+"""
+from pathlib import Path
+from datetime import datetime
+import argparse
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import utils.tutor_dashboard as tutor_dashboard  # noqa: E402
+from utils.auto_assign import propose_plan  # noqa: E402
+from utils.booking_window import fetch_bookings_window, window_bounds  # noqa: E402
+from utils.bulk_actions import confirm_bookings  # noqa: E402
+from utils.enrichment import enrich_bookings  # noqa: E402
+from utils.fake_supabase import FakeSupabase, seed_tables  # noqa: E402
+from utils.matching import candidate_tutors_for_bookings, eligible_tutors_for_booking  # noqa: E402
+from utils.pagination import fetch_page  # noqa: E402
+from utils.profile_link import link_profile, link_profile_steps  # noqa: E402
+
+NOW = datetime(2026, 10, 12, 7, 0)
+
+# Query budget per path and scale. Lookups by id go out in chunks of
+# `IN_CHUNK_SIZE` ids, so paths listing many distinct tutors or parents grow
+# by a query per chunk at 100x; nothing else may grow with the data.
+EXPECTED_ROUND_TRIPS = {
+    'admin_dashboard': {1: 2, 10: 2, 100: 3},     # window query + tutors
+    'pending_queue': {1: 4, 10: 4, 100: 4},       # pending query + tutors, unavailability, busy bookings
+    'awaiting_list': {1: 4, 10: 4, 100: 5},       # first page (+ undated check when short) + parents, tutors
+    'tutor_dashboard': {1: 2, 10: 2, 100: 2},     # tutor_bookings probe + bookings
+    'parent_booking': {1: 3, 10: 3, 100: 3},      # tutors, unavailability, busy bookings
+    'auto_assign_plan': {1: 3, 10: 3, 100: 3},    # tutors, unavailability, confirmed bookings
+    'bulk_confirm': {1: 6, 10: 6, 100: 6},        # one update per tutor (5) + audit row
+    'parent_login_link': {1: 1, 10: 1, 100: 1},   # link_profile RPC
+}
+
+
+def _pending(sb):
+    rows = sb.table('bookings').select('*').eq('status', 'Pending').order('exam_date').execute().data or []
+    return [b for b in rows if b.get('exam_date') >= NOW.date().isoformat()]
+
+
+def admin_dashboard(sb, data):
+    upcoming = fetch_bookings_window(*window_bounds(NOW), client=sb)
+    return enrich_bookings((b for _, b in upcoming), parents=False, client=sb)
+
+
+def pending_queue(sb, data):
+    return candidate_tutors_for_bookings(_pending(sb), client=sb)
+
+
+def awaiting_list(sb, data):
+    bookings, _ = fetch_page(filters=lambda q: q.in_('status', ['AwaitingTutorConfirmation', 'Assigned']), client=sb)
+    return enrich_bookings(bookings, client=sb)
+
+
+def tutor_dashboard_path(sb, data):
+    # The probe for a `tutor_bookings` table is cached per process; count it
+    tutor_dashboard._source_table = None
+    return tutor_dashboard.load_upcoming_bookings('t0', client=sb, now=NOW)
+
+
+def parent_booking(sb, data):
+    booking = next(b for b in data['bookings'] if b['status'] == 'Pending' and b['exam_date'] >= NOW.date().isoformat())
+    return eligible_tutors_for_booking(booking, client=sb)
+
+
+def auto_assign_plan(sb, data):
+    pending = [b for b in data['bookings'] if b['status'] == 'Pending' and b['exam_date'] >= NOW.date().isoformat()]
+    return propose_plan(pending, client=sb)
+
+
+def bulk_confirm(sb, data):
+    pending = [b for b in data['bookings'] if b['status'] == 'Pending'][:20]
+    tutor_ids = [t['id'] for t in data['tutors'][:5]]
+    assignments = {b['id']: tutor_ids[i % len(tutor_ids)] for i, b in enumerate(pending)}
+    return confirm_bookings(pending, assignments, admin_email='bench@example.com', notify=False,
+                            client=sb, audit_client=sb)
+
+
+def parent_login_link(sb, data):
+    # Stands in for scripts/add_link_profile_function.sql, run inside the database
+    sb.register_rpc('link_profile', lambda db, p: link_profile_steps(
+        p['p_table'], p['p_user_id'], p['p_email'], client=db.server()))
+    parent = data['parents'][len(data['parents']) // 2]
+    return link_profile('parents', parent['user_id'], 'changed-' + parent['email'], client=sb)
+
+
+PATHS = {
+    'admin_dashboard': admin_dashboard,
+    'pending_queue': pending_queue,
+    'awaiting_list': awaiting_list,
+    'tutor_dashboard': tutor_dashboard_path,
+    'parent_booking': parent_booking,
+    'auto_assign_plan': auto_assign_plan,
+    'bulk_confirm': bulk_confirm,
+    'parent_login_link': parent_login_link,
+}
+
+
+def budget_for(name, scale):
+    """Round-trip budget of a path at a scale (the nearest listed scale at or above it)."""
+    budgets = EXPECTED_ROUND_TRIPS[name]
+    return budgets[min((s for s in budgets if s >= scale), default=max(budgets))]
+
+
+def run_path(name, data, latency=0.0, repeat=1):
+    """Best wall time (seconds) over `repeat` runs and the stats of the last one.
+
+    Each run gets a fresh client over `data`, so writes do not carry over.
+    """
+    best, stats = None, None
+    for _ in range(max(1, repeat)):
+        sb = FakeSupabase(data, latency=latency)
+        t0 = time.perf_counter()
+        PATHS[name](sb, data)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+        stats = sb.stats()
+    return best, stats
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    ap.add_argument('--scales', default='1,10')
+    ap.add_argument('--latency-ms', type=float, default=20.0, help='simulated latency per request')
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--paths', default=','.join(PATHS))
+    ap.add_argument('--check', action='store_true', help='exit 1 if a path exceeds its round-trip budget')
+    args = ap.parse_args()
+
+    over = []
+    print(f"{'path':<18} {'scale':>5} {'bookings':>8} {'trips':>5} {'rows':>7} {'ms':>9}")
+    for scale in (int(s) for s in args.scales.split(',')):
+        data = seed_tables(scale, today=NOW.date())
+        for name in args.paths.split(','):
+            elapsed, stats = run_path(name, data, args.latency_ms / 1000.0, args.repeat)
+            print(f"{name:<18} {scale:>4}x {len(data['bookings']):>8} {stats['round_trips']:>5} "
+                  f"{stats['rows_returned']:>7} {elapsed * 1000:>9.1f}")
+            budget = budget_for(name, scale)
+            if stats['round_trips'] > budget:
+                over.append(f"{name} at {scale}x: {stats['round_trips']} round trips "
+                            f"(budget {budget}): {stats['by_call']}")
+    for line in over:
+        print(f"OVER BUDGET: {line}", file=sys.stderr)
+    if args.check and over:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,9 @@ Usage:
 This script requires `SUPABASE_URL` and `SUPABASE_KEY` (service role key) available
 in the environment or in the repository `.env` file. The script will refuse to run
 if the key looks like a publishable key (doesn't start with "service_role_").
+
+Users are confirmed concurrently over one pooled connection (`--concurrency`,
+default 8).
 """
 import os
 import argparse
@@ -19,6 +22,10 @@ from pathlib import Path
 import httpx
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils.auth_admin import AuthAdminClient, AUTH_ADMIN_CONCURRENCY  # noqa: E402
+
 
 def load_env():
     repo_root = Path(__file__).resolve().parents[1]
@@ -41,33 +48,14 @@ def ensure_service_key(key: str):
     return True, None
 
 
-def find_user_by_email(base_url: str, headers: dict, email: str):
-    url = f"{base_url}/auth/v1/admin/users?email={email}"
-    r = httpx.get(url, headers=headers, timeout=30.0)
-    r.raise_for_status()
-    data = r.json()
-    # API returns a list; if empty, return None
-    if isinstance(data, list) and data:
-        return data[0]
-    return None
-
-
-def confirm_user(base_url: str, headers: dict, user_id: str, password: str | None = None):
-    url = f"{base_url}/auth/v1/admin/users/{user_id}"
-    payload = {"email_confirm": True}
-    if password:
-        payload["password"] = password
-    r = httpx.patch(url, headers=headers, json=payload, timeout=30.0)
-    r.raise_for_status()
-    return r.json()
-
-
 def main():
     load_env()
     supabase_url, supabase_key = get_config()
     parser = argparse.ArgumentParser(description="Confirm Supabase users using service role key")
     parser.add_argument("--email", action="append", required=True, help="Email address to confirm (can repeat)")
     parser.add_argument("--password", help="Optional: set a new password for the user(s)")
+    parser.add_argument("--concurrency", type=int, default=AUTH_ADMIN_CONCURRENCY,
+                        help="Users confirmed at once (default %(default)s)")
     args = parser.parse_args()
 
     ok, msg = ensure_service_key(supabase_key)
@@ -80,27 +68,21 @@ def main():
         print("SUPABASE_URL not set in environment or .env")
         sys.exit(2)
 
-    headers = {
-        "Authorization": f"Bearer {supabase_key}",
-        "apikey": supabase_key,
-        "Content-Type": "application/json",
-    }
-
-    for email in args.email:
-        try:
-            print(f"Looking up user: {email}")
-            user = find_user_by_email(supabase_url, headers, email)
-            if not user:
-                print(f"User not found: {email}")
-                continue
-            user_id = user.get("id")
-            print(f"Found user id: {user_id} — confirming")
-            res = confirm_user(supabase_url, headers, user_id, password=args.password)
-            print(f"Confirmed {email}: {res}")
-        except httpx.HTTPStatusError as e:
-            print(f"HTTP error for {email}: {e.response.status_code} - {e.response.text}")
-        except Exception as e:
-            print(f"Error confirming {email}: {e}")
+    print(f"Confirming {len(args.email)} user(s)")
+    with httpx.Client(timeout=30.0) as http_client:
+        admin = AuthAdminClient(supabase_url, supabase_key, http_client=http_client,
+                                concurrency=args.concurrency, timeout=30.0)
+        results = admin.confirm_users(args.email, password=args.password)
+
+    failed = 0
+    for email, res in results.items():
+        if res.get("ok"):
+            print(f"Confirmed {email}: {res.get('user')}")
+        else:
+            failed += 1
+            print(f"Error confirming {email}: {res.get('error')}")
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -4,8 +4,13 @@ from pathlib import Path
 from datetime import datetime, timedelta
 import json
 import os
+import sys
 import importlib.util
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils.booking_times import normalize_booking_times, window_positions  # noqa: E402
+
 
 def load_supabase():
     repo_root = Path(__file__).resolve().parents[1]
@@ -34,24 +39,20 @@ def main():
         return
 
     rows = res.data or []
+    # Parse every row's start in one pass and keep those inside the window, by time
+    times = normalize_booking_times(rows)
     matches = []
-    for b in rows:
-        try:
-            date_str = b.get('exam_date')
-            time_str = b.get('start_time') or '00:00:00'
-            dt = datetime.combine(datetime.fromisoformat(date_str), datetime.strptime(time_str, "%H:%M:%S").time())
-        except Exception:
-            continue
-        if start_of_day <= dt <= cutoff:
-            matches.append({
-                'id': b.get('id'),
-                'exam_date': date_str,
-                'start_time': time_str,
-                'child_name': b.get('child_name'),
-                'subject': b.get('subject'),
-                'status': b.get('status'),
-                'tutor_id': b.get('tutor_id'),
-            })
+    for i in window_positions(times, start_of_day, cutoff):
+        b = rows[i]
+        matches.append({
+            'id': b.get('id'),
+            'exam_date': b.get('exam_date'),
+            'start_time': b.get('start_time') or '00:00:00',
+            'child_name': b.get('child_name'),
+            'subject': b.get('subject'),
+            'status': b.get('status'),
+            'tutor_id': b.get('tutor_id'),
+        })
 
     print(json.dumps({'count': len(matches), 'window_start': start_of_day.isoformat(), 'window_end': cutoff.isoformat(), 'bookings': matches}, indent=2, default=str))
 
@@ -2,6 +2,7 @@ import streamlit as st
 from utils.ui import hide_sidebar
 from utils.session import init_session
 from utils.ui import safe_rerun
+from utils.schema import schema_cache
 
 # Configure the app once (must be called only once) and before any other Streamlit calls
 st.set_page_config(
@@ -162,6 +163,9 @@ st.markdown("""
 # Ensure session state defaults exist for all pages
 init_session()
 
+# Read the table columns once per process, off the request path; write paths use them
+schema_cache.start_background_load()
+
 # Detect simple recovery param and forward to password reset page
 try:
     params = st.query_params or {}
@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+import httpx
+
+from utils.auth_admin import AuthAdminClient
+
+
+def _serve(state):
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _handle(self):
+            with lock:
+                state['in_flight'] += 1
+                state['peak'] = max(state['peak'], state['in_flight'])
+                state['peers'].add(self.client_address)
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                state['calls'].append((self.command, self.path, self.headers['apikey'], body))
+                time.sleep(0.02)
+                user_id = self.path.split('?')[0].rsplit('/', 1)[-1]
+                if user_id == 'missing':
+                    status, out = 404, {'msg': 'User not found'}
+                elif self.command == 'GET':
+                    email = unquote(self.path.split('email=')[1])
+                    status, out = 200, {'users': [{'id': f"id-{email}", 'email': email}] if 'nobody' not in email else []}
+                else:
+                    status, out = 200, {'id': user_id}
+            finally:
+                with lock:
+                    state['in_flight'] -= 1
+            data = json.dumps(out).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_PUT = do_DELETE = _handle
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _state():
+    return {'in_flight': 0, 'peak': 0, 'peers': set(), 'calls': []}
+
+
+def test_batch_set_passwords_is_bounded_and_per_user():
+    state = _state()
+    server = _serve(state)
+    try:
+        with httpx.Client() as http:
+            admin = AuthAdminClient(f"http://127.0.0.1:{server.server_port}", 'svc', http_client=http, concurrency=4)
+            passwords = {f"u{i}": f"pw{i}" for i in range(20)}
+            passwords['missing'] = 'x'
+            started = time.perf_counter()
+            results = admin.set_passwords(passwords)
+            elapsed = time.perf_counter() - started
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert list(results) == list(passwords)
+    assert all(results[f"u{i}"]['ok'] for i in range(20))
+    assert results['missing'] == {'error': {'msg': 'User not found'}}
+    assert sorted(c[1] for c in state['calls']) == sorted(f"/auth/v1/admin/users/{u}" for u in passwords)
+    assert all(c[0] == 'PUT' and c[2] == 'svc' and c[3] == {'password': passwords[c[1].rsplit('/', 1)[1]]} for c in state['calls'])
+    assert 1 < state['peak'] <= 4
+    # Connections are reused across the batch: at most one per worker
+    assert len(state['peers']) <= 4
+    # 21 calls of 20ms each, four at a time
+    assert elapsed < 21 * 0.02
+
+
+def test_confirm_users_and_missing_configuration(monkeypatch):
+    state = _state()
+    server = _serve(state)
+    try:
+        with httpx.Client() as http:
+            admin = AuthAdminClient(f"http://127.0.0.1:{server.server_port}", 'svc', http_client=http)
+            results = admin.confirm_users(['a@x.com', 'nobody@x.com'], password='New1!')
+            assert admin.delete_users(['u1'])['u1']['ok']
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert results['a@x.com']['ok']
+    assert results['nobody@x.com'] == {'error': 'User not found'}
+    assert ('PUT', '/auth/v1/admin/users/id-a@x.com', 'svc', {'email_confirm': True, 'password': 'New1!'}) in state['calls']
+
+    monkeypatch.delenv('SUPABASE_SERVICE_ROLE', raising=False)
+    assert AuthAdminClient('https://x.supabase.co').set_passwords({'u1': 'p'}) == {'u1': {'error': 'SUPABASE_SERVICE_ROLE not configured'}}
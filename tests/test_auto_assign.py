@@ -0,0 +1,178 @@
+import itertools
+import random
+from datetime import date, timedelta
+
+from utils.auto_assign import propose_assignments, _DayMatching
+from utils.unavailability_index import UnavailabilityIndex
+
+
+def _tutor(i, roles='Reader', **kw):
+    return {'id': f"t{i}", 'name': f"T{i}", 'roles': roles, 'approved': True, **kw}
+
+
+def _booking(i, day, start, duration=60, role='Reader', subject='Maths'):
+    return {'id': i, 'exam_date': day.isoformat(), 'start_time': start, 'duration': duration,
+            'role_required': role, 'subject': subject}
+
+
+def _spans_ok(plan, bookings, cap):
+    by_tutor_day = {}
+    for b in bookings:
+        t = plan['assignments'].get(b['id'])
+        if t is None:
+            continue
+        h, m, _ = map(int, b['start_time'].split(':'))
+        s = h * 60 + m
+        by_tutor_day.setdefault((t, b['exam_date']), []).append((s, s + b['duration']))
+    for spans in by_tutor_day.values():
+        assert len(spans) <= cap
+        spans.sort()
+        assert all(a[1] <= b[0] for a, b in zip(spans, spans[1:]))
+
+
+def _brute_force(edges, capacity, load_costs):
+    """Max bookings matched, then min cost (no time overlaps involved)."""
+    best = (0, 0)
+    options = [[None] + list(e) for e in edges]
+    for choice in itertools.product(*options):
+        load = {}
+        cost = 0
+        for b, t in enumerate(choice):
+            if t is not None:
+                load[t] = load.get(t, 0) + 1
+                cost += edges[b][t]
+        if any(load[t] > capacity[t] for t in load):
+            continue
+        cost += sum(sum(load_costs[t][:k]) for t, k in load.items())
+        count = sum(t is not None for t in choice)
+        if (count, -cost) > (best[0], -best[1]):
+            best = (count, cost)
+    return best
+
+
+def _brute_force_with_overlaps(edges, capacity, spans, load_costs):
+    """Max bookings matched, then min cost, with no tutor on two overlapping bookings."""
+    order = sorted(range(len(edges)), key=lambda b: spans[b])
+    best = (0, 0)
+    for choice in itertools.product(*([None] + list(e) for e in edges)):
+        load, cost, ok = {}, 0, True
+        for b in order:
+            t = choice[b]
+            if t is None:
+                continue
+            if any(choice[o] == t and spans[o][0] < spans[b][1] and spans[b][0] < spans[o][1]
+                   for o in range(len(edges)) if o != b):
+                ok = False
+                break
+            k = load.get(t, 0)
+            if k >= capacity[t]:
+                ok = False
+                break
+            cost += edges[b][t] + load_costs[t][k]
+            load[t] = k + 1
+        count = sum(t is not None for t in choice)
+        if ok and (count, -cost) > (best[0], -best[1]):
+            best = (count, cost)
+    return best
+
+
+def test_day_matching_is_optimal_without_overlaps():
+    rng = random.Random(3)
+    for _ in range(150):
+        n, m = rng.randint(1, 6), rng.randint(1, 3)
+        edges = [{t: rng.randint(1, 9) for t in range(m) if rng.random() < 0.6} for _ in range(n)]
+        capacity = [rng.randint(1, 3) for _ in range(m)]
+        load_costs = [sorted(rng.randint(0, 6) for _ in range(c)) for c in capacity]
+        spans = [(i * 60, i * 60 + 60) for i in range(n)]
+        costs = [dict(e) for e in edges]
+        matching = _DayMatching(edges, capacity, spans, load_costs)
+        result = matching.solve()
+        assert matching.cost == sum(costs[b][t] for b, t in enumerate(result) if t >= 0) + sum(
+            sum(load_costs[t][:result.count(t)]) for t in set(result) if t >= 0)
+        assert (sum(t >= 0 for t in result), matching.cost) == _brute_force(costs, capacity, load_costs)
+
+
+def test_day_matching_places_the_most_bookings_with_overlaps():
+    rng = random.Random(11)
+    for _ in range(300):
+        n, m = rng.randint(1, 7), rng.randint(1, 3)
+        edges = [{t: rng.randint(1, 9) for t in range(m) if rng.random() < 0.7} for _ in range(n)]
+        capacity = [rng.randint(1, 3) for _ in range(m)]
+        load_costs = [sorted(rng.randint(0, 6) for _ in range(c)) for c in capacity]
+        spans = []
+        for _ in range(n):
+            s = 480 + 30 * rng.randint(0, 6)
+            spans.append((s, s + 30 * rng.randint(1, 4)))
+        costs = [dict(e) for e in edges]
+        matching = _DayMatching(edges, capacity, spans, load_costs)
+        result = matching.solve()
+        for t in range(m):
+            mine = sorted(spans[b] for b, u in enumerate(result) if u == t)
+            assert len(mine) <= capacity[t]
+            assert all(a[1] <= b[0] for a, b in zip(mine, mine[1:]))
+        best_count, _ = _brute_force_with_overlaps(costs, capacity, spans, load_costs)
+        assert sum(t >= 0 for t in result) == best_count
+
+
+def test_repair_does_not_strand_a_booking():
+    # One tutor: at most two of these fit (08:00-08:30 with 09:00-09:30 or 08:30-10:00)
+    day = date(2026, 11, 4)
+    bookings = [_booking(1, day, '08:00:00', duration=90), _booking(2, day, '09:00:00', duration=30),
+                _booking(3, day, '08:30:00', duration=90), _booking(4, day, '08:00:00', duration=30)]
+    plan = propose_assignments(bookings, [_tutor(1)], daily_cap=3)
+    _spans_ok(plan, bookings, cap=3)
+    assert len(plan['assignments']) == 2
+    assert set(plan['unassigned'].values()) == {'clashes with other assignments'}
+
+
+def test_beats_greedy_and_respects_roles_languages_and_cap():
+    day = date(2026, 11, 2)
+    tutors = [_tutor(1, roles='All of the Above'), _tutor(2, roles='Scribe'), _tutor(3, roles='Reader', afrikaans=True)]
+    bookings = [
+        _booking(1, day, '08:00:00', role='Reader'),
+        _booking(2, day, '08:00:00', role='Scribe'),
+        _booking(3, day, '08:00:00', role='Reader'),
+        _booking(4, day, '08:00:00', role='Reader', subject='Afrikaans'),
+    ]
+    plan = propose_assignments(bookings, tutors, daily_cap=1)
+    # Greedy in order would give booking 1 to t1 and strand booking 3
+    assert len(plan['assignments']) == 3
+    assert plan['assignments'][2] == 't2'
+    assert set(plan['assignments'].values()) == {'t1', 't2', 't3'}
+    assert list(plan['unassigned'].values()) == ['tutors fully booked']
+
+
+def test_overlaps_confirmed_bookings_and_unavailability():
+    day = date(2026, 11, 3)
+    tutors = [_tutor(i) for i in range(1, 4)]
+    bookings = [_booking(i, day, f"{8 + i // 2:02d}:{(i % 2) * 30:02d}:00", duration=90) for i in range(10)]
+    bookings.append({'id': 99, 'exam_date': None, 'start_time': None})
+    confirmed = [{'id': 500, 'tutor_id': 't1', 'exam_date': day.isoformat(), 'start_time': '08:00:00', 'duration': 240}]
+    unavailable = UnavailabilityIndex([{'id': 1, 'tutor_id': 't2', 'start_date': day.isoformat(), 'end_date': day.isoformat(),
+                                        'start_time': '11:00:00', 'end_time': '13:00:00'}], day, day)
+    plan = propose_assignments(bookings, tutors, unavailable, confirmed, daily_cap=4)
+    _spans_ok(plan, bookings, cap=4)
+    assert plan['unassigned'][99] == 'no exam date/start time'
+    by_id = {b['id']: b for b in bookings}
+    for bid, t in plan['assignments'].items():
+        start = by_id[bid]['start_time']
+        if t == 't1':
+            assert start >= '12:00:00'
+        if t == 't2':
+            assert not ('09:30:00' < start < '13:00:00')
+    # t1 already has one booking that day: at most three more
+    assert sum(t == 't1' for t in plan['assignments'].values()) <= 3
+
+
+def test_many_days_valid_plan():
+    rng = random.Random(7)
+    start = date(2026, 10, 1)
+    tutors = [_tutor(i, roles=rng.choice(['Reader', 'Scribe', 'Both', 'All of the Above'])) for i in range(25)]
+    bookings = [
+        _booking(i, start + timedelta(days=rng.randint(0, 9)), rng.choice(['08:00:00', '09:00:00', '11:30:00', '14:00:00']),
+                 duration=rng.choice([60, 90, 120, 180]), role=rng.choice(['Reader', 'Scribe']))
+        for i in range(300)
+    ]
+    plan = propose_assignments(bookings, tutors, daily_cap=2)
+    _spans_ok(plan, bookings, cap=2)
+    assert len(plan['assignments']) + len(plan['unassigned']) == 300
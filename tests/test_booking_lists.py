@@ -0,0 +1,96 @@
+import runpy
+from pathlib import Path
+
+import pytest
+
+import utils.booking_lists as bl
+from utils.booking_changes import mark_bookings_changed
+from utils.enrichment import EnrichedBookings
+
+
+class _Source:
+    def __init__(self, rows):
+        self.rows = rows
+        self.loads = 0
+        self.enriched = 0
+
+    def load(self):
+        self.loads += 1
+        return [dict(r) for r in self.rows]
+
+    def enrich(self, rows):
+        self.enriched += 1
+        return EnrichedBookings(rows, [None] * len(rows), [{'name': f"T{r['id']}"} for r in rows])
+
+
+def _list(session, source, **kwargs):
+    return bl.BookingList(session, 'parent_p1', load=source.load, enrich=source.enrich, **kwargs)
+
+
+def _rows():
+    return [{'id': 1, 'status': 'Pending'}, {'id': 2, 'status': 'Confirmed'}]
+
+
+def test_loads_once_per_session_and_counts_hits():
+    session, source = {}, _Source(_rows())
+    bookings = _list(session, source)
+    assert [r['id'] for r in bookings.rows()] == [1, 2]
+    assert bookings.enriched().tutor_for({'id': 2}) == {'name': 'T2'}
+    # A new BookingList on the same session (the next rerun) reads what is held
+    assert _list(session, source).rows() == bookings.rows()
+    assert (source.loads, source.enriched) == (1, 1)
+    assert bookings.stats() == {'loads': 1, 'queries_saved': 2}
+
+
+def test_own_write_is_merged_in_place():
+    session, source = {}, _Source(_rows())
+    bookings = _list(session, source)
+    bookings.rows()
+    version = mark_bookings_changed([{'id': 1, 'status': 'Cancelled'}])
+    bookings.apply_written([{'id': 1, 'status': 'Cancelled'}], version)
+    assert [r['status'] for r in bookings.rows()] == ['Cancelled', 'Confirmed']
+    assert bookings.enriched().tutor_for({'id': 1}) == {'name': 'T1'}
+    assert source.loads == 1
+
+
+def test_other_writes_reload_the_list():
+    session, source = {}, _Source(_rows())
+    bookings = _list(session, source)
+    bookings.rows()
+    mark_bookings_changed()  # another session's write
+    version = mark_bookings_changed([{'id': 1, 'status': 'Cancelled'}])
+    bookings.apply_written([{'id': 1, 'status': 'Cancelled'}], version)
+    source.rows[0]['status'] = 'Cancelled'
+    assert [r['status'] for r in bookings.rows()] == ['Cancelled', 'Confirmed']
+    assert source.loads == 2
+
+    mark_bookings_changed()
+    bookings.rows()
+    assert source.loads == 3
+
+
+def test_ttl_and_invalidate_reload(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(bl._time, 'monotonic', lambda: now[0])
+    session, source = {}, _Source(_rows())
+    bookings = _list(session, source, ttl=60)
+    bookings.rows()
+    now[0] += 59
+    bookings.rows()
+    assert source.loads == 1
+    now[0] += 2
+    bookings.rows()
+    assert source.loads == 2
+    bookings.invalidate()
+    assert 'parent_p1' not in ''.join(session)
+    bookings.rows()
+    assert source.loads == 3
+
+
+_flows = runpy.run_path(str(Path(__file__).resolve().parents[1] / 'scripts' / 'benchmark_booking_flows.py'))
+
+
+@pytest.mark.parametrize('name', list(_flows['FLOWS']))
+def test_booking_flows_stay_within_call_budget(name):
+    run = _flows['run_flow'](name)
+    assert run.calls <= _flows['EXPECTED_CALLS'][name], run.steps
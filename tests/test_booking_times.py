@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+import random
+
+import pandas as pd
+
+from utils.booking_times import (
+    normalize_booking_times,
+    start_datetimes,
+    window_positions,
+    sorted_positions,
+    started_mask,
+    cancellation_cutoff_passed,
+)
+
+
+def _legacy_slot(b):
+    """The per-row parser tutor.py used."""
+    slot = b.get("slot") or b.get("start_datetime") or None
+    if slot:
+        try:
+            return datetime.strptime(slot, "%Y-%m-%d %H:%M")
+        except Exception:
+            try:
+                return datetime.fromisoformat(slot)
+            except Exception:
+                pass
+    exam_date = b.get("exam_date")
+    if exam_date:
+        try:
+            time_part = b.get("start_time") or '00:00:00'
+            if len(time_part.split(':')) == 2:
+                time_part = time_part + ':00'
+            return datetime.fromisoformat(f"{exam_date}T{time_part}")
+        except Exception:
+            return None
+    return None
+
+
+def _legacy_exam_date(b):
+    """The per-row parser the admin lists used (`slot` ignored, blank time is midnight), also taking HH:MM."""
+    if not b.get('exam_date'):
+        return None
+    time_part = b.get('start_time') or '00:00:00'
+    if len(time_part.split(':')) == 2:
+        time_part = time_part + ':00'
+    try:
+        return datetime.fromisoformat(f"{b['exam_date']}T{time_part}")
+    except Exception:
+        return None
+
+
+def _random_bookings(n, seed=1):
+    rng = random.Random(seed)
+    base = datetime(2026, 3, 1)
+    out = []
+    for i in range(n):
+        dt = base + timedelta(days=rng.randint(-60, 60), minutes=30 * rng.randint(14, 34))
+        b = {'id': i, 'duration': rng.choice([60, 90, None, '120'])}
+        kind = rng.random()
+        if kind < 0.1:
+            b['slot'] = dt.strftime('%Y-%m-%d %H:%M')
+        elif kind < 0.15:
+            # Both: the tutor pages prefer `slot`, the admin lists `exam_date`
+            b['slot'] = dt.strftime('%Y-%m-%d %H:%M')
+            b['exam_date'] = (dt + timedelta(days=1)).date().isoformat()
+            b['start_time'] = '09:00:00'
+        elif kind < 0.2:
+            b['start_datetime'] = dt.isoformat()
+        elif kind < 0.25:
+            b['exam_date'] = rng.choice([None, '', 'not a date', '2026-02-30'])
+            b['start_time'] = '10:00:00'
+        else:
+            b['exam_date'] = dt.date().isoformat()
+            b['start_time'] = rng.choice([dt.strftime('%H:%M:%S'), dt.strftime('%H:%M'), None, '', 'soon'])
+        out.append(b)
+    return out
+
+
+def test_matches_legacy_row_parser():
+    bookings = _random_bookings(2000)
+    times = normalize_booking_times(bookings, use_slot=True)
+    assert list(times.columns) == ['start', 'end', 'valid']
+    assert str(times['start'].dtype) == 'datetime64[ns]'
+    assert start_datetimes(times) == [_legacy_slot(b) for b in bookings]
+    assert times['valid'].tolist() == [_legacy_slot(b) is not None for b in bookings]
+
+    durations = (times['end'] - times['start'])[times['valid']].dt.total_seconds() / 60
+    expected = [float(b['duration'] or 60) for b, ok in zip(bookings, times['valid']) if ok]
+    assert durations.tolist() == expected
+
+
+def test_default_reads_exam_date_and_start_time_only():
+    bookings = _random_bookings(2000, seed=3)
+    times = normalize_booking_times(bookings)
+    assert start_datetimes(times) == [_legacy_exam_date(b) for b in bookings]
+    assert any(b.get('slot') and b.get('exam_date') for b in bookings)
+
+
+def test_dataframe_input_keeps_index_and_offsets_are_wall_clock():
+    df = pd.DataFrame({
+        'exam_date': ['2026-05-01', None],
+        'start_time': ['09:15:00', None],
+        'start_datetime': [None, '2026-05-02T08:00:00+02:00'],
+    }, index=[10, 20])
+    times = normalize_booking_times(df, use_slot=True)
+    assert list(times.index) == [10, 20]
+    assert start_datetimes(times) == [datetime(2026, 5, 1, 9, 15), datetime(2026, 5, 2, 8, 0)]
+    assert normalize_booking_times([]).empty
+
+
+def test_window_sort_and_started():
+    bookings = _random_bookings(500, seed=2)
+    times = normalize_booking_times(bookings, use_slot=True)
+    starts = [_legacy_slot(b) for b in bookings]
+    lo, hi = datetime(2026, 2, 20), datetime(2026, 3, 5)
+
+    got = window_positions(times, lo, hi)
+    want = sorted((i for i, s in enumerate(starts) if s and lo <= s <= hi), key=lambda i: starts[i])
+    assert list(got) == want
+
+    order = list(sorted_positions(times))
+    want = sorted(range(len(starts)), key=lambda i: (starts[i] is None, starts[i] or datetime.min))
+    assert order == want
+
+    now = datetime(2026, 3, 1, 12)
+    assert list(started_mask(times, now)) == [bool(s and s < now) for s in starts]
+
+
+def test_cancellation_cutoff():
+    b = {'exam_date': '2026-05-10', 'start_time': '08:00:00'}
+    assert not cancellation_cutoff_passed(b, datetime(2026, 5, 9, 16, 59))
+    assert cancellation_cutoff_passed(b, datetime(2026, 5, 9, 17, 1))
+    assert not cancellation_cutoff_passed({'exam_date': None}, datetime(2030, 1, 1))
+    # No start time: unknown, so no billing (not midnight, which would move the cutoff a day early)
+    for missing in (None, '', 'soon'):
+        assert not cancellation_cutoff_passed({'exam_date': '2026-05-10', 'start_time': missing}, datetime(2026, 5, 9, 17, 1))
+    # A `slot` does not override the exam date the parent booked
+    b = {'exam_date': '2026-05-10', 'start_time': '08:00:00', 'slot': '2026-05-01 08:00'}
+    assert not cancellation_cutoff_passed(b, datetime(2026, 5, 9, 16, 59))
@@ -0,0 +1,56 @@
+from datetime import datetime
+import runpy
+from pathlib import Path
+
+from utils.booking_window import DASHBOARD_COLUMNS, fetch_bookings_window, window_bounds
+
+
+_bench = runpy.run_path(str(Path(__file__).resolve().parents[1] / 'scripts' / 'benchmark_admin_dashboard.py'))
+
+
+class _RecordingClient:
+    def __init__(self, store):
+        self.store = store
+        self.calls = []
+
+    def table(self, name):
+        q = self.store.table(name)
+        calls = self.calls
+
+        class Q:
+            def __getattr__(self, attr):
+                fn = getattr(q, attr)
+
+                def wrapper(*args, **kwargs):
+                    calls.append((attr,) + args)
+                    out = fn(*args, **kwargs)
+                    return self if out is q else out
+
+                return wrapper
+
+        return Q()
+
+
+def test_window_is_filtered_in_the_query():
+    now = datetime(2026, 6, 10, 12, 0)
+    client = _RecordingClient(_bench['IndexedBookings'](_bench['synthetic_bookings'](500, now)))
+    start, end = window_bounds(now, hours_ahead=48, days_back=7)
+    fetch_bookings_window(start, end, status='Confirmed', client=client)
+
+    assert ('select', DASHBOARD_COLUMNS) in client.calls
+    assert ('gte', 'exam_date', '2026-06-03') in client.calls
+    assert ('lte', 'exam_date', '2026-06-12') in client.calls
+    assert ('eq', 'status', 'Confirmed') in client.calls
+    assert ('neq', 'status', 'Cancelled') in client.calls
+
+
+def test_matches_legacy_full_scan():
+    now = datetime(2026, 6, 10, 12, 0)
+    store = _bench['IndexedBookings'](_bench['synthetic_bookings'](2000, now, seed=3))
+    for days_back in (0, 7):
+        start, end = window_bounds(now, hours_ahead=48, days_back=days_back)
+        for status in (None, 'Pending', 'Confirmed'):
+            legacy = _bench['legacy_dashboard'](store, start, end, status)
+            got = fetch_bookings_window(start, end, status=status, client=store)
+            assert [(dt, b['id']) for dt, b in got] == [(dt, b['id']) for dt, b in legacy]
+            assert all(start <= dt <= end for dt, _ in got)
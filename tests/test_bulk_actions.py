@@ -0,0 +1,136 @@
+import utils.outbox as outbox
+from utils.bulk_actions import confirm_bookings, set_tutors_approved, tutor_assignment_email
+
+
+class _FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.op = None
+        self.payload = None
+        self.filters = []
+
+    def update(self, payload):
+        self.op, self.payload = 'update', payload
+        return self
+
+    def insert(self, payload):
+        self.op, self.payload = 'insert', payload
+        return self
+
+    def select(self, *a):
+        self.op = 'select'
+        return self
+
+    def in_(self, col, values):
+        self.filters.append(lambda r: r.get(col) in values)
+        return self
+
+    def eq(self, col, val):
+        self.filters.append(lambda r: r.get(col) == val)
+        return self
+
+    def execute(self):
+        self.client.calls.append((self.op, self.table))
+        rows = self.client.rows.setdefault(self.table, [])
+        if self.op == 'insert':
+            rows.append(dict(self.payload))
+            out = [self.payload]
+        else:
+            out = [r for r in rows if all(f(r) for f in self.filters)]
+            if self.op == 'update':
+                for r in out:
+                    r.update(self.payload)
+            out = [dict(r) for r in out]
+
+        class R:
+            data = out
+
+        return R()
+
+
+class _FakeClient:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def table(self, name):
+        return _FakeQuery(self, name)
+
+
+def test_bulk_confirm_one_update_per_tutor_and_one_audit_row(monkeypatch):
+    bookings = [
+        {'id': i, 'status': 'Pending', 'parent_id': f"p{i % 3}", 'child_name': f"C{i}", 'subject': 'Maths',
+         'exam_date': f"2026-11-{i:02d}", 'start_time': '08:00:00', 'duration': 60}
+        for i in range(1, 31)
+    ]
+    bookings[4]['status'] = 'Cancelled'  # changed elsewhere since the page loaded
+    client = _FakeClient({
+        'bookings': [dict(b) for b in bookings],
+        'tutors': [{'id': 't1', 'name': 'Ann', 'email': 'ann@x.com'}, {'id': 't2', 'name': 'Bo'}],
+        'parents': [{'id': f"p{i}", 'email': f"p{i}@x.com"} for i in range(3)],
+    })
+    audit = _FakeClient({})
+    queued = []
+    monkeypatch.setattr(outbox, 'queue_emails', lambda msgs: [queued.append(m) or str(len(queued)) for m in msgs])
+
+    assignments = {b['id']: ('t1' if b['id'] % 2 else 't2') for b in bookings}
+    assignments[30] = None
+    result = confirm_bookings(bookings, assignments, admin_email='admin@x.com', client=client, audit_client=audit)
+
+    assert [c for c in client.calls if c[0] == 'update'] == [('update', 'bookings')] * 2
+    assert [c for c in client.calls if c[0] == 'select'] == [('select', 'tutors'), ('select', 'parents')]
+    assert sorted(result['confirmed']) == [i for i in range(1, 30) if i != 5]
+    assert result['skipped'] == [30] and result['errors'] == [] and result['audited']
+    by_id = {r['id']: r for r in client.rows['bookings']}
+    assert by_id[1]['tutor_id'] == 't1' and by_id[2]['status'] == 'Confirmed' and by_id[5]['status'] == 'Cancelled'
+
+    # Every booking gets a parent email; only t1 has an email address
+    assert result['emails_queued'] == len(queued) == 28 + 14
+    assert len(audit.rows['admin_actions']) == 1
+    row = audit.rows['admin_actions'][0]
+    assert row['action'] == 'bulk_confirm_bookings' and row['admin_email'] == 'admin@x.com'
+    assert row['target_id'] == '28 bookings' and row['details']['skipped'] == ['30']
+
+
+def test_bulk_tutor_approval():
+    client = _FakeClient({'tutors': [{'id': f"t{i}", 'approved': False} for i in range(5)]})
+    audit = _FakeClient({})
+    result = set_tutors_approved(['t1', 't2', 't2', 't9'], client=client, audit_client=audit)
+    assert client.calls == [('update', 'tutors')]
+    assert result['requested'] == ['t1', 't2', 't9'] and sorted(result['updated']) == ['t1', 't2']
+    assert [t['approved'] for t in client.rows['tutors']] == [False, True, True, False, False]
+    assert audit.rows['admin_actions'][0]['action'] == 'bulk_approve_tutors'
+
+    assert set_tutors_approved([], client=client, audit_client=audit)['updated'] == []
+    assert len(client.calls) == 1
+
+
+def test_audit_failure_does_not_fail_the_batch():
+    class Broken:
+        def table(self, name):
+            raise RuntimeError('no service role')
+
+    client = _FakeClient({'tutors': [{'id': 't1'}]})
+    result = set_tutors_approved(['t1'], approved=False, client=client, audit_client=Broken())
+    assert result['updated'] == ['t1'] and result['audited'] is False
+    assert tutor_assignment_email({}, {'name': 'A'}, None) is None
+
+
+def test_bulk_confirm_rejects_clashes_within_the_batch(monkeypatch):
+    bookings = [
+        {'id': 1, 'status': 'Pending', 'exam_date': '2026-11-02', 'start_time': '08:00:00', 'duration': 90},
+        {'id': 2, 'status': 'Pending', 'exam_date': '2026-11-02', 'start_time': '09:00:00', 'duration': 60},
+        {'id': 3, 'status': 'Pending', 'exam_date': '2026-11-02', 'start_time': '09:30:00', 'duration': 60},
+        {'id': 4, 'status': 'Pending', 'exam_date': '2026-11-02', 'start_time': '09:00:00', 'duration': 60},
+    ]
+    client = _FakeClient({'bookings': [dict(b) for b in bookings]})
+    # "One tutor for all of them": 2 overlaps 1, 3 starts when 1 ends; 4 goes to another tutor
+    assignments = {1: 't1', 2: 't1', 3: 't1', 4: 't2'}
+    result = confirm_bookings(bookings, assignments, notify=False, client=client, audit_client=_FakeClient({}))
+
+    assert sorted(result['confirmed']) == [1, 3, 4]
+    assert result['skipped'] == [2]
+    assert result['errors'] == ['booking 2: tutor t1 already takes overlapping booking 1 in this batch']
+    by_id = {r['id']: r for r in client.rows['bookings']}
+    assert by_id[2]['status'] == 'Pending' and by_id[2].get('tutor_id') is None
@@ -0,0 +1,157 @@
+import random
+from datetime import date, datetime, time, timedelta
+
+import utils.database
+import utils.busy_index as bi
+from utils.booking_changes import mark_bookings_changed
+from utils.busy_index import BusyIndex
+
+
+def _legacy_is_free(bookings, tutor_id, day, start, minutes, exclude=None):
+    """Linear scan: does any busy booking of the tutor overlap the slot?"""
+    s = datetime.combine(day, start)
+    e = s + timedelta(minutes=minutes)
+    for b in bookings:
+        if b['id'] == exclude or b['tutor_id'] != tutor_id or b['status'] not in bi.BUSY_STATUSES:
+            continue
+        bs = datetime.combine(date.fromisoformat(b['exam_date']), time.fromisoformat(b['start_time']))
+        be = bs + timedelta(minutes=b['duration'] + (b.get('extra_time') or 0))
+        if bs < e and s < be:
+            return False
+    return True
+
+
+def _random_bookings(rng, n, n_tutors=6, base=date(2026, 6, 1)):
+    return [{
+        'id': i,
+        'tutor_id': f"t{rng.randrange(n_tutors)}",
+        'status': rng.choice(['Confirmed', 'TutorConfirmed', 'Pending', 'Cancelled']),
+        'exam_date': (base + timedelta(days=rng.randint(0, 6))).isoformat(),
+        'start_time': f"{rng.randint(7, 15):02d}:{rng.choice([0, 15, 30, 45]):02d}:00",
+        'duration': rng.choice([30, 60, 90, 180]),
+        'extra_time': rng.choice([0, 0, 15, 30]),
+    } for i in range(n)]
+
+
+def _assert_matches_scan(rng, index, bookings, n_tutors=6, base=date(2026, 6, 1)):
+    for _ in range(500):
+        tutor_id = f"t{rng.randrange(n_tutors)}"
+        d = base + timedelta(days=rng.randint(-1, 7))
+        t = time(rng.randint(6, 17), rng.choice([0, 10, 30, 50]))
+        minutes = rng.choice([15, 60, 120])
+        exclude = rng.choice([None, rng.randrange(len(bookings))])
+        expected = _legacy_is_free(bookings, tutor_id, d, t, minutes, exclude)
+        assert index.is_free(tutor_id, d, t, minutes, exclude) == expected, (tutor_id, d, t, minutes, exclude)
+
+
+def test_index_matches_linear_scan():
+    rng = random.Random(11)
+    bookings = _random_bookings(rng, 300)
+    index = BusyIndex(bookings)
+    assert len(index) == sum(b['status'] in bi.BUSY_STATUSES for b in bookings)
+    _assert_matches_scan(rng, index, bookings)
+
+
+def test_status_changes_update_in_place():
+    rng = random.Random(12)
+    bookings = _random_bookings(rng, 200)
+    index = BusyIndex(bookings[:100])
+    for b in bookings[100:]:
+        index.update(b)
+    _assert_matches_scan(rng, index, bookings)
+
+    # Cancel some, confirm some, move some to another tutor or time
+    for b in bookings[::4]:
+        b['status'] = 'Cancelled'
+        index.update(b)
+    for b in bookings[1::4]:
+        b['status'] = 'Confirmed'
+        b['tutor_id'] = 't0'
+        b['start_time'] = '12:00:00'
+        index.update(b)
+    _assert_matches_scan(rng, index, bookings)
+    assert index.remove(bookings[1]['id'])
+    assert not index.remove(bookings[1]['id'])
+
+
+class _CountingClient:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = 0
+
+    def table(self, name):
+        client = self
+
+        class Q:
+            def select(self, *a, **k):
+                return self
+
+            def in_(self, col, vals):
+                self.statuses = vals
+                return self
+
+            def gte(self, col, val):
+                self.lo = val
+                return self
+
+            def lte(self, col, val):
+                self.hi = val
+                return self
+
+            def execute(self):
+                client.calls += 1
+
+                class R:
+                    data = [dict(r) for r in client.rows
+                            if r['status'] in self.statuses and self.lo <= r['exam_date'] <= self.hi]
+
+                return R()
+
+        return Q()
+
+
+def test_shared_index_follows_booking_changes(monkeypatch):
+    rows = [
+        {'id': 1, 'tutor_id': 't1', 'status': 'Confirmed', 'exam_date': '2026-06-02', 'start_time': '09:00:00', 'duration': 60},
+        {'id': 2, 'tutor_id': 't2', 'status': 'Pending', 'exam_date': '2026-06-02', 'start_time': '09:00:00', 'duration': 60},
+    ]
+    client = _CountingClient(rows)
+    monkeypatch.delenv('SUPABASE_SERVICE_ROLE', raising=False)
+    monkeypatch.setattr(utils.database, 'supabase', client, raising=False)
+    bi.invalidate_shared_busy_index()
+
+    idx = bi.busy_for(date(2026, 6, 1), date(2026, 6, 5))
+    assert client.calls == 1
+    assert not idx.is_free('t1', date(2026, 6, 2), time(9, 30), 30)
+    assert bi.busy_for(date(2026, 6, 2)) is idx
+
+    # A write reported with its rows is applied without a query
+    mark_bookings_changed([dict(rows[1], status='Confirmed')])
+    idx = bi.busy_for(date(2026, 6, 2))
+    assert client.calls == 1
+    assert not idx.is_free('t2', date(2026, 6, 2), time(9, 30), 30)
+
+    # A write reported without rows makes the next use reload
+    rows[0]['status'] = 'Cancelled'
+    mark_bookings_changed()
+    idx = bi.busy_for(date(2026, 6, 2))
+    assert client.calls == 2
+    assert idx.is_free('t1', date(2026, 6, 2), time(9, 30), 30)
+    bi.invalidate_shared_busy_index()
+
+
+def test_shared_index_loads_with_the_service_role(monkeypatch):
+    import utils.supabase_clients as sc
+    rows = [{'id': 1, 'tutor_id': 't1', 'status': 'Confirmed', 'exam_date': '2026-06-02', 'start_time': '09:00:00', 'duration': 60}]
+    service, anon = _CountingClient(rows), _CountingClient([])
+    roles = []
+    monkeypatch.setenv('SUPABASE_SERVICE_ROLE', 'service-key')
+    monkeypatch.setattr(sc, 'get_client', lambda role='anon', name='default': roles.append(role) or service)
+    monkeypatch.setattr(utils.database, 'supabase', anon, raising=False)
+    bi.invalidate_shared_busy_index()
+    try:
+        idx = bi.busy_for(date(2026, 6, 2))
+        assert roles == ['service'] and (service.calls, anon.calls) == (1, 0)
+        assert not idx.is_free('t1', date(2026, 6, 2), time(9, 30), 30)
+    finally:
+        bi.invalidate_shared_busy_index()
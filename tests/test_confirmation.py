@@ -0,0 +1,61 @@
+import time
+
+from utils.confirmation import ConfirmationPipeline, remember_steps, pop_steps
+
+
+def _slow(value, seconds=0.1):
+    def run():
+        time.sleep(seconds)
+        return value
+    return run
+
+
+def test_stage_runs_steps_concurrently():
+    pipeline = ConfirmationPipeline(deadline=5)
+    started = time.perf_counter()
+    found = pipeline.stage({
+        'Tutor lookup': _slow({'id': 't1'}),
+        'Parent lookup': _slow({'id': 'p1'}),
+    })
+    sent = pipeline.stage({
+        'Parent email': _slow('queued for p@x.com'),
+        'Tutor email': _slow('queued for t@x.com'),
+        'Admin summary': _slow('queued'),
+    })
+    elapsed = time.perf_counter() - started
+
+    # Two stages of 0.1s steps: about 0.2s, not the 0.5s sum
+    assert elapsed < 0.4
+    assert found == {'Tutor lookup': {'id': 't1'}, 'Parent lookup': {'id': 'p1'}}
+    assert sent['Parent email'] == 'queued for p@x.com'
+    assert [s['status'] for s in pipeline.steps] == ['ok'] * 5
+    assert pipeline.steps[2]['detail'] == 'queued for p@x.com' and pipeline.steps[0]['detail'] == ''
+    assert all(s['ms'] >= 90 for s in pipeline.steps)
+
+
+def test_failures_skips_and_deadline():
+    def boom():
+        raise RuntimeError('no tutor')
+
+    pipeline = ConfirmationPipeline(deadline=0.2)
+    pipeline.skip('Parent email', 'parent email not found')
+    values = pipeline.stage({'Tutor lookup': boom, 'Slow step': _slow('late', 1.0), 'Quick': _slow('done', 0)})
+    assert values == {'Tutor lookup': None, 'Slow step': None, 'Quick': 'done'}
+    status = {s['step']: (s['status'], s['detail']) for s in pipeline.steps}
+    assert status['Parent email'] == ('skipped', 'parent email not found')
+    assert status['Tutor lookup'] == ('failed', 'no tutor')
+    assert status['Slow step'][0] == 'timed out'
+    assert pipeline.ok('Quick') and not pipeline.ok('Slow step')
+
+    # Past the deadline later stages do not wait at all
+    started = time.perf_counter()
+    pipeline.stage({'After': _slow('x', 0.5)})
+    assert time.perf_counter() - started < 0.2
+    assert pipeline.steps[-1]['status'] == 'timed out'
+
+
+def test_steps_survive_one_rerun():
+    session = {}
+    remember_steps(session, 7, [{'step': 'Tutor email', 'status': 'ok', 'detail': '', 'ms': 1.0}])
+    assert list(pop_steps(session)) == [7]
+    assert pop_steps(session) == {}
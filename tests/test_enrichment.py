@@ -0,0 +1,128 @@
+import pandas as pd
+
+import utils.enrichment as enrichment
+from utils.enrichment import enrich_bookings, billing_columns, fetch_by_ids
+
+
+class _FakeTable:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.ids = None
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def in_(self, col, values):
+        self.ids = [str(v) for v in values]
+        return self
+
+    def execute(self):
+        self.client.queries.append((self.name, len(self.ids)))
+        if self.name in self.client.fail:
+            raise RuntimeError("boom")
+        rows = [r for r in self.client.rows.get(self.name, []) if str(r['id']) in self.ids]
+
+        class R:
+            data = rows
+
+        return R()
+
+
+class _FakeClient:
+    def __init__(self, rows, fail=()):
+        self.rows = rows
+        self.queries = []
+        self.fail = set(fail)
+
+    def table(self, name):
+        return _FakeTable(self, name)
+
+
+def _data():
+    parents = [{'id': f"p{i}", 'parent_name': f"Parent {i}", 'email': f"p{i}@x.com", 'phone': f"0{i}"} for i in range(5)]
+    tutors = [{'id': f"t{i}", 'name': f"T{i}", 'surname': 'S', 'phone': None, 'email': f"t{i}@x.com"} for i in range(3)]
+    bookings = []
+    for i in range(12):
+        bookings.append({
+            'id': i,
+            'parent_id': f"p{i % 6}",
+            'tutor_id': f"t{i % 4}" if i % 3 else None,
+            'child_name': f"Child {i}",
+            'exam_date': '2026-06-01',
+            'duration': 60,
+            'status': 'Confirmed' if i % 2 else 'Pending',
+        })
+    return parents, tutors, bookings
+
+
+def test_one_query_per_table_and_column_output():
+    parents, tutors, bookings = _data()
+    client = _FakeClient({'parents': parents, 'tutors': tutors})
+    enriched = enrich_bookings(bookings, client=client)
+
+    assert client.queries == [('parents', 6), ('tutors', 4)]
+    assert len(enriched) == 12
+    assert enriched.column('parent_name')[:6] == ['Parent 0', 'Parent 1', 'Parent 2', 'Parent 3', 'Parent 4', None]
+    assert enriched.column('tutor_name')[1] == 'T1 S'
+    assert enriched.column('tutor_contact')[1] == 't1@x.com'
+    assert enriched.column('tutor_name')[3] is None
+    assert enriched.column('child_name')[0] == 'Child 0'
+    assert enriched.parent_for(bookings[2])['email'] == 'p2@x.com'
+    assert enriched.tutor_for({'id': 'unknown'}) is None
+
+    df = pd.DataFrame(billing_columns(enriched))
+    assert list(df.columns) == ["Parent Name", "Child Name", "Exam Date", "Duration", "Tutor Name", "Confirmed"]
+    assert df["Parent Name"][5] == 'p5'
+    assert df["Tutor Name"][2] == 'T2 S'
+    assert df["Tutor Name"][0] is None
+    assert df["Confirmed"].tolist() == [bool(i % 2) for i in range(12)]
+
+    frame = enriched.frame({'Child': 'child_name', 'Tutor': 'tutor_name'})
+    assert list(frame) == ['Child', 'Tutor'] and len(frame['Tutor']) == 12
+
+
+def test_skipped_tables_and_empty_input_make_no_queries():
+    parents, tutors, bookings = _data()
+    client = _FakeClient({'parents': parents, 'tutors': tutors})
+    enrich_bookings(bookings, tutors=False, client=client)
+    assert client.queries == [('parents', 6)]
+
+    client.queries.clear()
+    assert len(enrich_bookings([], client=client)) == 0
+    assert client.queries == []
+
+
+def test_long_id_lists_are_chunked(monkeypatch):
+    monkeypatch.setattr(enrichment, 'IN_CHUNK_SIZE', 4)
+    rows = [{'id': i} for i in range(10)]
+    client = _FakeClient({'tutors': rows})
+    got = fetch_by_ids('tutors', [r['id'] for r in rows] + [3, None, ''], client=client)
+    assert sorted(got) == sorted(str(i) for i in range(10))
+    assert client.queries == [('tutors', 4), ('tutors', 4), ('tutors', 2)]
+
+
+def test_failed_query_degrades_to_ids():
+    parents, tutors, bookings = _data()
+    client = _FakeClient({'parents': parents, 'tutors': tutors}, fail={'parents'})
+    enriched = enrich_bookings(bookings, client=client)
+    assert enriched.errors and enriched.errors[0].startswith('parents')
+    assert billing_columns(enriched)["Parent Name"][0] == 'p0'
+    assert enriched.column('tutor_name')[1] == 'T1 S'
+
+
+def test_fallback_resolves_legacy_references(monkeypatch):
+    import utils.reference_cache as rc
+
+    tutors = [{'id': 't1', 'user_id': 'u1', 'name': 'Ann', 'surname': 'Smith', 'email': 'ann@x.com'}]
+    client = _FakeClient({'tutors': tutors})
+    monkeypatch.setattr(rc.tutors_cache, 'all', lambda *a, **k: list(tutors))
+    bookings = [
+        {'id': 1, 'tutor_id': 't1'},
+        {'id': 2, 'tutor_id': 'ann@x.com'},
+        {'id': 3, 'tutor_id': 'legacy', 'tutor_name': 'ann smith'},
+        {'id': 4, 'tutor_id': None},
+    ]
+    enriched = enrich_bookings(bookings, parents=False, fallback=True, client=client)
+    assert [(t or {}).get('id') for t in enriched.tutor_rows] == ['t1', 't1', 't1', None]
+    assert client.queries == [('tutors', 3)]
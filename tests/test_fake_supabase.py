@@ -0,0 +1,97 @@
+import runpy
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from utils.fake_supabase import FakeSupabase, FakeAPIError, seed_tables
+from utils.pagination import iter_booking_pages, fetch_page
+
+_bench = runpy.run_path(str(Path(__file__).resolve().parents[1] / 'scripts' / 'benchmark_pages.py'))
+
+
+def _client(**kwargs):
+    return FakeSupabase({'bookings': [
+        {'id': 1, 'status': 'Pending', 'exam_date': '2026-06-02', 'tutor_id': None},
+        {'id': 2, 'status': 'Confirmed', 'exam_date': '2026-06-01', 'tutor_id': 't1'},
+        {'id': 3, 'status': 'Cancelled', 'exam_date': None, 'tutor_id': 't2'},
+        {'id': 4, 'status': 'Confirmed', 'exam_date': '2026-06-02', 'tutor_id': 't1'},
+    ]}, **kwargs)
+
+
+def _ids(res):
+    return [r['id'] for r in res.data]
+
+
+def test_filters_order_and_projection():
+    sb = _client()
+    q = sb.table('bookings')
+    assert _ids(q.select('id').eq('status', 'Confirmed').order('id', desc=True).execute()) == [4, 2]
+    assert _ids(sb.table('bookings').select('*').neq('status', 'Pending').execute()) == [2, 3, 4]
+    assert _ids(sb.table('bookings').select('*').in_('id', ['1', 3]).execute()) == [1, 3]
+    assert _ids(sb.table('bookings').select('*').gte('exam_date', '2026-06-02').execute()) == [1, 4]
+    assert _ids(sb.table('bookings').select('*').is_('exam_date', 'null').execute()) == [3]
+    assert _ids(sb.table('bookings').select('*').not_.is_('exam_date', 'null').execute()) == [1, 2, 4]
+    # NULLs last ascending, first descending
+    assert _ids(sb.table('bookings').select('*').order('exam_date').order('id').execute()) == [2, 1, 4, 3]
+    assert _ids(sb.table('bookings').select('*').order('exam_date', desc=True).limit(2).execute()) == [3, 1]
+    assert sb.table('bookings').select('id,status').eq('id', 2).execute().data == [{'id': 2, 'status': 'Confirmed'}]
+    res = sb.table('bookings').select('id', count='exact').limit(1).execute()
+    assert res.count == 4 and len(res.data) == 1
+
+
+def test_or_filters_match_postgrest_syntax():
+    sb = _client()
+    q = sb.table('bookings').select('*').or_('exam_date.gt.2026-06-01,and(exam_date.eq.2026-06-01,id.gt.1)')
+    assert _ids(q.order('id').execute()) == [1, 2, 4]
+    q = sb.table('bookings').select('*').eq('tutor_id', 't2').or_('exam_date.gte.2026-06-02,exam_date.is.null')
+    assert _ids(q.execute()) == [3]
+    assert _ids(sb.table('bookings').select('*').or_('status.in.(Pending,Cancelled)').execute()) == [1, 3]
+
+
+def test_pagination_walks_every_row_once():
+    sb = FakeSupabase(seed_tables(1, today=date(2026, 6, 1)))
+    rows = [r for page in iter_booking_pages(page_size=37, client=sb) for r in page]
+    assert sorted(r['id'] for r in rows) == sorted(r['id'] for r in sb.tables['bookings'])
+    bookings, more = fetch_page(page_size=100, client=sb)
+    assert len(bookings) == 100 and more
+    # 11 dated pages of 37 plus one (empty) undated query, then one page of 100 (+1)
+    assert sb.round_trips == 12 + 1
+
+
+def test_writes_return_rows_and_are_counted():
+    sb = _client()
+    res = sb.table('bookings').update({'status': 'Confirmed', 'tutor_id': 't9'}).in_('id', [1, 3]).eq('status', 'Pending').execute()
+    assert res.data == [{'id': 1, 'status': 'Confirmed', 'exam_date': '2026-06-02', 'tutor_id': 't9'}]
+    assert _ids(sb.table('bookings').insert([{'status': 'Pending'}, {'id': 10}]).execute()) == [5, 10]
+    assert sb.table('bookings').upsert({'id': 10, 'status': 'Cancelled'}).execute().data[0]['status'] == 'Cancelled'
+    assert _ids(sb.table('bookings').delete().eq('status', 'Cancelled').execute()) == [3, 10]
+    assert len(sb.tables['bookings']) == 4
+    assert sb.stats()['by_call'] == {'bookings.delete': 1, 'bookings.insert': 1, 'bookings.update': 1, 'bookings.upsert': 1}
+    sb.reset_stats()
+    assert sb.round_trips == 0
+
+
+def test_unknown_tables_and_rpcs_fail_like_postgrest():
+    sb = _client()
+    with pytest.raises(FakeAPIError):
+        sb.table('tutor_bookings').select('id').limit(1).execute()
+    with pytest.raises(FakeAPIError):
+        sb.rpc('missing').execute()
+    sb.register_rpc('count_bookings', lambda client, params: len(client.tables['bookings']))
+    assert sb.rpc('count_bookings', {}).execute().data == 4
+    assert sb.round_trips == 3
+
+
+def test_seed_scales_linearly():
+    small, large = seed_tables(1), seed_tables(10)
+    for table in ('parents', 'tutors', 'bookings', 'tutor_unavailability'):
+        assert len(large[table]) == 10 * len(small[table])
+    assert seed_tables(1, seed=3) == seed_tables(1, seed=3)
+
+
+@pytest.mark.parametrize('path', list(_bench['PATHS']))
+def test_page_paths_stay_within_round_trip_budget(path):
+    data = seed_tables(1, today=_bench['NOW'].date())
+    _, stats = _bench['run_path'](path, data)
+    assert stats['round_trips'] <= _bench['budget_for'](path, 1), stats['by_call']
@@ -0,0 +1,102 @@
+import base64
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import utils.email as email
+from utils.email import MailblazeClient
+
+
+def _clear_env(monkeypatch):
+    for k in ('API_KEY', 'MAILBLAZE_API_KEY', 'MAILBLAZE_KEY', 'mailblaze_api_key', 'MAILBLAZE_APIKEY',
+              'MAILBLAZE_BASE', 'MAILBLAZE_BASE_URL', 'mailblaze_http', 'MAILBLAZE_BASEURL',
+              'MAILBLAZE_PORT', 'Mailblaze_Port', 'SENDER_EMAIL', 'sender_email', 'EMAIL_FROM',
+              'email_from', 'SMTP_USER', 'ADMIN_EMAIL', 'MAILBLAZE_FROM_NAME', 'EMAIL_FROM_NAME'):
+        monkeypatch.delenv(k, raising=False)
+
+
+def test_configuration_is_resolved_once(monkeypatch):
+    _clear_env(monkeypatch)
+    monkeypatch.setenv('MAILBLAZE_KEY', 'k1')
+    monkeypatch.setenv('MAILBLAZE_BASE_URL', 'https://mb.example.com/api')
+    monkeypatch.setenv('MAILBLAZE_PORT', '8443')
+    monkeypatch.setenv('EMAIL_FROM', 'Team <team@example.com>')
+    client = MailblazeClient(pool_size=4)
+
+    monkeypatch.setenv('MAILBLAZE_KEY', 'changed')
+    assert client.api_key == 'k1' and client.has_mailblaze_key
+    assert client.transactional_url == 'https://mb.example.com:8443/api/transactional'
+    assert client.sender == 'team@example.com'
+    assert client.session.get_adapter('https://mb.example.com')._pool_maxsize == 4
+
+    payload = client.build_payload('a@x.com', 'Hi', 'Line 1\nLine <2>')
+    assert base64.b64decode(payload['plain_text']).decode() == 'Line 1\nLine <2>'
+    assert base64.b64decode(payload['body']).decode() == 'Line 1<br>Line &lt;2&gt;'
+    assert payload['from_email'] == 'team@example.com'
+
+
+def test_missing_configuration(monkeypatch):
+    _clear_env(monkeypatch)
+    assert MailblazeClient().send('a@x.com', 'Hi', 'x') == {'error': 'no-mailblaze-key'}
+    assert MailblazeClient(api_key='k').send('a@x.com', 'Hi', 'x')['error'].startswith('missing-sender')
+
+    # Only the generic API_KEY: send_email still refuses, as before
+    monkeypatch.setenv('API_KEY', 'k')
+    monkeypatch.setattr(email, '_client', None)
+    assert email.send_email('a@x.com', 'Hi', 'x')['error'].startswith('Missing Mailblaze configuration')
+    monkeypatch.setattr(email, '_client', None)
+
+
+def test_sends_reuse_one_keep_alive_connection(monkeypatch):
+    _clear_env(monkeypatch)
+    received = []
+    peers = set()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            peers.add(self.client_address)
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            received.append((self.headers['Authorization'], body['to_email']))
+            out = b'{"status": "success"}'
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = MailblazeClient(api_key='k', base_url=f"http://127.0.0.1:{server.server_port}/api", sender='s@x.com')
+        results = [client.send(f"r{i}@x.com", 'Hi', 'Body') for i in range(5)]
+        client.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert all(r.get('ok') and r['response'] == {'status': 'success'} for r in results)
+    assert received == [('k', f"r{i}@x.com") for i in range(5)]
+    assert len(peers) == 1
+
+
+def test_send_email_uses_shared_client(monkeypatch):
+    _clear_env(monkeypatch)
+    calls = []
+
+    class FakeClient:
+        has_mailblaze_key = True
+
+        def send(self, to_addr, subject, body, html=None):
+            calls.append((to_addr, subject, body, html))
+            return {'ok': True}
+
+    monkeypatch.setattr(email, '_client', FakeClient())
+    assert email.send_email('a@x.com', 'Hi', 'Body')['ok']
+    assert email.send_admin_email('Summary', 'B')['ok']
+    assert calls[0][0] == 'a@x.com' and 'The Turning Point Team' in calls[0][2]
+    assert calls[1][0] == 'admin@theturningpoint.co.za'
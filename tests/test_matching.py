@@ -0,0 +1,267 @@
+import random
+from datetime import date, datetime, time, timedelta
+
+from utils.matching import (
+    candidate_tutors_for_bookings,
+    eligible_tutors,
+    eligible_tutors_for_booking,
+    load_unavailability,
+    role_matches,
+)
+
+
+class _FakeTable:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.filters = []
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def eq(self, col, val):
+        self.filters.append(lambda r: r.get(col) == val)
+        return self
+
+    def lte(self, col, val):
+        self.filters.append(lambda r: r.get(col) is not None and str(r.get(col)) <= str(val))
+        return self
+
+    def gte(self, col, val):
+        self.filters.append(lambda r: r.get(col) is not None and str(r.get(col)) >= str(val))
+        return self
+
+    def in_(self, col, vals):
+        self.filters.append(lambda r: r.get(col) in vals)
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def execute(self):
+        self.client.queries.append(self.name)
+        rows = [r for r in self.client.rows.get(self.name, []) if all(f(r) for f in self.filters)]
+
+        class R:
+            data = rows
+
+        return R()
+
+
+class _FakeClient:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def table(self, name):
+        return _FakeTable(self, name)
+
+
+def _legacy_suitable(client, tutors, booking):
+    """Copy of the per-tutor filtering the pages used before utils.matching."""
+
+    def _language_column_for(subject_text):
+        if not subject_text:
+            return None
+        s = subject_text.strip().lower()
+        mapping = {
+            'afrikaans': 'afrikaans', 'afr': 'afrikaans', 'isizulu': 'isizulu', 'zulu': 'isizulu',
+            'setswana': 'setswana', 'isixhosa': 'isixhosa', 'xhosa': 'isixhosa', 'french': 'french'
+        }
+        return mapping.get(s)
+
+    def _tutor_is_available(tutor_id, exam_date_obj, start_time_obj, duration_minutes):
+        try:
+            u_res = client.table('tutor_unavailability').select('*').eq('tutor_id', tutor_id).lte('start_date', exam_date_obj.isoformat()).gte('end_date', exam_date_obj.isoformat()).execute()
+            entries = u_res.data or []
+            if not entries:
+                return True
+            bstart_dt = datetime.combine(exam_date_obj, start_time_obj)
+            bend_dt = bstart_dt + timedelta(minutes=duration_minutes)
+            for e in entries:
+                if not e.get('start_time') or not e.get('end_time'):
+                    return False
+                try:
+                    es = datetime.strptime(e.get('start_time'), '%H:%M:%S').time()
+                    ee = datetime.strptime(e.get('end_time'), '%H:%M:%S').time()
+                except Exception:
+                    return False
+                estart_dt = datetime.combine(exam_date_obj, es)
+                eend_dt = datetime.combine(exam_date_obj, ee)
+                overlap = (min(bend_dt, eend_dt) - max(bstart_dt, estart_dt)).total_seconds()
+                if overlap > 0:
+                    return False
+            return True
+        except Exception:
+            return False
+
+    exam_date_obj = datetime.fromisoformat(booking['exam_date']).date()
+    start_time = datetime.strptime(booking['start_time'], "%H:%M:%S").time()
+    lang_col = _language_column_for(booking.get('subject'))
+    out = []
+    for t in tutors:
+        if not role_matches(t.get('roles'), booking.get('role_required')):
+            continue
+        has_flags = any(bool(t.get(k)) for k in ('afrikaans', 'isizulu', 'setswana', 'isixhosa', 'french'))
+        if lang_col and has_flags and not t.get(lang_col):
+            continue
+        if not _tutor_is_available(t.get('id'), exam_date_obj, start_time, booking.get('duration') or 60):
+            continue
+        out.append(t)
+    return out
+
+
+def _random_dataset(rng, n_tutors=40, n_unavail=120):
+    roles = ["Reader", "Scribe", "Both", "Both (Reader & Scribe)", "Invigilator", "Prompter", "All of the Above", None]
+    tutors = []
+    for i in range(n_tutors):
+        t = {'id': i + 1, 'name': f"T{i}", 'surname': 'X', 'roles': rng.choice(roles), 'approved': True}
+        for lang in ('afrikaans', 'isizulu', 'french'):
+            t[lang] = rng.random() < 0.2
+        tutors.append(t)
+    base = date(2026, 6, 1)
+    unavail = []
+    for j in range(n_unavail):
+        start = base + timedelta(days=rng.randint(0, 10))
+        row = {
+            'id': j + 1,
+            'tutor_id': rng.randint(1, n_tutors),
+            'start_date': start.isoformat(),
+            'end_date': (start + timedelta(days=rng.randint(0, 3))).isoformat(),
+        }
+        kind = rng.random()
+        if kind < 0.6:
+            h = rng.randint(6, 16)
+            row['start_time'] = f"{h:02d}:{rng.choice([0, 30]):02d}:00"
+            row['end_time'] = f"{h + rng.randint(1, 3):02d}:00:00"
+        elif kind < 0.65:
+            row['start_time'] = '8am'
+            row['end_time'] = '9am'
+        unavail.append(row)
+    return tutors, unavail, base
+
+
+def test_matches_legacy_per_tutor_logic():
+    rng = random.Random(1234)
+    tutors, unavail, base = _random_dataset(rng)
+    client = _FakeClient({'tutors': tutors, 'tutor_unavailability': unavail})
+
+    subjects = ['Maths', 'Afrikaans', 'zulu', 'French', 'History']
+    for _ in range(60):
+        booking = {
+            'exam_date': (base + timedelta(days=rng.randint(0, 12))).isoformat(),
+            'start_time': f"{rng.randint(6, 17):02d}:{rng.choice([0, 15, 45]):02d}:00",
+            'duration': rng.choice([None, 30, 60, 120, 180]),
+            'role_required': rng.choice(["Reader", "Scribe", "Both", "Invigilator", "Prompter"]),
+            'subject': rng.choice(subjects),
+        }
+        expected = [t['id'] for t in _legacy_suitable(client, tutors, booking)]
+        got = [t['id'] for t in eligible_tutors_for_booking(booking, tutors=tutors, client=client)]
+        assert got == expected, booking
+
+
+def test_single_unavailability_query_per_booking():
+    rng = random.Random(7)
+    tutors, unavail, base = _random_dataset(rng)
+    client = _FakeClient({'tutors': tutors, 'tutor_unavailability': unavail})
+
+    booking = {'exam_date': base.isoformat(), 'start_time': '09:00:00', 'duration': 60, 'role_required': 'Reader', 'subject': 'Maths'}
+    eligible_tutors_for_booking(booking, tutors=tutors, client=client)
+    assert client.queries == ['tutor_unavailability', 'bookings']
+
+    client.queries.clear()
+    eligible_tutors_for_booking(booking, client=client)
+    assert client.queries == ['tutors', 'tutor_unavailability', 'bookings']
+
+
+def test_range_load_filters_by_exact_date():
+    unavail = [
+        {'tutor_id': 1, 'start_date': '2026-06-01', 'end_date': '2026-06-01'},
+        {'tutor_id': 2, 'start_date': '2026-06-02', 'end_date': '2026-06-03', 'start_time': '09:00:00', 'end_time': '10:00:00'},
+    ]
+    client = _FakeClient({'tutor_unavailability': unavail})
+    by_tutor = load_unavailability(date(2026, 6, 1), date(2026, 6, 3), client=client)
+    tutors = [{'id': 1, 'roles': 'Reader'}, {'id': 2, 'roles': 'Reader'}]
+
+    # Tutor 1 is blocked all day on the 1st only; tutor 2 only 09:00-10:00 on the 2nd/3rd.
+    on_first = eligible_tutors(tutors, 'Reader', 'Maths', date(2026, 6, 1), time(9, 30), 60, by_tutor)
+    on_second = eligible_tutors(tutors, 'Reader', 'Maths', date(2026, 6, 2), time(9, 30), 60, by_tutor)
+    after_block = eligible_tutors(tutors, 'Reader', 'Maths', date(2026, 6, 2), time(10, 0), 60, by_tutor)
+    assert [t['id'] for t in on_first] == [2]
+    assert [t['id'] for t in on_second] == [1]
+    assert [t['id'] for t in after_block] == [1, 2]
+
+
+def test_batch_candidates_match_per_booking_results():
+    rng = random.Random(99)
+    tutors, unavail, base = _random_dataset(rng)
+    client = _FakeClient({'tutors': tutors, 'tutor_unavailability': unavail})
+
+    queue = []
+    for i in range(50):
+        queue.append({
+            'id': i + 100,
+            'exam_date': (base + timedelta(days=rng.randint(0, 12))).isoformat(),
+            'start_time': f"{rng.randint(6, 17):02d}:30:00",
+            'duration': rng.choice([60, 90, 120]),
+            'role_required': rng.choice(["Reader", "Scribe", "Both"]),
+            'subject': rng.choice(['Maths', 'Afrikaans', 'French']),
+        })
+    queue.append({'id': 999, 'exam_date': None, 'start_time': None, 'role_required': 'Reader', 'subject': 'Maths'})
+
+    got = candidate_tutors_for_bookings(queue, client=client)
+    # One tutors, one unavailability and one busy-bookings fetch for the whole queue
+    assert client.queries == ['tutors', 'tutor_unavailability', 'bookings']
+
+    for b in queue:
+        expected = [t['id'] for t in eligible_tutors_for_booking(b, tutors=tutors, client=client)]
+        assert [t['id'] for t in got[b['id']]] == expected, b
+
+
+def test_batch_candidates_empty_queue_skips_unavailability():
+    client = _FakeClient({'tutors': [{'id': 1, 'roles': 'Reader', 'approved': True}]})
+    assert candidate_tutors_for_bookings([], client=client) == {}
+    assert client.queries == ['tutors']
+
+
+def test_busy_tutors_are_excluded():
+    tutors = [{'id': 't1', 'roles': 'Reader', 'approved': True}, {'id': 't2', 'roles': 'Reader', 'approved': True}]
+    bookings = [
+        {'id': 1, 'tutor_id': 't1', 'status': 'Confirmed', 'exam_date': '2026-06-01', 'start_time': '09:00:00',
+         'duration': 60, 'extra_time': 30},
+        {'id': 2, 'tutor_id': 't2', 'status': 'Cancelled', 'exam_date': '2026-06-01', 'start_time': '09:00:00', 'duration': 60},
+    ]
+    client = _FakeClient({'tutors': tutors, 'bookings': bookings})
+    queue = [
+        {'id': 10, 'exam_date': '2026-06-01', 'start_time': '10:15:00', 'duration': 60, 'role_required': 'Reader', 'subject': 'Maths'},
+        {'id': 11, 'exam_date': '2026-06-01', 'start_time': '10:30:00', 'duration': 60, 'role_required': 'Reader', 'subject': 'Maths'},
+    ]
+    got = candidate_tutors_for_bookings(queue, client=client)
+    # t1 is busy until 10:30 (60 minutes plus 30 extra); the cancelled booking keeps no one busy
+    assert [t['id'] for t in got[10]] == ['t2']
+    assert [t['id'] for t in got[11]] == ['t1', 't2']
+    # Reassigning booking 1 itself does not count against its own tutor
+    own = dict(bookings[0], role_required='Reader', subject='Maths')
+    assert [t['id'] for t in eligible_tutors_for_booking(own, tutors=tutors, client=client)] == ['t1', 't2']
+
+
+class _NoBookingsClient(_FakeClient):
+    def table(self, name):
+        if name == 'bookings':
+            raise RuntimeError('permission denied')
+        return super().table(name)
+
+
+def test_failed_busy_load_is_reported():
+    tutors = [{'id': 't1', 'roles': 'Reader', 'approved': True}]
+    client = _FakeClient({'tutors': tutors})
+    broken = _NoBookingsClient({'tutors': tutors})
+    queue = [{'id': 10, 'exam_date': '2026-06-01', 'start_time': '10:00:00', 'duration': 60, 'role_required': 'Reader', 'subject': 'Maths'}]
+    errors = []
+    assert [t['id'] for t in candidate_tutors_for_bookings(queue, client=client, errors=errors)[10]] == ['t1']
+    assert errors == []
+    got = candidate_tutors_for_bookings(queue, client=broken, errors=errors)
+    assert [t['id'] for t in got[10]] == ['t1']
+    assert errors == ['busy bookings: permission denied']
+    eligible_tutors_for_booking(queue[0], tutors=tutors, client=broken, errors=errors)
+    assert len(errors) == 2
@@ -0,0 +1,183 @@
+import threading
+import time
+
+import utils.outbox as outbox_mod
+from utils.outbox import EmailOutbox, backoff_delay
+
+
+class _Sender:
+    def __init__(self, results=None):
+        self.results = list(results or [])
+        self.sent = []
+
+    def __call__(self, to_email, subject, body, html=None):
+        self.sent.append((to_email, subject))
+        res = self.results.pop(0) if self.results else {'ok': True}
+        if isinstance(res, Exception):
+            raise res
+        return res
+
+
+def _due_now(box, msg_id):
+    # Skip the backoff wait without sleeping
+    with box._db() as conn:
+        conn.execute("UPDATE outbox SET next_attempt_at = 0 WHERE id = ?", (msg_id,))
+
+
+def test_enqueue_returns_id_and_delivery_updates_status(tmp_path):
+    sender = _Sender()
+    box = EmailOutbox(path=str(tmp_path / 'o.db'), sender=sender)
+    msg_id = box.enqueue('a@x.com', 'Hi', 'Body')
+    assert box.status(msg_id)['status'] == 'queued'
+    assert sender.sent == []
+
+    assert box.process_due() == 1
+    st = box.status(msg_id)
+    assert st['status'] == 'sent' and st['attempts'] == 1 and st['sent_at']
+    assert sender.sent == [('a@x.com', 'Hi')]
+    assert box.process_due() == 0
+
+
+def test_enqueue_many_queues_in_one_call(tmp_path):
+    sender = _Sender()
+    box = EmailOutbox(path=str(tmp_path / 'o.db'), sender=sender)
+    ids = box.enqueue_many([(f"r{i}@x.com", 'Hi', 'Body') for i in range(5)])
+    assert len(set(ids)) == 5 and all(box.status(i)['status'] == 'queued' for i in ids)
+    assert box.enqueue_many([]) == []
+    assert box.process_due() == 5
+    assert sorted(to for to, _ in sender.sent) == [f"r{i}@x.com" for i in range(5)]
+
+
+def test_retries_with_backoff_then_dead_letter_and_requeue(tmp_path):
+    sender = _Sender([{'error': 'mailblaze: 503'}, RuntimeError('timeout'), {'error': 'mailblaze: 503'}])
+    box = EmailOutbox(path=str(tmp_path / 'o.db'), sender=sender, max_attempts=3, backoff_base=10, backoff_max=15)
+    msg_id = box.enqueue('a@x.com', 'Hi', 'Body')
+
+    before = time.time()
+    box.process_due()
+    st = box.status(msg_id)
+    assert st['status'] == 'retrying' and st['last_error'] == 'mailblaze: 503'
+    assert before + 8 <= st['next_attempt_at'] <= time.time() + 10
+    assert box.process_due() == 0  # not due yet
+
+    _due_now(box, msg_id)
+    box.process_due()
+    assert box.status(msg_id)['status'] == 'retrying'
+    assert 'timeout' in box.status(msg_id)['last_error']
+
+    _due_now(box, msg_id)
+    box.process_due()
+    assert box.status(msg_id)['status'] == 'dead'
+    assert [m['id'] for m in box.dead_letters()] == [msg_id]
+    assert box.stats()['dead'] == 1
+
+    assert box.retry(msg_id)
+    box.process_due()
+    assert box.status(msg_id)['status'] == 'sent'
+    assert not box.retry(msg_id)
+
+
+def test_configuration_errors_are_not_retried(tmp_path):
+    sender = _Sender([{'error': 'Missing Mailblaze configuration (MAILBLAZE_API_KEY)'}])
+    box = EmailOutbox(path=str(tmp_path / 'o.db'), sender=sender)
+    msg_id = box.enqueue('a@x.com', 'Hi', 'Body')
+    box.process_due()
+    assert box.status(msg_id)['status'] == 'dead' and box.status(msg_id)['attempts'] == 1
+
+
+def test_backoff_doubles_and_caps():
+    assert [backoff_delay(n, 5, 60) for n in range(1, 6)] == [5, 10, 20, 40, 60]
+
+
+def test_workers_deliver_in_background_once_each(tmp_path):
+    lock = threading.Lock()
+    delivered = []
+
+    def sender(to_email, subject, body, html=None):
+        time.sleep(0.01)
+        with lock:
+            delivered.append(subject)
+        return {'ok': True}
+
+    box = EmailOutbox(path=str(tmp_path / 'o.db'), sender=sender, workers=4)
+    t0 = time.perf_counter()
+    ids = [box.enqueue('a@x.com', f"m{i}", 'Body') for i in range(20)]
+    assert time.perf_counter() - t0 < 1.0  # enqueue never waits on delivery
+    box.start()
+    try:
+        deadline = time.time() + 10
+        while box.stats()['sent'] < 20 and time.time() < deadline:
+            time.sleep(0.02)
+    finally:
+        box.stop()
+    assert sorted(delivered) == sorted(f"m{i}" for i in range(20))
+    assert all(box.status(i)['status'] == 'sent' for i in ids)
+
+
+def test_restart_requeues_only_messages_whose_lease_expired(tmp_path):
+    path = str(tmp_path / 'o.db')
+    box = EmailOutbox(path=path, sender=_Sender())
+    msg_id = box.enqueue('a@x.com', 'Hi', 'Body')
+    assert box._claim()['id'] == msg_id  # simulate a crash mid-send
+    assert box.status(msg_id)['status'] == 'sending'
+
+    # Still within its lease: another process may be sending it right now
+    sender = _Sender()
+    again = EmailOutbox(path=path, sender=sender, workers=1, sending_lease=300).start()
+    try:
+        time.sleep(0.2)
+        assert again.process_due() == 0
+    finally:
+        again.stop()
+    assert sender.sent == [] and again.status(msg_id)['status'] == 'sending'
+
+    # Once the lease has run out the message was abandoned: deliver it
+    with box._db() as conn:
+        conn.execute("UPDATE outbox SET updated_at = updated_at - 301 WHERE id = ?", (msg_id,))
+    again = EmailOutbox(path=path, sender=sender, workers=1, sending_lease=300).start()
+    try:
+        deadline = time.time() + 5
+        while again.status(msg_id)['status'] != 'sent' and time.time() < deadline:
+            time.sleep(0.02)
+    finally:
+        again.stop()
+    assert again.status(msg_id)['status'] == 'sent'
+    assert sender.sent == [('a@x.com', 'Hi')]
+
+
+def test_queue_admin_email_uses_admin_address(tmp_path, monkeypatch):
+    box = EmailOutbox(path=str(tmp_path / 'o.db'), sender=_Sender())
+    monkeypatch.setattr(outbox_mod, '_outbox', box)
+    monkeypatch.delenv('ADMIN_EMAIL', raising=False)
+    msg_id = outbox_mod.queue_admin_email('Summary', 'Body')
+    assert box.status(msg_id)['to_email'] == 'admin@theturningpoint.co.za'
+
+
+def test_a_taken_over_lease_does_not_overwrite_the_new_claim(tmp_path):
+    path = str(tmp_path / 'o.db')
+    slow = EmailOutbox(path=path, sender=_Sender([{'ok': False, 'error': 'timeout'}]))
+    fresh = EmailOutbox(path=path, sender=_Sender())
+    msg_id = slow.enqueue('a@x.com', 'Hi', 'Body')
+    first = slow._claim()
+    # The first claimer overran its lease and another worker claimed the message
+    with slow._db() as conn:
+        conn.execute("UPDATE outbox SET updated_at = updated_at - 301 WHERE id = ?", (msg_id,))
+    second = fresh._claim()
+    assert second['id'] == msg_id and second['lease_owner'] != first['lease_owner']
+
+    assert slow._deliver(first) == 'lost'
+    assert slow.status(msg_id)['status'] == 'sending' and slow.status(msg_id)['last_error'] is None
+    assert fresh._deliver(second) == 'sent'
+    assert fresh._deliver(second) == 'lost'
+    assert fresh.status(msg_id)['status'] == 'sent'
+
+
+def test_outboxes_created_before_lease_owners_are_migrated(tmp_path):
+    import sqlite3
+    path = str(tmp_path / 'o.db')
+    conn = sqlite3.connect(path)
+    conn.executescript(outbox_mod._SCHEMA.replace(",\n    lease_owner TEXT", ""))
+    conn.close()
+    box = EmailOutbox(path=path, sender=_Sender())
+    msg_id = box.enqueue('a@x.com', 'Hi', 'Body')
+    assert box._deliver(box._claim()) == 'sent' and box.status(msg_id)['status'] == 'sent'
@@ -0,0 +1,179 @@
+import random
+import re
+
+import utils.pagination as pg
+from utils.booking_changes import mark_bookings_changed
+from utils.pagination import iter_booking_pages, iter_bookings, fetch_page, cursor_of, BookingPager
+
+
+class _FakeQuery:
+    def __init__(self, client):
+        self.client = client
+        self.preds = []
+        self.negate = False
+        self.size = None
+        self.calls = []
+
+    def select(self, *args, **kwargs):
+        return self
+
+    @property
+    def not_(self):
+        self.negate = True
+        return self
+
+    def _add(self, pred):
+        neg, self.negate = self.negate, False
+        self.preds.append((lambda r: not pred(r)) if neg else pred)
+        return self
+
+    def in_(self, col, values):
+        return self._add(lambda r: r.get(col) in values)
+
+    def is_(self, col, value):
+        return self._add(lambda r: r.get(col) is None)
+
+    def gte(self, col, val):
+        return self._add(lambda r: r.get(col) is not None and r.get(col) >= val)
+
+    def gt(self, col, val):
+        return self._add(lambda r: r.get(col) > val)
+
+    def or_(self, filters):
+        self.calls.append(('or', filters))
+        d, d2, i = re.fullmatch(r"exam_date\.gt\.(.+),and\(exam_date\.eq\.(.+),id\.gt\.(\d+)\)", filters).groups()
+        assert d == d2
+        return self._add(lambda r: r['exam_date'] > d or (r['exam_date'] == d and r['id'] > int(i)))
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def limit(self, n):
+        self.size = n
+        return self
+
+    def execute(self):
+        self.client.queries += 1
+        rows = [r for r in self.client.rows if all(p(r) for p in self.preds)]
+        rows.sort(key=lambda r: (r['exam_date'] is None, r['exam_date'] or '', r['id']))
+
+        class R:
+            data = rows[:self.size]
+
+        return R()
+
+
+class _FakeClient:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    def table(self, name):
+        return _FakeQuery(self)
+
+
+def _rows(n, seed=1):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        date = None if rng.random() < 0.1 else f"2026-0{rng.randint(1, 3)}-{rng.randint(10, 12)}"
+        rows.append({'id': i, 'exam_date': date, 'status': rng.choice(['Assigned', 'Confirmed', 'Cancelled'])})
+    rng.shuffle(rows)
+    return rows
+
+
+def _expected(rows):
+    return sorted(rows, key=lambda r: (r['exam_date'] is None, r['exam_date'] or '', r['id']))
+
+
+def test_pages_cover_every_row_once_in_order():
+    rows = _rows(137)
+    for size in (1, 7, 50, 136, 137, 500):
+        client = _FakeClient(rows)
+        pages = list(iter_booking_pages(page_size=size, client=client))
+        assert all(0 < len(p) <= size for p in pages)
+        assert [r['id'] for p in pages for r in p] == [r['id'] for r in _expected(rows)]
+
+
+def test_filters_date_from_and_resume():
+    rows = _rows(200, seed=2)
+    client = _FakeClient(rows)
+    got = list(iter_bookings(filters=lambda q: q.in_('status', ['Assigned']), date_from='2026-02-01', page_size=9, client=client))
+    want = [r for r in _expected(rows) if r['status'] == 'Assigned' and (r['exam_date'] is None or r['exam_date'] >= '2026-02-01')]
+    assert [r['id'] for r in got] == [r['id'] for r in want]
+
+    # Resuming from a cursor continues where the previous page stopped,
+    # including from inside the undated tail
+    ordered = _expected(rows)
+    for cut in (0, 50, len(ordered) - 5):
+        rest = list(iter_bookings(after=cursor_of(ordered[cut]), page_size=11, client=_FakeClient(rows)))
+        assert [r['id'] for r in rest] == [r['id'] for r in ordered[cut + 1:]]
+
+
+def test_fetch_page_knows_whether_more_follow():
+    rows = _rows(100, seed=3)
+    client = _FakeClient(rows)
+    first, more = fetch_page(page_size=20, client=client)
+    assert [r['id'] for r in first] == [r['id'] for r in _expected(rows)[:20]] and more
+    assert client.queries == 1
+
+    client = _FakeClient(rows[:5])
+    first, more = fetch_page(page_size=10, client=client)
+    assert len(first) == 5 and not more
+
+
+def test_total_an_exact_multiple_of_the_page_size():
+    rows = [{'id': i, 'exam_date': '2026-02-10', 'status': 'Assigned'} for i in range(20)]
+    first, more = fetch_page(page_size=10, client=_FakeClient(rows))
+    assert len(first) == 10 and more
+    rest, more = fetch_page(page_size=10, after=cursor_of(first[-1]), client=_FakeClient(rows))
+    assert [r['id'] for r in rest] == list(range(10, 20)) and not more
+
+    session, client = {}, _FakeClient(rows)
+    pager = BookingPager(session, 'awaiting', page_size=10, client=client)
+    assert len(pager.rows()) == 10 and pager.more
+    pager.load_more()
+    assert len(pager.rows()) == 20 and not pager.more
+    pager.load_more()
+    assert len(pager.rows()) == 20
+
+
+def test_pager_fetches_only_the_next_page():
+    rows = _rows(95, seed=4)
+    session, client = {}, _FakeClient(rows)
+    pager = BookingPager(session, 'awaiting', page_size=30, client=client)
+    pager.rows()
+    queries = client.queries
+    while pager.more:
+        before = client.queries
+        pager.load_more()
+        # One query per page; two where the page reaches the undated rows
+        assert client.queries - before in (1, 2)
+    assert [r['id'] for r in pager.rows()] == [r['id'] for r in _expected(rows)]
+    assert client.queries - queries <= 4
+
+    # A rerun (new pager, same session) is served from the session
+    queries = client.queries
+    assert len(BookingPager(session, 'awaiting', page_size=30, client=client).rows()) == 95
+    assert client.queries == queries
+
+
+def test_pager_reloads_what_was_loaded_after_a_write(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(pg._time, 'monotonic', lambda: now[0])
+    rows = _rows(50, seed=5)
+    session, client = {}, _FakeClient(rows)
+    pager = BookingPager(session, 'awaiting', page_size=10, ttl=60, client=client)
+    pager.rows()
+    pager.load_more()
+    mark_bookings_changed()
+    queries = client.queries
+    assert len(pager.rows()) == 20 and pager.more
+    assert client.queries - queries in (1, 2)
+
+    queries = client.queries
+    pager.rows()
+    assert client.queries == queries
+    now[0] += 61
+    assert len(pager.rows()) == 20
+    assert client.queries - queries in (1, 2)
@@ -0,0 +1,85 @@
+import utils.parent_profile_store as store_mod
+from utils.parent_profile_store import ParentProfileStore, parent_children, profile_store_totals
+
+
+class _FakeClient:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    def table(self, name):
+        client = self
+
+        class Q:
+            def select(self, *a):
+                return self
+
+            def eq(self, col, val):
+                self.match = (col, val)
+                return self
+
+            def execute(self):
+                client.queries += 1
+                col, val = self.match
+                rows = [dict(r) for r in client.rows if r.get(col) == val]
+
+                class R:
+                    data = rows
+
+                return R()
+
+        return Q()
+
+
+def test_loads_once_and_serves_reruns_from_session():
+    client = _FakeClient([{'id': 'p1', 'user_id': 'u1', 'parent_name': 'Ann', 'child_name': 'Sam', 'grade': '7'}])
+    session = {}
+    before = profile_store_totals()
+    for _ in range(25):
+        # Each rerun builds a new store over the same session state
+        store = ParentProfileStore(session, client=client)
+        assert store.get('u1')['parent_name'] == 'Ann'
+        assert store.children('u1') == [{'name': 'Sam', 'grade': '7', 'school': None}]
+    assert client.queries == 1
+    assert store.stats() == {'loads': 1, 'queries_saved': 49}
+    after = profile_store_totals()
+    assert after['loads'] - before['loads'] == 1 and after['queries_saved'] - before['queries_saved'] == 49
+
+
+def test_update_writes_through_and_invalidate_reloads():
+    client = _FakeClient([{'id': 'p1', 'user_id': 'u1', 'parent_name': 'Ann', 'children': None}])
+    session = {}
+    store = ParentProfileStore(session, client=client)
+    profile = store.get('u1')
+    profile['parent_name'] = 'changed by caller'
+    assert store.get('u1')['parent_name'] == 'Ann'
+
+    store.update({'parent_name': 'Anne', 'children': [{'name': 'Kim', 'grade': '9', 'school': 'X'}]})
+    assert store.get('u1')['parent_name'] == 'Anne'
+    assert [c['name'] for c in store.children('u1')] == ['Kim']
+    assert client.queries == 1
+
+    store.invalidate()
+    assert store.get('u1')['parent_name'] == 'Ann'
+    assert client.queries == 2
+
+
+def test_missing_profile_and_user_switch():
+    client = _FakeClient([])
+    session = {}
+    store = ParentProfileStore(session, client=client)
+    assert store.get('u1') is None and store.get('u1') is None
+    assert client.queries == 1
+    store.update({'parent_name': 'ignored'})
+    assert store.get('u1') is None
+
+    client.rows.append({'id': 'p2', 'user_id': 'u2', 'parent_name': 'Bo'})
+    assert store.get('u2')['parent_name'] == 'Bo'
+    assert client.queries == 2
+    assert session[store_mod.SESSION_KEY]['user_id'] == 'u2'
+
+
+def test_parent_children_prefers_children_list():
+    assert parent_children(None) == []
+    assert parent_children({'children': [{'name': 'A'}], 'child_name': 'B'}) == [{'name': 'A'}]
+    assert parent_children({'child_firstname': 'C'}) == [{'name': 'C', 'grade': None, 'school': None}]
@@ -0,0 +1,77 @@
+import pytest
+
+import utils.profile_link as pl
+from utils.fake_supabase import FakeSupabase
+from utils.profile_link import link_profile
+
+
+def _db(rows, rpc=True):
+    sb = FakeSupabase({'parents': rows, 'tutors': []})
+    if rpc:
+        # Stands in for scripts/add_link_profile_function.sql, run inside the database
+        sb.register_rpc('link_profile', lambda db, p: pl.link_profile_steps(
+            p['p_table'], p['p_user_id'], p['p_email'], client=db.server()))
+    return sb
+
+
+@pytest.fixture(autouse=True)
+def _rpc_available(monkeypatch):
+    monkeypatch.setattr(pl, '_rpc_missing', False)
+
+
+ROWS = [
+    {'id': 1, 'user_id': 'u1', 'email': 'old@example.com'},
+    {'id': 2, 'user_id': None, 'email': 'known@example.com'},
+    {'id': 3, 'user_id': 'u3', 'email': 'same@example.com'},
+]
+
+
+@pytest.mark.parametrize('user_id,email,changed,expected', [
+    ('u1', 'new@example.com', True, {'id': 1, 'user_id': 'u1', 'email': 'new@example.com'}),
+    ('u3', 'same@example.com', False, {'id': 3, 'user_id': 'u3', 'email': 'same@example.com'}),
+    ('u1', None, False, {'id': 1, 'user_id': 'u1', 'email': 'old@example.com'}),
+    ('u2', ' known@example.com ', True, {'id': 2, 'user_id': 'u2', 'email': 'known@example.com'}),
+    (None, 'known@example.com', False, {'id': 2, 'user_id': None, 'email': 'known@example.com'}),
+    ('u9', 'fresh@example.com', True, {'id': 4, 'user_id': 'u9', 'email': 'fresh@example.com'}),
+    (None, 'fresh@example.com', True, {'id': 4, 'user_id': None, 'email': 'fresh@example.com'}),
+])
+def test_link_or_create_in_one_round_trip(user_id, email, changed, expected):
+    sb = _db(ROWS)
+    linked = link_profile('parents', user_id, email, client=sb)
+    assert linked == {'profile': expected, 'changed': changed}
+    assert sb.stats()['by_call'] == {'rpc.link_profile': 1}
+    assert expected in sb.tables['parents']
+    assert len(sb.tables['parents']) == len(ROWS) + (expected['id'] == 4)
+
+
+def test_nothing_to_link_and_unknown_tables():
+    sb = _db(ROWS)
+    assert link_profile('parents', None, '  ', client=sb) is None
+    assert sb.round_trips == 0
+    with pytest.raises(ValueError):
+        link_profile('bookings', 'u1', 'a@example.com', client=sb)
+
+
+def test_falls_back_to_separate_calls_until_migrated():
+    sb = _db(ROWS, rpc=False)
+    linked = link_profile('parents', 'u2', 'known@example.com', client=sb)
+    assert linked == {'profile': {'id': 2, 'user_id': 'u2', 'email': 'known@example.com'}, 'changed': True}
+    assert sb.stats()['by_call'] == {'rpc.link_profile': 1, 'parents.select': 2, 'parents.update': 1}
+    assert pl._rpc_missing
+
+    # The missing function is remembered: no further RPC attempts
+    sb.reset_stats()
+    link_profile('parents', 'u3', 'same@example.com', client=sb)
+    assert sb.stats()['by_call'] == {'parents.select': 1}
+
+
+def test_other_errors_are_raised():
+    sb = _db(ROWS, rpc=False)
+
+    def broken(db, params):
+        raise RuntimeError('permission denied for table parents')
+
+    sb.register_rpc('link_profile', broken)
+    with pytest.raises(RuntimeError):
+        link_profile('parents', 'u1', 'a@example.com', client=sb)
+    assert not pl._rpc_missing
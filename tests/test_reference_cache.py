@@ -0,0 +1,158 @@
+import pytest
+
+import utils.reference_cache as rc
+from utils.reference_cache import ReferenceCache
+
+
+class _FakeTable:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.filters = []
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def eq(self, col, val):
+        self.filters.append(lambda r: r.get(col) == val)
+        return self
+
+    def execute(self):
+        self.client.queries.append((self.name, len(self.filters)))
+        rows = [dict(r) for r in self.client.rows.get(self.name, []) if all(f(r) for f in self.filters)]
+
+        class R:
+            data = rows
+
+        return R()
+
+
+class _FakeClient:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def table(self, name):
+        return _FakeTable(self, name)
+
+
+def _tutors():
+    return [
+        {'id': 'a', 'user_id': 'u1', 'email': 'Ann@Example.com', 'name': 'ann'},
+        {'id': 'b', 'user_id': 'u2', 'email': 'bob@example.com', 'name': 'Bob'},
+        {'id': 'c', 'user_id': None, 'email': None, 'name': None},
+    ]
+
+
+def test_snapshot_serves_lookups_and_counts_hits():
+    client = _FakeClient({'tutors': _tutors()})
+    cache = ReferenceCache('tutors', ttl=60, client=client)
+
+    assert [t['id'] for t in cache.all(order='name')] == ['a', 'b', 'c']
+    assert cache.all()[0]['id'] == 'a'
+    assert cache.get_by_id('b')['name'] == 'Bob'
+    assert cache.get_by_user_id('u1')['id'] == 'a'
+    assert cache.get_by_email('  ann@EXAMPLE.com')['id'] == 'a'
+    assert client.queries == [('tutors', 0)]
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries'], stats['snapshot']) == (4, 1, 3, True)
+    assert stats['role'] == 'anon'
+
+
+def test_missing_key_falls_through_to_query():
+    client = _FakeClient({'tutors': _tutors()})
+    cache = ReferenceCache('tutors', ttl=60, client=client)
+    cache.all()
+
+    assert cache.get_by_user_id('nobody') is None
+    assert cache.get_by_user_id('nobody') is None
+    assert client.queries == [('tutors', 0), ('tutors', 1), ('tutors', 1)]
+
+
+def test_returned_rows_are_copies():
+    client = _FakeClient({'tutors': _tutors()})
+    cache = ReferenceCache('tutors', ttl=60, client=client)
+    cache.get_by_id('a')['name'] = 'changed'
+    cache.all()[0]['name'] = 'changed'
+    assert cache.get_by_id('a')['name'] == 'ann'
+
+
+def test_invalidate_and_ttl_force_reload(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(rc._time, 'monotonic', lambda: clock[0])
+    client = _FakeClient({'tutors': _tutors()})
+    cache = ReferenceCache('tutors', ttl=30, client=client)
+
+    cache.all()
+    client.rows['tutors'][0]['approved'] = True
+    cache.invalidate()
+    assert cache.get_by_id('a')['approved'] is True
+    assert len(client.queries) == 2
+
+    clock[0] += 31
+    cache.get_by_id('a')
+    assert len(client.queries) == 3
+
+
+def test_size_bound_evicts_least_recent():
+    client = _FakeClient({'tutors': _tutors()})
+    cache = ReferenceCache('tutors', ttl=60, max_entries=2, client=client)
+
+    cache.get_by_id('a')
+    cache.get_by_id('b')
+    cache.get_by_id('a')
+    cache.get_by_id('c')
+    assert cache.stats()['entries'] == 2
+    queries = len(client.queries)
+    cache.get_by_id('a')
+    assert len(client.queries) == queries
+    cache.get_by_id('b')
+    assert len(client.queries) == queries + 1
+
+    # A table larger than the bound is returned but not held as a snapshot
+    assert len(cache.all()) == 3
+    assert not cache.stats()['snapshot']
+
+
+def test_visitor_client_lookups_are_not_shared():
+    shared = _FakeClient({'tutors': [t for t in _tutors() if t['id'] != 'b']})
+    visitor = _FakeClient({'tutors': _tutors()})  # RLS lets the owner see their own row
+    cache = ReferenceCache('tutors', ttl=60, client=shared)
+
+    assert cache.get_by_user_id('u2', client=visitor)['id'] == 'b'
+    # Not kept: another session (no client of its own) goes to the shared client
+    assert cache.get_by_user_id('u2') is None
+    assert [t['id'] for t in cache.all()] == ['a', 'c']
+    assert cache.get_by_user_id('u2', client=visitor)['id'] == 'b'
+    assert len(visitor.queries) == 2
+
+    # Rows the shared role can see are served to visitors from memory
+    assert cache.get_by_user_id('u1', client=visitor)['id'] == 'a'
+    assert len(visitor.queries) == 2
+
+
+def test_only_fixed_roles_load_a_shared_cache():
+    with pytest.raises(ValueError):
+        ReferenceCache('tutors', role='authenticated')
+
+
+def test_private_rows_loaded_with_the_service_role_are_not_served_to_visitors():
+    parents = [{'id': 'p1', 'user_id': 'u1', 'email': 'p1@example.com'},
+               {'id': 'p2', 'user_id': 'u2', 'email': 'p2@example.com'}]
+    service = _FakeClient({'parents': parents})
+    visitor = _FakeClient({'parents': parents[:1]})  # RLS: a parent sees only their own row
+    cache = ReferenceCache('parents', ttl=60, role='service', client=service)
+
+    assert len(cache.all()) == 2 and cache.get_by_id('p2')['id'] == 'p2'
+    assert len(service.queries) == 1
+    # The visitor's lookups go to the database as the visitor, even for rows held in memory
+    assert cache.get_by_id('p2', client=visitor) is None
+    assert cache.get_by_user_id('u1', client=visitor)['id'] == 'p1'
+    assert [p['id'] for p in cache.all(client=visitor)] == ['p1']
+    assert len(visitor.queries) == 3 and len(service.queries) == 1
+
+
+def test_parents_are_never_loaded_as_anon():
+    assert rc.parents_cache.role == 'service'
+    assert rc.tutors_cache.role == 'anon'
@@ -0,0 +1,227 @@
+import random
+
+from utils.resolver import ParentResolver, TutorResolver, normalize_name
+
+
+class _FakeTable:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.filters = []
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def eq(self, col, val):
+        rows = self.client.rows.get(self.name, [])
+        if rows and col not in rows[0]:
+            raise RuntimeError(f"column {col} does not exist")
+        self.filters.append(lambda r: r.get(col) == val)
+        return self
+
+    def execute(self):
+        self.client.queries += 1
+        rows = [r for r in self.client.rows.get(self.name, []) if all(f(r) for f in self.filters)]
+
+        class R:
+            data = rows
+
+        return R()
+
+
+class _FakeClient:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    def table(self, name):
+        return _FakeTable(self, name)
+
+
+def _legacy_find_parent(supabase, parent_ref, booking=None):
+    """Copy of the per-booking lookup `pages/tutor_bookings.py` used to run."""
+    if not parent_ref and not booking:
+        return None
+    try:
+        if parent_ref:
+            r = supabase.table('parents').select('*').eq('id', parent_ref).execute()
+            if r.data:
+                return r.data[0]
+    except Exception:
+        pass
+    try:
+        if booking:
+            for key in ('parent_user_id', 'parent_user', 'user_id'):
+                v = booking.get(key)
+                if v:
+                    r = supabase.table('parents').select('*').eq('user_id', v).execute()
+                    if r.data:
+                        return r.data[0]
+    except Exception:
+        pass
+    parents = supabase.table('parents').select('*').execute().data or []
+    if parent_ref:
+        for col in ['id', 'parent_id', 'user_id', 'uid']:
+            try:
+                r = supabase.table('parents').select('*').eq(col, parent_ref).execute()
+                if r.data:
+                    return r.data[0]
+            except Exception:
+                pass
+    booking_parent_name = (booking.get('parent_name') if booking else '') or (booking.get('parent') if booking else '') or ''
+    booking_parent_name = booking_parent_name.strip().lower() if booking_parent_name else ''
+    booking_child = (booking.get('child_name') or booking.get('child') or '').strip().lower() if booking else ''
+    booking_parent_email = (booking.get('parent_email') or booking.get('email') or '').strip().lower() if booking else ''
+    booking_parent_phone = (booking.get('parent_phone') or booking.get('phone') or '').strip() if booking else ''
+    best = (None, 0)
+    for p in parents:
+        score = 0
+        if parent_ref and str(p.get('id')) == str(parent_ref):
+            score += 50
+        pname = (p.get('parent_name') or p.get('name') or '').strip().lower()
+        if booking_parent_name and pname and booking_parent_name == pname:
+            score += 30
+        pemail = (p.get('email') or '').strip().lower()
+        if booking_parent_email and pemail and booking_parent_email == pemail:
+            score += 40
+        pphone = (p.get('phone') or p.get('mobile') or '').strip()
+        if booking_parent_phone and pphone and booking_parent_phone[-6:] and pphone.endswith(booking_parent_phone[-6:]):
+            score += 25
+        pchild = (p.get('child_name') or p.get('child_firstname') or p.get('child_lastname') or '').strip().lower()
+        if booking_child and pchild:
+            b_tokens = [t for t in booking_child.split() if t]
+            p_tokens = [t for t in pchild.split() if t]
+            common = sum(1 for t in b_tokens if any(t == pt or t in pt or pt in t for pt in p_tokens))
+            score += common * 10
+        if score > best[1]:
+            best = (p, score)
+    if best[0] and best[1] > 0:
+        return best[0]
+    return None
+
+
+def _legacy_find_tutor(supabase, tutor_ref, booking=None):
+    """Copy of `find_tutor` from the admin confirmation pages."""
+    if not tutor_ref:
+        return None
+    for k in ["id", "tutor_id", "user_id", "email"]:
+        try:
+            res = supabase.table('tutors').select('*').eq(k, tutor_ref).execute()
+            if res.data:
+                return res.data[0]
+        except Exception:
+            pass
+    tutors = supabase.table('tutors').select('*').execute().data or []
+    for t in tutors:
+        if str(t.get('id')) == str(tutor_ref):
+            return t
+    if booking:
+        candidates = []
+        for field in ('tutor_name', 'tutor_fullname', 'tutor'):
+            v = booking.get(field)
+            if v:
+                candidates.append(v.lower())
+        for t in tutors:
+            fullname = f"{t.get('name','')} {t.get('surname','')}".strip().lower()
+            if fullname in candidates or any(c in fullname for c in candidates):
+                return t
+    return None
+
+
+# Tokens chosen so none is a substring of another
+_FIRST = ['Thabo', 'Lerato', 'Sipho', 'Ayanda', 'Pieter', 'Marie', 'Kgomotso', 'Zanele']
+_LAST = ['Nkosi', 'Botha', 'Dlamini', 'Mokoena', 'Venter', 'Naidoo']
+
+
+def _random_parents(rng, n=60):
+    parents = []
+    for i in range(n):
+        p = {
+            'id': f"p{i}",
+            'user_id': f"u{i}" if rng.random() < 0.8 else None,
+            'parent_name': f"{rng.choice(_FIRST)} {rng.choice(_LAST)}" if rng.random() < 0.9 else None,
+            'email': f"parent{i}@Example.com" if rng.random() < 0.8 else None,
+            'phone': f"08{rng.randint(10000000, 99999999)}" if rng.random() < 0.8 else None,
+            'child_name': f"{rng.choice(_FIRST)} {rng.choice(_LAST)}" if rng.random() < 0.8 else None,
+        }
+        parents.append(p)
+    return parents
+
+
+def _random_booking(rng, parents, i):
+    p = rng.choice(parents)
+    b = {'id': i}
+    kind = rng.random()
+    if kind < 0.3:
+        b['parent_id'] = p['id']
+    elif kind < 0.4:
+        b['parent_id'] = 'missing'
+        b['user_id'] = p['user_id']
+    elif kind < 0.5:
+        b['parent_id'] = p['user_id']
+    else:
+        b['parent_id'] = 'missing' if rng.random() < 0.5 else None
+    if rng.random() < 0.5:
+        b['parent_name'] = (p['parent_name'] or '').upper()
+    if rng.random() < 0.4:
+        b['parent_email'] = (p['email'] or '').lower()
+    if rng.random() < 0.4 and p['phone']:
+        b['parent_phone'] = '+27' + p['phone'][-9:]
+    if rng.random() < 0.6:
+        b['child_name'] = rng.choice([p['child_name'] or '', f"{rng.choice(_FIRST)} {rng.choice(_LAST)}"])
+    return b
+
+
+def test_parent_resolver_matches_legacy_lookup():
+    rng = random.Random(2024)
+    parents = _random_parents(rng)
+    client = _FakeClient({'parents': parents})
+    resolver = ParentResolver(parents)
+    bookings = [_random_booking(rng, parents, i) for i in range(300)]
+
+    resolved = resolver.resolve_many(bookings)
+    for b in bookings:
+        expected = _legacy_find_parent(client, b.get('parent_id'), b)
+        got = resolved[b['id']]
+        assert (got or {}).get('id') == (expected or {}).get('id'), b
+
+
+def test_tutor_resolver_matches_legacy_lookup():
+    rng = random.Random(77)
+    tutors = []
+    for i in range(40):
+        tutors.append({
+            'id': f"t{i}",
+            'user_id': f"tu{i}",
+            'name': rng.choice(_FIRST),
+            'surname': rng.choice(_LAST),
+            'email': f"tutor{i}@example.com",
+        })
+    client = _FakeClient({'tutors': tutors})
+    resolver = TutorResolver(tutors)
+
+    bookings = []
+    for i in range(200):
+        t = rng.choice(tutors)
+        ref = rng.choice([t['id'], t['user_id'], t['email'], 'unknown'])
+        b = {'id': i, 'tutor_id': ref}
+        if rng.random() < 0.5:
+            b['tutor_name'] = rng.choice([f"{t['name']} {t['surname']}", t['surname'], 'Nobody Here'])
+        bookings.append(b)
+
+    resolved = resolver.resolve_many(bookings)
+    for b in bookings:
+        expected = _legacy_find_tutor(client, b['tutor_id'], b)
+        assert (resolved[b['id']] or {}).get('id') == (expected or {}).get('id'), b
+
+
+def test_index_lookups_normalize_keys():
+    parents = [{'id': 1, 'parent_name': 'Ann  Smith', 'email': 'ANN@x.com', 'phone': '0821234567'}]
+    resolver = ParentResolver(parents)
+    assert resolver.by_email('ann@X.com')['id'] == 1
+    assert resolver.by_name('ann smith')['id'] == 1
+    assert resolver.by_phone('+27 1234567')['id'] == 1
+    assert resolver.resolve(1)['id'] == 1
+    assert resolver.resolve('2', {'parent_phone': '27821234567'})['id'] == 1
+    assert resolver.resolve(None, None) is None
+    assert normalize_name('  Ann ', None, 'SMITH ') == 'ann smith'
@@ -0,0 +1,139 @@
+import threading
+
+from utils.fake_supabase import FakeSupabase, FakeAPIError
+from utils.schema import SchemaCache, parse_openapi, missing_column, send_without_missing_column
+
+import pytest
+
+
+OPENAPI = {
+    'swagger': '2.0',
+    'definitions': {
+        'parents': {'properties': {'id': {'type': 'integer'}, 'user_id': {'type': 'string', 'format': 'uuid'},
+                                   'parent_name': {'type': 'string'}, 'phone': {'type': 'string'}}},
+        'bookings': {'properties': {'id': {'type': 'integer'}, 'status': {'type': 'string'},
+                                    'role_required': {'type': 'string', 'enum': ['Reader', 'Scribe', 'Both']}}},
+    },
+}
+
+
+def test_parse_reads_swagger_and_openapi3():
+    tables = parse_openapi(OPENAPI)
+    assert set(tables['parents']) == {'id', 'user_id', 'parent_name', 'phone'}
+    assert tables['parents']['user_id'] == {'type': 'string', 'format': 'uuid', 'enum': None}
+    assert tables['bookings']['role_required']['enum'] == ('Reader', 'Scribe', 'Both')
+    v3 = {'components': {'schemas': OPENAPI['definitions']}}
+    assert parse_openapi(v3) == tables
+
+
+def test_payloads_keep_only_existing_columns():
+    schema = SchemaCache(fetch=lambda: OPENAPI)
+    values = {'parent_name': 'A', 'phone': '1', 'email': 'a@example.com', 'children': []}
+    assert schema.writable_payload('parents', values) == {'parent_name': 'A', 'phone': '1'}
+    assert schema.missing('parents', values) == ['email', 'children']
+    assert schema.has_column('bookings', 'cancelled') is False
+    assert schema.allowed_values('bookings', 'role_required') == ('Reader', 'Scribe', 'Both')
+    assert schema.allowed_values('bookings', 'status') is None
+    # Columns the row was not selected with still count
+    assert schema.writable_payload('bookings', {'status': 'Cancelled'}, row={'id': 1}) == {'status': 'Cancelled'}
+    # Tables the description does not list are unknown
+    assert schema.columns('tutor_unavailability') is None
+    assert schema.loads == 1
+
+
+def test_unknown_schema_falls_back_and_retries_later():
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise RuntimeError('401 Unauthorized')
+
+    schema = SchemaCache(fetch=broken, retry_after=3600)
+    values = {'status': 'Cancelled', 'cancelled': True}
+    assert schema.writable_payload('bookings', values) == values
+    assert schema.writable_payload('bookings', values, row={'id': 1, 'status': 'Pending'}) == {'status': 'Cancelled'}
+    assert schema.missing('bookings', values) == []
+    assert len(calls) == 1 and schema.stats()['last_error'] == '401 Unauthorized'
+
+    schema.retry_after = 0
+    schema._fetch = lambda: OPENAPI
+    assert schema.columns('bookings') == {'id', 'status', 'role_required'}
+
+
+def test_concurrent_first_uses_share_one_fetch():
+    gate = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        gate.wait(5)
+        return OPENAPI
+
+    schema = SchemaCache(fetch=slow)
+    schema.start_background_load()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(schema.columns('parents'))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    gate.set()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and all(r == {'id', 'user_id', 'parent_name', 'phone'} for r in results)
+
+
+def test_writes_succeed_first_time_against_an_older_schema():
+    sb = FakeSupabase({'parents': [{'id': 1, 'parent_name': 'A', 'phone': '1'}]},
+                      schema={'parents': ['id', 'user_id', 'parent_name', 'phone', 'child_name']})
+    values = {'parent_name': 'B', 'email': 'b@example.com', 'children': [{'name': 'C'}], 'child_name': 'C'}
+    with pytest.raises(FakeAPIError) as err:
+        sb.table('parents').update(values).eq('id', 1).execute()
+    assert err.value.code == 'PGRST204'
+
+    sb.reset_stats()
+    schema = SchemaCache(fetch=sb.openapi)
+    payload = schema.writable_payload('parents', values)
+    res = sb.table('parents').update(payload).eq('id', 1).execute()
+    assert res.data == [{'id': 1, 'parent_name': 'B', 'phone': '1', 'child_name': 'C'}]
+    assert sb.stats()['by_call'] == {'openapi.get': 1, 'parents.update': 1}
+
+    # The description is fetched once; later writes cost one round trip each
+    sb.reset_stats()
+    sb.table('parents').update(schema.writable_payload('parents', {'phone': '2', 'email': None})).eq('id', 1).execute()
+    assert sb.round_trips == 1
+
+
+def test_unknown_schema_writes_retry_once_without_the_missing_column():
+    sb = FakeSupabase({'parents': [{'id': 1, 'parent_name': 'A', 'phone': '1'}]},
+                      schema={'parents': ['id', 'user_id', 'parent_name', 'phone']})
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise RuntimeError('401 Unauthorized')
+
+    schema = SchemaCache(fetch=broken, retry_after=3600)
+    payload = schema.writable_payload('parents', {'parent_name': 'B', 'email': 'b@example.com'})
+    res, dropped = send_without_missing_column(
+        lambda p: sb.table('parents').update(p).eq('id', 1).execute(), payload, schema)
+    assert dropped == ['email'] and res.data[0]['parent_name'] == 'B'
+    # The error also makes the next lookup fetch the description again
+    assert len(calls) == 1
+    assert schema.columns('parents') is None and len(calls) == 2
+
+    # Other errors, and a second missing column, are raised
+    with pytest.raises(FakeAPIError):
+        send_without_missing_column(lambda p: sb.table('parents').update(p).eq('id', 1).execute(),
+                                    {'email': 'b@example.com', 'children': []}, schema)
+    with pytest.raises(FakeAPIError):
+        send_without_missing_column(lambda p: sb.table('nope').insert(p).execute(), {'parent_name': 'C'}, schema)
+    assert missing_column("Could not find the 'children' column of 'parents' in the schema cache") == 'children'
+    assert missing_column('permission denied') is None
+
+
+def test_schema_is_fetched_again_after_its_ttl():
+    docs = [OPENAPI, {'definitions': {'parents': {'properties': {'id': {}, 'email': {}}}}}]
+    schema = SchemaCache(fetch=lambda: docs[min(schema.loads, 1)], ttl=3600)
+    assert 'email' not in schema.columns('parents')
+    assert 'email' not in schema.columns('parents') and schema.loads == 1
+    schema.ttl = 0
+    assert 'email' in schema.columns('parents') and schema.loads >= 2
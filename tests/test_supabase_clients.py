@@ -0,0 +1,216 @@
+import json
+import threading
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import utils.supabase_clients as sc
+from utils.supabase_clients import SupabaseClientFactory
+
+
+def _serve(received, peers):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _reply(self, body):
+            peers.add(self.client_address)
+            received.append((self.command, self.path.split('?')[0], self.headers['apikey']))
+            out = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def do_GET(self):
+            self._reply([{'id': 1}])
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers['Content-Length']))
+            self._reply([{'id': 2}])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_roles_share_one_keep_alive_connection(monkeypatch):
+    monkeypatch.setenv('SUPABASE_HTTP2', '0')
+    received, peers = [], set()
+    server = _serve(received, peers)
+    factory = SupabaseClientFactory(url=f"http://127.0.0.1:{server.server_port}",
+                                    keys={'anon': 'anon-key', 'service': 'service-key'})
+    try:
+        anon = factory.client('anon')
+        svc = factory.client('service')
+        assert factory.client('anon') is anon and factory.client('service') is svc
+        assert factory.client('anon', name='session') is not anon
+        assert factory.new('anon') is not factory.new('anon')
+
+        for i in range(3):
+            assert anon.table('bookings').select('*').execute().data == [{'id': 1}]
+            svc.table('admin_actions').insert({'action': f"a{i}"}).execute()
+        stats = factory.stats()
+    finally:
+        factory.close()
+        server.shutdown()
+        server.server_close()
+
+    # Each request still carries its own role's key
+    assert received == [('GET', '/rest/v1/bookings', 'anon-key'), ('POST', '/rest/v1/admin_actions', 'service-key')] * 3
+    assert len(peers) == 1
+    assert stats['requests'] == 6 and stats['connections_opened'] == 1 and stats['reused'] == 5
+    assert stats['clients'] == ['anon:default', 'anon:session', 'service:default']
+    assert stats['http2'] is False
+
+
+def test_settings_and_missing_configuration(monkeypatch):
+    monkeypatch.setenv('SUPABASE_POOL_MAX_CONNECTIONS', '7')
+    monkeypatch.setenv('SUPABASE_TIMEOUT', '12')
+    factory = SupabaseClientFactory(url='https://example.supabase.co', keys={'anon': 'k'})
+    try:
+        assert factory.max_connections == 7 and factory.http2 is True
+        assert factory.http_client.timeout.read == 12 and factory.http_client.timeout.connect == 5
+        with pytest.raises(RuntimeError, match='SUPABASE_SERVICE_ROLE'):
+            factory.client('service')
+        with pytest.raises(ValueError):
+            factory.client('admin')
+    finally:
+        factory.close()
+
+    with pytest.raises(RuntimeError, match='SUPABASE_URL'):
+        SupabaseClientFactory(url='', keys={'anon': 'k'}).client('anon')
+
+
+def test_module_factory_is_shared(monkeypatch):
+    monkeypatch.setenv('SUPABASE_URL', 'https://example.supabase.co')
+    monkeypatch.setenv('SUPABASE_SERVICE_ROLE', 'service-role-key')
+    monkeypatch.setattr(sc, '_factory', None)
+    try:
+        from utils.session import get_supabase_service
+        assert get_supabase_service() is get_supabase_service()
+        assert sc.pool_stats()['clients'] == ['service:default']
+    finally:
+        sc.reset_client_factory()
+
+
+def _serve_auth(received, peers):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _reply(self, body, status=200):
+            peers.add(self.client_address)
+            out = json.dumps(body).encode() if body is not None else b''
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def do_GET(self):
+            received.append((self.path.split('?')[0], self.headers['Authorization']))
+            self._reply([])
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+            path = self.path.split('?')[0]
+            received.append((path, self.headers['Authorization']))
+            if path == '/auth/v1/logout':
+                return self._reply(None, 204)
+            if path.startswith('/rest/'):
+                return self._reply([])
+            user = body['email'].split('@')[0]
+            self._reply({
+                'access_token': f"jwt-{user}", 'refresh_token': f"rt-{user}", 'token_type': 'bearer',
+                'expires_in': 3600,
+                'user': {'id': f"uid-{user}", 'email': body['email'], 'aud': 'authenticated',
+                         'app_metadata': {}, 'user_metadata': {}, 'created_at': '2026-01-01T00:00:00Z'},
+            })
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_session_clients_keep_their_own_jwt_on_the_shared_pool(monkeypatch):
+    monkeypatch.setenv('SUPABASE_HTTP2', '0')
+    received, peers = [], set()
+    server = _serve_auth(received, peers)
+    factory = SupabaseClientFactory(url=f"http://127.0.0.1:{server.server_port}", keys={'anon': 'anon-key'})
+    try:
+        alice, bob = factory.session('anon'), factory.session('anon')
+        shared = factory.client('anon')
+        assert alice.http_client is bob.http_client is factory.http_client
+        assert factory.stats()['clients'] == ['anon:default']
+
+        alice.auth.sign_in_with_password({'email': 'alice@example.com', 'password': 'pw'})
+        bob.auth.sign_in_with_password({'email': 'bob@example.com', 'password': 'pw'})
+        assert (alice.access_token, bob.access_token) == ('jwt-alice', 'jwt-bob')
+        received.clear()
+
+        alice.table('parents').select('*').execute()
+        bob.table('parents').select('*').execute()
+        shared.table('parents').select('*').execute()
+        bob.auth.sign_out()
+        bob.table('parents').select('*').execute()
+        alice.table('parents').select('*').execute()
+    finally:
+        factory.close()
+        server.shutdown()
+        server.server_close()
+
+    assert received == [
+        ('/rest/v1/parents', 'Bearer jwt-alice'),
+        ('/rest/v1/parents', 'Bearer jwt-bob'),
+        ('/rest/v1/parents', 'Bearer anon-key'),
+        ('/auth/v1/logout', 'Bearer jwt-bob'),
+        ('/rest/v1/parents', 'Bearer anon-key'),
+        ('/rest/v1/parents', 'Bearer jwt-alice'),
+    ]
+    assert len(peers) == 1
+
+
+def test_signed_in_visitor_queries_send_their_jwt(monkeypatch):
+    import utils.session as session
+    import utils.tutor_dashboard as tutor_dashboard
+    from utils.parent_profile_store import ParentProfileStore
+    from utils.reference_cache import ReferenceCache
+
+    monkeypatch.setenv('SUPABASE_HTTP2', '0')
+    received, peers = [], set()
+    server = _serve_auth(received, peers)
+    factory = SupabaseClientFactory(url=f"http://127.0.0.1:{server.server_port}", keys={'anon': 'anon-key'})
+    monkeypatch.setattr(sc, '_factory', factory)
+    monkeypatch.setattr(session, 'st', SimpleNamespace(session_state={}))
+    monkeypatch.setattr(tutor_dashboard, '_source_table', 'bookings')
+    tutors = ReferenceCache('tutors', client=factory.client('anon'))
+    try:
+        # What a page does once the visitor has signed in on their session client
+        session.get_session_client().auth.sign_in_with_password({'email': 'carol@example.com', 'password': 'pw'})
+        received.clear()
+        supabase = session.get_session_client()
+        ParentProfileStore(session.st.session_state, client=supabase).get('uid-carol')
+        tutors.get_by_user_id('uid-carol', client=supabase)
+        tutor_dashboard.load_upcoming_bookings('t1', client=supabase)
+        supabase.table('bookings').insert({'email': 'carol@example.com'}).execute()
+        # The shared cache still loads as anon
+        tutors.get_by_user_id('uid-carol')
+    finally:
+        factory.close()
+        server.shutdown()
+        server.server_close()
+
+    assert received == [
+        ('/rest/v1/parents', 'Bearer jwt-carol'),
+        ('/rest/v1/tutors', 'Bearer jwt-carol'),
+        ('/rest/v1/bookings', 'Bearer jwt-carol'),
+        ('/rest/v1/bookings', 'Bearer jwt-carol'),
+        ('/rest/v1/tutors', 'Bearer anon-key'),
+    ]
@@ -0,0 +1,165 @@
+import threading
+import time
+
+from utils.token_store import TokenStore, normalize_session
+
+
+class _Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class _Auth:
+    """Token endpoint stand-in: rotates the refresh token on every exchange and rejects reuse."""
+
+    def __init__(self, gate=None, expires_in=3600):
+        self.calls = []
+        self.gate = gate
+        self.expires_in = expires_in
+        self.revoked = set()
+
+    def __call__(self, refresh_token):
+        self.calls.append(refresh_token)
+        if self.gate is not None:
+            self.gate.wait(5)
+        if refresh_token in self.revoked:
+            return None
+        self.revoked.add(refresh_token)
+        n = len(self.calls)
+        return {'access_token': f"at{n}", 'refresh_token': f"{refresh_token}>{n}", 'expires_in': self.expires_in,
+                'user': {'id': 'u1', 'email': 'p@example.com'}}
+
+
+class _Session:
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+def test_normalize_accepts_auth_responses_and_json():
+    inner = _Session(access_token='a', refresh_token='r', expires_at=2000, user=_Session(id='u', email='e'))
+    assert normalize_session(_Session(session=inner, user=None), now=0) == {
+        'access_token': 'a', 'refresh_token': 'r', 'expires_at': 2000.0, 'user': {'id': 'u', 'email': 'e'}}
+    assert normalize_session({'access_token': 'a', 'refresh_token': 'r', 'expires_in': 60}, now=100)['expires_at'] == 160
+    assert normalize_session({'access_token': 'a'}, now=0) is None
+
+
+def test_sessions_refresh_ahead_of_expiry_and_idle_ones_are_dropped():
+    clock, auth = _Clock(), _Auth()
+    store = TokenStore(auth, lead=120, idle_ttl=7200, clock=clock, background=False)
+    key = store.put({'access_token': 'at0', 'refresh_token': 'rt', 'expires_in': 3600})
+    idle = store.put({'access_token': 'x', 'refresh_token': 'other', 'expires_in': 3600})
+
+    clock.now += 3400
+    assert store.run_due() == 0
+    clock.now += 100                       # 100 s before expiry
+    store.get(key)
+    assert store.run_due() == 2
+    # Both were due at the same moment, so they refresh in either order
+    assert sorted(auth.calls) == ['other', 'rt']
+    assert store.access_token(key) in ('at1', 'at2')
+
+    # The current token restores from memory
+    current = store.get(key)['refresh_token']
+    assert store.restore(current)['access_token'] == store.access_token(key)
+    assert len(auth.calls) == 2
+
+    clock.now += 3600 * 2                 # `idle` unused for over idle_ttl
+    store.get(key)
+    store.run_due()
+    assert store.get(idle) is None and store.status('other') == 'unknown'
+    assert store.counts['dropped_idle'] == 1 and store.get(key) is not None
+    store.close()
+
+
+def test_restore_does_not_block_and_concurrent_refreshes_share_one_call():
+    gate = threading.Event()
+    auth = _Auth(gate=gate)
+    store = TokenStore(auth, background=False)
+
+    t0 = time.perf_counter()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.restore('rt'))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert time.perf_counter() - t0 < 1.0
+    assert results == [None] * 8 and store.status('rt') == 'pending'
+
+    gate.set()
+    session = store.wait('rt', timeout=5)
+    assert auth.calls == ['rt']
+    assert store.counts['deduplicated'] == 7
+    assert session['access_token'] == 'at1' and session['user']['email'] == 'p@example.com'
+    # From now on the session answers to its new token only
+    assert store.restore(session['refresh_token'])['key'] == session['key']
+    store.close()
+
+
+def test_failed_exchanges_are_not_retried_on_every_run():
+    clock, auth = _Clock(), _Auth()
+    auth.revoked.add('bad')
+    store = TokenStore(auth, clock=clock, background=False)
+    store.restore('bad')
+    store.wait('bad', timeout=5)
+    assert store.status('bad') == 'failed'
+    assert store.restore('bad') is None and auth.calls == ['bad']
+    clock.now += 60
+    store.restore('bad')
+    store.wait('bad', timeout=5)
+    assert auth.calls == ['bad', 'bad']
+
+    # A scheduled refresh that fails keeps the still-valid session and retries
+    key = store.put({'access_token': 'a', 'refresh_token': 'rt2', 'expires_in': 600})
+    auth.revoked.add('rt2')
+    clock.now += 600 - 100
+    store.run_due()
+    assert store.access_token(key) == 'a'
+    auth.revoked.discard('rt2')
+    auth.calls.clear()
+    clock.now += 30
+    store.run_due()
+    assert store.access_token(key) != 'a'
+    store.forget(key)
+    assert store.restore('rt2') is None
+    store.close()
+
+
+def test_background_thread_refreshes_without_being_asked():
+    auth = _Auth(expires_in=3600)
+    store = TokenStore(auth, lead=3599.8)
+    try:
+        key = store.put({'access_token': 'at0', 'refresh_token': 'rt', 'expires_in': 3600})
+        deadline = time.time() + 5
+        while store.access_token(key) == 'at0' and time.time() < deadline:
+            time.sleep(0.02)
+        assert store.access_token(key) == 'at1'
+    finally:
+        store.close()
+
+
+def test_rotated_out_tokens_go_to_the_auth_endpoint():
+    clock, auth = _Clock(), _Auth()
+    store = TokenStore(auth, lead=120, clock=clock, background=False)
+    key = store.put({'access_token': 'at0', 'refresh_token': 'rt', 'expires_in': 3600})
+    clock.now += 3500
+    store.run_due()
+    assert store.get(key)['refresh_token'] == 'rt>1'
+
+    # A stale tp_rt is not answered from memory: the exchange is refused
+    assert store.restore('rt') is None
+    assert store.wait('rt', timeout=5) is None
+    assert auth.calls == ['rt', 'rt'] and store.status('rt') == 'failed'
+    assert store.counts['cache_hits'] == 0
+    assert store.access_token(key) == 'at1'
+
+    # A token exchanged for restore() is handed to its caller once, then treated the same
+    assert store.restore('other') is None
+    assert store.wait('other', timeout=5)['access_token'] == 'at3'
+    assert store.restore('other') is None
+    store.wait('other', timeout=5)
+    assert auth.calls[-1] == 'other' and store.status('other') == 'failed'
+    store.close()
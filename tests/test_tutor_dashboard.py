@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+
+import utils.tutor_dashboard as td
+from utils.booking_changes import mark_bookings_changed
+from utils.fake_supabase import FakeAPIError
+
+
+class _FakeTable:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.preds = []
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def eq(self, col, val):
+        self.preds.append(lambda r: r.get(col) == val)
+        return self
+
+    def in_(self, col, values):
+        values = [str(v) for v in values]
+        self.preds.append(lambda r: str(r.get(col)) in values)
+        return self
+
+    def or_(self, filters):
+        day = filters.split(',')[0].rsplit('.', 1)[1]
+        self.preds.append(lambda r: r.get('exam_date') is None or r['exam_date'] >= day)
+        return self
+
+    def limit(self, n):
+        return self
+
+    def execute(self):
+        self.client.queries.append(self.name)
+        if self.client.failures:
+            raise self.client.failures.pop(0)
+        if self.name not in self.client.rows:
+            raise FakeAPIError(f"Could not find the table 'public.{self.name}' in the schema cache", code='PGRST205')
+        rows = [dict(r) for r in self.client.rows[self.name] if all(p(r) for p in self.preds)]
+
+        class R:
+            data = rows
+
+        return R()
+
+
+class _FakeClient:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+        self.failures = []
+
+    def table(self, name):
+        return _FakeTable(self, name)
+
+
+def _client(now):
+    today = now.date()
+    bookings = [
+        {'id': 1, 'tutor_id': 't1', 'exam_date': (today - timedelta(days=3)).isoformat(), 'start_time': '09:00:00', 'parent_id': 'p1', 'school': ''},
+        {'id': 2, 'tutor_id': 't1', 'exam_date': (today + timedelta(days=2)).isoformat(), 'start_time': '09:00', 'parent_id': 'p1', 'school': ''},
+        {'id': 3, 'tutor_id': 't1', 'exam_date': (today + timedelta(days=1)).isoformat(), 'start_time': '10:00:00', 'parent_id': 'p2', 'school': 'Own School'},
+        {'id': 4, 'tutor_id': 't1', 'exam_date': None, 'slot': (now + timedelta(days=5)).strftime('%Y-%m-%d %H:%M'), 'parent_id': 'p3'},
+        {'id': 5, 'tutor_id': 't2', 'exam_date': (today + timedelta(days=1)).isoformat(), 'start_time': '10:00:00', 'parent_id': 'p2'},
+    ] + [
+        {'id': 100 + i, 'tutor_id': 't1', 'exam_date': (today + timedelta(days=10 + i)).isoformat(), 'start_time': '08:00:00', 'parent_id': f"p{i % 7}", 'school': None}
+        for i in range(40)
+    ]
+    parents = [{'id': f"p{i}", 'school': f"School {i}"} for i in range(7)]
+    return _FakeClient({'bookings': bookings, 'parents': parents})
+
+
+def test_two_round_trips_and_batched_schools(monkeypatch):
+    monkeypatch.setattr(td, '_source_table', None)
+    now = datetime.now()
+    client = _client(now)
+    rows = td.load_upcoming_bookings('t1', client=client, now=now)
+
+    assert [b['id'] for _, b in rows][:3] == [3, 2, 4]
+    assert len(rows) == 43
+    assert [dt for dt, _ in rows] == sorted(dt for dt, _ in rows)
+    schools = {b['id']: b['school'] for _, b in rows}
+    assert schools[3] == 'Own School' and schools[2] == 'School 1' and schools[4] == 'School 3'
+    assert client.queries == ['tutor_bookings', 'bookings', 'parents']
+
+    # The missing legacy table is only probed once per process
+    client.queries.clear()
+    td.load_upcoming_bookings('t1', client=client, now=now)
+    assert client.queries == ['bookings', 'parents']
+
+
+def test_session_cache_until_bookings_change(monkeypatch):
+    monkeypatch.setattr(td, '_source_table', 'bookings')
+    client = _client(datetime.now())
+    session = {}
+    first = td.cached_upcoming_bookings('t1', session, client=client)
+    td.cached_upcoming_bookings('t1', session, client=client)
+    assert client.queries == ['bookings', 'parents']
+
+    mark_bookings_changed()
+    again = td.cached_upcoming_bookings('t1', session, client=client)
+    assert client.queries == ['bookings', 'parents', 'bookings', 'parents']
+    assert [b['id'] for _, b in again] == [b['id'] for _, b in first]
+
+    td.cached_upcoming_bookings('t1', session, client=client, ttl=0)
+    assert len(client.queries) == 6
+
+
+def test_table_choice_is_only_kept_after_a_missing_table_answer(monkeypatch):
+    monkeypatch.setattr(td, '_source_table', None)
+    now = datetime.now()
+    client = _client(now)
+    # A timeout says nothing about the legacy table: read bookings now, probe again next time
+    client.failures.append(RuntimeError('timed out'))
+    assert len(td.load_upcoming_bookings('t1', client=client, now=now)) == 43
+    assert td._source_table is None
+
+    client.rows['tutor_bookings'] = []
+    client.queries.clear()
+    assert td.load_upcoming_bookings('t1', client=client, now=now) == []
+    assert client.queries == ['tutor_bookings', 'tutor_bookings'] and td._source_table == 'tutor_bookings'
+
+    # Postgres' own code for a missing relation is just as definite
+    monkeypatch.setattr(td, '_source_table', None)
+    client.failures.append(RuntimeError("{'code': '42P01', 'message': 'relation \"tutor_bookings\" does not exist'}"))
+    td.load_upcoming_bookings('t1', client=client, now=now)
+    assert td._source_table == 'bookings'
@@ -0,0 +1,162 @@
+import random
+from datetime import date, datetime, time, timedelta
+
+import utils.database
+import utils.unavailability_index as ui
+from utils.unavailability_index import UnavailabilityIndex
+
+
+def _legacy_is_available(entries, exam_date_obj, start_time_obj, duration_minutes):
+    """The per-row check every page used to run (after the DB date filter)."""
+    entries = [e for e in entries if e['start_date'] <= exam_date_obj.isoformat() <= e['end_date']]
+    if not entries:
+        return True
+    bstart_dt = datetime.combine(exam_date_obj, start_time_obj)
+    bend_dt = bstart_dt + timedelta(minutes=duration_minutes)
+    for e in entries:
+        if not e.get('start_time') or not e.get('end_time'):
+            return False
+        try:
+            es = datetime.strptime(e.get('start_time'), '%H:%M:%S').time()
+            ee = datetime.strptime(e.get('end_time'), '%H:%M:%S').time()
+        except Exception:
+            return False
+        estart_dt = datetime.combine(exam_date_obj, es)
+        eend_dt = datetime.combine(exam_date_obj, ee)
+        if (min(bend_dt, eend_dt) - max(bstart_dt, estart_dt)).total_seconds() > 0:
+            return False
+    return True
+
+
+def _random_rows(rng, n, n_tutors=8, base=date(2026, 6, 1)):
+    rows = []
+    for i in range(n):
+        start = base + timedelta(days=rng.randint(0, 20))
+        row = {
+            'id': i + 1,
+            'tutor_id': rng.randint(1, n_tutors),
+            'start_date': start.isoformat(),
+            'end_date': (start + timedelta(days=rng.randint(0, 5))).isoformat(),
+        }
+        kind = rng.random()
+        if kind < 0.7:
+            s = rng.randint(6 * 60, 18 * 60)
+            e = s + rng.choice([-30, 0, 15, 60, 150])
+            row['start_time'] = f"{s // 60:02d}:{s % 60:02d}:00"
+            row['end_time'] = f"{min(e, 1439) // 60:02d}:{min(e, 1439) % 60:02d}:00"
+        elif kind < 0.75:
+            row['start_time'] = 'morning'
+            row['end_time'] = 'noon'
+        rows.append(row)
+    return rows
+
+
+def _assert_matches_legacy(rng, index, rows, n_tutors=8, base=date(2026, 6, 1)):
+    for _ in range(400):
+        tutor_id = rng.randint(1, n_tutors)
+        d = base + timedelta(days=rng.randint(-2, 28))
+        t = time(rng.randint(5, 20), rng.choice([0, 15, 30, 45]))
+        dur = rng.choice([15, 30, 60, 90, 240])
+        expected = _legacy_is_available([r for r in rows if r['tutor_id'] == tutor_id], d, t, dur)
+        assert index.is_available(tutor_id, d, t, dur) == expected, (tutor_id, d, t, dur)
+
+
+def test_index_matches_linear_scan():
+    rng = random.Random(42)
+    rows = _random_rows(rng, 200)
+    index = UnavailabilityIndex(rows)
+    assert len(index) == 200
+    _assert_matches_legacy(rng, index, rows)
+
+
+def test_incremental_add_and_remove():
+    rng = random.Random(5)
+    rows = _random_rows(rng, 120)
+    index = UnavailabilityIndex(rows[:60])
+    for r in rows[60:]:
+        index.add(r)
+    _assert_matches_legacy(rng, index, rows)
+
+    removed = rows[::3]
+    for r in removed:
+        assert index.remove(r['id'])
+    assert not index.remove(-1)
+    remaining = [r for r in rows if r not in removed]
+    assert len(index) == len(remaining)
+    _assert_matches_legacy(rng, index, remaining)
+
+
+def test_string_and_object_inputs_agree():
+    index = UnavailabilityIndex([
+        {'id': 1, 'tutor_id': 'a', 'start_date': '2026-06-01', 'end_date': '2026-06-01', 'start_time': '09:00:00', 'end_time': '10:00:00'},
+    ])
+    assert not index.is_available('a', '2026-06-01', '09:30:00', 30)
+    assert not index.is_available('a', date(2026, 6, 1), time(9, 30), 30)
+    assert index.is_available('a', date(2026, 6, 1), time(10, 0), 30)
+    assert index.is_available('b', date(2026, 6, 1), time(9, 30), 30)
+
+
+class _CountingClient:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def table(self, name):
+        client = self
+
+        class Q:
+            def __init__(self):
+                self.lo = self.hi = None
+
+            def select(self, *a, **k):
+                return self
+
+            def lte(self, col, val):
+                self.hi = val
+                return self
+
+            def gte(self, col, val):
+                self.lo = val
+                return self
+
+            def execute(self):
+                client.calls.append((self.lo, self.hi))
+
+                class R:
+                    data = [r for r in client.rows if r['start_date'] <= self.hi and r['end_date'] >= self.lo]
+
+                return R()
+
+        return Q()
+
+
+def test_shared_index_reuses_window_and_tracks_writes(monkeypatch):
+    rows = [
+        {'id': 1, 'tutor_id': 1, 'start_date': '2026-06-02', 'end_date': '2026-06-02'},
+        {'id': 2, 'tutor_id': 2, 'start_date': '2026-06-10', 'end_date': '2026-06-12'},
+    ]
+    client = _CountingClient(rows)
+    monkeypatch.setattr(utils.database, 'supabase', client, raising=False)
+    ui.invalidate_shared_index()
+
+    idx = ui.get_shared_index(date(2026, 6, 1), date(2026, 6, 5))
+    assert client.calls == [('2026-06-01', '2026-06-05')]
+    assert not idx.is_available(1, date(2026, 6, 2), time(9), 60)
+
+    # A sub-window is answered from memory
+    assert ui.get_shared_index(date(2026, 6, 2)) is idx
+    assert len(client.calls) == 1
+
+    # A wider window reloads once, keeping the earlier range covered
+    idx = ui.get_shared_index(date(2026, 6, 10), date(2026, 6, 12))
+    assert client.calls[-1] == ('2026-06-01', '2026-06-12')
+    assert idx.covers(date(2026, 6, 1), date(2026, 6, 12))
+
+    # Writes from the unavailability pages update the index in place
+    ui.record_insert({'id': 3, 'tutor_id': 3, 'start_date': '2026-06-03', 'end_date': '2026-06-03', 'start_time': '08:00:00', 'end_time': '09:00:00'})
+    ui.record_delete(1)
+    idx = ui.get_shared_index(date(2026, 6, 3))
+    assert len(client.calls) == 2
+    assert not idx.is_available(3, date(2026, 6, 3), time(8, 30), 30)
+    assert idx.is_available(1, date(2026, 6, 2), time(9), 60)
+    ui.invalidate_shared_index()
@@ -0,0 +1,194 @@
+"""Supabase Auth admin API over the shared connection pool, with batch calls.
+
+`AuthAdminClient` wraps the `/auth/v1/admin/...` endpoints used to delete
+users, set passwords, confirm accounts and generate recovery links. It sends
+its requests over the pooled `httpx.Client` from `utils.supabase_clients`
+(or one passed in), so repeated admin calls reuse warm connections.
+
+The batch methods (`set_passwords`, `delete_users`, `confirm_users`) run
+one request per user on a thread pool of at most `concurrency` workers
+(env `AUTH_ADMIN_CONCURRENCY`, default 8) and return a result per user, in
+input order, shaped like the single calls: `{'ok': True, ...}` or
+`{'error': ...}`. One user's failure never stops the others.
+"""
+
+from typing import Optional, Dict, List, Iterable, Callable, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+
+import httpx
+
+
+AUTH_ADMIN_CONCURRENCY = int(os.getenv("AUTH_ADMIN_CONCURRENCY", "8"))
+AUTH_ADMIN_TIMEOUT = float(os.getenv("AUTH_ADMIN_TIMEOUT", "10"))
+
+
+def _error_of(resp: httpx.Response):
+    try:
+        return resp.json()
+    except Exception:
+        return f'Status {resp.status_code}: {resp.text}'
+
+
+class AuthAdminClient:
+    """Calls the Auth admin API with the service role key.
+
+    `url`, `service_key` and `http_client` default to `SUPABASE_URL`,
+    `SUPABASE_SERVICE_ROLE` (read when a call is made) and the shared pool.
+    """
+
+    def __init__(self, url: Optional[str] = None, service_key: Optional[str] = None,
+                 http_client: Optional[httpx.Client] = None, concurrency: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        self._url = url
+        self._service_key = service_key
+        self._http_client = http_client
+        self.concurrency = max(1, concurrency or AUTH_ADMIN_CONCURRENCY)
+        self.timeout = timeout if timeout is not None else AUTH_ADMIN_TIMEOUT
+
+    @property
+    def url(self) -> Optional[str]:
+        return self._url or os.getenv('SUPABASE_URL')
+
+    @property
+    def service_key(self) -> Optional[str]:
+        return self._service_key or os.getenv('SUPABASE_SERVICE_ROLE')
+
+    @property
+    def http_client(self) -> httpx.Client:
+        if self._http_client is None:
+            from utils.supabase_clients import get_client_factory
+            return get_client_factory().http_client
+        return self._http_client
+
+    def config_error(self) -> Optional[str]:
+        """Why calls cannot be made (missing key or URL), or None."""
+        if not self.service_key:
+            return 'SUPABASE_SERVICE_ROLE not configured'
+        if not self.url:
+            return 'SUPABASE_URL not configured'
+        return None
+
+    def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send `method` to `/auth/v1{path}` with the service role headers."""
+        svc = self.service_key
+        headers = {
+            'apikey': svc,
+            'Authorization': f'Bearer {svc}',
+            'Content-Type': 'application/json',
+            **kwargs.pop('headers', {}),
+        }
+        kwargs.setdefault('timeout', self.timeout)
+        url = f"{self.url.rstrip('/')}/auth/v1{path}"
+        return self.http_client.request(method, url, headers=headers, **kwargs)
+
+    def _call(self, method: str, path: str, ok_codes: Tuple[int, ...] = (200, 204), **kwargs) -> Dict:
+        err = self.config_error()
+        if err:
+            return {'error': err}
+        try:
+            resp = self.request(method, path, **kwargs)
+        except Exception as e:
+            return {'error': str(e)}
+        if resp.status_code not in ok_codes:
+            return {'error': _error_of(resp)}
+        out = {'ok': True}
+        if resp.content:
+            try:
+                out['user'] = resp.json()
+            except Exception:
+                pass
+        return out
+
+    def delete_user(self, user_id: str) -> Dict:
+        """Delete an Auth user. Returns {'ok': True} or {'error': ...}."""
+        return self._call('DELETE', f'/admin/users/{user_id}')
+
+    def update_user(self, user_id: str, attributes: Dict) -> Dict:
+        """Update an Auth user's attributes (password, email_confirm, ...)."""
+        return self._call('PUT', f'/admin/users/{user_id}', json=attributes)
+
+    def set_password(self, user_id: str, new_password: str) -> Dict:
+        return self.update_user(user_id, {'password': new_password})
+
+    def find_user_by_email(self, email: str) -> Dict:
+        """{'ok': True, 'user': user-or-None} for the account with `email`."""
+        res = self._call('GET', '/admin/users', params={'email': email})
+        if not res.get('ok'):
+            return res
+        data = res.get('user')
+        users = data.get('users') if isinstance(data, dict) else data
+        match = None
+        for u in users or []:
+            if isinstance(u, dict) and (u.get('email') or '').lower() == email.lower():
+                match = u
+                break
+        if match is None and isinstance(data, list) and data:
+            # Older Auth versions filter by email server-side and omit it
+            match = data[0]
+        return {'ok': True, 'user': match}
+
+    def confirm_user(self, email: str, password: Optional[str] = None) -> Dict:
+        """Mark the account with `email` as confirmed, optionally setting its password."""
+        found = self.find_user_by_email(email)
+        if not found.get('ok'):
+            return found
+        user = found.get('user')
+        if not user:
+            return {'error': 'User not found'}
+        attributes = {'email_confirm': True}
+        if password:
+            attributes['password'] = password
+        return self.update_user(user.get('id'), attributes)
+
+    def generate_link(self, email: str, link_type: str = 'recovery') -> httpx.Response:
+        """POST /admin/generate_link and return the raw response."""
+        return self.request('POST', '/admin/generate_link', json={'type': link_type, 'email': email})
+
+    def run_batch(self, items: Iterable, call: Callable[[Any], Dict]) -> List[Dict]:
+        """`call(item)` for each item, at most `concurrency` at a time, results in input order."""
+        items = list(items)
+        if not items:
+            return []
+
+        def one(item):
+            try:
+                return call(item)
+            except Exception as e:
+                return {'error': str(e)}
+
+        workers = min(self.concurrency, len(items))
+        if workers == 1:
+            return [one(item) for item in items]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(one, items))
+
+    def set_passwords(self, passwords: Dict[str, str]) -> Dict[str, Dict]:
+        """Set each user's password: {user_id: new_password} -> {user_id: result}."""
+        ids = list(passwords)
+        results = self.run_batch(ids, lambda uid: self.set_password(uid, passwords[uid]))
+        return dict(zip(ids, results))
+
+    def delete_users(self, user_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Delete each user: {user_id: result}."""
+        ids = list(user_ids)
+        return dict(zip(ids, self.run_batch(ids, self.delete_user)))
+
+    def confirm_users(self, emails: Iterable[str], password: Optional[str] = None) -> Dict[str, Dict]:
+        """Confirm each account by email: {email: result}."""
+        emails = list(emails)
+        return dict(zip(emails, self.run_batch(emails, lambda e: self.confirm_user(e, password))))
+
+
+_admin: Optional[AuthAdminClient] = None
+_admin_lock = threading.Lock()
+
+
+def get_auth_admin() -> AuthAdminClient:
+    """The shared Auth admin client (on the shared connection pool)."""
+    global _admin
+    with _admin_lock:
+        if _admin is None:
+            _admin = AuthAdminClient()
+        return _admin
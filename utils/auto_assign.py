@@ -0,0 +1,624 @@
+"""Propose tutor assignments for the whole pending queue at once.
+
+Admins used to pick a tutor for each Pending booking by hand. `propose_plan`
+takes every pending booking in a window and every approved tutor and works
+out a conflict-free assignment that an admin can review and accept in bulk
+(see `utils.bulk_actions.confirm_bookings`).
+
+A tutor is a candidate for a booking when `utils.matching.eligible_tutors`
+allows it (role, language, unavailability) and the slot, extra time
+included, does not overlap one of the tutor's Confirmed or TutorConfirmed
+bookings (see `utils.busy_index`). Each tutor takes at most
+`AUTO_ASSIGN_DAILY_CAP` bookings per day, counting the ones already
+confirmed.
+
+Days are independent, so each day is solved on its own as a min-cost
+flow: source -> booking -> tutor -> sink, with one unit edge per booking
+the tutor can still take that day on the last hop, using primal-dual
+successive shortest paths (Dijkstra with node potentials). That assigns as
+many bookings as possible and, among those, picks the cheapest plan: each
+booking a tutor has that day (confirmed or planned) costs more than the
+one before, so work is spread out, and tutors who cover every role cost
+slightly more than ones who match the role exactly, so all-rounders stay
+free for bookings only they can take.
+
+Two new bookings that overlap in time must not go to the same tutor. That
+is not a flow constraint, so the day's bookings are grouped into sets that
+all run through a common minute and each tutor gets a capacity-1 node per
+group. Overlaps between bookings of different groups are rarer; when the
+flow produces one, the later booking's edge to that tutor is removed with
+its unit of flow and the booking is augmented again from the current flow.
+
+Those repairs can leave a booking unplaced that another arrangement would
+place (with time clashes and per-tutor eligibility the problem is no longer
+a flow problem, and finding the maximum is NP-hard in general). So when a
+day ends with a booking unplaced although an eligible tutor still has room,
+the plan is improved by an exact branch-and-bound search over that day,
+seeded with the flow's plan and bounded to `AUTO_ASSIGN_SEARCH_NODES`
+steps. Days of realistic size finish well within it, which makes their plan
+maximal; a day that hits the bound keeps the best plan found, never one
+worse than the flow's.
+"""
+
+from typing import Optional, Dict, List, Iterable, Any, Tuple
+from collections import defaultdict, deque
+from datetime import date
+import heapq
+import os
+
+from utils.booking_times import normalize_booking_times
+from utils.busy_index import booking_spans, fetch_busy_bookings
+from utils.matching import eligible_tutors, load_approved_tutors, unavailability_for
+
+
+AUTO_ASSIGN_DAILY_CAP = int(os.getenv("AUTO_ASSIGN_DAILY_CAP", "3"))
+AUTO_ASSIGN_SEARCH_NODES = int(os.getenv("AUTO_ASSIGN_SEARCH_NODES", "50000"))
+
+# Edge costs (integers keep the potentials exact)
+COST_BASE = 10
+COST_PER_DAY_BOOKING = 20
+COST_GENERALIST = 5
+
+_INF = float('inf')
+
+
+def _minutes(ts) -> int:
+    return int(ts.hour) * 60 + int(ts.minute)
+
+
+def _extra_minutes(value) -> int:
+    try:
+        return max(int(value or 0), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _overlaps(spans: List[Tuple[int, int]], start: int, end: int) -> bool:
+    return any(s < end and start < e for s, e in spans)
+
+
+def _edge_cost(tutor: Dict, day_load: int, role_required) -> int:
+    cost = COST_BASE + COST_PER_DAY_BOOKING * day_load
+    if tutor.get('roles') == 'All of the Above' and role_required != 'All of the Above':
+        cost += COST_GENERALIST
+    return cost
+
+
+def _clique_cover(spans: List[Tuple[int, int]]) -> List[int]:
+    """Group a day's bookings into sets that all overlap one minute; returns each booking's group.
+
+    Repeatedly takes the earliest-ending remaining booking's last minute and
+    groups every remaining booking running through it.
+    """
+    group = [-1] * len(spans)
+    remaining = sorted(range(len(spans)), key=lambda i: spans[i][1])
+    g = 0
+    while remaining:
+        point = spans[remaining[0]][1] - 1
+        rest = []
+        for i in remaining:
+            s, e = spans[i]
+            if s <= point < e:
+                group[i] = g
+            else:
+                rest.append(i)
+        if len(rest) == len(remaining):
+            # Zero-length booking: a group of its own
+            group[remaining[0]] = g
+            rest = remaining[1:]
+        remaining = rest
+        g += 1
+    return group
+
+
+class _MinCostFlow:
+    """Min-cost flow with unit paths on a small graph (Dijkstra with node potentials)."""
+
+    def __init__(self, nodes: int):
+        self.adj: List[List[int]] = [[] for _ in range(nodes)]
+        self.to: List[int] = []
+        self.cap: List[int] = []
+        self.cost: List[int] = []
+        self.pi = [0] * nodes
+
+    def add_node(self) -> int:
+        self.adj.append([])
+        self.pi.append(0)
+        return len(self.adj) - 1
+
+    def add_edge(self, u: int, v: int, cap: int, cost: int) -> int:
+        """Add u->v (and its residual twin); returns the forward edge's index."""
+        e = len(self.to)
+        self.to += [v, u]
+        self.cap += [cap, 0]
+        self.cost += [cost, -cost]
+        self.adj[u].append(e)
+        self.adj[v].append(e + 1)
+        return e
+
+    def _dijkstra(self, s: int, t: int) -> bool:
+        """Shift potentials by reduced-cost distances from `s`; False if `t` is unreachable."""
+        to, cap, cost, pi, adj = self.to, self.cap, self.cost, self.pi, self.adj
+        dist = {s: 0}
+        seen = set()
+        heap = [(0, s)]
+        while heap:
+            d, x = heapq.heappop(heap)
+            if x in seen:
+                continue
+            seen.add(x)
+            if x == t:
+                continue
+            px = pi[x]
+            for e in adj[x]:
+                if cap[e] <= 0:
+                    continue
+                y = to[e]
+                nd = d + cost[e] + px - pi[y]
+                if nd < dist.get(y, _INF):
+                    dist[y] = nd
+                    heapq.heappush(heap, (nd, y))
+        if t not in dist:
+            return False
+        # Nodes further than t move by t's distance, which keeps every
+        # residual edge's reduced cost non-negative
+        D = dist[t]
+        for x in range(len(pi)):
+            pi[x] += min(dist.get(x, D), D)
+        return True
+
+    def _push_admissible(self, s: int, t: int) -> int:
+        """Push unit paths from `s` to `t` over zero reduced-cost edges until none is left."""
+        to, cap, cost, pi, adj = self.to, self.cap, self.cost, self.pi, self.adj
+        nxt = [0] * len(adj)
+        pushed = 0
+        while True:
+            path: List[int] = []
+            x = s
+            on_path = {s}
+            while x != t:
+                edges = adj[x]
+                i = nxt[x]
+                while i < len(edges):
+                    e = edges[i]
+                    y = to[e]
+                    if cap[e] > 0 and y not in on_path and cost[e] + pi[x] - pi[y] == 0:
+                        break
+                    i += 1
+                nxt[x] = i
+                if i == len(edges):
+                    if x == s:
+                        return pushed
+                    # Dead end: retreat and skip the edge that led here
+                    on_path.discard(x)
+                    e = path.pop()
+                    x = to[e ^ 1]
+                    nxt[x] += 1
+                    continue
+                path.append(edges[i])
+                x = to[edges[i]]
+                on_path.add(x)
+            for e in path:
+                cap[e] -= 1
+                cap[e ^ 1] += 1
+            pushed += 1
+
+    def run(self, s: int, t: int) -> int:
+        """Primal-dual successive shortest paths: one Dijkstra per path length, then every
+        path of that length. Returns the units pushed."""
+        total = 0
+        while self._dijkstra(s, t):
+            pushed = self._push_admissible(s, t)
+            if not pushed:
+                break
+            total += pushed
+        return total
+
+    def cancel(self, edges: List[int]):
+        """Take back the unit of flow on `edges` (a source-sink path)."""
+        for e in edges:
+            self.cap[e] += 1
+            self.cap[e ^ 1] -= 1
+
+    def reset_potentials(self, s: int, t: int) -> bool:
+        """Recompute potentials after flow was cancelled, when some reduced costs went negative.
+
+        Label-correcting shortest paths from `s` (never expanding `t`, so a
+        negative edge into the sink does no harm); unreachable nodes keep
+        their potentials since no augmenting path can reach them. Returns
+        False, leaving the potentials as they were, if moved edges closed a
+        negative cycle (no potentials exist then).
+        """
+        to, cap, cost, pi, adj = self.to, self.cap, self.cost, self.pi, self.adj
+        dist = {s: 0}
+        queue = deque([s])
+        queued = {s}
+        relaxed: Dict[int, int] = defaultdict(int)
+        while queue:
+            x = queue.popleft()
+            queued.discard(x)
+            if x == t:
+                continue
+            d = dist[x] + pi[x]
+            for e in adj[x]:
+                if cap[e] <= 0:
+                    continue
+                y = to[e]
+                if y == s:
+                    # Paths back into the source are never augmenting paths
+                    continue
+                nd = d + cost[e] - pi[y]
+                if nd < dist.get(y, _INF):
+                    dist[y] = nd
+                    relaxed[y] += 1
+                    if relaxed[y] > len(pi):
+                        return False
+                    if y not in queued:
+                        queued.add(y)
+                        queue.append(y)
+        for x, d in dist.items():
+            pi[x] += d
+        return True
+
+
+class _DayMatching:
+    """Min-cost assignment of one day's bookings to tutors.
+
+    Network: source -> booking (1) -> tutor x overlap group (1) -> tutor's
+    day -> sink (one unit edge per booking the tutor can still take). A
+    tutor takes at most one booking from each group of mutually overlapping
+    bookings. When two bookings from different groups still overlap on a
+    tutor, the later one's edge is moved onto the earlier one's group node
+    for that tutor, so the two compete for one place; a second overlap on
+    the same tutor removes the edge. Whatever is still unplaced then goes to
+    the cheapest tutor that is free for it, if any, and if a booking is
+    still unplaced while one of its tutors has room, `_search` looks for a
+    plan placing more.
+    """
+
+    MAX_ROUNDS = 50
+
+    def __init__(self, edges: List[Dict[int, int]], capacity: List[int], spans: List[Tuple[int, int]],
+                 load_costs: Optional[List[List[int]]] = None, search_nodes: Optional[int] = None):
+        self.edges = edges              # per booking: {tutor: cost}
+        self.capacity = capacity        # per tutor
+        self.spans = spans              # per booking: (start, end) minutes
+        # per tutor: extra cost of its 1st, 2nd, ... booking of the day
+        self.load_costs = load_costs or [[0] * c for c in capacity]
+        self.search_nodes = AUTO_ASSIGN_SEARCH_NODES if search_nodes is None else search_nodes
+        self.repairs = 0
+        self.searched = 0               # search steps taken
+        self.exact = True               # False if the search hit its bound
+        self.cost = 0
+
+    def solve(self) -> List[int]:
+        n, m = len(self.edges), len(self.capacity)
+        src, sink = 0, 1
+        group = _clique_cover(self.spans)
+        flow = _MinCostFlow(2 + n + m)
+        # One unit edge per booking a tutor can still take, each dearer than
+        # the last, so the flow spreads bookings instead of stacking them
+        to_sink = [[flow.add_edge(2 + n + t, sink, 1, self.load_costs[t][k]) for k in range(c)]
+                   for t, c in enumerate(self.capacity)]
+        from_src = []
+        slot_out: Dict[int, int] = {}
+        arcs: List[Dict[int, int]] = []     # per booking: {tutor: edge}
+        slots: Dict[Tuple[int, int], int] = {}
+        for b, row in enumerate(self.edges):
+            from_src.append(flow.add_edge(src, 2 + b, 1, 0))
+            out = {}
+            for t, c in row.items():
+                key = (t, group[b])
+                if key not in slots:
+                    node = slots[key] = flow.add_node()
+                    slot_out[node] = flow.add_edge(node, 2 + n + t, 1, 0)
+                out[t] = flow.add_edge(2 + b, slots[key], 1, c)
+            arcs.append(out)
+
+        def assigned() -> List[int]:
+            result = [-1] * n
+            for b, out in enumerate(arcs):
+                for t, e in out.items():
+                    if flow.cap[e] == 0 and flow.cap[e ^ 1] == 1:
+                        result[b] = t
+            return result
+
+        flow.run(src, sink)
+        moved = set()
+        for _ in range(self.MAX_ROUNDS):
+            result = assigned()
+            conflicts = self._conflicts(result, self.spans)
+            if not conflicts:
+                break
+            # Take each offending booking's unit of flow back, then let it
+            # (and anyone it displaces) augment again
+            for b, t, a in conflicts:
+                self.repairs += 1
+                e = arcs[b].pop(t)
+                last = max(i for i in to_sink[t] if flow.cap[i] == 0)
+                flow.cancel([from_src[b], e, slot_out[flow.to[e]], last])
+                flow.cap[e] = 0
+                if (b, t) not in moved:
+                    moved.add((b, t))
+                    arcs[b][t] = flow.add_edge(2 + b, flow.to[arcs[a][t]], 1, self.edges[b][t])
+            # Unused edges into a tutor already holding an overlapping booking
+            # would only cause the same repair next round: move them now
+            result = assigned()
+            holding: Dict[int, List[int]] = defaultdict(list)
+            for b, t in enumerate(result):
+                if t >= 0:
+                    holding[t].append(b)
+            for b, out in enumerate(arcs):
+                for t, e in list(out.items()):
+                    if (b, t) in moved or flow.cap[e] == 0:
+                        continue
+                    a = next((a for a in holding.get(t, ()) if flow.to[arcs[a][t]] != flow.to[e]
+                              and _overlaps([self.spans[a]], *self.spans[b])), None)
+                    if a is not None:
+                        moved.add((b, t))
+                        flow.cap[e] = 0
+                        out[t] = flow.add_edge(2 + b, flow.to[arcs[a][t]], 1, self.edges[b][t])
+            if not flow.reset_potentials(src, sink):
+                # Leave the rest to _fill and _search
+                break
+            flow.run(src, sink)
+        result = assigned()
+        for b, _, _ in self._conflicts(result, self.spans):
+            result[b] = -1
+        return self._costed(self._search(self._fill(result)))
+
+    def _fill(self, result: List[int]) -> List[int]:
+        """Give still-unplaced bookings the cheapest tutor with room and no overlap."""
+        load: Dict[int, int] = defaultdict(int)
+        taken: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+        for b, t in enumerate(result):
+            if t >= 0:
+                load[t] += 1
+                taken[t].append(self.spans[b])
+        for b, t in enumerate(result):
+            if t >= 0:
+                continue
+            options = [
+                (c + self.load_costs[u][load[u]], u) for u, c in self.edges[b].items()
+                if load[u] < self.capacity[u] and not _overlaps(taken[u], *self.spans[b])
+            ]
+            if options:
+                u = min(options)[1]
+                result[b] = u
+                load[u] += 1
+                taken[u].append(self.spans[b])
+        return result
+
+    def _improvable(self, result: List[int]) -> bool:
+        """Whether an unplaced booking has an eligible tutor with room left."""
+        load: Dict[int, int] = defaultdict(int)
+        for t in result:
+            if t >= 0:
+                load[t] += 1
+        return any(t < 0 and any(load[u] < self.capacity[u] for u in self.edges[b])
+                   for b, t in enumerate(result))
+
+    def _plan_cost(self, result: List[int]) -> int:
+        load: Dict[int, int] = defaultdict(int)
+        cost = 0
+        for b in sorted(range(len(result)), key=lambda b: self.spans[b]):
+            t = result[b]
+            if t >= 0:
+                cost += self.edges[b][t] + self.load_costs[t][load[t]]
+                load[t] += 1
+        return cost
+
+    def _search(self, result: List[int]) -> List[int]:
+        """Most bookings placed, then least cost: branch and bound seeded with `result`.
+
+        Bookings are taken in start order, so one overlaps a tutor's earlier
+        picks exactly when it starts before the latest of their ends. Each
+        booking tries its tutors cheapest first, then staying unplaced. A
+        branch is cut when even placing every remaining booking that has a
+        tutor could not beat the best plan so far. Stops after
+        `search_nodes` steps, keeping the best plan found.
+        """
+        if not self._improvable(result):
+            return result
+        order = sorted(range(len(result)), key=lambda b: self.spans[b])
+        # Bookings with a tutor at or after each position: the bound on what is left
+        placeable = [0] * (len(order) + 1)
+        for i in range(len(order) - 1, -1, -1):
+            placeable[i] = placeable[i + 1] + bool(self.edges[order[i]])
+        options = [sorted(self.edges[b].items(), key=lambda tc: (tc[1], tc[0])) for b in order]
+
+        best = [sum(t >= 0 for t in result), self._plan_cost(result), list(result)]
+        load = [0] * len(self.capacity)
+        busy_until = [-1] * len(self.capacity)
+        choice = [-1] * len(result)
+        steps = 0
+
+        def visit(i: int, placed: int, cost: int) -> bool:
+            nonlocal steps
+            steps += 1
+            if steps > self.search_nodes:
+                return False
+            if i == len(order):
+                if (placed, -cost) > (best[0], -best[1]):
+                    best[:] = [placed, cost, list(choice)]
+                return True
+            if placed + placeable[i] < best[0] or (placed + placeable[i] == best[0] and cost >= best[1]):
+                return True
+            b = order[i]
+            start, end = self.spans[b]
+            for t, c in options[i]:
+                if load[t] >= self.capacity[t] or start < busy_until[t]:
+                    continue
+                prev = busy_until[t]
+                step = c + self.load_costs[t][load[t]]
+                load[t] += 1
+                busy_until[t] = max(prev, end)
+                choice[b] = t
+                ok = visit(i + 1, placed + 1, cost + step)
+                load[t] -= 1
+                busy_until[t] = prev
+                choice[b] = -1
+                if not ok:
+                    return False
+            return visit(i + 1, placed, cost)
+
+        self.exact = visit(0, 0, 0)
+        self.searched += steps
+        return best[2]
+
+    def unplaced_reason(self, result: List[int], b: int) -> str:
+        """Why booking `b` is unplaced in `result`: every tutor full, or a time clash."""
+        load: Dict[int, int] = defaultdict(int)
+        for t in result:
+            if t >= 0:
+                load[t] += 1
+        if any(load[u] < self.capacity[u] for u in self.edges[b]):
+            return 'clashes with other assignments'
+        return 'tutors fully booked'
+
+    def _costed(self, result: List[int]) -> List[int]:
+        load: Dict[int, int] = defaultdict(int)
+        self.cost = 0
+        for b, t in enumerate(result):
+            if t >= 0:
+                self.cost += self.edges[b][t] + self.load_costs[t][load[t]]
+                load[t] += 1
+        return result
+
+    @staticmethod
+    def _conflicts(assigned: List[int], spans: List[Tuple[int, int]]) -> List[Tuple[int, int, int]]:
+        """(booking, tutor, earlier booking) for each booking overlapping an earlier one of its tutor."""
+        by_tutor: Dict[int, List[int]] = defaultdict(list)
+        for b, t in enumerate(assigned):
+            if t >= 0:
+                by_tutor[t].append(b)
+        out = []
+        for t, members in by_tutor.items():
+            busy_until, holder = -1, -1
+            for b in sorted(members, key=lambda b: spans[b]):
+                if spans[b][0] < busy_until:
+                    out.append((b, t, holder))
+                else:
+                    busy_until, holder = spans[b][1], b
+        return out
+
+
+def propose_assignments(
+    bookings: Iterable[Dict],
+    tutors: Iterable[Dict],
+    unavailability=None,
+    confirmed: Iterable[Dict] = (),
+    daily_cap: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Compute a plan for `bookings` (Pending rows) over `tutors` (approved rows).
+
+    `unavailability` is an `UnavailabilityIndex` covering the bookings'
+    dates; `confirmed` are the busy bookings (with `tutor_id`) on those
+    dates. Returns {'assignments': {booking_id: tutor_id}, 'unassigned':
+    {booking_id: reason}, 'cost', 'repairs'}.
+    """
+    cap = AUTO_ASSIGN_DAILY_CAP if daily_cap is None else daily_cap
+    bookings = list(bookings or [])
+    tutors = list(tutors or [])
+    unassigned: Dict[Any, str] = {}
+
+    times = normalize_booking_times(bookings, use_slot=True)
+    starts = times['start'].to_list()
+    ends = times['end'].to_list()
+    valid = times['valid'].to_numpy()
+
+    # Busy bookings per tutor and day: their spans and the day's load
+    busy: Dict[Tuple[Any, date], List[Tuple[int, int]]] = defaultdict(list)
+    confirmed = [c for c in confirmed or [] if c.get('tutor_id') is not None]
+    for c, span in zip(confirmed, booking_spans(confirmed)):
+        if span is not None:
+            day, s, e = span
+            busy[(str(c.get('tutor_id')), date.fromordinal(day))].append((s // 60, e // 60))
+
+    by_day: Dict[date, List[int]] = defaultdict(list)
+    for i, b in enumerate(bookings):
+        if not valid[i]:
+            unassigned[b.get('id')] = 'no exam date/start time'
+        else:
+            by_day[starts[i].date()].append(i)
+
+    tutor_ids = [str(t.get('id')) for t in tutors]
+    tutor_pos = {tid: k for k, tid in enumerate(tutor_ids)}
+    eligible_cache: Dict[Tuple, List[Dict]] = {}
+
+    assignments: Dict[Any, Any] = {}
+    total_cost = 0
+    repairs = 0
+    for day, idx in sorted(by_day.items()):
+        # Day-local tutor numbering: only tutors some booking can use
+        local: Dict[int, int] = {}
+        edges: List[Dict[int, int]] = []
+        spans: List[Tuple[int, int]] = []
+        for i in idx:
+            b = bookings[i]
+            s, e = starts[i], ends[i]
+            start_min = _minutes(s)
+            span = (start_min, start_min + max(int((e - s).total_seconds() // 60), 0) + _extra_minutes(b.get('extra_time')))
+            spans.append(span)
+            duration = span[1] - span[0]
+            key = (b.get('role_required'), b.get('subject'), day, s.time(), duration)
+            if key not in eligible_cache:
+                eligible_cache[key] = eligible_tutors(
+                    tutors, b.get('role_required'), b.get('subject'), day,
+                    s.time().strftime('%H:%M:%S'), duration, unavailability,
+                )
+            row: Dict[int, int] = {}
+            for t in eligible_cache[key]:
+                tid = str(t.get('id'))
+                spans_busy = busy.get((tid, day), ())
+                if len(spans_busy) >= cap or _overlaps(spans_busy, *span):
+                    continue
+                k = local.setdefault(tutor_pos[tid], len(local))
+                row[k] = _edge_cost(t, 0, b.get('role_required'))
+            edges.append(row)
+            if not row:
+                unassigned[b.get('id')] = 'no eligible tutor free'
+
+        if not local:
+            continue
+        global_of = {k: g for g, k in local.items()}
+        loads = [len(busy.get((tutor_ids[global_of[k]], day), ())) for k in range(len(local))]
+        # The day's load is priced on the tutor side, booking by booking
+        matching = _DayMatching(edges, [cap - had for had in loads], spans,
+                                [[COST_PER_DAY_BOOKING * (had + j) for j in range(cap - had)] for had in loads])
+        result = matching.solve()
+        repairs += matching.repairs
+        total_cost += matching.cost
+        for j, i in enumerate(idx):
+            bid = bookings[i].get('id')
+            if result[j] >= 0:
+                assignments[bid] = tutors[global_of[result[j]]].get('id')
+            elif bid not in unassigned:
+                unassigned[bid] = matching.unplaced_reason(result, j)
+
+    return {'assignments': assignments, 'unassigned': unassigned, 'cost': total_cost, 'repairs': repairs}
+
+
+def fetch_confirmed_bookings(date_from, date_to, client=None) -> List[Dict]:
+    """Busy (Confirmed/TutorConfirmed) bookings with a tutor between the two dates (inclusive)."""
+    return fetch_busy_bookings(date_from, date_to, client=client)
+
+
+def propose_plan(pending: Iterable[Dict], tutors: Optional[List[Dict]] = None, client=None,
+                 daily_cap: Optional[int] = None) -> Dict[str, Any]:
+    """Load tutors, unavailability and confirmed bookings for `pending`'s dates and propose a plan.
+
+    Costs one tutors query (unless supplied or cached), one unavailability
+    query and one confirmed-bookings query.
+    """
+    pending = list(pending or [])
+    times = normalize_booking_times(pending, use_slot=True)
+    days = times['start'][times['valid']]
+    if days.empty:
+        return propose_assignments(pending, [], daily_cap=daily_cap)
+    first, last = days.min().date(), days.max().date()
+    if tutors is None:
+        tutors = load_approved_tutors(client)
+    unavailability = unavailability_for(first, last, client=client)
+    confirmed = fetch_confirmed_bookings(first, last, client=client)
+    return propose_assignments(pending, tutors, unavailability, confirmed, daily_cap)
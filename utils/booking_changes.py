@@ -0,0 +1,50 @@
+"""Process-wide change counter for the bookings table.
+
+Per-session caches of booking data (see `utils.tutor_dashboard`) remember
+the counter value they were built at and reload once it moves. Every page
+that writes to `bookings` calls `mark_bookings_changed()` straight after the
+write, so a change made in any session is seen by all sessions served by
+this process on their next render; changes made outside the app are picked
+up when the caches' TTL runs out.
+
+Pages that have the written rows at hand (the `data` of the update's
+response) pass them along. Indexes that can apply a change in place (see
+`utils.busy_index`) register with `on_bookings_changed` and receive them
+instead of reloading.
+"""
+
+from typing import Optional, Callable, Dict, List, Iterable
+import threading
+
+
+_version = 0
+_lock = threading.Lock()
+_listeners: List[Callable[[int, Optional[List[Dict]]], None]] = []
+
+
+def bookings_version() -> int:
+    """The current counter value."""
+    return _version
+
+
+def on_bookings_changed(callback: Callable[[int, Optional[List[Dict]]], None]) -> None:
+    """Call `callback(version, rows)` after every change; `rows` is None when they were not given."""
+    with _lock:
+        _listeners.append(callback)
+
+
+def mark_bookings_changed(rows: Optional[Iterable[Dict]] = None) -> int:
+    """Record that bookings were written (optionally the rows as written); returns the new counter value."""
+    global _version
+    # No rows back (e.g. hidden by row-level security) means "changed, reload"
+    rows = [r for r in rows or [] if isinstance(r, dict)] or None
+    with _lock:
+        _version += 1
+        version = _version
+        listeners = list(_listeners)
+    for callback in listeners:
+        try:
+            callback(version, rows)
+        except Exception:
+            pass
+    return version
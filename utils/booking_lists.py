@@ -0,0 +1,101 @@
+"""Session-held booking lists for the parent and tutor booking pages.
+
+The cancel, accept and decline buttons on those pages used to rerun the
+whole page, which queried the visitor's bookings and their parents/tutors
+again before the button's own update ran. The lists are now drawn inside an
+`st.fragment`, so a click reruns only the list, and `BookingList` keeps the
+rows and their lookups (`utils.enrichment.enrich_bookings`) in
+`st.session_state`:
+
+- the first draw loads them (one bookings query plus one lookup query);
+- later draws are served from the session;
+- after the page's own write, `apply_written(rows, version)` merges the rows
+  PostgREST returned into the held list instead of reloading it.
+
+As in `utils.tutor_dashboard`, a held list is reloaded once any other
+booking write in this process moves the change counter
+(`utils.booking_changes`), or after `BOOKING_LIST_TTL` seconds.
+"""
+
+from typing import Optional, Dict, List, Callable, MutableMapping, Iterable, Any
+import os
+import time as _time
+
+from utils.booking_changes import bookings_version
+from utils.enrichment import EnrichedBookings
+
+
+BOOKING_LIST_TTL = int(os.getenv("BOOKING_LIST_TTL", "60"))
+
+
+class BookingList:
+    """A list of bookings and their lookups, held in a Streamlit session under `key`.
+
+    `load()` returns the rows; `enrich(rows)` returns their
+    `EnrichedBookings` (omit it to skip lookups).
+    """
+
+    def __init__(self, session: MutableMapping, key: str, load: Callable[[], List[Dict]],
+                 enrich: Optional[Callable[[List[Dict]], EnrichedBookings]] = None, ttl: Optional[int] = None):
+        self.session = session
+        self.key = f"_booking_list_{key}"
+        self._load = load
+        self._enrich = enrich
+        self.ttl = BOOKING_LIST_TTL if ttl is None else ttl
+
+    def _entry(self, count: bool = True) -> Dict[str, Any]:
+        entry = self.session.get(self.key)
+        if (
+            entry
+            and entry['version'] == bookings_version()
+            and _time.monotonic() - entry['loaded_at'] < self.ttl
+        ):
+            if count:
+                entry['hits'] += 1
+            return entry
+
+        version = bookings_version()
+        rows = self._load() or []
+        enriched = self._enrich(rows) if self._enrich else None
+        loads = (entry or {}).get('loads', 0) + 1
+        entry = {'rows': rows, 'enriched': enriched, 'version': version, 'loaded_at': _time.monotonic(),
+                 'loads': loads, 'hits': (entry or {}).get('hits', 0)}
+        self.session[self.key] = entry
+        return entry
+
+    def rows(self) -> List[Dict]:
+        """The bookings, loading them if the held copy is missing or stale."""
+        return self._entry()['rows']
+
+    def enriched(self) -> Optional[EnrichedBookings]:
+        """Parent/tutor lookups for `rows()` (None without an `enrich` function)."""
+        return self._entry(count=False)['enriched']
+
+    def apply_written(self, rows: Optional[Iterable[Dict]], version: int) -> None:
+        """Merge rows this session just wrote, as returned by the update, into the held list.
+
+        `version` is what `mark_bookings_changed` returned for that write. If
+        other writes happened since the list was loaded, or no rows came back,
+        the list is reloaded on the next draw instead.
+        """
+        entry = self.session.get(self.key)
+        rows = [r for r in rows or [] if isinstance(r, dict)]
+        if not entry or not rows or entry['version'] != version - 1:
+            self.invalidate()
+            return
+        by_id = {r.get('id'): r for r in rows}
+        for held in entry['rows']:
+            # In place, so the lookups (keyed by booking id) stay valid
+            written = by_id.get(held.get('id'))
+            if written is not None:
+                held.update(written)
+        entry['version'] = version
+
+    def invalidate(self) -> None:
+        """Drop the held list; the next draw loads it again."""
+        self.session.pop(self.key, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Loads and draws served from the session for this list."""
+        entry = self.session.get(self.key) or {}
+        return {'loads': entry.get('loads', 0), 'queries_saved': entry.get('hits', 0)}
@@ -0,0 +1,167 @@
+"""Parse booking start/end times for many bookings at once.
+
+Bookings carry their start as `exam_date` plus `start_time` (`HH:MM:SS` or
+`HH:MM`), and in some schemas as `slot` / `start_datetime` (a datetime
+string). `normalize_booking_times` parses those columns for a whole list of
+bookings (or a DataFrame) in one vectorized pandas pass and returns aligned
+`start` / `end` datetime64 columns plus a `valid` mask, so windowing,
+sorting and cutoff checks are array operations instead of a `strptime` per
+row.
+
+The rules match the per-row parsers this replaced:
+
+- by default only `exam_date` + `start_time` are read, as on the admin
+  lists; `use_slot=True` prefers `slot` / `start_datetime` when they parse
+  and falls back to `exam_date` + `start_time`, as the tutor pages did;
+- a missing `start_time` means midnight, except with
+  `require_start_time=True`: the row is then unparseable, as the
+  cancellation cutoff check has always treated it.
+
+Datetime strings with a UTC offset are read as the wall-clock time written
+in them, like the dates and times the rest of the app displays.
+"""
+
+from typing import Optional, Dict, List, Iterable, Union
+from datetime import datetime, time as dt_time
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_DURATION_MINUTES = 60
+
+# Parents may cancel without billing until 17:00 the day before the exam
+CANCEL_CUTOFF_TIME = dt_time(17, 0)
+
+
+TIME_COLUMNS = ('slot', 'start_datetime', 'exam_date', 'start_time', 'duration')
+
+
+def _frame(bookings: Union[pd.DataFrame, Iterable[Dict]]) -> pd.DataFrame:
+    if isinstance(bookings, pd.DataFrame):
+        return bookings
+    rows = list(bookings or [])
+    # Only the time columns, pulled straight from the dicts
+    return pd.DataFrame({c: [b.get(c) for b in rows] for c in TIME_COLUMNS}, index=pd.RangeIndex(len(rows)))
+
+
+def _column(df: pd.DataFrame, name: str) -> pd.Series:
+    if name in df:
+        return df[name]
+    return pd.Series(None, index=df.index, dtype=object)
+
+
+def _text(s: pd.Series) -> pd.Series:
+    """Strings with blanks as missing."""
+    s = s.astype('string').str.strip()
+    return s.mask(s == '')
+
+
+def _parse_distinct(values: pd.Series, parse, missing) -> np.ndarray:
+    """Apply the vectorized `parse` to each distinct value once, then broadcast.
+
+    Bookings share few distinct dates and times, so this parses hundreds of
+    strings rather than one per booking. `missing` fills null inputs.
+    """
+    codes, uniques = pd.factorize(values)
+    parsed = np.append(parse(pd.Series(uniques, dtype=object)).to_numpy(), missing)
+    return parsed[codes]  # code -1 (null) picks `missing`
+
+
+def _parse_slot(u: pd.Series) -> pd.Series:
+    # Drop any fractional seconds/offset: keep the wall-clock time as written
+    return pd.to_datetime(_text(u).str.slice(0, 19), format='ISO8601', errors='coerce')
+
+
+def _parse_date(u: pd.Series) -> pd.Series:
+    return pd.to_datetime(_text(u).str.slice(0, 10), format='%Y-%m-%d', errors='coerce')
+
+
+def _parse_time(u: pd.Series) -> pd.Series:
+    t = _text(u)
+    t = t.where(t.str.count(':') != 1, t + ':00')
+    offset = pd.to_timedelta(t, errors='coerce')
+    return offset.where((offset >= pd.Timedelta(0)) & (offset < pd.Timedelta(days=1)))
+
+
+def normalize_booking_times(
+    bookings: Union[pd.DataFrame, Iterable[Dict]],
+    default_duration: int = DEFAULT_DURATION_MINUTES,
+    use_slot: bool = False,
+    require_start_time: bool = False,
+) -> pd.DataFrame:
+    """`start`, `end` (datetime64) and `valid` (bool) columns aligned with `bookings`.
+
+    `start` comes from `exam_date` + `start_time` (midnight when the time is
+    missing, unless `require_start_time`); with `use_slot`, from
+    `slot`/`start_datetime` first when that parses. `end` adds `duration`
+    minutes (or `default_duration`). Unparseable rows get NaT and
+    `valid=False`. The result shares the DataFrame's index, or 0..n-1 for
+    a list.
+    """
+    df = _frame(bookings)
+    nat = np.datetime64('NaT', 'ns')
+    if df.empty:
+        empty = pd.Series(dtype='datetime64[ns]', index=df.index)
+        return pd.DataFrame({'start': empty, 'end': empty.copy(), 'valid': pd.Series(dtype=bool, index=df.index)})
+
+    day = _parse_distinct(_column(df, 'exam_date'), _parse_date, nat)
+    no_time = np.timedelta64('NaT', 'ns') if require_start_time else np.timedelta64(0, 'ns')
+    # Blank times count as missing
+    offset = _parse_distinct(_text(_column(df, 'start_time')), _parse_time, no_time)
+    start = (day + offset).astype('datetime64[ns]')
+
+    if use_slot:
+        slot = _parse_distinct(_column(df, 'slot'), _parse_slot, nat)
+        slot_alt = _parse_distinct(_column(df, 'start_datetime'), _parse_slot, nat)
+        slot = np.where(np.isnat(slot), slot_alt, slot)
+        start = np.where(np.isnat(slot), start, slot).astype('datetime64[ns]')
+
+    minutes = pd.to_numeric(_column(df, 'duration'), errors='coerce').fillna(default_duration).to_numpy()
+    end = start + (minutes * 60e9).astype('timedelta64[ns]')
+    return pd.DataFrame({'start': start, 'end': end, 'valid': ~np.isnat(start)}, index=df.index)
+
+
+def start_datetimes(times: pd.DataFrame) -> List[Optional[datetime]]:
+    """`times['start']` as Python datetimes, None where invalid."""
+    return [ts.to_pydatetime() if not pd.isna(ts) else None for ts in times['start']]
+
+
+def window_positions(times: pd.DataFrame, start: Optional[datetime], end: Optional[datetime] = None) -> np.ndarray:
+    """Positions of bookings starting within [start, end], ordered by start (None = unbounded)."""
+    s = times['start'].to_numpy()
+    mask = times['valid'].to_numpy()
+    if start is not None:
+        mask = mask & (s >= np.datetime64(start, 'ns'))
+    if end is not None:
+        mask = mask & (s <= np.datetime64(end, 'ns'))
+    idx = np.flatnonzero(mask)
+    return idx[np.argsort(s[idx], kind='stable')]
+
+
+def sorted_positions(times: pd.DataFrame) -> np.ndarray:
+    """Positions ordered by start time, unparseable bookings last (in input order)."""
+    s = times['start'].to_numpy()
+    valid = times['valid'].to_numpy()
+    idx = np.flatnonzero(valid)
+    return np.concatenate([idx[np.argsort(s[idx], kind='stable')], np.flatnonzero(~valid)])
+
+
+def started_mask(times: pd.DataFrame, now: datetime) -> np.ndarray:
+    """True for bookings that have a start time before `now`."""
+    return times['valid'].to_numpy() & (times['start'].to_numpy() < np.datetime64(now, 'ns'))
+
+
+def cancellation_cutoffs(times: pd.DataFrame) -> pd.Series:
+    """Latest free-cancellation time per booking: 17:00 the day before (NaT if invalid)."""
+    day_before = times['start'].dt.normalize() - pd.Timedelta(days=1)
+    return day_before + pd.Timedelta(hours=CANCEL_CUTOFF_TIME.hour, minutes=CANCEL_CUTOFF_TIME.minute)
+
+
+def cancellation_cutoff_passed(booking: Dict, now: Optional[datetime] = None) -> bool:
+    """Whether cancelling `booking` at `now` is after its cutoff.
+
+    False if its exam date or start time is missing or unparseable.
+    """
+    cutoff = cancellation_cutoffs(normalize_booking_times([booking], require_start_time=True))
+    return bool(cutoff.notna().iloc[0] and (now or datetime.now()) > cutoff.iloc[0])
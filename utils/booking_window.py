@@ -0,0 +1,66 @@
+"""Fetch the bookings that fall inside a time window.
+
+The admin dashboard used to select every booking and parse each row's
+`exam_date`/`start_time` in Python to keep the next 48 hours. Here the
+`exam_date` range is pushed to the database (so the query only touches the
+few days in the window, via the index in
+`scripts/add_bookings_exam_date_index.sql`) and only the columns the view
+renders are selected; the exact start/end times are then checked on that
+small result.
+"""
+
+from typing import Optional, Dict, List, Tuple, Iterable
+from datetime import datetime, timedelta
+
+from utils.booking_times import normalize_booking_times, start_datetimes, window_positions
+
+
+DASHBOARD_COLUMNS = "id,exam_date,start_time,child_name,subject,status,school,duration,role_required,tutor_id,parent_id"
+
+
+def _get_client(client=None):
+    if client is not None:
+        return client
+    from utils.database import supabase
+    return supabase
+
+
+def window_bounds(now: Optional[datetime] = None, hours_ahead: int = 48, days_back: int = 0) -> Tuple[datetime, datetime]:
+    """(start, end) of the dashboard window: `days_back` days before now to `hours_ahead` after."""
+    now = now or datetime.now()
+    return now - timedelta(days=days_back), now + timedelta(hours=hours_ahead)
+
+
+def booking_start(b: Dict) -> Optional[datetime]:
+    """Start datetime of one booking; None if unparseable."""
+    return start_datetimes(normalize_booking_times([b]))[0]
+
+
+def filter_window(bookings: Iterable[Dict], start: datetime, end: datetime) -> List[Tuple[datetime, Dict]]:
+    """(start datetime, booking) pairs inside [start, end], sorted by time."""
+    bookings = list(bookings)
+    times = normalize_booking_times(bookings)
+    positions = window_positions(times, start, end)
+    starts = times['start'].iloc[positions]
+    return [(ts.to_pydatetime(), bookings[i]) for ts, i in zip(starts, positions)]
+
+
+def fetch_bookings_window(
+    start: datetime,
+    end: datetime,
+    status: Optional[str] = None,
+    columns: str = DASHBOARD_COLUMNS,
+    client=None,
+) -> List[Tuple[datetime, Dict]]:
+    """Bookings starting within [start, end], excluding cancelled ones.
+
+    Only rows whose `exam_date` lies between the window's first and last
+    day are read. Raises if the query fails.
+    """
+    q = _get_client(client).table("bookings").select(columns)
+    q = q.gte("exam_date", start.date().isoformat()).lte("exam_date", end.date().isoformat())
+    if status:
+        q = q.eq("status", status)
+    q = q.neq("status", "Cancelled")
+    res = q.order("exam_date").order("start_time").execute()
+    return filter_window(res.data or [], start, end)
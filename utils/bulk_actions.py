@@ -0,0 +1,223 @@
+"""Bulk admin operations: one write per table and one audit row per batch.
+
+Approving tutors and confirming pending bookings used to be one click, one
+`update().eq('id', ...)` and one rerun per row. The functions here take a
+whole selection:
+
+- `set_tutors_approved` approves (or denies) every selected tutor with a
+  single `update(...).in_('id', ids)`.
+- `confirm_bookings` confirms every selected booking. Assignments are first
+  checked against each other, so one tutor is never confirmed for two
+  overlapping bookings of the batch. Bookings assigned to
+  the same tutor share one `update(...).in_('id', ids)`, so a batch costs
+  one request per distinct tutor rather than one per booking, and only rows
+  still `Pending` are changed. The tutor and parent emails for the whole
+  batch are looked up with one `in_` query per table and queued to the
+  outbox in one transaction.
+
+Each call writes a single `admin_actions` row summarizing the batch and
+returns a result dict the page can display.
+"""
+
+from typing import Optional, Dict, List, Iterable, Tuple, Any
+from collections import defaultdict
+
+
+def _get_client(client=None):
+    if client is not None:
+        return client
+    from utils.database import supabase
+    return supabase
+
+
+def _get_audit_client(client=None):
+    if client is not None:
+        return client
+    from utils.session import get_supabase_service
+    return get_supabase_service()
+
+
+def _unique(ids: Iterable[Any]) -> List[Any]:
+    return list(dict.fromkeys(i for i in ids if i is not None and i != ''))
+
+
+def record_admin_action(action: str, target_type: str, target_id: str, details: Dict,
+                        admin_email: Optional[str] = None, client=None) -> bool:
+    """Insert one `admin_actions` row; returns False (never raises) if it could not be written."""
+    try:
+        _get_audit_client(client).table('admin_actions').insert({
+            'admin_email': admin_email,
+            'action': action,
+            'target_type': target_type,
+            'target_id': target_id,
+            'details': details,
+        }).execute()
+        return True
+    except Exception:
+        return False
+
+
+def set_tutors_approved(tutor_ids: Iterable[Any], approved: bool = True, admin_email: Optional[str] = None,
+                        client=None, audit_client=None) -> Dict[str, Any]:
+    """Set `approved` on all `tutor_ids` in one update and audit the batch.
+
+    Returns {'requested', 'updated', 'audited'}; `updated` lists the ids
+    the database reported as changed. Raises if the update fails.
+    """
+    ids = _unique(tutor_ids)
+    if not ids:
+        return {'requested': [], 'updated': [], 'audited': False}
+    res = _get_client(client).table('tutors').update({'approved': approved}).in_('id', ids).execute()
+    updated = [r.get('id') for r in getattr(res, 'data', None) or []]
+
+    from utils.reference_cache import tutors_cache
+    tutors_cache.invalidate()
+
+    audited = record_admin_action(
+        'bulk_approve_tutors' if approved else 'bulk_deny_tutors',
+        'tutor',
+        f"{len(ids)} tutors",
+        {'tutor_ids': [str(i) for i in ids], 'updated': len(updated)},
+        admin_email=admin_email,
+        client=audit_client,
+    )
+    return {'requested': ids, 'updated': updated, 'audited': audited}
+
+
+def tutor_assignment_email(booking: Dict, tutor: Optional[Dict], parent: Optional[Dict]) -> Optional[Tuple[str, str, str]]:
+    """(to, subject, body) telling the tutor about the booking, or None without a tutor email."""
+    if not tutor or not tutor.get('email'):
+        return None
+    t_name = f"{tutor.get('name') or ''} {tutor.get('surname') or ''}".strip()
+    subject = f"New booking assigned: {booking.get('child_name') or 'Child'} — {booking.get('subject') or ''}"
+    body = (
+        f"Hello {t_name or 'Tutor'},\n\n"
+        f"You have been assigned to a booking:\n"
+        f"Child: {booking.get('child_name')}\n"
+        f"Subject: {booking.get('subject')}\n"
+        f"Date: {booking.get('exam_date')}\n"
+        f"Start Time: {booking.get('start_time')}\n"
+        f"Duration: {booking.get('duration')} minutes\n"
+        f"Parent contact (email): {parent.get('email') if parent else 'N/A'}\n"
+        f"Parent phone: {parent.get('phone') if parent else 'N/A'}\n\n"
+        f"Please log in to the admin panel to view details.\n"
+    )
+    return tutor.get('email'), subject, body
+
+
+def parent_confirmation_email(booking: Dict, tutor: Optional[Dict], parent: Optional[Dict],
+                              tutor_id=None) -> Optional[Tuple[str, str, str]]:
+    """(to, subject, body) confirming the booking to the parent, or None without a parent email."""
+    if not parent or not parent.get('email'):
+        return None
+    tutor_display = (f"{tutor.get('name') or ''} {tutor.get('surname') or ''}".strip()) if tutor else str(tutor_id)
+    subject = f"Booking confirmed — Tutor assigned: {tutor_display}"
+    body = (
+        f"Hello {parent.get('parent_name') or ''},\n\n"
+        f"Your booking has been confirmed.\n\n"
+        f"Booking details:\n"
+        f"- Child: {booking.get('child_name') or 'N/A'}\n"
+        f"- Date: {booking.get('exam_date')}\n"
+        f"- Time: {booking.get('start_time')}\n"
+        f"- Assigned tutor: {tutor_display}\n"
+        f"- Tutor email: {tutor.get('email') if tutor else 'N/A'}\n"
+        f"- Tutor phone: {tutor.get('phone') if tutor else 'N/A'}\n\n"
+        f"If you have any questions, reply to this email or contact admin.\n"
+    )
+    return parent.get('email'), subject, body
+
+
+def confirm_bookings(bookings: Iterable[Dict], assignments: Dict[Any, Any], admin_email: Optional[str] = None,
+                     notify: bool = True, client=None, audit_client=None) -> Dict[str, Any]:
+    """Confirm `bookings`, assigning each the tutor in `assignments` ({booking_id: tutor_id}).
+
+    Bookings without an assignment are skipped, and so is a booking whose
+    tutor already takes an overlapping booking earlier in the batch (the
+    clash is reported in `errors`). Returns {'confirmed', 'skipped',
+    'errors', 'emails_queued', 'audited'}; `confirmed` holds the ids the
+    database changed (rows no longer Pending are left alone).
+    """
+    from utils.booking_changes import mark_bookings_changed
+    from utils.busy_index import BusyIndex
+
+    by_id = {str(b.get('id')): b for b in bookings or []}
+    by_tutor: Dict[Any, List[Any]] = defaultdict(list)
+    skipped: List[Any] = []
+    errors: List[str] = []
+    # The batch's own assignments, so two of them cannot double-book a tutor
+    batch = BusyIndex()
+    for b in by_id.values():
+        tid = assignments.get(b.get('id'))
+        if tid in (None, ''):
+            skipped.append(b.get('id'))
+            continue
+        planned = dict(b, tutor_id=tid, status='Confirmed')
+        clashes = batch.conflicts_with(planned)
+        if clashes:
+            skipped.append(b.get('id'))
+            errors.append(f"booking {b.get('id')}: tutor {tid} already takes overlapping booking "
+                          f"{', '.join(str(i) for i in clashes)} in this batch")
+            continue
+        batch.update(planned)
+        by_tutor[tid].append(b.get('id'))
+
+    sb = _get_client(client)
+    confirmed: List[Any] = []
+    written: List[Dict] = []
+    for tid, ids in by_tutor.items():
+        try:
+            res = (
+                sb.table('bookings')
+                .update({'status': 'Confirmed', 'tutor_id': tid})
+                .in_('id', ids)
+                .eq('status', 'Pending')
+                .execute()
+            )
+            rows = getattr(res, 'data', None) or []
+            written.extend(rows)
+            confirmed.extend(r.get('id') for r in rows)
+        except Exception as e:
+            errors.append(f"tutor {tid}: {e}")
+    if confirmed:
+        mark_bookings_changed(written)
+
+    emails_queued = 0
+    if notify and confirmed:
+        try:
+            emails_queued = _queue_confirmation_emails([by_id[str(i)] for i in confirmed], assignments, sb)
+        except Exception as e:
+            errors.append(f"notifications: {e}")
+
+    audited = record_admin_action(
+        'bulk_confirm_bookings',
+        'booking',
+        f"{len(confirmed)} bookings",
+        {
+            'assignments': {str(i): str(assignments.get(by_id[str(i)].get('id'))) for i in confirmed},
+            'requested': len(by_id),
+            'skipped': [str(i) for i in skipped],
+            'emails_queued': emails_queued,
+            'errors': errors,
+        },
+        admin_email=admin_email,
+        client=audit_client,
+    )
+    return {'confirmed': confirmed, 'skipped': skipped, 'errors': errors,
+            'emails_queued': emails_queued, 'audited': audited}
+
+
+def _queue_confirmation_emails(bookings: List[Dict], assignments: Dict[Any, Any], client) -> int:
+    from utils.enrichment import fetch_by_ids
+    from utils.outbox import queue_emails
+
+    tutors = fetch_by_ids('tutors', (assignments.get(b.get('id')) for b in bookings), client=client)
+    parents = fetch_by_ids('parents', (b.get('parent_id') for b in bookings), client=client)
+    messages = []
+    for b in bookings:
+        tid = assignments.get(b.get('id'))
+        tutor = tutors.get(str(tid))
+        parent = parents.get(str(b.get('parent_id')))
+        for msg in (tutor_assignment_email(b, tutor, parent), parent_confirmation_email(b, tutor, parent, tid)):
+            if msg:
+                messages.append(msg)
+    return len(queue_emails(messages))
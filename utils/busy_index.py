@@ -0,0 +1,292 @@
+"""In-memory index of when each tutor is already booked.
+
+`utils.unavailability_index` answers "has the tutor blocked this time"; it
+knows nothing about bookings, so an admin could confirm the same tutor for
+two exams at once. `BusyIndex` holds the tutor's Confirmed and
+TutorConfirmed bookings (start time plus duration plus extra time) and
+answers "is tutor T free on D from start for N minutes" with a binary
+search over that tutor's bookings for the day.
+
+A process-wide instance per date window is shared by the pages (see
+`busy_for`). It follows `utils.booking_changes`: when a page reports the
+rows it wrote (`mark_bookings_changed(rows)`), they are applied in place; a
+change reported without rows makes the index reload on its next use, and so
+does age (`BUSY_INDEX_TTL` seconds) so changes made outside the app are
+picked up.
+
+The shared index holds every tutor's bookings, which row-level security
+hides from the anon role, so it loads with the service role when
+`SUPABASE_SERVICE_ROLE` is configured (like `utils.schema.fetch_openapi`).
+"""
+
+from typing import Optional, Dict, List, Iterable, Any, Tuple
+from datetime import date
+import bisect
+import os
+import threading
+import time as _time
+
+from utils.booking_changes import bookings_version, on_bookings_changed
+from utils.booking_times import normalize_booking_times
+from utils.unavailability_index import _ordinal, _seconds_of_day
+
+
+BUSY_STATUSES = ('Confirmed', 'TutorConfirmed')
+
+SHARED_INDEX_MAX_AGE = int(os.getenv("BUSY_INDEX_TTL", "300"))
+
+BUSY_COLUMNS = 'id,tutor_id,status,exam_date,start_time,duration,extra_time,slot,start_datetime'
+
+
+def _minutes(value) -> int:
+    try:
+        return max(int(value or 0), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def booking_spans(bookings: Iterable[Dict]) -> List[Optional[Tuple[int, int, int]]]:
+    """(day ordinal, start second, end second) per booking, or None when it has no usable start.
+
+    The end includes `extra_time`.
+    """
+    rows = list(bookings or [])
+    if not rows:
+        return []
+    times = normalize_booking_times(rows, use_slot=True)
+    out: List[Optional[Tuple[int, int, int]]] = []
+    for row, ok, start, end in zip(rows, times['valid'].to_numpy(), times['start'], times['end']):
+        if not ok:
+            out.append(None)
+            continue
+        s = start.hour * 3600 + start.minute * 60 + start.second
+        length = int((end - start).total_seconds()) + _minutes(row.get('extra_time')) * 60
+        out.append((start.date().toordinal(), s, s + max(length, 0)))
+    return out
+
+
+class _DayBookings:
+    """One tutor's bookings on one day, sorted by start, with running maximum ends."""
+
+    __slots__ = ('starts', 'max_ends', 'entries')
+
+    def __init__(self, entries: Iterable[Tuple[int, int, Any]]):
+        self.entries = sorted(entries, key=lambda x: (x[0], x[1]))
+        self.starts = [s for s, _, _ in self.entries]
+        self.max_ends: List[int] = []
+        running = -1
+        for _, e, _ in self.entries:
+            running = max(running, e)
+            self.max_ends.append(running)
+
+    def is_free(self, start: int, end: int, exclude=None) -> bool:
+        # Only bookings starting before `end` can overlap; the latest end
+        # among them decides, unless the one to ignore is among them
+        j = bisect.bisect_left(self.starts, end) - 1
+        if j < 0 or self.max_ends[j] <= start:
+            return True
+        if exclude is None:
+            return False
+        return not any(e > start and bid != exclude for _, e, bid in self.entries[:j + 1])
+
+
+class BusyIndex:
+    """Per-tutor, per-day index over busy (Confirmed/TutorConfirmed) bookings.
+
+    `start_date`/`end_date` record the date window the bookings were loaded
+    for. `update` applies a booking row as it is now: it is indexed while it
+    has a tutor, a start and a busy status, and dropped otherwise.
+    """
+
+    def __init__(self, bookings: Iterable[Dict] = (), start_date=None, end_date=None):
+        self.start_ord = _ordinal(start_date)
+        self.end_ord = _ordinal(end_date) if end_date is not None else self.start_ord
+        self._where: Dict[Any, Tuple[str, int, Tuple[int, int, Any]]] = {}
+        self._cells: Dict[Tuple[str, int], Dict[Any, Tuple[int, int, Any]]] = {}
+        self._days: Dict[Tuple[str, int], _DayBookings] = {}
+        self.update_many(bookings)
+
+    def update_many(self, bookings: Iterable[Dict]) -> None:
+        rows = [b for b in bookings or [] if b.get('id') is not None]
+        touched = set()
+        for row, span in zip(rows, booking_spans(rows)):
+            touched.update(self._drop(row.get('id')))
+            if span is None or row.get('status') not in BUSY_STATUSES or row.get('tutor_id') in (None, ''):
+                continue
+            day, s, e = span
+            key = (str(row.get('tutor_id')), day)
+            entry = (s, e, row.get('id'))
+            self._cells.setdefault(key, {})[row.get('id')] = entry
+            self._where[row.get('id')] = (key[0], day, entry)
+            touched.add(key)
+        for key in touched:
+            self._rebuild(key)
+
+    def update(self, booking: Dict) -> None:
+        """Apply one booking row (added, re-timed, reassigned or no longer busy)."""
+        self.update_many([booking])
+
+    def remove(self, booking_id) -> bool:
+        """Forget a booking. Returns True if it was indexed."""
+        touched = self._drop(booking_id)
+        for key in touched:
+            self._rebuild(key)
+        return bool(touched)
+
+    def _drop(self, booking_id) -> List[Tuple[str, int]]:
+        where = self._where.pop(booking_id, None)
+        if where is None:
+            return []
+        key = (where[0], where[1])
+        self._cells.get(key, {}).pop(booking_id, None)
+        return [key]
+
+    def _rebuild(self, key: Tuple[str, int]) -> None:
+        cell = self._cells.get(key)
+        if cell:
+            self._days[key] = _DayBookings(cell.values())
+        else:
+            self._cells.pop(key, None)
+            self._days.pop(key, None)
+
+    def covers(self, start_date, end_date=None) -> bool:
+        s = _ordinal(start_date)
+        e = _ordinal(end_date) if end_date is not None else s
+        return self._covers(s, e)
+
+    def _covers(self, s: Optional[int], e: Optional[int]) -> bool:
+        if s is None or e is None or self.start_ord is None or self.end_ord is None:
+            return False
+        return self.start_ord <= s and e <= self.end_ord
+
+    def is_free(self, tutor_id, exam_date, start_time, duration_minutes, exclude=None) -> bool:
+        """True when none of the tutor's busy bookings overlap the slot.
+
+        `exclude` is a booking id to ignore (the booking being reassigned).
+        A slot without a parseable date or start is reported free, as
+        `eligible_tutors` skips time checks for such bookings.
+        """
+        day = _ordinal(exam_date)
+        start = _seconds_of_day(start_time)
+        if day is None or start is None:
+            return True
+        bookings = self._days.get((str(tutor_id), day))
+        if bookings is None:
+            return True
+        return bookings.is_free(start, start + int(duration_minutes * 60), exclude)
+
+    def conflicts_with(self, booking: Dict) -> List[Any]:
+        """Ids of the indexed bookings of `booking`'s tutor that overlap it (itself excluded)."""
+        tutor_id = booking.get('tutor_id')
+        span = booking_spans([booking])[0]
+        if span is None or tutor_id in (None, ''):
+            return []
+        day, s, e = span
+        cell = self._cells.get((str(tutor_id), day), {})
+        return [bid for bs, be, bid in sorted(cell.values()) if bid != booking.get('id') and bs < e and s < be]
+
+    def bookings_for(self, tutor_id, exam_date) -> List[Any]:
+        """Ids of the tutor's busy bookings on the day, by start time."""
+        bookings = self._days.get((str(tutor_id), _ordinal(exam_date)))
+        return [bid for _, _, bid in bookings.entries] if bookings else []
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+
+def fetch_busy_bookings(start_date, end_date=None, client=None) -> List[Dict]:
+    """Busy bookings with a tutor between the two dates (inclusive), time columns only, in one query."""
+    if client is None:
+        from utils.database import supabase as client
+    start = date.fromordinal(_ordinal(start_date))
+    end = date.fromordinal(_ordinal(end_date)) if end_date is not None else start
+    res = (
+        client.table('bookings')
+        .select(BUSY_COLUMNS)
+        .in_('status', list(BUSY_STATUSES))
+        .gte('exam_date', start.isoformat())
+        .lte('exam_date', end.isoformat())
+        .execute()
+    )
+    return [b for b in res.data or [] if b.get('tutor_id') not in (None, '')]
+
+
+def load_busy_index(start_date, end_date=None, client=None) -> BusyIndex:
+    """A fresh index over the window (one query). Raises if the query fails."""
+    s = _ordinal(start_date)
+    if s is None:
+        return BusyIndex()
+    e = _ordinal(end_date) if end_date is not None else s
+    rows = fetch_busy_bookings(date.fromordinal(s), date.fromordinal(e), client=client)
+    return BusyIndex(rows, date.fromordinal(s), date.fromordinal(e))
+
+
+def _shared_client():
+    """The client the shared index loads with: the service role when configured, else the app client."""
+    from utils.supabase_clients import get_client, role_key
+    if role_key('service'):
+        return get_client('service')
+    from utils.database import supabase
+    return supabase
+
+
+_shared_lock = threading.Lock()
+_shared_index: Optional[BusyIndex] = None
+_shared_loaded_at = 0.0
+_shared_version = -1
+
+
+def get_shared_busy_index(start_date, end_date=None) -> BusyIndex:
+    """Return the process-wide index, loading or widening it if needed.
+
+    A query is only made when the window is not covered, bookings changed
+    without the rows being reported, or the index is older than
+    `SHARED_INDEX_MAX_AGE` seconds. Raises if that query fails.
+    """
+    global _shared_index, _shared_loaded_at, _shared_version
+    s = _ordinal(start_date)
+    e = _ordinal(end_date) if end_date is not None else s
+    if s is None or e is None:
+        return BusyIndex()
+    with _shared_lock:
+        fresh = (
+            _shared_index is not None
+            and _shared_version == bookings_version()
+            and (_time.monotonic() - _shared_loaded_at) < SHARED_INDEX_MAX_AGE
+        )
+        if fresh and _shared_index._covers(s, e):
+            return _shared_index
+        if fresh and _shared_index.start_ord is not None:
+            s = min(s, _shared_index.start_ord)
+            e = max(e, _shared_index.end_ord)
+        version = bookings_version()
+        index = load_busy_index(date.fromordinal(s), date.fromordinal(e), client=_shared_client())
+        _shared_index, _shared_loaded_at, _shared_version = index, _time.monotonic(), version
+        return index
+
+
+def _on_bookings_changed(version: int, rows: Optional[List[Dict]]) -> None:
+    global _shared_version
+    with _shared_lock:
+        if _shared_index is None:
+            return
+        if rows is not None and _shared_version == version - 1:
+            _shared_index.update_many(rows)
+            _shared_version = version
+        # Otherwise the version no longer matches and the next use reloads
+
+
+on_bookings_changed(_on_bookings_changed)
+
+
+def invalidate_shared_busy_index() -> None:
+    global _shared_index
+    with _shared_lock:
+        _shared_index = None
+
+
+def busy_for(start_date, end_date=None, client=None) -> BusyIndex:
+    """Index for the window: the shared process index for the app client, else a fresh load."""
+    if client is None:
+        return get_shared_busy_index(start_date, end_date)
+    return load_busy_index(start_date, end_date, client=client)
@@ -0,0 +1,112 @@
+"""Run a booking confirmation's side effects concurrently, under one deadline.
+
+Once a booking's status update has committed, the rest of "Confirm Booking"
+- looking up the tutor and the parent, then notifying parent, tutor and
+admin - used to run one step after another. `ConfirmationPipeline` runs each
+stage's independent steps at the same time on a shared thread pool, so a
+stage takes about as long as its slowest step, and stops waiting once the
+pipeline's overall deadline (env `CONFIRMATION_DEADLINE`, default 10
+seconds) has passed.
+
+Every step is recorded as `{'step', 'status', 'detail', 'ms'}` with status
+`ok`, `failed`, `timed out` or `skipped`. Pages keep the list with
+`remember_steps` so it can be shown after the rerun that follows a
+confirmation.
+"""
+
+from typing import Optional, Dict, List, Callable, Any, MutableMapping
+from concurrent.futures import ThreadPoolExecutor, wait
+import os
+import threading
+import time
+
+
+CONFIRMATION_DEADLINE = float(os.getenv("CONFIRMATION_DEADLINE", "10"))
+CONFIRMATION_WORKERS = int(os.getenv("CONFIRMATION_WORKERS", "8"))
+
+SESSION_KEY = "_confirmation_steps"
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=CONFIRMATION_WORKERS, thread_name_prefix="confirm")
+        return _executor
+
+
+class ConfirmationPipeline:
+    """Stages of concurrent steps sharing one deadline.
+
+    `deadline` is in seconds from creation; `executor` defaults to a
+    process-wide pool.
+    """
+
+    def __init__(self, deadline: Optional[float] = None, executor: Optional[ThreadPoolExecutor] = None):
+        self.deadline = CONFIRMATION_DEADLINE if deadline is None else deadline
+        self.executor = executor
+        self.started = time.monotonic()
+        self.steps: List[Dict[str, Any]] = []
+
+    def remaining(self) -> float:
+        return max(0.0, self.started + self.deadline - time.monotonic())
+
+    def _record(self, step: str, status: str, detail: str = '', ms: float = 0.0):
+        self.steps.append({'step': step, 'status': status, 'detail': detail, 'ms': round(ms, 1)})
+
+    def skip(self, step: str, reason: str):
+        """Record a step that was not run (e.g. no email address)."""
+        self._record(step, 'skipped', reason)
+
+    def stage(self, tasks: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+        """Run `tasks` concurrently; returns each step's value (None if it failed or timed out).
+
+        A task's return value is shown as the step's detail when it is a
+        string. Steps still running at the deadline are recorded as timed out
+        and left to finish in the background.
+        """
+        if not tasks:
+            return {}
+        executor = self.executor or _get_executor()
+
+        def timed(fn):
+            t0 = time.monotonic()
+            value = fn()
+            return value, (time.monotonic() - t0) * 1000
+
+        futures = {name: executor.submit(timed, fn) for name, fn in tasks.items()}
+        wait(list(futures.values()), timeout=self.remaining())
+
+        values: Dict[str, Any] = {}
+        for name, fut in futures.items():
+            values[name] = None
+            if not fut.done():
+                self._record(name, 'timed out', f"no result within {self.deadline:g}s", (time.monotonic() - self.started) * 1000)
+                continue
+            try:
+                value, ms = fut.result()
+            except Exception as e:
+                self._record(name, 'failed', str(e))
+                continue
+            values[name] = value
+            self._record(name, 'ok', value if isinstance(value, str) else '', ms)
+        return values
+
+    def elapsed_ms(self) -> float:
+        return (time.monotonic() - self.started) * 1000
+
+    def ok(self, step: str) -> bool:
+        return any(s['step'] == step and s['status'] == 'ok' for s in self.steps)
+
+
+def remember_steps(session: MutableMapping, booking_id, steps: List[Dict[str, Any]]):
+    """Keep a booking's step results in the session for the next render."""
+    session.setdefault(SESSION_KEY, {})[booking_id] = list(steps)
+
+
+def pop_steps(session: MutableMapping) -> Dict[Any, List[Dict[str, Any]]]:
+    """Step results remembered since the last render (cleared once read)."""
+    return session.pop(SESSION_KEY, None) or {}
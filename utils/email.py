@@ -2,16 +2,20 @@
 
 This module provides a minimal, Mailblaze-focused sending wrapper and a small
 sender-resolution helper. Any non-Mailblaze provider support has been removed.
+Sends go through a shared `MailblazeClient`, which resolves its configuration
+once and keeps connections to Mailblaze alive between messages.
 """
 
 from typing import Optional, Dict
 import os
 import json
 import re
+import threading
 from html import escape
 from urllib.parse import urlparse, urlunparse
 
 import requests
+import requests.adapters
 import base64
 
 
@@ -86,83 +90,140 @@ def _get_sender() -> Optional[str]:
     return None
 
 
-def _send_via_mailblaze(to_addr: str, subject: str, body: str, html: Optional[str] = None) -> Dict:
-    """Send email via Mailblaze HTTP API.
+MAILBLAZE_DEFAULT_BASE = "https://control.mailblaze.com/api"
+MAILBLAZE_POOL_SIZE = int(os.getenv("MAILBLAZE_POOL_SIZE", "10"))
+MAILBLAZE_CONNECT_TIMEOUT = float(os.getenv("MAILBLAZE_CONNECT_TIMEOUT", "5"))
+MAILBLAZE_TIMEOUT = float(os.getenv("MAILBLAZE_TIMEOUT", "10"))
+
 
-    Looks for `MAILBLAZE_API_KEY` and `MAILBLAZE_BASE` (or `mailblaze_http`).
-    Tries common Mailblaze endpoints and returns a dict with `{'ok': True}` on success
-    or `{'error': '...'}'` on failure.
+def _with_port(base: str, port: Optional[str]) -> str:
+    """Add `port` to `base` unless the URL already names one."""
+    if not port:
+        return base
+    try:
+        parsed = urlparse(base)
+        # If netloc already contains a port, leave it.
+        if parsed.port is None:
+            host = parsed.hostname or parsed.netloc
+            if parsed.username and parsed.password:
+                userinfo = f"{parsed.username}:{parsed.password}@"
+            elif parsed.username:
+                userinfo = f"{parsed.username}@"
+            else:
+                userinfo = ""
+            parsed = parsed._replace(netloc=f"{userinfo}{host}:{port}")
+            return urlunparse(parsed)
+    except Exception:
+        # If parsing fails, fall back to the original base unchanged.
+        pass
+    return base
+
+
+class MailblazeClient:
+    """Mailblaze transactional API client over a pooled keep-alive session.
+
+    The API key, base URL (with `MAILBLAZE_PORT` applied), sender and from
+    name are resolved from the environment once, when the client is built.
+    Requests go through one `requests.Session` whose connection pool holds
+    up to `pool_size` connections, so consecutive sends reuse the TCP/TLS
+    connection instead of handshaking per email. The session is safe to
+    share between the outbox worker threads.
     """
-    mb_key = (
-        os.getenv("API_KEY")
-        or os.getenv("MAILBLAZE_API_KEY")
-        or os.getenv("MAILBLAZE_KEY")
-        or os.getenv("mailblaze_api_key")
-        or os.getenv("MAILBLAZE_APIKEY")
-    )
-    if not mb_key:
-        return {"error": "no-mailblaze-key"}
-
-    base = (
-        os.getenv("MAILBLAZE_BASE")
-        or os.getenv("MAILBLAZE_BASE_URL")
-        or os.getenv("mailblaze_http")
-        or os.getenv("MAILBLAZE_BASEURL")
-        or "https://control.mailblaze.com/api"
-    )
-
-    # Allow Render or other deploys to set an explicit port via env var.
-    # If MAILBLAZE_PORT is set and the base URL doesn't already include a port,
-    # append it while preserving scheme and path.
-    mb_port = os.getenv("MAILBLAZE_PORT") or os.getenv("Mailblaze_Port")
-    if mb_port:
-        try:
-            parsed = urlparse(base)
-            # If netloc already contains a port, leave it.
-            if parsed.port is None:
-                host = parsed.hostname or parsed.netloc
-                if parsed.username and parsed.password:
-                    userinfo = f"{parsed.username}:{parsed.password}@"
-                elif parsed.username:
-                    userinfo = f"{parsed.username}@"
-                else:
-                    userinfo = ""
-                new_netloc = f"{userinfo}{host}:{mb_port}"
-                parsed = parsed._replace(netloc=new_netloc)
-                base = urlunparse(parsed)
-        except Exception:
-            # If parsing fails, fall back to the original base unchanged.
-            pass
-
-    sender = _get_sender()
-    if not sender:
-        return {"error": "missing-sender: set SENDER_EMAIL or EMAIL_FROM"}
-
-    # Build minimal transactional JSON payload — only include non-empty body fields
-    html_body = html if html is not None else _plain_to_html(body)
-    encoded_body = base64.b64encode((html_body or "").encode("utf-8")).decode("utf-8")
-    encoded_plain = base64.b64encode((body or "").encode("utf-8")).decode("utf-8")
-
-    tx_payload = {
-        "to_email": to_addr,
-        "to_name": None,
-        "from_email": sender,
-        "from_name": os.getenv("MAILBLAZE_FROM_NAME") or os.getenv("EMAIL_FROM_NAME") or None,
-        "subject": subject,
-    }
-
-    # Mailblaze treats empty strings as missing; only send keys when non-empty
-    if encoded_body:
-        tx_payload["body"] = encoded_body
-    if encoded_plain:
-        tx_payload["plain_text"] = encoded_plain
-
-    endpoints = [f"{base.rstrip('/')}/transactional"]
-    headers = {"Authorization": mb_key, "Content-Type": "application/json"}
-    last_err = None
-    for ep in endpoints:
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        sender: Optional[str] = None,
+        from_name: Optional[str] = None,
+        pool_size: Optional[int] = None,
+        connect_timeout: Optional[float] = None,
+        timeout: Optional[float] = None,
+        session: Optional[requests.Session] = None,
+    ):
+        self.api_key = api_key or (
+            os.getenv("API_KEY")
+            or os.getenv("MAILBLAZE_API_KEY")
+            or os.getenv("MAILBLAZE_KEY")
+            or os.getenv("mailblaze_api_key")
+            or os.getenv("MAILBLAZE_APIKEY")
+        )
+        # `send_email` only sends when one of the Mailblaze-specific variables is set
+        self.has_mailblaze_key = bool(api_key) or bool(
+            os.getenv("MAILBLAZE_API_KEY") or os.getenv("MAILBLAZE_KEY") or os.getenv("mailblaze_api_key")
+        )
+        base = base_url or (
+            os.getenv("MAILBLAZE_BASE")
+            or os.getenv("MAILBLAZE_BASE_URL")
+            or os.getenv("mailblaze_http")
+            or os.getenv("MAILBLAZE_BASEURL")
+            or MAILBLAZE_DEFAULT_BASE
+        )
+        # Allow Render or other deploys to set an explicit port via env var.
+        self.base_url = _with_port(base, os.getenv("MAILBLAZE_PORT") or os.getenv("Mailblaze_Port"))
+        self.transactional_url = f"{self.base_url.rstrip('/')}/transactional"
+        self.sender = sender or _get_sender()
+        self.from_name = from_name or os.getenv("MAILBLAZE_FROM_NAME") or os.getenv("EMAIL_FROM_NAME") or None
+        self.timeout = (
+            MAILBLAZE_CONNECT_TIMEOUT if connect_timeout is None else connect_timeout,
+            MAILBLAZE_TIMEOUT if timeout is None else timeout,
+        )
+        self.pool_size = max(1, pool_size or MAILBLAZE_POOL_SIZE)
+
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
+        self.session.headers.update({"Connection": "keep-alive"})
+
+    def config_error(self) -> Optional[str]:
+        """Why sends cannot work with this configuration, or None."""
+        if not self.api_key:
+            return "no-mailblaze-key"
+        if not self.sender:
+            return "missing-sender: set SENDER_EMAIL or EMAIL_FROM"
+        return None
+
+    def build_payload(self, to_addr: str, subject: str, body: str, html: Optional[str] = None) -> Dict:
+        """The transactional JSON payload; bodies are base64-encoded."""
+        html_body = html if html is not None else _plain_to_html(body)
+        encoded_body = base64.b64encode((html_body or "").encode("utf-8")).decode("utf-8")
+        encoded_plain = base64.b64encode((body or "").encode("utf-8")).decode("utf-8")
+
+        payload = {
+            "to_email": to_addr,
+            "to_name": None,
+            "from_email": self.sender,
+            "from_name": self.from_name,
+            "subject": subject,
+        }
+        # Mailblaze treats empty strings as missing; only send keys when non-empty
+        if encoded_body:
+            payload["body"] = encoded_body
+        if encoded_plain:
+            payload["plain_text"] = encoded_plain
+        return payload
+
+    def post(self, payload: Dict) -> requests.Response:
+        """POST a prepared payload to the transactional endpoint."""
+        headers = {"Authorization": self.api_key, "Content-Type": "application/json"}
+        return self.session.post(self.transactional_url, json=payload, headers=headers, timeout=self.timeout)
+
+    def ping(self) -> requests.Response:
+        """GET the API base URL (connectivity check)."""
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        return self.session.get(self.base_url, headers=headers, timeout=self.timeout)
+
+    def send(self, to_addr: str, subject: str, body: str, html: Optional[str] = None) -> Dict:
+        """Send one message; `{'ok': True, ...}` on success or `{'error': '...'}`."""
+        err = self.config_error()
+        if err:
+            return {"error": err}
+        ep = self.transactional_url
         try:
-            r = requests.post(ep, json=tx_payload, headers=headers, timeout=10)
+            r = self.post(self.build_payload(to_addr, subject, body, html=html))
             try:
                 resp_json = r.json()
             except Exception:
@@ -174,7 +235,40 @@ def _send_via_mailblaze(to_addr: str, subject: str, body: str, html: Optional[st
             last_err = f"{ep} -> {r.status_code} {r.text}"
         except Exception as e:
             last_err = repr(e)
-    return {"error": f"mailblaze: {last_err}"}
+        return {"error": f"mailblaze: {last_err}"}
+
+    def close(self):
+        self.session.close()
+
+
+_client: Optional[MailblazeClient] = None
+_client_lock = threading.Lock()
+
+
+def get_mailblaze_client() -> MailblazeClient:
+    """The shared Mailblaze client, built from the environment on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = MailblazeClient()
+        return _client
+
+
+def reset_mailblaze_client():
+    """Drop the shared client so the next send re-reads the environment."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+
+
+def _send_via_mailblaze(to_addr: str, subject: str, body: str, html: Optional[str] = None) -> Dict:
+    """Send email via the shared Mailblaze client.
+
+    Returns a dict with `{'ok': True}` on success or `{'error': '...'}'` on failure.
+    """
+    return get_mailblaze_client().send(to_addr, subject, body, html=html)
 
 
 def send_email(to_email: str, subject: str, body: str, html: Optional[str] = None) -> Dict:
@@ -183,10 +277,7 @@ def send_email(to_email: str, subject: str, body: str, html: Optional[str] = Non
     Returns `{'ok': True}` on success or `{'error': '...'}'` on failure. This function
     no longer attempts any other provider.
     """
-    mb_key_present = bool(
-        os.getenv("MAILBLAZE_API_KEY") or os.getenv("MAILBLAZE_KEY") or os.getenv("mailblaze_api_key")
-    )
-    if not mb_key_present:
+    if not get_mailblaze_client().has_mailblaze_key:
         return {"error": "Missing Mailblaze configuration (MAILBLAZE_API_KEY)"}
 
     body_with_sign_off = _with_sign_off(body)
@@ -194,13 +285,18 @@ def send_email(to_email: str, subject: str, body: str, html: Optional[str] = Non
     return _send_via_mailblaze(to_email, subject, body_with_sign_off, html=html_with_sign_off)
 
 
+def admin_address(admin_email: Optional[str] = None) -> str:
+    """The admin recipient: `admin_email`, else `ADMIN_EMAIL`, else the shared inbox."""
+    return admin_email or os.getenv("ADMIN_EMAIL") or "admin@theturningpoint.co.za"
+
+
 def send_admin_email(subject: str, body: str, admin_email: Optional[str] = None) -> Dict:
     """Send an email to admin via Mailblaze.
 
     If `admin_email` is not provided this will use the `ADMIN_EMAIL` env var,
     then fall back to the shared admin inbox.
     """
-    admin = admin_email or os.getenv("ADMIN_EMAIL") or "admin@theturningpoint.co.za"
+    admin = admin_address(admin_email)
     if not admin:
         return {"error": "no-admin-email"}
     return send_email(admin, subject, body)
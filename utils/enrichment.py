@@ -0,0 +1,176 @@
+"""Attach parent and tutor details to a list of bookings.
+
+Booking views need the parent's and tutor's names and contact details next
+to each booking. `enrich_bookings` collects the referenced ids, fetches each
+related table with a single `in_` query (split into chunks when the id list
+would make the request URL too long) and returns the result column-wise so
+it can go straight into a DataFrame.
+
+With `fallback=True`, bookings whose reference does not match a row by id
+are handed to the indexed resolvers in `utils.resolver`, which also match by
+user_id, email or the names stored on the booking.
+"""
+
+from typing import Optional, Dict, List, Iterable, Any
+import os
+
+
+# Each uuid adds ~37 characters to the query string; keep well under 8 KB.
+IN_CHUNK_SIZE = int(os.getenv("ENRICH_IN_CHUNK_SIZE", "150"))
+
+ENRICHED_FIELDS = (
+    'parent_name',
+    'parent_email',
+    'parent_phone',
+    'tutor_name',
+    'tutor_email',
+    'tutor_phone',
+    'tutor_contact',
+)
+
+
+def _get_client(client=None):
+    if client is not None:
+        return client
+    from utils.database import supabase
+    return supabase
+
+
+def _chunks(values: List[Any], size: int) -> Iterable[List[Any]]:
+    size = max(1, size)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def fetch_by_ids(table: str, ids: Iterable[Any], columns: str = '*', client=None, chunk_size: Optional[int] = None) -> Dict[str, Dict]:
+    """Fetch rows of `table` whose id is in `ids`, keyed by `str(id)`.
+
+    One `in_` query per `chunk_size` ids (a single query for typical lists).
+    Raises if a query fails.
+    """
+    unique = list(dict.fromkeys(i for i in ids if i is not None and i != ''))
+    if not unique:
+        return {}
+    sb = _get_client(client)
+    out: Dict[str, Dict] = {}
+    for chunk in _chunks(unique, chunk_size or IN_CHUNK_SIZE):
+        res = sb.table(table).select(columns).in_('id', chunk).execute()
+        for row in res.data or []:
+            out.setdefault(str(row.get('id')), row)
+    return out
+
+
+def _tutor_name(t: Optional[Dict]) -> Optional[str]:
+    if not t:
+        return None
+    return f"{t.get('name') or ''} {t.get('surname') or ''}".strip() or None
+
+
+class EnrichedBookings:
+    """Bookings with their parent and tutor rows, stored column-wise.
+
+    `columns` holds one list per field in `ENRICHED_FIELDS`, aligned with
+    `bookings`. `column(name)` also serves any booking field, and
+    `frame(mapping)` builds a `{label: values}` dict for `pd.DataFrame`.
+    """
+
+    def __init__(self, bookings: List[Dict], parent_rows: List[Optional[Dict]], tutor_rows: List[Optional[Dict]], errors: Optional[List[str]] = None):
+        self.bookings = bookings
+        self.parent_rows = parent_rows
+        self.tutor_rows = tutor_rows
+        self.errors = errors or []
+        self._pos = {b.get('id'): i for i, b in enumerate(bookings) if b.get('id') is not None}
+
+        self.columns: Dict[str, List[Any]] = {f: [] for f in ENRICHED_FIELDS}
+        for p, t in zip(parent_rows, tutor_rows):
+            p = p or {}
+            self.columns['parent_name'].append(p.get('parent_name'))
+            self.columns['parent_email'].append(p.get('email'))
+            self.columns['parent_phone'].append(p.get('phone'))
+            self.columns['tutor_name'].append(_tutor_name(t))
+            self.columns['tutor_email'].append((t or {}).get('email'))
+            self.columns['tutor_phone'].append((t or {}).get('phone'))
+            self.columns['tutor_contact'].append((t or {}).get('phone') or (t or {}).get('email'))
+
+    def __len__(self) -> int:
+        return len(self.bookings)
+
+    def column(self, name: str) -> List[Any]:
+        if name in self.columns:
+            return self.columns[name]
+        return [b.get(name) for b in self.bookings]
+
+    def frame(self, mapping: Dict[str, str]) -> Dict[str, List[Any]]:
+        """`{label: field}` -> `{label: values}` ready for `pd.DataFrame`."""
+        return {label: self.column(field) for label, field in mapping.items()}
+
+    def parent_for(self, booking: Dict) -> Optional[Dict]:
+        i = self._pos.get(booking.get('id'))
+        return self.parent_rows[i] if i is not None else None
+
+    def tutor_for(self, booking: Dict) -> Optional[Dict]:
+        i = self._pos.get(booking.get('id'))
+        return self.tutor_rows[i] if i is not None else None
+
+
+def enrich_bookings(
+    bookings: Iterable[Dict],
+    parents: bool = True,
+    tutors: bool = True,
+    fallback: bool = False,
+    client=None,
+) -> EnrichedBookings:
+    """Look up each booking's parent and tutor with at most one `in_` query per table.
+
+    Pass `parents=False` / `tutors=False` to skip a table. A failed query
+    leaves that table's columns empty and is recorded in `errors`, so views
+    still render the bookings.
+    """
+    bookings = list(bookings or [])
+    errors: List[str] = []
+
+    def load(table: str, ref_key: str) -> Dict[str, Dict]:
+        try:
+            return fetch_by_ids(table, (b.get(ref_key) for b in bookings), client=client)
+        except Exception as e:
+            errors.append(f"{table}: {e}")
+            return {}
+
+    parent_map = load('parents', 'parent_id') if parents and bookings else {}
+    tutor_map = load('tutors', 'tutor_id') if tutors and bookings else {}
+
+    parent_rows: List[Optional[Dict]] = [parent_map.get(str(b.get('parent_id'))) for b in bookings]
+    tutor_rows: List[Optional[Dict]] = [tutor_map.get(str(b.get('tutor_id'))) for b in bookings]
+
+    if fallback:
+        try:
+            if parents and not all(parent_rows):
+                from utils.resolver import ParentResolver
+                resolver = ParentResolver(client=client)
+                parent_rows = [p or resolver.resolve(b.get('parent_id'), b) for p, b in zip(parent_rows, bookings)]
+            if tutors and not all(t for t, b in zip(tutor_rows, bookings) if b.get('tutor_id')):
+                from utils.resolver import TutorResolver
+                resolver = TutorResolver()
+                tutor_rows = [t or resolver.resolve(b.get('tutor_id'), b) for t, b in zip(tutor_rows, bookings)]
+        except Exception as e:
+            errors.append(f"resolver: {e}")
+
+    return EnrichedBookings(bookings, parent_rows, tutor_rows, errors)
+
+
+def billing_columns(enriched: EnrichedBookings, tutor_name: Optional[str] = None) -> Dict[str, List[Any]]:
+    """The billing/export table: names fall back to the raw ids when unresolved."""
+    bookings = enriched.bookings
+    parent_names = [n or b.get('parent_id') for n, b in zip(enriched.columns['parent_name'], bookings)]
+    if tutor_name is not None:
+        tutor_names = [tutor_name] * len(bookings)
+    else:
+        tutor_names = [n or b.get('tutor_id') for n, b in zip(enriched.columns['tutor_name'], bookings)]
+    return {
+        "Parent Name": parent_names,
+        "Child Name": [b.get('child_name') or '' for b in bookings],
+        "Exam Date": [b.get('exam_date') or '' for b in bookings],
+        "Duration": [b.get('duration') or '' for b in bookings],
+        "Tutor Name": tutor_names,
+        "Confirmed": [b.get('status') == 'Confirmed' for b in bookings],
+    }
@@ -0,0 +1,536 @@
+"""In-process stand-in for a Supabase client, for benchmarks and tests.
+
+`FakeSupabase` answers the query-builder calls the app makes
+(`table(...).select/eq/neq/in_/gt/gte/lt/lte/is_/not_/or_/order/limit/
+range`, `insert/update/upsert/delete`, `execute`, plus `rpc`) from plain
+lists of dicts held in memory. Each `execute` counts as one round trip and
+can sleep for a configurable latency first, so a code path's wall time and
+query count behave as they would against PostgREST; `stats()` reports the
+round trips per table and operation.
+
+`seed_tables(scale)` builds a synthetic data set (parents, tutors, bookings,
+tutor unavailability) sized like the live tables at 1x and grown linearly
+for 10x / 100x runs. See `scripts/benchmark_pages.py`.
+"""
+
+from typing import Optional, Dict, List, Iterable, Callable, Any, Tuple
+from collections import Counter
+from datetime import date, datetime, timedelta
+import copy
+import random
+import threading
+import time
+
+
+class FakeAPIError(Exception):
+    """Raised by `execute` where PostgREST would answer with an error (e.g. unknown table).
+
+    `code` is the PostgREST error code (PGRST205 unknown table, PGRST202
+    unknown function, PGRST204 unknown column).
+    """
+
+    def __init__(self, message: str, code: Optional[str] = None):
+        super().__init__(message)
+        self.code = code
+
+
+class FakeResponse:
+    def __init__(self, data: List[Dict], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+def _same(a, b) -> bool:
+    if a is None or b is None:
+        return a is b
+    return a == b or str(a) == str(b)
+
+
+def _compare(a, b) -> Optional[int]:
+    """-1/0/1 like Postgres would order the two values; None when either is NULL."""
+    if a is None or b is None:
+        return None
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return (a > b) - (a < b)
+    try:
+        fa, fb = float(a), float(b)
+        if isinstance(a, (int, float)) or isinstance(b, (int, float)):
+            return (fa > fb) - (fa < fb)
+    except (TypeError, ValueError):
+        pass
+    sa, sb = str(a), str(b)
+    return (sa > sb) - (sa < sb)
+
+
+def _null(value) -> Optional[bool]:
+    text = str(value).lower()
+    if value is None or text == 'null':
+        return None
+    return {'true': True, 'false': False}.get(text, value)
+
+
+def _predicate(column: str, op: str, value) -> Callable[[Dict], bool]:
+    if op == 'eq':
+        return lambda r: _same(r.get(column), value)
+    if op == 'neq':
+        return lambda r: r.get(column) is not None and not _same(r.get(column), value)
+    if op in ('gt', 'gte', 'lt', 'lte'):
+        ok = {'gt': (1,), 'gte': (0, 1), 'lt': (-1,), 'lte': (-1, 0)}[op]
+        return lambda r: _compare(r.get(column), value) in ok
+    if op == 'in':
+        wanted = {str(v) for v in value}
+        return lambda r: r.get(column) is not None and str(r.get(column)) in wanted
+    if op == 'is':
+        target = _null(value)
+        return lambda r: r.get(column) is target if target in (None, True, False) else _same(r.get(column), target)
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+def _split_top(text: str) -> List[str]:
+    parts, depth, cur = [], 0, ''
+    for ch in text:
+        if ch == ',' and depth == 0:
+            parts.append(cur)
+            cur = ''
+            continue
+        depth += ch == '('
+        depth -= ch == ')'
+        cur += ch
+    if cur:
+        parts.append(cur)
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _parse_logic(expr: str) -> Callable[[Dict], bool]:
+    """Parse one PostgREST logic term: `col.op.value`, `and(...)`, `or(...)`, `not.`-prefixed ops."""
+    for joiner, combine in (('and(', all), ('or(', any)):
+        if expr.startswith(joiner) and expr.endswith(')'):
+            terms = [_parse_logic(t) for t in _split_top(expr[len(joiner):-1])]
+            return lambda r, terms=terms, combine=combine: combine(t(r) for t in terms)
+    column, rest = expr.split('.', 1)
+    negate = rest.startswith('not.')
+    if negate:
+        rest = rest[4:]
+    op, value = rest.split('.', 1)
+    if op == 'in':
+        value = [v.strip().strip('"') for v in value.strip('()').split(',') if v.strip()]
+    pred = _predicate(column, op, value)
+    return (lambda r: not pred(r)) if negate else pred
+
+
+class _Not:
+    def __init__(self, query: '_FakeQuery'):
+        self._query = query
+
+    def __getattr__(self, name):
+        method = getattr(self._query, name)
+
+        def negated(*args, **kwargs):
+            self._query._negate_next = True
+            return method(*args, **kwargs)
+
+        return negated
+
+
+class _FakeQuery:
+    def __init__(self, client: 'FakeSupabase', table: str):
+        self.client = client
+        self.table_name = table
+        self.op = 'select'
+        self.columns: Optional[List[str]] = None
+        self.count_mode: Optional[str] = None
+        self.filters: List[Callable[[Dict], bool]] = []
+        self.orders: List[Tuple[str, bool]] = []
+        self.limit_n: Optional[int] = None
+        self.offset = 0
+        self.payload: Any = None
+        self.on_conflict = 'id'
+        self._negate_next = False
+
+    # Reads
+    def select(self, columns: str = '*', count: Optional[str] = None, **kwargs):
+        cols = [c.strip() for c in str(columns).split(',') if c.strip()]
+        # Embedded resources (`parents(*)`) are not modelled: keep plain columns only
+        cols = [c for c in cols if '(' not in c]
+        self.columns = None if not cols or '*' in cols else cols
+        self.count_mode = count
+        return self
+
+    def _filter(self, column: str, op: str, value):
+        pred = _predicate(column, op, value)
+        if self._negate_next:
+            self._negate_next = False
+            self.filters.append(lambda r: not pred(r))
+        else:
+            self.filters.append(pred)
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, 'eq', value)
+
+    def neq(self, column, value):
+        return self._filter(column, 'neq', value)
+
+    def gt(self, column, value):
+        return self._filter(column, 'gt', value)
+
+    def gte(self, column, value):
+        return self._filter(column, 'gte', value)
+
+    def lt(self, column, value):
+        return self._filter(column, 'lt', value)
+
+    def lte(self, column, value):
+        return self._filter(column, 'lte', value)
+
+    def in_(self, column, values):
+        return self._filter(column, 'in', list(values))
+
+    def is_(self, column, value):
+        return self._filter(column, 'is', value)
+
+    @property
+    def not_(self):
+        return _Not(self)
+
+    def or_(self, filters: str, reference_table: Optional[str] = None):
+        pred = _parse_logic(f"or({filters})")
+        self.filters.append(pred)
+        return self
+
+    def order(self, column: str, desc: bool = False, **kwargs):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, n: int, **kwargs):
+        self.limit_n = int(n)
+        return self
+
+    def range(self, start: int, end: int, **kwargs):
+        self.offset = int(start)
+        self.limit_n = int(end) - int(start) + 1
+        return self
+
+    def single(self):
+        return self
+
+    def maybe_single(self):
+        return self
+
+    # Writes
+    def insert(self, rows, **kwargs):
+        self.op = 'insert'
+        self.payload = rows
+        return self
+
+    def upsert(self, rows, on_conflict: str = 'id', **kwargs):
+        self.op = 'upsert'
+        self.payload = rows
+        self.on_conflict = on_conflict or 'id'
+        return self
+
+    def update(self, values: Dict, **kwargs):
+        self.op = 'update'
+        self.payload = values
+        return self
+
+    def delete(self, **kwargs):
+        self.op = 'delete'
+        return self
+
+    def _matches(self, row: Dict) -> bool:
+        return all(f(row) for f in self.filters)
+
+    def _sorted(self, rows: List[Dict]) -> List[Dict]:
+        # Later keys first so the first order() call is the primary one;
+        # NULLs sort last ascending and first descending, as in Postgres
+        for column, desc in reversed(self.orders):
+            present = [r for r in rows if r.get(column) is not None]
+            nulls = [r for r in rows if r.get(column) is None]
+            present.sort(key=lambda r: _SortKey(r.get(column)), reverse=desc)
+            rows = nulls + present if desc else present + nulls
+        return rows
+
+    def _project(self, rows: List[Dict]) -> List[Dict]:
+        if self.columns is None:
+            return [dict(r) for r in rows]
+        return [{c: r.get(c) for c in self.columns} for r in rows]
+
+    def execute(self) -> FakeResponse:
+        return self.client._execute(self)
+
+
+class _SortKey:
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return _compare(self.value, other.value) == -1
+
+
+class FakeSupabase:
+    """A Supabase client stand-in over in-memory tables.
+
+    `tables` maps table names to lists of row dicts (copied). `latency` is
+    the seconds each `execute` waits before answering (plus up to `jitter`
+    more), outside the client's lock so concurrent callers overlap as they
+    would on the network. Tables not in `tables` raise `FakeAPIError`, like
+    a missing relation; `create_table` adds one. `schema` optionally fixes
+    a table's columns: writes naming any other column then fail as PostgREST
+    does, and `openapi()` describes them.
+    """
+
+    def __init__(self, tables: Optional[Dict[str, List[Dict]]] = None, latency: float = 0.0,
+                 jitter: float = 0.0, seed: int = 0, schema: Optional[Dict[str, Iterable[str]]] = None):
+        self.tables: Dict[str, List[Dict]] = {name: [dict(r) for r in rows] for name, rows in (tables or {}).items()}
+        self.schema: Dict[str, List[str]] = {name: list(cols) for name, cols in (schema or {}).items()}
+        self.latency = latency
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._rpcs: Dict[str, Callable[['FakeSupabase', Dict], Any]] = {}
+        self._lock = threading.Lock()
+        self.calls: Counter = Counter()
+        self.rows_returned = 0
+
+    def table(self, name: str) -> _FakeQuery:
+        return _FakeQuery(self, name)
+
+    from_ = table
+
+    def use_access_token(self, token: Optional[str]) -> None:
+        """Accepted so the fake can stand in for a visitor's `SessionClient`; there is no row-level security here."""
+
+    def create_table(self, name: str, rows: Iterable[Dict] = ()) -> None:
+        with self._lock:
+            self.tables[name] = [dict(r) for r in rows]
+
+    def register_rpc(self, name: str, fn: Callable[['FakeSupabase', Dict], Any]) -> None:
+        """Serve `rpc(name, params)` with `fn(client, params)`; its return value becomes `data`.
+
+        The call is one round trip; `fn` should query `client.server()` so its
+        own reads and writes, which run inside the database, are not counted.
+        """
+        self._rpcs[name] = fn
+
+    def columns(self, name: str) -> List[str]:
+        """The table's declared columns, else every key seen in its rows."""
+        if name in self.schema:
+            return list(self.schema[name])
+        seen = {}
+        for row in self.tables.get(name, []):
+            seen.update(dict.fromkeys(row))
+        return list(seen)
+
+    def openapi(self) -> Dict[str, Any]:
+        """The tables as PostgREST's OpenAPI root (`GET /rest/v1/`) describes them; one round trip."""
+        self._wait()
+        with self._lock:
+            self.calls[('openapi', 'get')] += 1
+            return {
+                'swagger': '2.0',
+                'definitions': {
+                    name: {'type': 'object', 'properties': {c: {'type': 'string'} for c in self.columns(name)}}
+                    for name in self.tables
+                },
+            }
+
+    def server(self) -> 'FakeSupabase':
+        """A client on the same tables without latency or accounting (for RPC handlers)."""
+        view = FakeSupabase()
+        view.tables = self.tables
+        view.schema = self.schema
+        view._lock = self._lock
+        return view
+
+    def rpc(self, name: str, params: Optional[Dict] = None):
+        client = self
+
+        class _Call:
+            def execute(self_inner):
+                client._wait()
+                with client._lock:
+                    client.calls[('rpc', name)] += 1
+                if name not in client._rpcs:
+                    raise FakeAPIError(f"Could not find the function public.{name}", code='PGRST202')
+                return FakeResponse(client._rpcs[name](client, dict(params or {})))
+
+        return _Call()
+
+    # Accounting
+
+    @property
+    def round_trips(self) -> int:
+        return sum(self.calls.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """Round trips in total and per (table, operation), plus rows returned."""
+        with self._lock:
+            return {
+                'round_trips': sum(self.calls.values()),
+                'by_call': {f"{t}.{op}": n for (t, op), n in sorted(self.calls.items())},
+                'rows_returned': self.rows_returned,
+            }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.rows_returned = 0
+
+    def _wait(self) -> None:
+        delay = self.latency + (self._rng.random() * self.jitter if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _execute(self, q: _FakeQuery) -> FakeResponse:
+        self._wait()
+        with self._lock:
+            self.calls[(q.table_name, q.op)] += 1
+            rows = self.tables.get(q.table_name)
+            if rows is None:
+                raise FakeAPIError(f"Could not find the table 'public.{q.table_name}'", code='PGRST205')
+            if q.op in ('insert', 'upsert', 'update') and q.table_name in self.schema:
+                self._check_columns(q.table_name, q.payload)
+            if q.op == 'select':
+                hits = [r for r in rows if q._matches(r)]
+                total = len(hits)
+                hits = q._sorted(hits)
+                hits = hits[q.offset:q.offset + q.limit_n if q.limit_n is not None else None]
+                data = q._project(hits)
+                self.rows_returned += len(data)
+                return FakeResponse(data, total if q.count_mode else None)
+            if q.op in ('insert', 'upsert'):
+                new = q.payload if isinstance(q.payload, list) else [q.payload]
+                out = []
+                for row in new:
+                    row = dict(row)
+                    keys = [k.strip() for k in q.on_conflict.split(',')]
+                    existing = None
+                    if q.op == 'upsert' and all(row.get(k) is not None for k in keys):
+                        existing = next((r for r in rows if all(_same(r.get(k), row.get(k)) for k in keys)), None)
+                    if existing is not None:
+                        existing.update(row)
+                        out.append(dict(existing))
+                        continue
+                    if row.get('id') is None:
+                        row['id'] = self._next_id(rows)
+                    rows.append(row)
+                    out.append(dict(row))
+                self.rows_returned += len(out)
+                return FakeResponse(out)
+            if q.op == 'update':
+                out = []
+                for r in rows:
+                    if q._matches(r):
+                        r.update(copy.deepcopy(q.payload))
+                        out.append(dict(r))
+                self.rows_returned += len(out)
+                return FakeResponse(out)
+            if q.op == 'delete':
+                keep, out = [], []
+                for r in rows:
+                    (out if q._matches(r) else keep).append(r)
+                rows[:] = keep
+                return FakeResponse([dict(r) for r in out])
+        raise FakeAPIError(f"Unsupported operation {q.op}")
+
+    def _check_columns(self, table: str, payload) -> None:
+        known = set(self.schema[table])
+        for row in (payload if isinstance(payload, list) else [payload]):
+            for column in row:
+                if column not in known:
+                    raise FakeAPIError(f"Could not find the '{column}' column of '{table}' in the schema cache",
+                                       code='PGRST204')
+
+    @staticmethod
+    def _next_id(rows: List[Dict]) -> int:
+        ids = [r.get('id') for r in rows if isinstance(r.get('id'), int)]
+        return (max(ids) + 1) if ids else 1
+
+
+# Synthetic data
+
+SEED_ROLES = ['Reader', 'Scribe', 'Both', 'All of the Above']
+SEED_SUBJECTS = ['Maths', 'English', 'Science', 'History', 'Afrikaans', 'IsiZulu', 'French']
+SEED_SLOTS = ['07:45:00', '08:00:00', '08:30:00', '09:00:00', '11:00:00', '12:00:00', '14:00:00']
+
+# Rows per table at 1x, roughly the size of the live project
+BASE_COUNTS = {'parents': 60, 'tutors': 30, 'bookings': 400, 'tutor_unavailability': 50}
+
+
+def seed_tables(scale: int = 1, seed: int = 0, today: Optional[date] = None) -> Dict[str, List[Dict]]:
+    """Synthetic parents, tutors, bookings and unavailability at `scale` times the 1x counts.
+
+    Bookings span the past year and the next 60 days; upcoming ones are a
+    mix of Pending, Confirmed, TutorConfirmed and Assigned, past ones mostly
+    Confirmed or Cancelled. An empty `admin_actions` table is included so the
+    audited write paths can run; there is no `tutor_bookings` table, as in
+    the live project.
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    n_parents, n_tutors, n_bookings, n_unavailable = (BASE_COUNTS[k] * scale for k in
+                                                       ('parents', 'tutors', 'bookings', 'tutor_unavailability'))
+
+    parents = [{
+        'id': f"p{i}", 'user_id': f"user-p{i}", 'parent_name': f"Parent {i}", 'email': f"parent{i}@example.com",
+        'phone': f"0820000{i:05d}", 'school': f"School {i % 40}",
+        'children': [{'name': f"Child {i}", 'grade': rng.randint(1, 12), 'school': f"School {i % 40}"}],
+    } for i in range(n_parents)]
+
+    tutors = []
+    for i in range(n_tutors):
+        t = {
+            'id': f"t{i}", 'user_id': f"user-t{i}", 'name': f"Tutor{i}", 'surname': 'Test', 'email': f"tutor{i}@example.com",
+            'phone': f"0830000{i:05d}", 'city': 'Johannesburg', 'roles': rng.choice(SEED_ROLES),
+            'approved': rng.random() < 0.9,
+        }
+        for lang in ('afrikaans', 'isizulu', 'setswana', 'isixhosa', 'french'):
+            t[lang] = rng.random() < 0.2
+        tutors.append(t)
+
+    bookings = []
+    for i in range(n_bookings):
+        upcoming = rng.random() < 0.3
+        day = today + timedelta(days=rng.randint(0, 60)) if upcoming else today - timedelta(days=rng.randint(1, 365))
+        if upcoming:
+            status = rng.choice(['Pending', 'Pending', 'Confirmed', 'TutorConfirmed', 'Assigned', 'Cancelled'])
+        else:
+            status = rng.choice(['Confirmed', 'Confirmed', 'Confirmed', 'Cancelled'])
+        parent = parents[rng.randrange(n_parents)]
+        bookings.append({
+            'id': i + 1,
+            'parent_id': parent['id'],
+            'child_name': parent['children'][0]['name'],
+            'grade': parent['children'][0]['grade'],
+            'school': parent['school'],
+            'subject': rng.choice(SEED_SUBJECTS),
+            'role_required': rng.choice(['Reader', 'Scribe', 'Reader', 'Both']),
+            'exam_date': day.isoformat(),
+            'start_time': rng.choice(SEED_SLOTS),
+            'duration': rng.choice([60, 90, 120, 180]),
+            'extra_time': rng.choice([0, 0, 0, 15, 30]),
+            'status': status,
+            'tutor_id': None if status == 'Pending' else tutors[rng.randrange(n_tutors)]['id'],
+            'cancelled': status == 'Cancelled',
+            'cancelled_at': None,
+            'created_at': datetime.combine(day - timedelta(days=14), datetime.min.time()).isoformat(),
+        })
+
+    unavailability = []
+    for i in range(n_unavailable):
+        d = today + timedelta(days=rng.randint(-10, 60))
+        row = {'id': i + 1, 'tutor_id': tutors[rng.randrange(n_tutors)]['id'], 'start_date': d.isoformat(),
+               'end_date': (d + timedelta(days=rng.choice([0, 0, 1, 3]))).isoformat(), 'reason': 'Busy'}
+        if rng.random() < 0.6:
+            row.update(start_time='08:00:00', end_time=rng.choice(['10:00:00', '12:00:00']))
+        unavailability.append(row)
+
+    return {
+        'parents': parents,
+        'tutors': tutors,
+        'bookings': bookings,
+        'tutor_unavailability': unavailability,
+        'admin_actions': [],
+    }
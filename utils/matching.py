@@ -0,0 +1,258 @@
+"""Tutor matching helpers shared by the booking and admin pages.
+
+The pending-booking, manual-booking and parent booking pages all need the
+same answer: which approved tutors can cover a booking. Previously each
+page asked Supabase for every tutor's `tutor_unavailability` rows one tutor
+at a time. These helpers load the unavailability rows for a date range in a
+single query, index them by tutor (see `utils.unavailability_index`) and do
+the role, language and time-overlap checks in memory. Tutors already booked
+for an overlapping slot (see `utils.busy_index`) are left out as well.
+"""
+
+from typing import Optional, Dict, List, Iterable, Any
+from datetime import date, datetime, time
+
+from utils.unavailability_index import UnavailabilityIndex, fetch_unavailability_rows, get_shared_index
+from utils.busy_index import BusyIndex, busy_for
+from utils.reference_cache import tutors_cache
+
+
+LANGUAGE_COLUMNS = ('afrikaans', 'isizulu', 'setswana', 'isixhosa', 'french')
+
+_LANGUAGE_MAPPING = {
+    'afrikaans': 'afrikaans',
+    'afr': 'afrikaans',
+    'isizulu': 'isizulu',
+    'zulu': 'isizulu',
+    'setswana': 'setswana',
+    'isixhosa': 'isixhosa',
+    'xhosa': 'isixhosa',
+    'french': 'french',
+}
+
+
+def _get_client(client=None):
+    """Return the given client or fall back to the shared app client."""
+    if client is not None:
+        return client
+    from utils.database import supabase
+    return supabase
+
+
+def _normalize_role(r):
+    if not r:
+        return r
+    r = str(r)
+    if "Both" in r:
+        return "Both"
+    return r
+
+
+def role_matches(tutor_role, required_role) -> bool:
+    """Return True when a tutor's role label can cover the required role."""
+    tr = _normalize_role(tutor_role)
+    rr = _normalize_role(required_role)
+    if not tr or not rr:
+        return False
+    if tr == rr:
+        return True
+    if tr == "All of the Above":
+        return True
+    if rr in ("Reader", "Scribe") and tr == "Both":
+        return True
+    return False
+
+
+def language_column_for(subject_text: Optional[str]) -> Optional[str]:
+    """Map a booking subject to the tutor language flag column, if any."""
+    if not subject_text:
+        return None
+    return _LANGUAGE_MAPPING.get(subject_text.strip().lower())
+
+
+def tutor_has_any_lang_flags(tutor_row: Dict) -> bool:
+    return any(bool(tutor_row.get(k)) for k in LANGUAGE_COLUMNS)
+
+
+def _as_date(value) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.fromisoformat(str(value)).date()
+    except Exception:
+        return None
+
+
+def _as_time(value) -> Optional[time]:
+    if value is None:
+        return None
+    if isinstance(value, time):
+        return value
+    try:
+        return datetime.strptime(str(value), "%H:%M:%S").time()
+    except Exception:
+        return None
+
+
+def _extra_minutes(value) -> int:
+    try:
+        return max(int(value or 0), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _busy_or_none(start_date, end_date=None, client=None, errors: Optional[List[str]] = None) -> Optional[BusyIndex]:
+    # Without the busy index tutors are matched as before rather than not at all,
+    # and the failure goes to `errors` so the page can say clashes were not checked
+    try:
+        return busy_for(start_date, end_date, client=client)
+    except Exception as e:
+        if errors is not None:
+            errors.append(f"busy bookings: {e}")
+        return None
+
+
+def load_unavailability(start_date, end_date=None, client=None) -> UnavailabilityIndex:
+    """Fetch every unavailability row overlapping [start_date, end_date] in one query.
+
+    Returns an `UnavailabilityIndex` over the rows. Raises if the query
+    fails so callers can decide how to degrade.
+    """
+    start = _as_date(start_date)
+    end = _as_date(end_date) or start
+    if start is None:
+        return UnavailabilityIndex()
+    rows = fetch_unavailability_rows(start, end, client=client)
+    return UnavailabilityIndex(rows, start, end)
+
+
+def unavailability_for(start_date, end_date=None, client=None) -> UnavailabilityIndex:
+    """Index for the window: the shared process index for the app client, else a fresh load."""
+    if client is None:
+        return get_shared_index(start_date, end_date)
+    return load_unavailability(start_date, end_date, client=client)
+
+
+def load_approved_tutors(client=None, order: Optional[str] = None) -> List[Dict]:
+    """Approved tutors: from the shared reference cache for the app client, else one query."""
+    if client is None:
+        return [t for t in tutors_cache.all(order=order) if t.get('approved') is True]
+    sb = _get_client(client)
+    q = sb.table('tutors').select('*').eq('approved', True)
+    if order:
+        q = q.order(order)
+    res = q.execute()
+    return res.data or []
+
+
+def eligible_tutors(
+    tutors: Iterable[Dict],
+    role_required,
+    subject,
+    exam_date,
+    start_time,
+    duration_minutes,
+    unavailability: Optional[UnavailabilityIndex] = None,
+    busy: Optional[BusyIndex] = None,
+    extra_time=0,
+    exclude_booking=None,
+) -> List[Dict]:
+    """Filter `tutors` down to those who can cover the described booking.
+
+    `unavailability` is the index returned by `load_unavailability`; `busy`
+    (see `utils.busy_index.busy_for`) drops tutors with a busy booking
+    overlapping the slot plus `extra_time`, ignoring `exclude_booking` (the
+    booking being reassigned). The time checks are skipped when the exam
+    date or start time is missing or unparseable, matching how the pages
+    behaved before.
+    """
+    lang_col = language_column_for(subject)
+    d = _as_date(exam_date)
+    t = _as_time(start_time)
+    check_time = d is not None and t is not None
+    if unavailability is None:
+        unavailability = UnavailabilityIndex()
+
+    suitable = []
+    for tutor in tutors or []:
+        if not role_matches(tutor.get('roles'), role_required):
+            continue
+        # Tutors with no language flags set are treated as able to cover any
+        # language subject; only enforce the flag when some are ticked.
+        if lang_col and tutor_has_any_lang_flags(tutor) and not tutor.get(lang_col):
+            continue
+        if check_time and not unavailability.is_available(tutor.get('id'), d, t, duration_minutes):
+            continue
+        if check_time and busy is not None and not busy.is_free(
+                tutor.get('id'), d, t, (duration_minutes or 0) + _extra_minutes(extra_time), exclude_booking):
+            continue
+        suitable.append(tutor)
+    return suitable
+
+
+def eligible_tutors_for_booking(booking: Dict, tutors: Optional[List[Dict]] = None, client=None,
+                                errors: Optional[List[str]] = None) -> List[Dict]:
+    """Convenience wrapper: load what is needed and return suitable tutors for a booking dict.
+
+    Costs one tutors query (unless `tutors` is supplied), one
+    unavailability query and one busy-bookings query for the booking's exam
+    date. The booking itself never makes its own tutor look busy. If the
+    busy bookings cannot be loaded, tutors are matched without them and the
+    failure is appended to `errors`.
+    """
+    if tutors is None:
+        tutors = load_approved_tutors(client)
+    exam_date = _as_date(booking.get('exam_date'))
+    unavailability = unavailability_for(exam_date, client=client) if exam_date else None
+    busy = _busy_or_none(exam_date, client=client, errors=errors) if exam_date else None
+    return eligible_tutors(
+        tutors,
+        booking.get('role_required'),
+        booking.get('subject'),
+        exam_date,
+        booking.get('start_time'),
+        booking.get('duration') or 60,
+        unavailability,
+        busy,
+        booking.get('extra_time'),
+        booking.get('id'),
+    )
+
+
+def candidate_tutors_for_bookings(bookings: Iterable[Dict], tutors: Optional[List[Dict]] = None, client=None,
+                                  errors: Optional[List[str]] = None) -> Dict[Any, List[Dict]]:
+    """Compute suitable tutors for a whole queue of bookings at once.
+
+    Runs one tutors query (unless `tutors` is supplied), one unavailability
+    query and one busy-bookings query spanning the earliest to latest
+    `exam_date` in the queue, then matches every booking in memory. Returns
+    a dict keyed by booking id. A failed busy-bookings query is appended to
+    `errors` (see `eligible_tutors_for_booking`).
+    """
+    bookings = list(bookings or [])
+    if tutors is None:
+        tutors = load_approved_tutors(client)
+
+    dates = [d for d in (_as_date(b.get('exam_date')) for b in bookings) if d is not None]
+    unavailability = unavailability_for(min(dates), max(dates), client=client) if dates else None
+    busy = _busy_or_none(min(dates), max(dates), client=client, errors=errors) if dates else None
+
+    out: Dict[Any, List[Dict]] = {}
+    for b in bookings:
+        out[b.get('id')] = eligible_tutors(
+            tutors,
+            b.get('role_required'),
+            b.get('subject'),
+            b.get('exam_date'),
+            b.get('start_time'),
+            b.get('duration') or 60,
+            unavailability,
+            busy,
+            b.get('extra_time'),
+            b.get('id'),
+        )
+    return out
@@ -0,0 +1,357 @@
+"""Outbound email queue delivered by background worker threads.
+
+`send_email` blocks the Streamlit script on Mailblaze for up to 10 seconds
+per message. `queue_email` instead records the message in a local SQLite
+outbox and returns its id straight away; a small pool of daemon threads
+delivers queued messages with `utils.email.send_email`.
+
+A failed delivery is retried with exponential backoff (`OUTBOX_BACKOFF_BASE`
+seconds, doubling per attempt, capped at `OUTBOX_BACKOFF_MAX`). After
+`OUTBOX_MAX_ATTEMPTS` attempts, or straight away for configuration errors
+that a retry cannot fix, the message is moved to the dead-letter list where
+an admin can inspect it and requeue it from the Email Diagnostics page.
+
+Message statuses: queued -> sending -> sent, or retrying / dead on failure.
+The outbox survives app restarts. Claiming a message for sending takes a
+lease of `OUTBOX_SENDING_LEASE` seconds (well above the send timeout): a
+message still `sending` after its lease ran out was left by a process that
+died mid-send, and any worker may claim it again. Messages another live
+process is sending right now are left alone, so several app processes, or
+a restart next to a running one, do not send the same email twice. Each
+claim records its own `lease_owner`, and the outcome of a send is only
+written while that claim still holds the message: a worker whose lease ran
+out and was taken over does not overwrite the new claimer's status.
+"""
+
+from typing import Optional, Dict, List, Callable, Iterable, Tuple
+from contextlib import contextmanager
+import os
+import random
+import sqlite3
+import threading
+import time as _time
+import uuid
+
+
+OUTBOX_DB = os.getenv("OUTBOX_DB") or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".outbox.sqlite3")
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "3"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "5"))
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "600"))
+OUTBOX_SENDING_LEASE = float(os.getenv("OUTBOX_SENDING_LEASE", "300"))
+
+STATUSES = ('queued', 'sending', 'retrying', 'sent', 'dead')
+
+# Errors returned by `send_email` that retrying cannot fix
+PERMANENT_ERRORS = ('Missing Mailblaze configuration', 'no-mailblaze-key', 'missing-sender', 'no-admin-email')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id TEXT PRIMARY KEY,
+    to_email TEXT NOT NULL,
+    subject TEXT,
+    body TEXT,
+    html TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    sent_at REAL,
+    lease_owner TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);
+"""
+
+
+def _default_sender(to_email: str, subject: str, body: str, html: Optional[str] = None) -> Dict:
+    # Resolved at call time so the worker always uses the current helper
+    from utils.email import send_email
+    return send_email(to_email, subject, body, html=html)
+
+
+def backoff_delay(attempts: int, base: float = None, cap: float = None) -> float:
+    """Seconds to wait after the `attempts`-th failed delivery: base * 2^(n-1), capped."""
+    base = OUTBOX_BACKOFF_BASE if base is None else base
+    cap = OUTBOX_BACKOFF_MAX if cap is None else cap
+    return min(cap, base * (2 ** max(0, attempts - 1)))
+
+
+class EmailOutbox:
+    """SQLite-backed email queue with a pool of delivery threads.
+
+    `enqueue()` returns a message id immediately; `start()` launches the
+    workers (idempotent). `process_due()` delivers due messages on the
+    calling thread, which is what the workers run in a loop.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        sender: Optional[Callable[..., Dict]] = None,
+        workers: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        sending_lease: Optional[float] = None,
+    ):
+        self.path = path or OUTBOX_DB
+        self.sender = sender or _default_sender
+        self.workers = max(1, workers or OUTBOX_WORKERS)
+        self.max_attempts = max(1, max_attempts or OUTBOX_MAX_ATTEMPTS)
+        self.backoff_base = OUTBOX_BACKOFF_BASE if backoff_base is None else backoff_base
+        self.backoff_max = OUTBOX_BACKOFF_MAX if backoff_max is None else backoff_max
+        self.sending_lease = OUTBOX_SENDING_LEASE if sending_lease is None else sending_lease
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+        with self._db() as conn:
+            conn.executescript(_SCHEMA)
+            # Outboxes created before leases had owners
+            if 'lease_owner' not in {r['name'] for r in conn.execute("PRAGMA table_info(outbox)")}:
+                conn.execute("ALTER TABLE outbox ADD COLUMN lease_owner TEXT")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @contextmanager
+    def _db(self):
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # -- producer side --
+
+    def enqueue(self, to_email: str, subject: str, body: str, html: Optional[str] = None) -> str:
+        """Queue a message and wake a worker; returns the message id."""
+        msg_id = uuid.uuid4().hex
+        now = _time.time()
+        with self._db() as conn:
+            conn.execute(
+                "INSERT INTO outbox (id, to_email, subject, body, html, status, attempts, next_attempt_at, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, 'queued', 0, ?, ?, ?)",
+                (msg_id, to_email, subject, body, html, now, now, now),
+            )
+        with self._cond:
+            self._cond.notify()
+        return msg_id
+
+    def enqueue_many(self, messages: Iterable[Tuple[str, str, str]]) -> List[str]:
+        """Queue (to_email, subject, body) messages in one transaction; returns their ids."""
+        now = _time.time()
+        rows = [(uuid.uuid4().hex, to_email, subject, body, now, now, now) for to_email, subject, body in messages]
+        if not rows:
+            return []
+        with self._db() as conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT INTO outbox (id, to_email, subject, body, html, status, attempts, next_attempt_at, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, NULL, 'queued', 0, ?, ?, ?)",
+                rows,
+            )
+            conn.execute("COMMIT")
+        with self._cond:
+            self._cond.notify_all()
+        return [r[0] for r in rows]
+
+    def status(self, msg_id: str) -> Optional[Dict]:
+        """The message row (without bodies) or None if unknown."""
+        with self._db() as conn:
+            row = conn.execute(
+                "SELECT id, to_email, subject, status, attempts, next_attempt_at, last_error, created_at, updated_at, sent_at"
+                " FROM outbox WHERE id = ?",
+                (msg_id,),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def messages(self, status: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Most recent messages first, optionally only those with `status`."""
+        sql = "SELECT id, to_email, subject, status, attempts, next_attempt_at, last_error, created_at, updated_at, sent_at FROM outbox"
+        args: tuple = ()
+        if status:
+            sql += " WHERE status = ?"
+            args = (status,)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        with self._db() as conn:
+            return [dict(r) for r in conn.execute(sql, args + (limit,)).fetchall()]
+
+    def dead_letters(self, limit: int = 100) -> List[Dict]:
+        return self.messages(status='dead', limit=limit)
+
+    def retry(self, msg_id: str) -> bool:
+        """Requeue a dead message with a fresh attempt budget."""
+        now = _time.time()
+        with self._db() as conn:
+            cur = conn.execute(
+                "UPDATE outbox SET status = 'queued', attempts = 0, next_attempt_at = ?, updated_at = ? WHERE id = ? AND status = 'dead'",
+                (now, now, msg_id),
+            )
+        if cur.rowcount:
+            with self._cond:
+                self._cond.notify()
+        return bool(cur.rowcount)
+
+    def stats(self) -> Dict[str, int]:
+        """Message count per status."""
+        counts = {s: 0 for s in STATUSES}
+        with self._db() as conn:
+            for row in conn.execute("SELECT status, COUNT(*) AS n FROM outbox GROUP BY status"):
+                counts[row['status']] = row['n']
+        return counts
+
+    # -- delivery side --
+
+    def _claim(self) -> Optional[Dict]:
+        """Atomically move the next due message to `sending`, leasing it until `sending_lease` runs out.
+
+        A `sending` message whose lease has expired (its claimer died) is due again.
+        The returned message carries the claim's `lease_owner`.
+        """
+        now = _time.time()
+        owner = uuid.uuid4().hex
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM outbox WHERE (status IN ('queued', 'retrying') AND next_attempt_at <= ?)"
+                " OR (status = 'sending' AND updated_at <= ?)"
+                " ORDER BY next_attempt_at LIMIT 1",
+                (now, now - self.sending_lease),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE outbox SET status = 'sending', attempts = attempts + 1, updated_at = ?, lease_owner = ? WHERE id = ?",
+                (now, owner, row['id']),
+            )
+            conn.execute("COMMIT")
+            msg = dict(row)
+            msg['attempts'] += 1
+            msg['lease_owner'] = owner
+            return msg
+        except Exception:
+            try:
+                conn.execute("ROLLBACK")
+            except Exception:
+                pass
+            raise
+        finally:
+            conn.close()
+
+    def _deliver(self, msg: Dict) -> str:
+        """Send a claimed message and record the outcome; 'lost' if its lease was taken over meanwhile."""
+        try:
+            res = self.sender(msg['to_email'], msg['subject'], msg['body'], html=msg['html']) or {}
+            error = None if res.get('ok') else str(res.get('error') or res)
+        except Exception as e:
+            error = repr(e)
+
+        now = _time.time()
+        if error is None:
+            status, next_at = 'sent', msg['next_attempt_at']
+        elif msg['attempts'] >= self.max_attempts or error.startswith(PERMANENT_ERRORS):
+            status, next_at = 'dead', msg['next_attempt_at']
+        else:
+            # Jitter so messages that failed together do not retry together
+            delay = backoff_delay(msg['attempts'], self.backoff_base, self.backoff_max)
+            status, next_at = 'retrying', now + delay * random.uniform(0.8, 1.0)
+
+        with self._db() as conn:
+            cur = conn.execute(
+                "UPDATE outbox SET status = ?, next_attempt_at = ?, last_error = ?, updated_at = ?, sent_at = ?,"
+                " lease_owner = NULL WHERE id = ? AND status = 'sending' AND lease_owner = ?",
+                (status, next_at, error, now, now if status == 'sent' else None, msg['id'], msg['lease_owner']),
+            )
+        return status if cur.rowcount == 1 else 'lost'
+
+    def process_due(self, limit: Optional[int] = None) -> int:
+        """Deliver due messages on this thread; returns how many were attempted."""
+        done = 0
+        while limit is None or done < limit:
+            msg = self._claim()
+            if msg is None:
+                break
+            self._deliver(msg)
+            done += 1
+        return done
+
+    def _seconds_until_due(self) -> float:
+        with self._db() as conn:
+            row = conn.execute(
+                "SELECT MIN(next_attempt_at) AS t FROM outbox WHERE status IN ('queued', 'retrying')"
+            ).fetchone()
+        if row is None or row['t'] is None:
+            return 30.0
+        return min(30.0, max(0.0, row['t'] - _time.time()))
+
+    def _run(self):
+        while not self._stopping:
+            try:
+                if self.process_due(limit=1):
+                    continue
+                wait = self._seconds_until_due()
+            except Exception:
+                wait = 5.0
+            with self._cond:
+                if not self._stopping:
+                    self._cond.wait(wait)
+
+    def start(self) -> 'EmailOutbox':
+        """Start the worker threads (once).
+
+        Messages a crash left `sending` are claimed again once their lease
+        expires (see `_claim`); ones in flight elsewhere are not touched.
+        """
+        with self._cond:
+            if self._threads:
+                return self
+            self._stopping = False
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, name=f"email-outbox-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+
+_outbox: Optional[EmailOutbox] = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox() -> EmailOutbox:
+    """The process-wide outbox, with its workers started on first use."""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = EmailOutbox().start()
+        return _outbox
+
+
+def queue_email(to_email: str, subject: str, body: str, html: Optional[str] = None) -> str:
+    """Queue an email for background delivery; returns the message id."""
+    return get_outbox().enqueue(to_email, subject, body, html=html)
+
+
+def queue_emails(messages: Iterable[Tuple[str, str, str]]) -> List[str]:
+    """Queue several (to_email, subject, body) emails at once; returns the message ids."""
+    return get_outbox().enqueue_many(messages)
+
+
+def queue_admin_email(subject: str, body: str, admin_email: Optional[str] = None) -> str:
+    """Queue an email to the admin inbox (same recipient rules as `send_admin_email`)."""
+    from utils.email import admin_address
+    return queue_email(admin_address(admin_email), subject, body)
@@ -0,0 +1,186 @@
+"""Page through the bookings table with a keyset cursor on (exam_date, id).
+
+Offset/limit paging gets slower the deeper it goes and skips or repeats rows
+when bookings are added between pages; a hard `.limit(500)` silently drops
+everything after the cap. `iter_booking_pages` instead orders by
+`(exam_date, id)` and asks each next page for rows strictly after the last
+one seen, so every page is an index range scan (see
+`scripts/add_bookings_exam_date_index.sql`) and nothing is held beyond the
+current page.
+
+Bookings without an `exam_date` come last, paged by id alone, matching
+Postgres' default `NULLS LAST` ordering.
+
+For "Load more" lists, `BookingPager` keeps the loaded rows and the cursor
+after the last one in the visitor's session, so each click fetches only the
+next page, and `fetch_page` reads one row past the page to know whether a
+next page exists at all.
+"""
+
+from typing import Optional, Dict, List, Iterator, Tuple, Callable, Any, MutableMapping
+import os
+import time as _time
+
+
+PAGE_SIZE = int(os.getenv("BOOKINGS_PAGE_SIZE", "200"))
+BOOKING_PAGER_TTL = int(os.getenv("BOOKING_PAGER_TTL", "60"))
+
+Cursor = Tuple[Optional[str], Any]
+
+
+def _get_client(client=None):
+    if client is not None:
+        return client
+    from utils.database import supabase
+    return supabase
+
+
+def cursor_of(row: Dict) -> Cursor:
+    """The (exam_date, id) cursor pointing just past `row`."""
+    return row.get('exam_date'), row.get('id')
+
+
+def iter_booking_pages(
+    filters: Optional[Callable] = None,
+    columns: str = '*',
+    page_size: Optional[int] = None,
+    date_from: Optional[str] = None,
+    after: Optional[Cursor] = None,
+    client=None,
+) -> Iterator[List[Dict]]:
+    """Yield lists of bookings ordered by (exam_date, id), one query per page.
+
+    `filters` receives the query builder and returns it with extra filters
+    (e.g. `lambda q: q.in_("status", statuses)`). `date_from` skips dated
+    bookings before that ISO date; undated bookings are still returned.
+    `after` resumes from a cursor returned by `cursor_of`. Pages are fetched
+    lazily, so stopping early saves the remaining queries. Raises if a
+    query fails.
+    """
+    size = max(1, page_size or PAGE_SIZE)
+    sb = _get_client(client)
+    last_date, last_id = after if after else (None, None)
+    dated = not (after and last_date is None)
+
+    while True:
+        q = sb.table("bookings").select(columns)
+        if filters:
+            q = filters(q)
+        if dated:
+            q = q.not_.is_("exam_date", "null")
+            if date_from:
+                q = q.gte("exam_date", date_from)
+            if last_id is not None:
+                q = q.or_(f"exam_date.gt.{last_date},and(exam_date.eq.{last_date},id.gt.{last_id})")
+            q = q.order("exam_date").order("id")
+        else:
+            q = q.is_("exam_date", "null")
+            if last_id is not None:
+                q = q.gt("id", last_id)
+            q = q.order("id")
+        rows = q.limit(size).execute().data or []
+
+        if rows:
+            yield rows
+            last_date, last_id = cursor_of(rows[-1])
+        if len(rows) < size:
+            if not dated:
+                return
+            # Dated rows exhausted: continue with the undated ones
+            dated = False
+            last_date, last_id = None, None
+
+
+def iter_bookings(**kwargs) -> Iterator[Dict]:
+    """Every booking from `iter_booking_pages`, one row at a time."""
+    for page in iter_booking_pages(**kwargs):
+        yield from page
+
+
+def fetch_page(page_size: Optional[int] = None, after: Optional[Cursor] = None, **kwargs) -> Tuple[List[Dict], bool]:
+    """Up to `page_size` bookings after `after`, and whether another one follows.
+
+    Asks for one row more than the page, so the flag is exact: it is False
+    when the table ends on the page boundary. Takes `iter_booking_pages`'
+    keyword arguments; one query, or two when the page reaches the undated
+    bookings.
+    """
+    size = max(1, page_size or PAGE_SIZE)
+    rows: List[Dict] = []
+    for row in iter_bookings(page_size=size + 1, after=after, **kwargs):
+        rows.append(row)
+        if len(rows) > size:
+            return rows[:size], True
+    return rows, False
+
+
+class BookingPager:
+    """Bookings loaded a page at a time, held in a Streamlit session under `key`.
+
+    `rows()` returns what has been loaded so far (the first page on first
+    use); `load_more()` fetches only the next page, from the cursor kept
+    after the last row. Takes `iter_booking_pages`' keyword arguments
+    (`filters`, `columns`, `date_from`, `client`).
+
+    As in `utils.booking_lists`, the held rows are reloaded (as many as had
+    been loaded, in one query) once a booking write in this process moves
+    the change counter (`utils.booking_changes`), after `BOOKING_PAGER_TTL`
+    seconds, or when `date_from` changes.
+    """
+
+    def __init__(self, session: MutableMapping, key: str, page_size: Optional[int] = None,
+                 ttl: Optional[int] = None, **query):
+        self.session = session
+        self.key = f"_booking_pager_{key}"
+        self.page_size = max(1, page_size or PAGE_SIZE)
+        self.ttl = BOOKING_PAGER_TTL if ttl is None else ttl
+        self.query = query
+
+    def _load(self, count: int) -> Dict[str, Any]:
+        from utils.booking_changes import bookings_version
+
+        version = bookings_version()
+        rows, more = fetch_page(page_size=count, **self.query)
+        entry = {'rows': rows, 'more': more, 'version': version, 'loaded_at': _time.monotonic(),
+                 'date_from': self.query.get('date_from'), 'queries': (self.session.get(self.key) or {}).get('queries', 0) + 1}
+        self.session[self.key] = entry
+        return entry
+
+    def _entry(self) -> Dict[str, Any]:
+        from utils.booking_changes import bookings_version
+
+        entry = self.session.get(self.key)
+        if entry is None:
+            return self._load(self.page_size)
+        if (
+            entry['version'] != bookings_version()
+            or _time.monotonic() - entry['loaded_at'] >= self.ttl
+            or entry['date_from'] != self.query.get('date_from')
+        ):
+            # Reload as many rows as had been loaded, whole pages
+            pages = max(1, -(-len(entry['rows']) // self.page_size))
+            return self._load(pages * self.page_size)
+        return entry
+
+    def rows(self) -> List[Dict]:
+        return list(self._entry()['rows'])
+
+    @property
+    def more(self) -> bool:
+        """Whether at least one more booking follows the loaded ones."""
+        return self._entry()['more']
+
+    def load_more(self) -> None:
+        """Fetch the next page after the last loaded row and append it."""
+        entry = self._entry()
+        if not entry['more']:
+            return
+        after = cursor_of(entry['rows'][-1]) if entry['rows'] else None
+        rows, more = fetch_page(page_size=self.page_size, after=after, **self.query)
+        entry['rows'].extend(rows)
+        entry['more'] = more
+        entry['queries'] += 1
+
+    def reset(self) -> None:
+        """Drop the held rows; the next `rows()` loads the first page again."""
+        self.session.pop(self.key, None)
@@ -0,0 +1,116 @@
+"""Session-scoped store for the logged-in parent's own profile.
+
+Every widget interaction reruns the parent pages from the top, and each run
+used to query `parents` for the parent's row and rebuild the children list.
+`ParentProfileStore` keeps that row in `st.session_state`: it is loaded once
+per login (one query), served from the session on later reruns, updated in
+place when the parent saves their profile, and reloaded only after
+`invalidate()`.
+
+`stats()` reports the session's loads and how many queries the store saved;
+`profile_store_totals()` sums those over every session in this process.
+"""
+
+from typing import Optional, Dict, List, MutableMapping, Any
+import threading
+
+
+SESSION_KEY = "_parent_profile_store"
+
+_totals = {'loads': 0, 'hits': 0}
+_totals_lock = threading.Lock()
+
+
+def _get_client(client=None):
+    if client is not None:
+        return client
+    from utils.database import supabase
+    return supabase
+
+
+def _count(name: str):
+    with _totals_lock:
+        _totals[name] += 1
+
+
+def parent_children(profile: Optional[Dict]) -> List[Dict]:
+    """The profile's `children` list, or a single child built from the legacy first-child columns."""
+    if not profile:
+        return []
+    children = profile.get('children') or []
+    if not children:
+        first = profile.get('child_name') or profile.get('child_firstname') or None
+        if first:
+            children = [{'name': first, 'grade': profile.get('grade'), 'school': profile.get('school')}]
+    return children
+
+
+class ParentProfileStore:
+    """The parent's `parents` row and children, held in a Streamlit session.
+
+    `session` is `st.session_state` (any mutable mapping works). Returned
+    profiles are copies, so callers can modify them without touching the
+    stored row.
+    """
+
+    def __init__(self, session: MutableMapping, client=None):
+        self.session = session
+        self.client = client
+
+    def _state(self) -> Dict[str, Any]:
+        state = self.session.get(SESSION_KEY)
+        if state is None:
+            state = {'user_id': None, 'loaded': False, 'profile': None, 'children': [], 'loads': 0, 'hits': 0}
+            self.session[SESSION_KEY] = state
+        return state
+
+    def get(self, user_id) -> Optional[Dict]:
+        """The parent row for `user_id` (None if there is none), loading it on first use."""
+        state = self._state()
+        if state['loaded'] and state['user_id'] == user_id:
+            state['hits'] += 1
+            _count('hits')
+        else:
+            res = _get_client(self.client).table("parents").select("*").eq("user_id", user_id).execute()
+            data = getattr(res, 'data', None) or []
+            profile = data[0] if data else None
+            state.update({
+                'user_id': user_id,
+                'loaded': True,
+                'profile': profile,
+                'children': parent_children(profile),
+            })
+            state['loads'] += 1
+            _count('loads')
+        return dict(state['profile']) if state['profile'] else None
+
+    def children(self, user_id) -> List[Dict]:
+        """The parent's children (see `parent_children`)."""
+        self.get(user_id)
+        return [dict(c) for c in self._state()['children']]
+
+    def update(self, changes: Dict):
+        """Apply fields just written to the parent's row to the stored copy."""
+        state = self._state()
+        if state['profile'] is None:
+            return
+        state['profile'] = {**state['profile'], **changes}
+        state['children'] = parent_children(state['profile'])
+
+    def invalidate(self):
+        """Drop the stored row; the next `get` queries again."""
+        state = self._state()
+        state['loaded'] = False
+        state['profile'] = None
+        state['children'] = []
+
+    def stats(self) -> Dict[str, int]:
+        """This session's loads and queries saved (rereads served from the session)."""
+        state = self._state()
+        return {'loads': state['loads'], 'queries_saved': state['hits']}
+
+
+def profile_store_totals() -> Dict[str, int]:
+    """Loads and queries saved across all sessions in this process."""
+    with _totals_lock:
+        return {'loads': _totals['loads'], 'queries_saved': _totals['hits']}
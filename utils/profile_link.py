@@ -0,0 +1,103 @@
+"""Link a signed-in user to their parents/tutors row in one round trip.
+
+After sign-in and registration the parent and tutor pages used to reconcile
+the profile row with up to five sequential PostgREST calls (select by
+`user_id`, update `email`, select by `email`, update `user_id`, insert).
+`link_profile` makes the one `rpc('link_profile')` call defined in
+`scripts/add_link_profile_function.sql` instead, so a login costs one auth
+call plus one database call.
+
+Until the migration is applied the function is missing (PostgREST answers
+PGRST202); `link_profile` then runs the same steps as separate calls
+(`link_profile_steps`) and remembers not to try the RPC again in this
+process.
+"""
+
+from typing import Optional, Dict, Any
+import threading
+
+
+LINK_PROFILE_RPC = 'link_profile'
+PROFILE_TABLES = ('parents', 'tutors')
+
+_rpc_missing = False
+_rpc_lock = threading.Lock()
+
+
+def _get_client(client=None):
+    if client is not None:
+        return client
+    from utils.database import supabase
+    return supabase
+
+
+def _missing_function(exc: Exception) -> bool:
+    code = getattr(exc, 'code', None)
+    text = str(exc)
+    return code in ('PGRST202', '42883') or 'PGRST202' in text or 'Could not find the function' in text \
+        or (LINK_PROFILE_RPC in text and 'does not exist' in text)
+
+
+def _result(profile: Optional[Dict], changed: bool) -> Dict[str, Any]:
+    return {'profile': profile, 'changed': changed}
+
+
+def link_profile_steps(table: str, user_id=None, email: Optional[str] = None, client=None) -> Optional[Dict[str, Any]]:
+    """The reconciliation as separate calls (two to three round trips); same result as the RPC."""
+    sb = _get_client(client)
+    email = (email or '').strip() or None
+    if not user_id and not email:
+        return None
+
+    if user_id:
+        rows = sb.table(table).select('*').eq('user_id', user_id).order('id').limit(1).execute().data or []
+        if rows:
+            row = rows[0]
+            if not email or row.get('email') == email:
+                return _result(row, False)
+            res = sb.table(table).update({'email': email}).eq('id', row.get('id')).execute()
+            return _result((res.data or [dict(row, email=email)])[0], True)
+
+    if email:
+        rows = sb.table(table).select('*').eq('email', email).order('id').limit(1).execute().data or []
+        if rows:
+            row = rows[0]
+            if not user_id:
+                return _result(row, False)
+            res = sb.table(table).update({'user_id': user_id}).eq('id', row.get('id')).execute()
+            return _result((res.data or [dict(row, user_id=user_id)])[0], True)
+
+    res = sb.table(table).insert({'user_id': user_id, 'email': email}).execute()
+    return _result((res.data or [None])[0], True)
+
+
+def link_profile(table: str, user_id=None, email: Optional[str] = None, client=None) -> Optional[Dict[str, Any]]:
+    """Find the user's `table` row by user_id, else by email, else create it.
+
+    Returns {'profile': row, 'changed': bool} (`changed` says whether a
+    row was written, so callers know to invalidate their caches), or None
+    without a user id or email. Raises if the database call fails.
+    """
+    global _rpc_missing
+    if table not in PROFILE_TABLES:
+        raise ValueError(f"Unsupported profile table: {table}")
+    if not user_id and not (email or '').strip():
+        return None
+    sb = _get_client(client)
+    if not _rpc_missing:
+        try:
+            res = sb.rpc(LINK_PROFILE_RPC, {
+                'p_table': table,
+                'p_user_id': str(user_id) if user_id else None,
+                'p_email': email,
+            }).execute()
+            data = res.data[0] if isinstance(res.data, list) and res.data else res.data
+            if not data:
+                return None
+            return _result(data.get('profile'), bool(data.get('changed')))
+        except Exception as e:
+            if not _missing_function(e):
+                raise
+            with _rpc_lock:
+                _rpc_missing = True
+    return link_profile_steps(table, user_id, email, client=sb)
@@ -0,0 +1,255 @@
+"""Process-wide cache for the `tutors` and `parents` reference tables.
+
+Most pages start by reading the full tutors or parents table, or by looking
+a single row up by `id`, `user_id` or email. Those tables change rarely, so
+the rows are kept in memory and shared across Streamlit reruns and sessions.
+
+Rows are indexed by `id`, `user_id` and lowercased email. Entries expire
+after `REFERENCE_CACHE_TTL` seconds so edits made outside the app are picked
+up, and at most `REFERENCE_CACHE_MAX_ENTRIES` rows are held per table. Every
+page that writes to one of these tables calls `invalidate()` on the matching
+cache straight after the write.
+
+The rows are shared by every session in the process, so they are only ever
+loaded with a fixed role: the cache's `role` ('anon' by default, the shared
+`utils.database.supabase` client, which is never signed in; or 'service').
+`tutors_cache` uses 'anon', since approved tutors are public. Parents are
+private, so `parents_cache` loads with 'service' and its rows are only
+served to server-side code that passes no client of its own.
+
+A visitor's own client (`utils.session.get_session_client()`) may be passed
+to `get()` or `all()` to read rows as that visitor, such as their own
+unapproved tutor row or, for an admin, every parent: those results are
+returned to the caller and never kept, so row-level security decisions made
+for one visitor are not served to another.
+"""
+
+from typing import Optional, Dict, List, Any
+from collections import OrderedDict
+import os
+import threading
+import time as _time
+
+
+REFERENCE_CACHE_TTL = int(os.getenv("REFERENCE_CACHE_TTL", "120"))
+REFERENCE_CACHE_MAX_ENTRIES = int(os.getenv("REFERENCE_CACHE_MAX_ENTRIES", "5000"))
+
+INDEXED_KEYS = ('id', 'user_id', 'email')
+
+# Roles a shared cache may load with (never a visitor's JWT)
+CACHE_ROLES = ('anon', 'service')
+
+
+def _role_client(role: str):
+    if role == 'anon':
+        from utils.database import supabase
+        return supabase
+    from utils.supabase_clients import get_client
+    return get_client(role)
+
+
+def _norm(key: str, value) -> Optional[str]:
+    if value is None or value == '':
+        return None
+    if key == 'email':
+        return str(value).strip().lower()
+    return str(value)
+
+
+def _sort_key(column: str):
+    def key(row):
+        v = row.get(column)
+        # Nulls last, like Postgres' default ascending order
+        return (v is None, str(v).lower() if v is not None else '')
+    return key
+
+
+class ReferenceCache:
+    """TTL + size-bounded cache over one table, indexed by id, user_id and email.
+
+    `all()` serves the whole table from a single snapshot; `get()` serves
+    single-row lookups from memory when the row is held, otherwise it
+    queries that row and keeps it. Rows are returned as copies so callers
+    can decorate them freely.
+
+    Loads go through the `role` client ('anon' or 'service'), or `client`
+    when given (a fixed-role client, e.g. in tests). Rows held by an 'anon'
+    cache are public and also answer visitors' lookups; rows held by a
+    'service' cache bypassed row-level security, so a visitor's lookup
+    always goes to the database as that visitor.
+    """
+
+    def __init__(self, table: str, ttl: Optional[int] = None, max_entries: Optional[int] = None,
+                 role: str = 'anon', client=None):
+        if role not in CACHE_ROLES:
+            raise ValueError(f"Unknown Supabase role for a shared cache: {role}")
+        self.table = table
+        self.role = role
+        self._fixed_client = client
+        self.ttl = REFERENCE_CACHE_TTL if ttl is None else ttl
+        self.max_entries = REFERENCE_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Bumped by invalidate() so a load that raced a write is not kept
+        self._generation = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        self._rows: "OrderedDict[str, Dict]" = OrderedDict()
+        self._loaded_at: Dict[str, float] = {}
+        self._index: Dict[str, Dict[str, str]] = {k: {} for k in INDEXED_KEYS}
+        self._snapshot_at: Optional[float] = None
+
+    def _client(self):
+        return self._fixed_client if self._fixed_client is not None else _role_client(self.role)
+
+    def _serves(self, client) -> bool:
+        """Whether rows held in memory may answer a caller using `client`."""
+        return client is None or self.role == 'anon'
+
+    def _fresh(self, loaded_at: Optional[float]) -> bool:
+        return loaded_at is not None and (_time.monotonic() - loaded_at) < self.ttl
+
+    def _put(self, row: Dict, now: float) -> None:
+        rid = _norm('id', row.get('id'))
+        if rid is None:
+            return
+        self._drop(rid)
+        self._rows[rid] = row
+        self._loaded_at[rid] = now
+        for key in INDEXED_KEYS:
+            v = _norm(key, row.get(key))
+            if v is not None:
+                self._index[key].setdefault(v, rid)
+        while len(self._rows) > self.max_entries:
+            oldest = next(iter(self._rows))
+            self._drop(oldest)
+            # The table is no longer fully held in memory
+            self._snapshot_at = None
+
+    def _drop(self, rid: str) -> None:
+        row = self._rows.pop(rid, None)
+        self._loaded_at.pop(rid, None)
+        if row is None:
+            return
+        for key in INDEXED_KEYS:
+            v = _norm(key, row.get(key))
+            if v is not None and self._index[key].get(v) == rid:
+                del self._index[key][v]
+
+    def all(self, order: Optional[str] = None, desc: bool = False, client=None) -> List[Dict]:
+        """Return every row of the table, optionally sorted by `order`.
+
+        `client` is the caller's own (per-visitor) client: unless the
+        cache's rows may be served to it, the table is read through it and
+        the rows are returned without being kept. Raises if the query fails
+        so callers can decide how to degrade.
+        """
+        if not self._serves(client):
+            res = client.table(self.table).select('*').execute()
+            return self._sorted([dict(r) for r in res.data or []], order, desc)
+        with self._lock:
+            if self._fresh(self._snapshot_at):
+                self.hits += 1
+                rows = [dict(r) for r in self._rows.values()]
+            else:
+                rows = None
+                self.misses += 1
+            generation = self._generation
+        if rows is None:
+            res = self._client().table(self.table).select('*').execute()
+            data = res.data or []
+            rows = [dict(r) for r in data]
+            with self._lock:
+                if generation != self._generation:
+                    return self._sorted(rows, order, desc)
+                now = _time.monotonic()
+                self._reset()
+                for r in data:
+                    self._put(r, now)
+                # Tables over the size bound are served but not kept whole
+                if len(data) <= self.max_entries:
+                    self._snapshot_at = now
+        return self._sorted(rows, order, desc)
+
+    @staticmethod
+    def _sorted(rows: List[Dict], order: Optional[str], desc: bool) -> List[Dict]:
+        if order:
+            rows.sort(key=_sort_key(order), reverse=desc)
+        return rows
+
+    def get(self, key: str, value, client=None) -> Optional[Dict]:
+        """Look up a single row by `id`, `user_id` or `email` (case-insensitive).
+
+        Keys not found in memory are always fetched, since row-level security
+        can hide rows from a snapshot that the current user may see. Empty
+        results are not cached.
+
+        `client` is the caller's own (per-visitor) client: a miss (or any
+        lookup, for a 'service' cache) is queried through it so the
+        visitor's JWT applies, and the row found is returned without being
+        kept.
+        """
+        if key not in INDEXED_KEYS:
+            raise ValueError(f"{self.table} cache is not indexed on {key!r}")
+        v = _norm(key, value)
+        if v is None:
+            return None
+        with self._lock:
+            rid = self._index[key].get(v) if self._serves(client) else None
+            if rid is not None and self._fresh(self._loaded_at.get(rid)):
+                self.hits += 1
+                self._rows.move_to_end(rid)
+                return dict(self._rows[rid])
+            self.misses += 1
+            generation = self._generation
+        res = (client or self._client()).table(self.table).select('*').eq(key, value).execute()
+        data = res.data or []
+        if not data:
+            return None
+        if client is not None:
+            # Seen with the visitor's JWT: not for other sessions
+            return dict(data[0])
+        with self._lock:
+            if generation == self._generation:
+                now = _time.monotonic()
+                for r in data:
+                    self._put(r, now)
+        return dict(data[0])
+
+    def get_by_id(self, value, client=None) -> Optional[Dict]:
+        return self.get('id', value, client=client)
+
+    def get_by_user_id(self, value, client=None) -> Optional[Dict]:
+        return self.get('user_id', value, client=client)
+
+    def get_by_email(self, value, client=None) -> Optional[Dict]:
+        return self.get('email', value, client=client)
+
+    def invalidate(self) -> None:
+        """Forget every cached row; call after any write to the table."""
+        with self._lock:
+            self._generation += 1
+            self._reset()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'table': self.table,
+                'role': self.role,
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._rows),
+                'snapshot': self._fresh(self._snapshot_at),
+                'ttl': self.ttl,
+                'max_entries': self.max_entries,
+            }
+
+
+tutors_cache = ReferenceCache('tutors')
+parents_cache = ReferenceCache('parents', role='service')
+
+
+def cache_stats() -> List[Dict[str, Any]]:
+    return [tutors_cache.stats(), parents_cache.stats()]
@@ -0,0 +1,245 @@
+"""Resolve the tutor or parent behind a booking from in-memory hash indexes.
+
+The booking pages used to find a booking's tutor or parent by trying one
+identifier column after another against Supabase and, failing that,
+fetching and scanning the whole table, once per booking. `TutorResolver`
+and `ParentResolver` index the rows once (by default from the shared
+reference cache) on id, user_id, email, phone and normalized full name, so
+a whole list of bookings resolves in a single pass.
+"""
+
+from typing import Optional, Dict, List, Iterable, Any, Tuple
+
+
+def normalize_name(*parts) -> str:
+    """Lowercase and collapse whitespace: `normalize_name(' Ann ', 'SMITH')` -> 'ann smith'."""
+    return ' '.join(' '.join(str(p) for p in parts if p).lower().split())
+
+
+def _norm_email(value) -> str:
+    return str(value or '').strip().lower()
+
+
+def _norm_phone(value) -> str:
+    return str(value or '').strip()
+
+
+class RecordIndex:
+    """Hash indexes over a list of rows.
+
+    `id_columns` are matched on their string value, emails case-insensitively,
+    names via `normalize_name`, and phones by suffix (up to the last 6
+    characters, as the pages compared them). When several rows share a key
+    the lookups return the first one, like the first row of a query result.
+    """
+
+    PHONE_SUFFIX = 6
+
+    def __init__(
+        self,
+        rows: Iterable[Dict],
+        id_columns: Tuple[str, ...] = ('id', 'user_id'),
+        name_columns: Tuple[Tuple[str, ...], ...] = (('name', 'surname'),),
+        phone_columns: Tuple[str, ...] = ('phone',),
+    ):
+        self.rows: List[Dict] = list(rows or [])
+        self._ids: Dict[str, Dict[str, int]] = {c: {} for c in id_columns}
+        self._emails: Dict[str, List[int]] = {}
+        self._names: Dict[str, List[int]] = {}
+        self._phones: Dict[str, List[int]] = {}
+        self._name_list: List[Tuple[str, int]] = []
+
+        for pos, row in enumerate(self.rows):
+            for col, index in self._ids.items():
+                v = row.get(col)
+                if v is not None and v != '':
+                    index.setdefault(str(v), pos)
+            email = _norm_email(row.get('email'))
+            if email:
+                self._emails.setdefault(email, []).append(pos)
+            for cols in name_columns:
+                name = normalize_name(*(row.get(c) for c in cols))
+                if name:
+                    self._names.setdefault(name, []).append(pos)
+                    self._name_list.append((name, pos))
+                    break
+            for col in phone_columns:
+                phone = _norm_phone(row.get(col))
+                if phone:
+                    for k in range(1, min(len(phone), self.PHONE_SUFFIX) + 1):
+                        self._phones.setdefault(phone[-k:], []).append(pos)
+                    break
+        self._substring_memo: Dict[str, Optional[int]] = {}
+
+    def _get(self, pos: Optional[int]) -> Optional[Dict]:
+        return self.rows[pos] if pos is not None else None
+
+    @staticmethod
+    def _first(positions: Optional[List[int]]) -> Optional[int]:
+        return positions[0] if positions else None
+
+    def position(self, column: str, value) -> Optional[int]:
+        if value is None or value == '':
+            return None
+        if column == 'email':
+            return self._first(self._emails.get(_norm_email(value)))
+        index = self._ids.get(column)
+        return index.get(str(value)) if index is not None else None
+
+    def by(self, column: str, value) -> Optional[Dict]:
+        return self._get(self.position(column, value))
+
+    def by_email(self, value) -> Optional[Dict]:
+        return self.by('email', value)
+
+    def by_name(self, value) -> Optional[Dict]:
+        return self._get(self._first(self._names.get(normalize_name(value))))
+
+    def by_phone(self, value) -> Optional[Dict]:
+        """Row whose phone ends with the last 6 characters of `value`."""
+        phone = _norm_phone(value)
+        if not phone:
+            return None
+        return self._get(self._first(self._phones.get(phone[-self.PHONE_SUFFIX:])))
+
+    def name_containing(self, hint) -> Optional[Dict]:
+        """First row whose name contains `hint` or is contained in it.
+
+        Exact matches are a hash lookup; the substring fallback is scanned
+        once per distinct hint and memoized for the rest of the batch.
+        """
+        hint = normalize_name(hint)
+        if not hint:
+            return None
+        if hint in self._names:
+            return self.rows[self._names[hint][0]]
+        if hint not in self._substring_memo:
+            self._substring_memo[hint] = next(
+                (pos for name, pos in self._name_list if hint in name or name in hint), None
+            )
+        return self._get(self._substring_memo[hint])
+
+
+class TutorResolver(RecordIndex):
+    """Resolve `bookings.tutor_id` (or a name stored on the booking) to a tutor row."""
+
+    NAME_HINT_FIELDS = ('tutor_name', 'tutor_fullname', 'tutor')
+
+    def __init__(self, tutors: Optional[Iterable[Dict]] = None):
+        if tutors is None:
+            from utils.reference_cache import tutors_cache
+            tutors = tutors_cache.all()
+        super().__init__(tutors)
+
+    def resolve(self, tutor_ref, booking: Optional[Dict] = None) -> Optional[Dict]:
+        if not tutor_ref:
+            return None
+        for col in ('id', 'user_id', 'email'):
+            t = self.by(col, tutor_ref)
+            if t:
+                return t
+        for field in self.NAME_HINT_FIELDS:
+            t = self.name_containing((booking or {}).get(field))
+            if t:
+                return t
+        return None
+
+    def resolve_many(self, bookings: Iterable[Dict], ref_key: str = 'tutor_id') -> Dict[Any, Optional[Dict]]:
+        """Resolve every booking's tutor; returns a dict keyed by booking id."""
+        return {b.get('id'): self.resolve(b.get(ref_key), b) for b in bookings or []}
+
+
+class ParentResolver(RecordIndex):
+    """Resolve `bookings.parent_id` to a parent row, falling back to the hints on the booking.
+
+    Lookup order follows the old `find_parent`: the id, the booking's user
+    reference, other id-like columns, and finally a score over name, email,
+    phone and child-name hints. Only parents that hit one of the hash
+    indexes are scored, so a child name that merely overlaps part of a
+    token no longer matches on its own.
+
+    Without `parents`, the rows come from the shared parents cache, or
+    through `client` (the caller's own session client) when given.
+    """
+
+    ID_COLUMNS = ('id', 'parent_id', 'user_id', 'uid')
+    USER_REF_FIELDS = ('parent_user_id', 'parent_user', 'user_id')
+
+    def __init__(self, parents: Optional[Iterable[Dict]] = None, client=None):
+        if parents is None:
+            from utils.reference_cache import parents_cache
+            parents = parents_cache.all(client=client)
+        super().__init__(
+            parents,
+            id_columns=self.ID_COLUMNS,
+            name_columns=(('parent_name',), ('name',)),
+            phone_columns=('phone', 'mobile'),
+        )
+        self._child_tokens: Dict[str, List[int]] = {}
+        for pos, row in enumerate(self.rows):
+            for token in set(self._child_name(row).split()):
+                self._child_tokens.setdefault(token, []).append(pos)
+
+    @staticmethod
+    def _child_name(row: Dict) -> str:
+        return (row.get('child_name') or row.get('child_firstname') or row.get('child_lastname') or '').strip().lower()
+
+    def _score(self, row: Dict, parent_ref, name: str, email: str, phone: str, child_tokens: List[str]) -> int:
+        score = 0
+        if parent_ref and str(row.get('id')) == str(parent_ref):
+            score += 50
+        pname = (row.get('parent_name') or row.get('name') or '').strip().lower()
+        if name and pname and name == pname:
+            score += 30
+        pemail = _norm_email(row.get('email'))
+        if email and pemail and email == pemail:
+            score += 40
+        pphone = _norm_phone(row.get('phone') or row.get('mobile'))
+        if phone and pphone and pphone.endswith(phone[-self.PHONE_SUFFIX:]):
+            score += 25
+        p_tokens = self._child_name(row).split()
+        if child_tokens and p_tokens:
+            score += 10 * sum(1 for t in child_tokens if any(t == pt or t in pt or pt in t for pt in p_tokens))
+        return score
+
+    def resolve(self, parent_ref, booking: Optional[Dict] = None) -> Optional[Dict]:
+        if not parent_ref and not booking:
+            return None
+        booking = booking or {}
+        p = self.by('id', parent_ref)
+        if p:
+            return p
+        for key in self.USER_REF_FIELDS:
+            p = self.by('user_id', booking.get(key))
+            if p:
+                return p
+        for col in self.ID_COLUMNS:
+            p = self.by(col, parent_ref)
+            if p:
+                return p
+
+        name = (booking.get('parent_name') or booking.get('parent') or '').strip().lower()
+        email = _norm_email(booking.get('parent_email') or booking.get('email'))
+        phone = _norm_phone(booking.get('parent_phone') or booking.get('phone'))
+        child_tokens = [t for t in (booking.get('child_name') or booking.get('child') or '').strip().lower().split() if t]
+
+        candidates = set()
+        if name:
+            candidates.update(self._names.get(normalize_name(name), ()))
+        if email:
+            candidates.update(self._emails.get(email, ()))
+        if phone:
+            candidates.update(self._phones.get(phone[-self.PHONE_SUFFIX:], ()))
+        for token in child_tokens:
+            candidates.update(self._child_tokens.get(token, ()))
+
+        best, best_score = None, 0
+        for pos in sorted(candidates):
+            score = self._score(self.rows[pos], parent_ref, name, email, phone, child_tokens)
+            if score > best_score:
+                best, best_score = self.rows[pos], score
+        return best
+
+    def resolve_many(self, bookings: Iterable[Dict], ref_key: str = 'parent_id') -> Dict[Any, Optional[Dict]]:
+        """Resolve every booking's parent; returns a dict keyed by booking id."""
+        return {b.get('id'): self.resolve(b.get(ref_key), b) for b in bookings or []}
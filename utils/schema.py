@@ -0,0 +1,252 @@
+"""Columns of the app's tables, read once from the PostgREST OpenAPI root.
+
+Write paths used to find out which columns exist the expensive way: the
+parent profile page sent its update or insert, looked for "Could not find
+... column" in the error and sent it again without `email` or `children`,
+and the cancel/confirm/edit buttons kept only the keys present on the row
+they had loaded (which drops real columns whenever the row was read with a
+narrower `select`).
+
+`SchemaCache` fetches `GET /rest/v1/` (one request, the OpenAPI description
+PostgREST builds from its schema cache) on first use, or from a background
+thread at startup, and keeps every table's columns, types and enum values.
+`writable_payload(table, values)` then keeps just the columns the table has,
+so each write is right on the first try.
+
+If the description cannot be fetched (for example when only the anon key
+is configured and the anon role may not read it) the cache reports the
+schema as unknown: `writable_payload` falls back to the keys of the row
+passed in, or sends the values unchanged. Another fetch is tried after
+`SCHEMA_RETRY_AFTER` seconds. Writes that may then name a column the table
+lacks go through `send_without_missing_column`, which retries once without
+the column PostgREST reports missing ("Could not find the 'x' column",
+PGRST204), as the parent profile page did before this cache existed.
+
+The description is fetched again after `SCHEMA_TTL` seconds, and straight
+away after a PGRST204 error, so a migration is picked up without a restart.
+
+Settings (environment):
+  SCHEMA_RETRY_AFTER  seconds before a failed fetch is tried again (default 60)
+  SCHEMA_TTL          seconds a fetched description is used for (default 600)
+"""
+
+from typing import Optional, Dict, List, Iterable, Callable, Any, FrozenSet, Tuple
+import os
+import re
+import threading
+import time
+
+
+# The tables the app writes to
+SCHEMA_TABLES = ('parents', 'tutors', 'bookings', 'tutor_unavailability')
+
+SCHEMA_RETRY_AFTER = float(os.getenv("SCHEMA_RETRY_AFTER", "60"))
+SCHEMA_TTL = float(os.getenv("SCHEMA_TTL", "600"))
+
+_MISSING_COLUMN = re.compile(r"could not find the '([^']+)' column", re.IGNORECASE)
+
+
+def fetch_openapi() -> Dict[str, Any]:
+    """The OpenAPI description from `SUPABASE_URL/rest/v1/`, on the shared connection pool.
+
+    Uses the service key when configured (the anon role may not be allowed
+    to read the description), otherwise the anon key.
+    """
+    from utils.supabase_clients import get_client_factory, role_key
+
+    factory = get_client_factory()
+    key = role_key('service') or role_key('anon')
+    if not factory.url or not key:
+        raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set in environment")
+    res = factory.http_client.get(
+        factory.url.rstrip('/') + '/rest/v1/',
+        headers={'apikey': key, 'Authorization': f"Bearer {key}", 'Accept': 'application/openapi+json'},
+    )
+    res.raise_for_status()
+    return res.json()
+
+
+def parse_openapi(doc: Dict[str, Any]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """{table: {column: {'type', 'format', 'enum'}}} from a PostgREST OpenAPI document.
+
+    Reads `definitions` (Swagger 2.0, what PostgREST serves) or
+    `components.schemas` (OpenAPI 3).
+    """
+    definitions = (doc or {}).get('definitions')
+    if definitions is None:
+        definitions = ((doc or {}).get('components') or {}).get('schemas') or {}
+    tables = {}
+    for table, spec in definitions.items():
+        props = (spec or {}).get('properties') or {}
+        tables[table] = {
+            column: {
+                'type': (p or {}).get('type'),
+                'format': (p or {}).get('format'),
+                'enum': tuple((p or {}).get('enum') or ()) or None,
+            }
+            for column, p in props.items()
+        }
+    return tables
+
+
+class SchemaCache:
+    """Table columns from one OpenAPI fetch, shared by every session in the process.
+
+    `fetch()` returns the OpenAPI document (default `fetch_openapi`).
+    Concurrent first uses share one fetch. Lookups answer None ("unknown")
+    while the schema could not be loaded. After `ttl` seconds the next
+    lookup fetches the description again; if that fails the old one is
+    kept until the next retry.
+    """
+
+    def __init__(self, fetch: Optional[Callable[[], Dict[str, Any]]] = None,
+                 retry_after: Optional[float] = None, ttl: Optional[float] = None):
+        self._fetch = fetch or fetch_openapi
+        self.retry_after = SCHEMA_RETRY_AFTER if retry_after is None else retry_after
+        self.ttl = SCHEMA_TTL if ttl is None else ttl
+        self._lock = threading.Lock()
+        self._tables: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None
+        self._loaded_at: Optional[float] = None
+        self._failed_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self.loads = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def load(self) -> bool:
+        """Fetch the schema now (replacing what is held); False if the fetch failed."""
+        with self._lock:
+            return self._load()
+
+    def _load(self) -> bool:
+        # Lock held, so callers arriving meanwhile wait for this fetch instead of repeating it
+        try:
+            tables = parse_openapi(self._fetch())
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            self._failed_at = time.monotonic()
+            return False
+        self._tables = tables
+        self._loaded_at = time.monotonic()
+        self._failed_at = None
+        self.loads += 1
+        return True
+
+    def _stale(self) -> bool:
+        return self._tables is None or time.monotonic() - (self._loaded_at or 0.0) >= self.ttl
+
+    def _ensure(self) -> Optional[Dict[str, Dict[str, Dict[str, Any]]]]:
+        tables = self._tables
+        if not self._stale():
+            return tables
+        with self._lock:
+            if self._stale():
+                if self._failed_at is None or time.monotonic() - self._failed_at >= self.retry_after:
+                    self._load()
+            return self._tables
+
+    def start_background_load(self) -> None:
+        """Load on a daemon thread (once), so startup does not wait for it."""
+        with self._lock:
+            if self._tables is not None or self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._ensure, name='schema-cache-load', daemon=True)
+            self._thread.start()
+
+    def invalidate(self) -> None:
+        """Forget the schema (e.g. after a migration); the next lookup fetches it again."""
+        with self._lock:
+            self._tables = None
+            self._loaded_at = None
+            self._failed_at = None
+            self._thread = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._tables is not None
+
+    # Lookups
+
+    def columns(self, table: str) -> Optional[FrozenSet[str]]:
+        """The columns of `table`, or None if the schema (or that table) is unknown."""
+        tables = self._ensure()
+        if tables is None or table not in tables:
+            return None
+        return frozenset(tables[table])
+
+    def has_column(self, table: str, column: str) -> Optional[bool]:
+        columns = self.columns(table)
+        return None if columns is None else column in columns
+
+    def allowed_values(self, table: str, column: str) -> Optional[Tuple]:
+        """The values of an enum-typed column, or None (not an enum, or unknown).
+
+        CHECK constraints are not part of the OpenAPI description, so columns
+        limited that way also answer None.
+        """
+        tables = self._ensure()
+        spec = ((tables or {}).get(table) or {}).get(column)
+        return spec.get('enum') if spec else None
+
+    def missing(self, table: str, columns: Iterable[str]) -> List[str]:
+        """Those of `columns` the table is known not to have (empty when unknown)."""
+        known = self.columns(table)
+        if known is None:
+            return []
+        return [c for c in columns if c not in known]
+
+    def writable_payload(self, table: str, values: Dict[str, Any], row: Optional[Dict] = None) -> Dict[str, Any]:
+        """`values` limited to columns `table` has.
+
+        With the schema unknown, falls back to the keys of `row` (a row
+        read from the table) when given, else returns `values` unchanged.
+        """
+        known = self.columns(table)
+        if known is None:
+            if row is None:
+                return dict(values)
+            known = set(row.keys())
+        return {k: v for k, v in values.items() if k in known}
+
+    def stats(self) -> Dict[str, Any]:
+        tables = self._tables
+        return {
+            'loaded': tables is not None,
+            'loads': self.loads,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'columns': {t: len(tables[t]) for t in SCHEMA_TABLES if tables and t in tables},
+        }
+
+
+schema_cache = SchemaCache()
+
+
+def writable_payload(table: str, values: Dict[str, Any], row: Optional[Dict] = None) -> Dict[str, Any]:
+    """`schema_cache.writable_payload` (see `SchemaCache.writable_payload`)."""
+    return schema_cache.writable_payload(table, values, row)
+
+
+def missing_column(error) -> Optional[str]:
+    """The column a "Could not find the 'x' column" (PGRST204) error names, else None."""
+    match = _MISSING_COLUMN.search(str(error or ''))
+    return match.group(1) if match else None
+
+
+def send_without_missing_column(send: Callable[[Dict[str, Any]], Any], payload: Dict[str, Any],
+                                schema: Optional[SchemaCache] = None) -> Tuple[Any, List[str]]:
+    """`send(payload)`, retried once without the column PostgREST reports missing.
+
+    Returns (result, dropped columns). A missing-column error also makes
+    `schema` (default `schema_cache`) fetch the description again on its
+    next lookup. Other errors, and a second failure, are raised.
+    """
+    try:
+        return send(payload), []
+    except Exception as e:
+        column = missing_column(e)
+        if column is None or column not in payload:
+            raise
+    (schema or schema_cache).invalidate()
+    return send({k: v for k, v in payload.items() if k != column}), [column]
@@ -1,8 +1,15 @@
 import os
+import threading
 import streamlit as st
-from supabase import create_client
 from config import SUPABASE_URL, SUPABASE_KEY
-import httpx
+from utils.supabase_clients import get_client, get_client_factory, new_session_client
+from utils.auth_admin import get_auth_admin
+from utils.token_store import TokenStore
+
+
+def _http():
+    # Auth REST calls go over the same pooled connections as the clients
+    return get_client_factory().http_client
 
 
 def init_session():
@@ -17,11 +24,96 @@ def init_session():
             st.session_state[key] = value
 
 
-@st.cache_resource
 def get_supabase():
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set in environment")
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+    """A shared anon client kept apart from `utils.database.supabase` (do not sign in on it)."""
+    return get_client('anon', name='session')
+
+
+def get_session_client():
+    """This visitor's `SessionClient`, created on first use and kept in session state.
+
+    Sign in, sign out, set sessions and change passwords on it: its auth
+    state and JWT belong to this Streamlit session only, while its requests
+    share the process-wide connection pool.
+    """
+    client = st.session_state.get("_supabase_session")
+    if client is None:
+        client = new_session_client('anon')
+        st.session_state["_supabase_session"] = client
+    # Tokens refreshed in the background (see `get_token_store`) take effect here
+    client.use_access_token(get_token_store().access_token(st.session_state.get("_token_key")))
+    return client
+
+
+_token_store = None
+_token_store_lock = threading.Lock()
+
+
+def get_token_store() -> TokenStore:
+    """The process-wide store of signed-in sessions, refreshed ahead of expiry."""
+    global _token_store
+    with _token_store_lock:
+        if _token_store is None:
+            _token_store = TokenStore(refresh=restore_session_from_refresh)
+        return _token_store
+
+
+def remember_session(session) -> str | None:
+    """Keep this visitor's session from sign-in (an AuthResponse or Session) fresh in the token store."""
+    key = get_token_store().put(session)
+    if key:
+        st.session_state["_token_key"] = key
+    return key
+
+
+def forget_session() -> None:
+    """Stop refreshing this visitor's session (call on sign-out)."""
+    get_token_store().forget(st.session_state.pop("_token_key", None))
+
+
+def restore_remembered_session(refresh_token: str, role: str) -> str:
+    """Sign the visitor in from a remembered refresh token without waiting on the auth endpoint.
+
+    Returns 'restored' (session state is set), 'pending' (the exchange runs
+    in the background; call `await_restored_session` so the page reruns when
+    it is done) or 'failed'.
+    """
+    store = get_token_store()
+    session = store.restore(refresh_token)
+    if session is None:
+        status = store.status(refresh_token)
+        if status == 'failed':
+            return 'failed'
+        if status != 'restored':
+            return 'pending'
+        session = store.restore(refresh_token)  # finished in the meantime
+    user = session.get('user') or {}
+    st.session_state['authenticated'] = True
+    st.session_state['user'] = user
+    st.session_state['role'] = role
+    st.session_state['email'] = user.get('email')
+    st.session_state['_token_key'] = session['key']
+    if session['refresh_token'] != refresh_token:
+        # The token was rotated: keep the browser's copy current
+        import json
+        st.markdown(f"<script>localStorage.setItem('tp_refresh', {json.dumps(session['refresh_token'])});</script>", unsafe_allow_html=True)
+    return 'restored'
+
+
+def await_restored_session(refresh_token: str, interval: float = 0.5) -> None:
+    """Rerun the page once the background restore of `refresh_token` finishes.
+
+    Polls in a fragment, so the rest of the page renders meanwhile.
+    """
+    @st.fragment(run_every=interval)
+    def _poll():
+        if get_token_store().status(refresh_token) != 'pending':
+            st.rerun()
+
+    try:
+        _poll()
+    except Exception:
+        pass
 
 
 def restore_session_from_refresh(refresh_token: str) -> dict | None:
@@ -40,7 +132,7 @@ def restore_session_from_refresh(refresh_token: str) -> dict | None:
         "Content-Type": "application/json",
     }
     try:
-        resp = httpx.post(url, json={"refresh_token": refresh_token}, headers=headers, timeout=10.0)
+        resp = _http().post(url, json={"refresh_token": refresh_token}, headers=headers, timeout=10.0)
         resp.raise_for_status()
         return resp.json()
     except Exception:
@@ -53,73 +145,26 @@ def delete_auth_user(user_id: str) -> dict:
     Requires environment variable `SUPABASE_SERVICE_ROLE` to be set.
     Returns {'ok': True} on success or {'error': 'msg'} on failure.
     """
-    svc = os.getenv('SUPABASE_SERVICE_ROLE')
-    if not svc:
-        return {'error': 'SUPABASE_SERVICE_ROLE not configured'}
-    if not SUPABASE_URL:
-        return {'error': 'SUPABASE_URL not configured'}
-
-    url = f"{SUPABASE_URL.rstrip('/')}/auth/v1/admin/users/{user_id}"
-    headers = {
-        'apikey': svc,
-        'Authorization': f'Bearer {svc}'
-    }
-    try:
-        resp = httpx.delete(url, headers=headers, timeout=10.0)
-        if resp.status_code in (200, 204):
-            return {'ok': True}
-        else:
-            try:
-                return {'error': resp.json()}
-            except Exception:
-                return {'error': f'Status {resp.status_code}: {resp.text}'}
-    except Exception as e:
-        return {'error': str(e)}
+    return get_auth_admin().delete_user(user_id)
 
 
 def set_auth_user_password(user_id: str, new_password: str) -> dict:
     """Set a Supabase Auth user's password via Admin API using the service role key.
 
     Requires `SUPABASE_SERVICE_ROLE` env var. Returns {'ok': True} or {'error': msg}.
+    For many users at once use `get_auth_admin().set_passwords(...)`.
     """
-    svc = os.getenv('SUPABASE_SERVICE_ROLE')
-    if not svc:
-        return {'error': 'SUPABASE_SERVICE_ROLE not configured'}
-    if not SUPABASE_URL:
-        return {'error': 'SUPABASE_URL not configured'}
-
-    url = f"{SUPABASE_URL.rstrip('/')}/auth/v1/admin/users/{user_id}"
-    headers = {
-        'apikey': svc,
-        'Authorization': f'Bearer {svc}',
-        'Content-Type': 'application/json'
-    }
-    body = {'password': new_password}
-    try:
-        resp = httpx.put(url, headers=headers, json=body, timeout=10.0)
-        if resp.status_code in (200, 204):
-            return {'ok': True}
-        else:
-            try:
-                return {'error': resp.json()}
-            except Exception:
-                return {'error': f'Status {resp.status_code}: {resp.text}'}
-    except Exception as e:
-        return {'error': str(e)}
+    return get_auth_admin().set_password(user_id, new_password)
 
 
 def get_supabase_service():
-    """Return a Supabase client using the service role key from SUPABASE_SERVICE_ROLE.
+    """Return the Supabase client using the service role key from SUPABASE_SERVICE_ROLE.
 
-    Raises RuntimeError if the env var is not set.
+    The client is created once and reused. Raises RuntimeError if the env var
+    is not set.
     """
-    svc = os.getenv('SUPABASE_SERVICE_ROLE')
-    if not svc:
-        raise RuntimeError('SUPABASE_SERVICE_ROLE not configured')
-    if not SUPABASE_URL:
-        raise RuntimeError('SUPABASE_URL not configured')
-    # Create a client using the service role
-    return create_client(SUPABASE_URL, svc)
+    # One long-lived service client on the shared connection pool
+    return get_client('service')
 
 
 def generate_recovery_link(email: str) -> dict:
@@ -185,18 +230,11 @@ def generate_recovery_link(email: str) -> dict:
     if not SUPABASE_URL:
         return {'error': 'SUPABASE_URL not configured'}
 
-    url = f"{SUPABASE_URL.rstrip('/')}/auth/v1/admin/generate_link"
-    headers = {
-        'apikey': svc,
-        'Authorization': f'Bearer {svc}',
-        'Content-Type': 'application/json'
-    }
     # Do NOT send an explicit `redirect_to` — let Supabase use the
     # project's configured Site URL. This avoids mismatches and keeps
     # token delivery consistent across environments.
-    body = {'type': 'recovery', 'email': email}
     try:
-        resp = httpx.post(url, headers=headers, json=body, timeout=10.0)
+        resp = get_auth_admin().generate_link(email, 'recovery')
         if resp.status_code in (200, 201):
             try:
                 j = resp.json()
@@ -0,0 +1,307 @@
+"""Long-lived Supabase clients sharing one pooled HTTP connection.
+
+Clients used to be created in several places (a module-level client in
+`utils.database`, a cached one in `utils.session.get_supabase`, a new one on
+every `get_supabase_service()` call and one in the password reset page), each
+with its own connection pool, so most requests - and every admin action
+written with the service client - paid a fresh TLS handshake.
+
+`get_client(role)` returns one client per role (`anon` uses `SUPABASE_KEY`,
+`service` uses `SUPABASE_SERVICE_ROLE`), built once per process. All of them
+share a single `httpx.Client` with keep-alive and HTTP/2. The supabase
+sub-clients send their own API key and auth headers with each request, so
+sharing the connection pool does not mix credentials.
+
+A client also holds the auth session it signed in with, so signing in on a
+shared client would give every Streamlit session in the process the last
+visitor's JWT. Sign-in, sign-out and password changes go through a
+`SessionClient` instead (`new_session_client(role)`, one per visitor, kept
+in the visitor's session state by `utils.session.get_session_client`): an
+auth client and a PostgREST client that carry that visitor's JWT, on the
+same shared pool, without the realtime and storage clients a full
+`supabase.Client` builds.
+
+Settings (environment):
+  SUPABASE_POOL_MAX_CONNECTIONS  connections open at once (default 20)
+  SUPABASE_POOL_MAX_KEEPALIVE    idle connections kept open (default 10)
+  SUPABASE_POOL_KEEPALIVE_EXPIRY seconds an idle connection is kept (default 60)
+  SUPABASE_CONNECT_TIMEOUT       seconds to connect (default 5)
+  SUPABASE_TIMEOUT               seconds to read/write/wait for the pool (default 30)
+  SUPABASE_HTTP2                 "0" to use HTTP/1.1 only (default on)
+"""
+
+from typing import Optional, Dict, Any, Tuple
+from pathlib import Path
+import os
+import threading
+import weakref
+
+import httpx
+from dotenv import load_dotenv
+
+
+# Load .env from repository root (robust when Streamlit changes CWD)
+dotenv_path = Path(__file__).resolve().parents[1] / ".env"
+load_dotenv(dotenv_path=str(dotenv_path))
+
+ROLES = ('anon', 'service')
+
+
+def _setting(name: str, default: str) -> float:
+    return float(os.getenv(name, default))
+
+
+def role_key(role: str) -> Optional[str]:
+    """The API key for `role` from the environment (None if unset)."""
+    if role == 'anon':
+        return os.getenv("SUPABASE_KEY") or os.getenv("SUPABASE_ANON_KEY")
+    if role == 'service':
+        return os.getenv("SUPABASE_SERVICE_ROLE")
+    raise ValueError(f"Unknown Supabase role: {role}")
+
+
+def _missing_error(role: str, url: Optional[str]) -> RuntimeError:
+    if not url:
+        return RuntimeError('SUPABASE_URL not configured')
+    if role == 'service':
+        return RuntimeError('SUPABASE_SERVICE_ROLE not configured')
+    return RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set in environment")
+
+
+class SupabaseClientFactory:
+    """Creates Supabase clients on demand and keeps them, all on one connection pool.
+
+    `url` and `keys` default to the environment; `http_client` is built from
+    the pool settings unless one is passed in.
+    """
+
+    def __init__(self, url: Optional[str] = None, keys: Optional[Dict[str, str]] = None,
+                 http_client: Optional[httpx.Client] = None):
+        self.url = url if url is not None else os.getenv("SUPABASE_URL")
+        self.keys = keys
+        self.max_connections = int(_setting("SUPABASE_POOL_MAX_CONNECTIONS", "20"))
+        self.max_keepalive = int(_setting("SUPABASE_POOL_MAX_KEEPALIVE", "10"))
+        self.keepalive_expiry = _setting("SUPABASE_POOL_KEEPALIVE_EXPIRY", "60")
+        self.connect_timeout = _setting("SUPABASE_CONNECT_TIMEOUT", "5")
+        self.timeout = _setting("SUPABASE_TIMEOUT", "30")
+        self.http2 = os.getenv("SUPABASE_HTTP2", "1").strip().lower() not in ("0", "false", "no", "off")
+
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple[str, str], Any] = {}
+        self._streams = weakref.WeakSet()
+        self._counts = {'requests': 0, 'connections_opened': 0, 'http2_responses': 0}
+        self.http_client = http_client or self._build_http_client()
+
+    def _build_http_client(self) -> httpx.Client:
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        timeout = httpx.Timeout(self.timeout, connect=self.connect_timeout)
+        hooks = {'response': [self._on_response]}
+        try:
+            return httpx.Client(http2=self.http2, limits=limits, timeout=timeout, event_hooks=hooks)
+        except ImportError:
+            # HTTP/2 needs the `h2` package; fall back to keep-alive HTTP/1.1
+            self.http2 = False
+            return httpx.Client(limits=limits, timeout=timeout, event_hooks=hooks)
+
+    def _on_response(self, response: httpx.Response):
+        stream = response.extensions.get('network_stream')
+        with self._lock:
+            self._counts['requests'] += 1
+            if response.http_version == 'HTTP/2':
+                self._counts['http2_responses'] += 1
+            # Each connection has one network stream; a new one means a new handshake
+            if stream is not None:
+                try:
+                    if stream not in self._streams:
+                        self._streams.add(stream)
+                        self._counts['connections_opened'] += 1
+                except TypeError:
+                    pass
+
+    def _key(self, role: str) -> Optional[str]:
+        if self.keys is not None:
+            if role not in ROLES:
+                raise ValueError(f"Unknown Supabase role: {role}")
+            return self.keys.get(role)
+        return role_key(role)
+
+    def new(self, role: str = 'anon'):
+        """A new `role` client on the shared pool (not kept by the factory)."""
+        key = self._key(role)
+        if not self.url or not key:
+            raise _missing_error(role, self.url)
+
+        from supabase import create_client
+        from supabase.lib.client_options import SyncClientOptions
+
+        options = SyncClientOptions(httpx_client=self.http_client)
+        return create_client(self.url, key, options=options)
+
+    def session(self, role: str = 'anon') -> 'SessionClient':
+        """A new `SessionClient` for `role` on the shared pool (not kept by the factory)."""
+        key = self._key(role)
+        if not self.url or not key:
+            raise _missing_error(role, self.url)
+        return SessionClient(self.url, key, self.http_client)
+
+    def client(self, role: str = 'anon', name: str = 'default'):
+        """The `role` client called `name`, created on first use."""
+        with self._lock:
+            existing = self._clients.get((role, name))
+        if existing is not None:
+            return existing
+
+        created = self.new(role)
+        with self._lock:
+            # Another thread may have won the race; keep the first one
+            return self._clients.setdefault((role, name), created)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool settings, request/connection counters and the clients created so far."""
+        with self._lock:
+            counts = dict(self._counts)
+            clients = sorted(f"{role}:{name}" for role, name in self._clients)
+        counts['reused'] = max(counts['requests'] - counts['connections_opened'], 0)
+        counts['open_connections'] = self._open_connections()
+        return {
+            **counts,
+            'clients': clients,
+            'http2': self.http2,
+            'max_connections': self.max_connections,
+            'max_keepalive': self.max_keepalive,
+            'keepalive_expiry': self.keepalive_expiry,
+            'connect_timeout': self.connect_timeout,
+            'timeout': self.timeout,
+        }
+
+    def _open_connections(self) -> Optional[int]:
+        # httpx does not expose its pool publicly; report it when we can see it
+        try:
+            return len(self.http_client._transport._pool.connections)
+        except Exception:
+            return None
+
+    def close(self):
+        """Close the shared HTTP client and forget all clients."""
+        with self._lock:
+            self._clients.clear()
+        try:
+            self.http_client.close()
+        except Exception:
+            pass
+
+
+class SessionClient:
+    """One visitor's Supabase handle: its own auth session, the factory's pool.
+
+    `auth` is a GoTrue client (sign_in_with_password, sign_up, set_session,
+    update_user, sign_out, ...). `table`/`from_`/`rpc` go to PostgREST with
+    the signed-in user's access token, or the API key when signed out, so
+    row-level security sees this visitor and no one else. Tokens are not
+    refreshed in the background.
+    """
+
+    def __init__(self, url: str, key: str, http_client: httpx.Client):
+        from supabase_auth import SyncGoTrueClient
+
+        self.url = url.rstrip('/')
+        self.key = key
+        self.http_client = http_client
+        self.auth = SyncGoTrueClient(
+            url=f"{self.url}/auth/v1",
+            headers={'apiKey': key, 'Authorization': f"Bearer {key}"},
+            http_client=http_client,
+            auto_refresh_token=False,
+        )
+        self._access_token: Optional[str] = None
+        self._postgrest = None
+        self.auth.on_auth_state_change(self._on_auth_event)
+
+    def _on_auth_event(self, event, session):
+        token = getattr(session, 'access_token', None) if event != 'SIGNED_OUT' else None
+        if token != self._access_token:
+            self._access_token = token
+            self._postgrest = None
+
+    @property
+    def access_token(self) -> Optional[str]:
+        """The signed-in user's JWT, or None when signed out."""
+        return self._access_token
+
+    def use_access_token(self, token: Optional[str]) -> None:
+        """Query with `token` (e.g. a session restored or refreshed by `utils.token_store`)."""
+        if token and token != self._access_token:
+            self._access_token = token
+            self._postgrest = None
+
+    @property
+    def postgrest(self):
+        if self._postgrest is None:
+            from postgrest import SyncPostgrestClient
+            from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+
+            headers = {
+                **DEFAULT_POSTGREST_CLIENT_HEADERS,
+                'apiKey': self.key,
+                'Authorization': f"Bearer {self._access_token or self.key}",
+            }
+            self._postgrest = SyncPostgrestClient(f"{self.url}/rest/v1", headers=headers,
+                                                  http_client=self.http_client)
+        return self._postgrest
+
+    def table(self, table_name: str):
+        return self.postgrest.from_(table_name)
+
+    from_ = table
+
+    def rpc(self, fn: str, params: Optional[Dict[str, Any]] = None, **kwargs):
+        return self.postgrest.rpc(fn, params or {}, **kwargs)
+
+
+_factory: Optional[SupabaseClientFactory] = None
+_factory_lock = threading.Lock()
+
+
+def get_client_factory() -> SupabaseClientFactory:
+    """The process-wide factory, created on first use."""
+    global _factory
+    with _factory_lock:
+        if _factory is None:
+            _factory = SupabaseClientFactory()
+        return _factory
+
+
+def reset_client_factory():
+    """Close the shared pool so the next call re-reads the settings."""
+    global _factory
+    with _factory_lock:
+        factory, _factory = _factory, None
+    if factory is not None:
+        factory.close()
+
+
+def get_client(role: str = 'anon', name: str = 'default'):
+    """A long-lived Supabase client for `role` ('anon' or 'service').
+
+    Raises RuntimeError if the URL or the role's key is not configured.
+    """
+    return get_client_factory().client(role, name)
+
+
+def new_client(role: str = 'anon'):
+    """A separate client for `role` with its own auth state, on the shared pool."""
+    return get_client_factory().new(role)
+
+
+def new_session_client(role: str = 'anon') -> SessionClient:
+    """A per-visitor `SessionClient` for `role`, on the shared pool."""
+    return get_client_factory().session(role)
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Statistics for the shared connection pool (see `SupabaseClientFactory.stats`)."""
+    return get_client_factory().stats()
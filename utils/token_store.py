@@ -0,0 +1,339 @@
+"""Auth sessions cached per visitor and refreshed before they expire.
+
+Pages used to call `restore_session_from_refresh` (a round trip to the auth
+endpoint) on every run while a remembered `tp_rt` token was in the URL, and
+nothing refreshed access tokens before they expired. `TokenStore` keeps each
+signed-in visitor's access/refresh pair with its expiry:
+
+- `put(session)` records a session from sign-in and returns its key;
+- `restore(refresh_token)` returns the session a remembered refresh token
+  belongs to, without a network call, when it is that session's current
+  token. Otherwise it starts the exchange in the background and returns
+  None; `status()` tells whether it is still running, and the next
+  `restore()` of the same token picks up the result once. A token rotated
+  out by a refresh is never answered from memory: it goes to the auth
+  endpoint, which rejects reuse, so a stale or leaked `tp_rt` stops working
+  with rotation, password changes and deleted users;
+- a scheduler thread refreshes every session `REFRESH_LEAD` seconds before it
+  expires, on a small worker pool. Concurrent refreshes of the same refresh
+  token share one request.
+
+Sessions not used for `SESSION_IDLE_TTL` seconds are dropped instead of
+refreshed, so abandoned ones stop costing requests.
+
+Settings (environment):
+  TOKEN_REFRESH_LEAD      seconds before expiry to refresh (default 120)
+  TOKEN_REFRESH_WORKERS   concurrent refresh requests (default 4)
+  TOKEN_SESSION_IDLE_TTL  seconds a session is kept without use (default 43200)
+"""
+
+from typing import Optional, Dict, List, Callable, Any, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+import heapq
+import os
+import threading
+import time
+import uuid
+
+
+REFRESH_LEAD = float(os.getenv("TOKEN_REFRESH_LEAD", "120"))
+REFRESH_WORKERS = int(os.getenv("TOKEN_REFRESH_WORKERS", "4"))
+SESSION_IDLE_TTL = float(os.getenv("TOKEN_SESSION_IDLE_TTL", "43200"))
+
+# Seconds before a failed exchange of the same refresh token is tried again
+FAILED_RETRY_AFTER = 30.0
+
+# Seconds the result of a background exchange waits for its caller's next restore()
+HANDOFF_TTL = 60.0
+
+
+def _field(obj, name: str):
+    return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+
+def _as_dict(user) -> Optional[Dict]:
+    if user is None or isinstance(user, dict):
+        return user
+    try:
+        return user.model_dump(mode='json')
+    except Exception:
+        return {'id': getattr(user, 'id', None), 'email': getattr(user, 'email', None)}
+
+
+def normalize_session(session, now: float) -> Optional[Dict[str, Any]]:
+    """{'access_token', 'refresh_token', 'expires_at', 'user'} from an auth response or Session.
+
+    Accepts the JSON of the token endpoint, a supabase `Session` or an
+    `AuthResponse` holding one. Returns None without both tokens.
+    """
+    if session is None:
+        return None
+    inner = _field(session, 'session')
+    if inner is not None and not _field(session, 'access_token'):
+        session = inner
+    access, refresh = _field(session, 'access_token'), _field(session, 'refresh_token')
+    if not access or not refresh:
+        return None
+    expires_at = _field(session, 'expires_at')
+    if not expires_at:
+        expires_at = now + float(_field(session, 'expires_in') or 3600)
+    return {
+        'access_token': access,
+        'refresh_token': refresh,
+        'expires_at': float(expires_at),
+        'user': _as_dict(_field(session, 'user')),
+    }
+
+
+class TokenStore:
+    """Access/refresh pairs by session key, refreshed in the background ahead of expiry.
+
+    `refresh(refresh_token)` exchanges a refresh token and returns the new
+    session (see `normalize_session`) or None. With `background=False` no
+    scheduler thread is started and `run_due()` performs due refreshes.
+    """
+
+    def __init__(self, refresh: Callable[[str], Any], lead: Optional[float] = None,
+                 idle_ttl: Optional[float] = None, workers: Optional[int] = None,
+                 clock: Callable[[], float] = time.time, background: bool = True):
+        self._refresh = refresh
+        self.lead = REFRESH_LEAD if lead is None else lead
+        self.idle_ttl = SESSION_IDLE_TTL if idle_ttl is None else idle_ttl
+        self.workers = REFRESH_WORKERS if workers is None else workers
+        self.clock = clock
+        self.background = background
+
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._last_used: Dict[str, float] = {}
+        # Current refresh token of each session -> its key (never rotated-out tokens)
+        self._by_refresh: Dict[str, str] = {}
+        # Token exchanged by restore() -> (key, when), until the caller picks it up
+        self._handoff: Dict[str, Tuple[str, float]] = {}
+        self._failed: Dict[str, float] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._due: List[Tuple[float, str, str]] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.counts = {'refreshes': 0, 'failures': 0, 'deduplicated': 0, 'cache_hits': 0, 'dropped_idle': 0}
+
+    # Sessions
+
+    def put(self, session) -> Optional[str]:
+        """Record a session (e.g. from sign-in); returns its key, or None if it has no tokens."""
+        s = normalize_session(session, self.clock())
+        if s is None:
+            return None
+        with self._lock:
+            key = self._by_refresh.get(s['refresh_token']) or uuid.uuid4().hex
+            self._last_used[key] = self.clock()
+            self._store(key, s)
+        return key
+
+    def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """The current session for `key` (marks it used), or None."""
+        with self._lock:
+            s = self._sessions.get(key) if key else None
+            if s is None:
+                return None
+            self._last_used[key] = self.clock()
+            return dict(s)
+
+    def access_token(self, key: Optional[str]) -> Optional[str]:
+        s = self.get(key)
+        return s['access_token'] if s else None
+
+    def forget(self, key: Optional[str]) -> None:
+        """Stop keeping and refreshing the session (sign-out)."""
+        with self._lock:
+            self._drop(key)
+
+    def restore(self, refresh_token: str) -> Optional[Dict[str, Any]]:
+        """The session `refresh_token` belongs to, without waiting on the auth endpoint.
+
+        A session's current refresh token answers from memory. Otherwise the
+        exchange is started in the background (once, however many callers
+        ask) and None is returned; call again, or check `status`, once it
+        has finished: that call returns the new session, once.
+        """
+        if not refresh_token:
+            return None
+        with self._lock:
+            key = self._by_refresh.get(refresh_token) or self._take_handoff(refresh_token)
+            if key in self._sessions:
+                self.counts['cache_hits'] += 1
+                self._last_used[key] = self.clock()
+                return dict(self._sessions[key])
+            failed_at = self._failed.get(refresh_token)
+            if failed_at is not None and self.clock() - failed_at < FAILED_RETRY_AFTER:
+                return None
+        self._start_refresh(refresh_token, None)
+        return None
+
+    def status(self, refresh_token: str) -> str:
+        """'restored', 'pending', 'failed' or 'unknown' for a remembered refresh token."""
+        with self._lock:
+            if self._by_refresh.get(refresh_token) in self._sessions or self._handoff_key(refresh_token) in self._sessions:
+                return 'restored'
+            if refresh_token in self._inflight:
+                return 'pending'
+            if refresh_token in self._failed:
+                return 'failed'
+            return 'unknown'
+
+    def wait(self, refresh_token: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Block until a running exchange of `refresh_token` finishes (scripts and tests)."""
+        with self._lock:
+            fut = self._inflight.get(refresh_token)
+        if fut is not None:
+            fut.result(timeout)
+        return self.restore(refresh_token) if self.status(refresh_token) == 'restored' else None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    # Internals (lock held unless noted)
+
+    def _handoff_key(self, token: str) -> Optional[str]:
+        entry = self._handoff.get(token)
+        if entry is None:
+            return None
+        if self.clock() - entry[1] > HANDOFF_TTL:
+            del self._handoff[token]
+            return None
+        return entry[0]
+
+    def _take_handoff(self, token: str) -> Optional[str]:
+        key = self._handoff_key(token)
+        self._handoff.pop(token, None)
+        return key
+
+    def _store(self, key: str, s: Dict[str, Any]) -> None:
+        s = dict(s, key=key)
+        previous = self._sessions.get(key)
+        if previous is not None and self._by_refresh.get(previous['refresh_token']) == key:
+            # Rotated out: from now on only the auth endpoint may accept it
+            del self._by_refresh[previous['refresh_token']]
+        self._sessions[key] = s
+        # A background refresh is not a use: idle sessions must still age out
+        self._last_used.setdefault(key, self.clock())
+        self._by_refresh[s['refresh_token']] = key
+        self._failed.pop(s['refresh_token'], None)
+        heapq.heappush(self._due, (s['expires_at'] - self.lead, key, s['refresh_token']))
+        self._wake.notify()
+        if self.background:
+            self._ensure_thread()
+
+    def _drop(self, key: Optional[str]) -> None:
+        s = self._sessions.pop(key, None)
+        self._last_used.pop(key, None)
+        if s is not None and self._by_refresh.get(s['refresh_token']) == key:
+            del self._by_refresh[s['refresh_token']]
+        for token in [t for t, (k, _) in self._handoff.items() if k == key]:
+            del self._handoff[token]
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix='token-refresh')
+        return self._executor
+
+    def _start_refresh(self, refresh_token: str, key: Optional[str]) -> Future:
+        # Not called with the lock held
+        with self._lock:
+            fut = self._inflight.get(refresh_token)
+            if fut is not None:
+                self.counts['deduplicated'] += 1
+                return fut
+            fut = self._pool().submit(self._run_refresh, refresh_token, key)
+            self._inflight[refresh_token] = fut
+            return fut
+
+    def _run_refresh(self, refresh_token: str, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        # Runs on a worker thread
+        try:
+            result = self._refresh(refresh_token)
+        except Exception:
+            result = None
+        now = self.clock()
+        s = normalize_session(result, now)
+        with self._lock:
+            self._inflight.pop(refresh_token, None)
+            if s is None:
+                self.counts['failures'] += 1
+                self._failed[refresh_token] = now
+                current = self._sessions.get(key) if key else None
+                if current is not None and current['expires_at'] > now + FAILED_RETRY_AFTER:
+                    # Still valid for a while: try again shortly
+                    heapq.heappush(self._due, (now + FAILED_RETRY_AFTER, key, refresh_token))
+                    self._wake.notify()
+                elif current is not None:
+                    self._drop(key)
+                return None
+            self.counts['refreshes'] += 1
+            if key is not None and key not in self._sessions:
+                return None  # signed out while the refresh ran
+            if key is None:
+                # Exchanged for restore(): its caller picks the session up once
+                key = uuid.uuid4().hex
+                self._handoff[refresh_token] = (key, now)
+            self._store(key, s)
+            return dict(self._sessions[key])
+
+    def _take_due(self, now: float) -> List[Tuple[str, str]]:
+        due = []
+        while self._due and self._due[0][0] <= now:
+            _, key, token = heapq.heappop(self._due)
+            s = self._sessions.get(key)
+            if s is None or s['refresh_token'] != token:
+                continue  # dropped or already refreshed
+            if now - self._last_used.get(key, now) > self.idle_ttl:
+                self.counts['dropped_idle'] += 1
+                self._drop(key)
+                continue
+            due.append((key, token))
+        return due
+
+    def run_due(self) -> int:
+        """Refresh every session due now and wait for the results; returns how many were started."""
+        with self._lock:
+            due = self._take_due(self.clock())
+        futures = [self._start_refresh(token, key) for key, token in due]
+        for fut in futures:
+            fut.result()
+        return len(futures)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None and not self._closed:
+            self._thread = threading.Thread(target=self._scheduler, name='token-refresh-scheduler', daemon=True)
+            self._thread.start()
+
+    def _scheduler(self) -> None:
+        while True:
+            with self._wake:
+                if self._closed:
+                    return
+                if not self._due:
+                    self._wake.wait()
+                    continue
+                delay = self._due[0][0] - self.clock()
+                if delay > 0:
+                    self._wake.wait(delay)
+                    continue
+                due = self._take_due(self.clock())
+            for key, token in due:
+                self._start_refresh(token, key)
+
+    def close(self) -> None:
+        """Stop the scheduler and worker threads."""
+        with self._wake:
+            self._closed = True
+            self._wake.notify_all()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.counts, 'sessions': len(self._sessions), 'in_flight': len(self._inflight),
+                    'scheduled': len(self._due)}
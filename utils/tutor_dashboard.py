@@ -0,0 +1,119 @@
+"""Data loader for the tutor home page.
+
+`load_upcoming_bookings` fetches a tutor's bookings from today onwards in
+one query (the `exam_date >= today` filter runs in the database; undated
+rows that carry a `slot` are still returned) and fills in blank schools from
+the parents table with a single batched `in_` query, so the page costs two
+round trips however many bookings the tutor has.
+
+`cached_upcoming_bookings` keeps that result in the Streamlit session per
+tutor and reloads it when any booking is written in this process (see
+`utils.booking_changes`) or after `TUTOR_DASHBOARD_TTL` seconds.
+"""
+
+from typing import Optional, Dict, List, Tuple, MutableMapping
+from datetime import datetime
+import os
+import time as _time
+
+from utils.booking_changes import bookings_version
+from utils.booking_times import normalize_booking_times, window_positions
+from utils.enrichment import fetch_by_ids
+
+
+TUTOR_DASHBOARD_TTL = int(os.getenv("TUTOR_DASHBOARD_TTL", "60"))
+
+# Legacy deployments kept tutor bookings in their own table; probed once per process
+_source_table: Optional[str] = None
+
+# "Relation does not exist", from PostgREST and from Postgres
+_MISSING_TABLE_CODES = ('PGRST205', '42P01')
+
+
+def _get_client(client=None):
+    if client is not None:
+        return client
+    from utils.database import supabase
+    return supabase
+
+
+def _is_missing_table(error) -> bool:
+    code = getattr(error, 'code', None)
+    if code in _MISSING_TABLE_CODES:
+        return True
+    text = str(error)
+    return any(f"'{c}'" in text or f'"{c}"' in text for c in _MISSING_TABLE_CODES)
+
+
+def _bookings_table(sb) -> str:
+    # Only a definite "no such table" answer is remembered; after any other
+    # failure this load reads `bookings` and the next one probes again
+    global _source_table
+    if _source_table is None:
+        try:
+            sb.table("tutor_bookings").select("id").limit(1).execute()
+        except Exception as e:
+            if not _is_missing_table(e):
+                return "bookings"
+            _source_table = "bookings"
+        else:
+            _source_table = "tutor_bookings"
+    return _source_table
+
+
+def load_upcoming_bookings(tutor_id, client=None, now: Optional[datetime] = None) -> List[Tuple[datetime, Dict]]:
+    """(start, booking) pairs for the tutor's upcoming bookings, sorted by start.
+
+    Each booking's blank `school` is replaced by its parent's school when
+    known. Raises if the bookings query fails; a failed school lookup leaves
+    schools blank.
+    """
+    sb = _get_client(client)
+    now = now or datetime.now()
+    table = _bookings_table(sb)
+    q = sb.table(table).select("*").eq("tutor_id", tutor_id)
+    if table == "bookings":
+        q = q.or_(f"exam_date.gte.{now.date().isoformat()},exam_date.is.null")
+    rows = q.execute().data or []
+
+    times = normalize_booking_times(rows, use_slot=True)
+    positions = window_positions(times, now)
+    upcoming = [(ts.to_pydatetime(), rows[i]) for ts, i in zip(times['start'].iloc[positions], positions)]
+
+    missing = [b.get('parent_id') or b.get('parent') for _, b in upcoming if not b.get('school')]
+    if any(missing):
+        try:
+            parents = fetch_by_ids('parents', missing, columns='id,school', client=sb)
+        except Exception:
+            parents = {}
+        for _, b in upcoming:
+            if not b.get('school'):
+                p = parents.get(str(b.get('parent_id') or b.get('parent')))
+                if p and p.get('school'):
+                    b['school'] = p['school']
+    return upcoming
+
+
+def cached_upcoming_bookings(
+    tutor_id,
+    session: MutableMapping,
+    client=None,
+    ttl: Optional[int] = None,
+) -> List[Tuple[datetime, Dict]]:
+    """`load_upcoming_bookings` cached in `session` (e.g. `st.session_state`)."""
+    ttl = TUTOR_DASHBOARD_TTL if ttl is None else ttl
+    key = f"_tutor_dashboard_{tutor_id}"
+    entry = session.get(key)
+    now = datetime.now()
+    if (
+        entry
+        and entry['version'] == bookings_version()
+        and _time.monotonic() - entry['loaded_at'] < ttl
+    ):
+        # Drop bookings that started since the list was loaded
+        return [(dt, b) for dt, b in entry['rows'] if dt >= now]
+
+    version = bookings_version()
+    rows = load_upcoming_bookings(tutor_id, client=client, now=now)
+    session[key] = {'rows': rows, 'version': version, 'loaded_at': _time.monotonic()}
+    return rows
@@ -174,3 +174,34 @@ def safe_rerun():
             st.stop()
         except Exception:
             pass
+
+
+def rerun_fragment():
+    """Rerun only the `st.fragment` this is called from.
+
+    Falls back to a full rerun when not inside a fragment rerun (e.g. the
+    fragment's first draw as part of the page).
+    """
+    try:
+        st.rerun(scope="fragment")
+    except st.errors.StreamlitAPIException:
+        st.rerun()
+
+
+def show_confirmation_steps(booking_label: str, steps: list):
+    """Show the per-step results of a booking confirmation (see utils.confirmation)."""
+    if not steps:
+        return
+    with st.expander(f"Confirmation steps — {booking_label}", expanded=True):
+        for s in steps:
+            line = f"{s['step']}: {s['status']}"
+            if s.get('ms'):
+                line += f" ({s['ms']:.0f} ms)"
+            if s.get('detail'):
+                line += f" — {s['detail']}"
+            if s['status'] == 'ok':
+                st.success(line)
+            elif s['status'] == 'skipped':
+                st.info(line)
+            else:
+                st.warning(line)
@@ -0,0 +1,271 @@
+"""In-memory index over `tutor_unavailability` rows.
+
+Each tutor's rows are split into date segments (ranges of days on which the
+same set of rows applies). Every segment keeps a whole-day flag plus the
+sorted, merged time-of-day intervals, so "is tutor T free on D from start
+for N minutes" is two binary searches instead of parsing and comparing every
+row on every check.
+
+A process-wide instance is shared by the pages. The tutor unavailability
+pages update it in place when they insert or delete a row, and it is
+reloaded from Supabase after `UNAVAILABILITY_INDEX_TTL` seconds so changes
+made outside the app are picked up.
+"""
+
+from typing import Optional, Dict, List, Iterable, Any, Tuple
+from datetime import date, datetime, time
+import bisect
+import os
+import threading
+import time as _time
+
+
+SHARED_INDEX_MAX_AGE = int(os.getenv("UNAVAILABILITY_INDEX_TTL", "300"))
+
+
+def _ordinal(value) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    try:
+        return datetime.fromisoformat(str(value)).date().toordinal()
+    except Exception:
+        return None
+
+
+def _seconds_of_day(value) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, time):
+        t = value
+    else:
+        try:
+            t = datetime.strptime(str(value), "%H:%M:%S").time()
+        except Exception:
+            return None
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+
+def _row_span(row: Dict) -> Optional[Tuple[int, int]]:
+    """Return (start, end) seconds for a timed row, or None for a whole-day block.
+
+    Rows without times block the whole day, and so do rows whose times
+    cannot be parsed (the conservative choice the pages always made).
+    """
+    if not row.get('start_time') or not row.get('end_time'):
+        return None
+    s = _seconds_of_day(row.get('start_time'))
+    e = _seconds_of_day(row.get('end_time'))
+    if s is None or e is None:
+        return None
+    return (s, e)
+
+
+class _TutorIntervals:
+    """Unavailability for a single tutor, segmented by date."""
+
+    __slots__ = ('bounds', 'segments')
+
+    def __init__(self, rows: Iterable[Dict]):
+        entries = []
+        for row in rows:
+            s = _ordinal(row.get('start_date'))
+            e = _ordinal(row.get('end_date'))
+            if s is None or e is None or e < s:
+                # The database date filter never matched such rows either.
+                continue
+            entries.append((s, e, _row_span(row)))
+
+        points = sorted({s for s, _, _ in entries} | {e + 1 for _, e, _ in entries})
+        self.bounds: List[int] = points
+        self.segments: List[Tuple[bool, List[int], List[int]]] = []
+        for day in points[:-1]:
+            full_day = False
+            spans = []
+            for s, e, span in entries:
+                if s <= day <= e:
+                    if span is None:
+                        full_day = True
+                    elif span[0] < span[1]:
+                        # Reversed or empty spans can never overlap a booking.
+                        spans.append(span)
+            self.segments.append((full_day,) + _merge(spans))
+
+    def is_free(self, day: int, start: int, end: int) -> bool:
+        i = bisect.bisect_right(self.bounds, day) - 1
+        if i < 0 or i >= len(self.segments):
+            return True
+        full_day, starts, ends = self.segments[i]
+        if full_day:
+            return False
+        if end <= start:
+            return True
+        # Merged intervals are disjoint and sorted, so only the last one that
+        # starts before the booking ends can overlap it.
+        j = bisect.bisect_left(starts, end) - 1
+        return not (j >= 0 and ends[j] > start)
+
+
+def _merge(spans: List[Tuple[int, int]]) -> Tuple[List[int], List[int]]:
+    starts: List[int] = []
+    ends: List[int] = []
+    for s, e in sorted(spans):
+        if ends and s <= ends[-1]:
+            ends[-1] = max(ends[-1], e)
+        else:
+            starts.append(s)
+            ends.append(e)
+    return starts, ends
+
+
+class UnavailabilityIndex:
+    """Per-tutor interval index over a set of `tutor_unavailability` rows.
+
+    `start_date`/`end_date` record the date window the rows were loaded for,
+    so callers can tell whether the index can answer queries for a date.
+    Use `add` and `remove` to keep it current after writes; only the
+    affected tutor is rebuilt.
+    """
+
+    def __init__(self, rows: Iterable[Dict] = (), start_date=None, end_date=None):
+        self.start_ord = _ordinal(start_date)
+        self.end_ord = _ordinal(end_date) if end_date is not None else self.start_ord
+        self._rows: Dict[Any, Dict[Any, Dict]] = {}
+        self._tutors: Dict[Any, _TutorIntervals] = {}
+        self._owner: Dict[Any, Any] = {}
+        self._anon = 0
+        for row in rows or []:
+            self._store(row)
+        for tutor_id in self._rows:
+            self._rebuild(tutor_id)
+
+    def _store(self, row: Dict) -> Any:
+        tutor_id = row.get('tutor_id')
+        key = row.get('id')
+        if key is None:
+            self._anon += 1
+            key = ('anon', self._anon)
+        self._rows.setdefault(tutor_id, {})[key] = row
+        self._owner[key] = tutor_id
+        return tutor_id
+
+    def _rebuild(self, tutor_id) -> None:
+        rows = self._rows.get(tutor_id)
+        if rows:
+            self._tutors[tutor_id] = _TutorIntervals(rows.values())
+        else:
+            self._rows.pop(tutor_id, None)
+            self._tutors.pop(tutor_id, None)
+
+    def add(self, row: Dict) -> None:
+        """Insert (or replace, by `id`) a row and rebuild that tutor's intervals."""
+        if row.get('id') is not None:
+            self.remove(row.get('id'))
+        self._rebuild(self._store(row))
+
+    def remove(self, row_id) -> bool:
+        """Drop the row with the given `id`. Returns True if it was present."""
+        if row_id not in self._owner:
+            return False
+        tutor_id = self._owner.pop(row_id)
+        self._rows.get(tutor_id, {}).pop(row_id, None)
+        self._rebuild(tutor_id)
+        return True
+
+    def rows_for(self, tutor_id) -> List[Dict]:
+        return list((self._rows.get(tutor_id) or {}).values())
+
+    def covers(self, start_date, end_date=None) -> bool:
+        s = _ordinal(start_date)
+        e = _ordinal(end_date) if end_date is not None else s
+        return self._covers(s, e)
+
+    def _covers(self, s: Optional[int], e: Optional[int]) -> bool:
+        if s is None or e is None or self.start_ord is None or self.end_ord is None:
+            return False
+        return self.start_ord <= s and e <= self.end_ord
+
+    def is_available(self, tutor_id, exam_date, start_time, duration_minutes) -> bool:
+        """True when none of the tutor's rows overlap the booking slot.
+
+        Same rules as the old per-page `_tutor_is_available`: a row without
+        times (or with unparseable ones) blocks the whole day, otherwise any
+        positive overlap with the booking makes the tutor unavailable.
+        """
+        day = _ordinal(exam_date)
+        start = _seconds_of_day(start_time)
+        if day is None or start is None:
+            return False
+        intervals = self._tutors.get(tutor_id)
+        if intervals is None:
+            return True
+        return intervals.is_free(day, start, start + int(duration_minutes * 60))
+
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self._rows.values())
+
+
+def fetch_unavailability_rows(start_date, end_date=None, client=None) -> List[Dict]:
+    """Fetch every unavailability row overlapping [start_date, end_date] in one query."""
+    if client is None:
+        from utils.database import supabase as client
+    start = date.fromordinal(_ordinal(start_date))
+    end = date.fromordinal(_ordinal(end_date)) if end_date is not None else start
+    res = client.table('tutor_unavailability').select('*').lte('start_date', end.isoformat()).gte('end_date', start.isoformat()).execute()
+    return res.data or []
+
+
+_shared_lock = threading.Lock()
+_shared_index: Optional[UnavailabilityIndex] = None
+_shared_loaded_at = 0.0
+
+
+def get_shared_index(start_date, end_date=None) -> UnavailabilityIndex:
+    """Return the process-wide index, loading or widening it if needed.
+
+    A query is only made when the requested window is not already covered
+    or the index is older than `SHARED_INDEX_MAX_AGE` seconds. Raises if
+    that query fails.
+    """
+    global _shared_index, _shared_loaded_at
+    s = _ordinal(start_date)
+    e = _ordinal(end_date) if end_date is not None else s
+    if s is None or e is None:
+        return UnavailabilityIndex()
+    with _shared_lock:
+        fresh = _shared_index is not None and (_time.monotonic() - _shared_loaded_at) < SHARED_INDEX_MAX_AGE
+        if fresh and _shared_index._covers(s, e):
+            return _shared_index
+        if fresh and _shared_index.start_ord is not None:
+            # Widen rather than replace so earlier windows stay answerable.
+            s = min(s, _shared_index.start_ord)
+            e = max(e, _shared_index.end_ord)
+        rows = fetch_unavailability_rows(date.fromordinal(s), date.fromordinal(e))
+        _shared_index = UnavailabilityIndex(rows, date.fromordinal(s), date.fromordinal(e))
+        _shared_loaded_at = _time.monotonic()
+        return _shared_index
+
+
+def record_insert(row: Optional[Dict]) -> None:
+    """Apply a freshly inserted `tutor_unavailability` row to the shared index."""
+    if not row:
+        return
+    with _shared_lock:
+        if _shared_index is not None:
+            _shared_index.add(row)
+
+
+def record_delete(row_id) -> None:
+    """Remove a deleted `tutor_unavailability` row from the shared index."""
+    with _shared_lock:
+        if _shared_index is not None:
+            _shared_index.remove(row_id)
+
+
+def invalidate_shared_index() -> None:
+    global _shared_index
+    with _shared_lock:
+        _shared_index = None